@@ -1,28 +1,54 @@
 from django.contrib import admin
-from .models import Evento, Inscripcion
+from django.db import transaction
+
+from . import contadores
+from .models import Evento, Inscripcion, ListaEspera
 from .models import EventoFoto, EventoCalificacion, EventoComentario
 
+
+class ContadoresAdminMixin:
+    """Los borrados desde el admin no pasan por contadores.ajustar: recalcular los eventos afectados."""
+
+    def delete_model(self, request, obj):
+        with transaction.atomic():
+            evento_id = obj.evento_id
+            super().delete_model(request, obj)
+            contadores.recalcular([evento_id])
+
+    def delete_queryset(self, request, queryset):
+        with transaction.atomic():
+            eventos = set(queryset.values_list('evento_id', flat=True))
+            super().delete_queryset(request, queryset)
+            contadores.recalcular(eventos)
+
+
 @admin.register(Evento)
 class EventoAdmin(admin.ModelAdmin):
     list_display = ('nombre', 'fecha')
     search_fields = ('nombre',)
 
 @admin.register(Inscripcion)
-class InscripcionAdmin(admin.ModelAdmin):
+class InscripcionAdmin(ContadoresAdminMixin, admin.ModelAdmin):
     list_display = ('usuario', 'evento', 'fecha_inscripcion')
     search_fields = ('usuario__email', 'evento__nombre')
     list_filter = ('evento',)
+
+@admin.register(ListaEspera)
+class ListaEsperaAdmin(admin.ModelAdmin):
+    list_display = ('usuario', 'evento', 'fecha')
+    search_fields = ('usuario__email', 'evento__nombre')
+    list_filter = ('evento',)
 @admin.register(EventoFoto)
 class EventoFotoAdmin(admin.ModelAdmin):
     list_display = ("id", "evento", "fecha_subida")
     list_filter = ("evento",)
 
 @admin.register(EventoCalificacion)
-class EventoCalificacionAdmin(admin.ModelAdmin):
+class EventoCalificacionAdmin(ContadoresAdminMixin, admin.ModelAdmin):
     list_display = ("evento", "usuario", "estrellas", "fecha")
     list_filter = ("estrellas", "evento")
 
 @admin.register(EventoComentario)
-class EventoComentarioAdmin(admin.ModelAdmin):
+class EventoComentarioAdmin(ContadoresAdminMixin, admin.ModelAdmin):
     list_display = ("evento", "usuario", "fecha")
     search_fields = ("texto",)
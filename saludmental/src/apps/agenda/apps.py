@@ -3,3 +3,6 @@ from django.apps import AppConfig
 class AgendaConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.agenda'
+
+    def ready(self):
+        from . import signals  # noqa: F401  (registra receptores de invalidación de cache)
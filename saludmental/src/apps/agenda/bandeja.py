@@ -0,0 +1,176 @@
+"""
+Bandeja de moderación: comentarios del foro y de eventos en una sola lista
+cronológica (más recientes primero).
+
+Cada fuente se lee con su propio keyset (fecha, pk) y como mucho `limite + 1`
+filas; las dos listas ya ordenadas se mezclan con heapq.merge (k-way merge),
+así que una página cuesta lo mismo esté donde esté la bandeja. El orden total
+es (fecha, fuente, pk) descendente y el cursor lo codifica:
+
+    <fecha ISO>_<fuente>_<pk>      p. ej. 2026-10-18T20:15:00+00:00_foro_812
+
+Ocultar y mostrar en bloque son un UPDATE por tabla sobre los pk elegidos.
+Eliminar usa el delete() del queryset, que no es un único DELETE: Django
+recoge y borra en cascada respuestas y likes y envía las señales de borrado
+que mantienen las estadísticas y las series del dashboard.
+"""
+import heapq
+from dataclasses import dataclass
+from datetime import datetime, timezone as dt_timezone
+from typing import Callable
+
+from django.db import transaction
+from django.db.models import Q
+from django.urls import reverse
+from django.utils import timezone
+
+from apps.foro.models import Comentario
+
+from . import contadores
+from .models import EventoComentario
+
+POR_PAGINA = 30
+MAX_POR_PAGINA = 100
+ESTADOS = ('marcados', 'ocultos', 'visibles')
+ACCIONES = ('ocultar', 'mostrar', 'eliminar')
+
+
+@dataclass(frozen=True)
+class Fuente:
+    modelo: type
+    relacion: str  # FK al objeto comentado (historia / evento)
+    contexto: Callable  # comentario -> título de la historia o del evento
+    url: Callable  # comentario -> enlace público
+
+
+FUENTES = {
+    'evento': Fuente(
+        EventoComentario, 'evento',
+        contexto=lambda c: str(c.evento),
+        url=lambda c: reverse('agenda_evento_detalle', args=[c.evento_id]),
+    ),
+    'foro': Fuente(
+        Comentario, 'historia',
+        contexto=lambda c: c.historia.titulo,
+        url=lambda c: reverse('historia_detalle', args=[c.historia_id]),
+    ),
+}
+
+
+@dataclass
+class Item:
+    fuente: str
+    obj: object
+
+    @property
+    def clave(self):
+        return (self.obj.fecha, self.fuente, self.obj.pk)
+
+    @property
+    def id(self) -> str:
+        return f'{self.fuente}:{self.obj.pk}'
+
+    def json(self) -> dict:
+        c, fuente = self.obj, FUENTES[self.fuente]
+        return {
+            'id': self.id,
+            'fuente': self.fuente,
+            'usuario': c.usuario.username,
+            'texto': c.texto,
+            'contexto': fuente.contexto(c),
+            'url': fuente.url(c),
+            'fecha': timezone.localtime(c.fecha).strftime('%d/%m/%Y %H:%M'),
+            'oculto': c.oculto,
+            'marcado': c.marcado,
+        }
+
+
+def parse_cursor(raw):
+    """'<fecha ISO>_<fuente>_<pk>' -> (fecha, fuente, pk), o None si no es válido."""
+    try:
+        fecha_iso, fuente, pk = raw.rsplit('_', 2)
+        fecha = datetime.fromisoformat(fecha_iso)
+        if timezone.is_naive(fecha):
+            fecha = timezone.make_aware(fecha, dt_timezone.utc)
+        if fuente not in FUENTES:
+            return None
+        return fecha, fuente, int(pk)
+    except (AttributeError, ValueError):
+        return None
+
+
+def _despues_del_cursor(nombre, cursor) -> Q:
+    """Filas de la fuente `nombre` que van después de `cursor` en el orden (fecha, fuente, pk) descendente."""
+    fecha, fuente, pk = cursor
+    if nombre < fuente:
+        return Q(fecha__lte=fecha)
+    if nombre > fuente:
+        return Q(fecha__lt=fecha)
+    return Q(fecha__lt=fecha) | Q(fecha=fecha, pk__lt=pk)
+
+
+def _queryset(nombre, estado=None, autor=None):
+    fuente = FUENTES[nombre]
+    qs = fuente.modelo.objects.select_related('usuario', fuente.relacion).only(
+        'pk', 'texto', 'fecha', 'oculto', 'marcado', 'usuario', 'usuario__username',
+        fuente.relacion, f'{fuente.relacion}__titulo',
+        *(['evento__nombre'] if nombre == 'evento' else []),
+    )
+    if estado == 'marcados':
+        qs = qs.filter(marcado=True)
+    elif estado == 'ocultos':
+        qs = qs.filter(oculto=True)
+    elif estado == 'visibles':
+        qs = qs.filter(oculto=False)
+    if autor:
+        qs = qs.filter(usuario__username__istartswith=autor)
+    return qs
+
+
+def pagina(cursor=None, limite=POR_PAGINA, fuentes=None, estado=None, autor=None):
+    """Devuelve (items, siguiente). Lee como mucho `limite + 1` filas de cada fuente."""
+    listas = []
+    for nombre in (fuentes or FUENTES):
+        qs = _queryset(nombre, estado, autor)
+        if cursor:
+            qs = qs.filter(_despues_del_cursor(nombre, cursor))
+        filas = qs.order_by('-fecha', '-pk')[:limite + 1]
+        listas.append([Item(nombre, c) for c in filas])
+    mezcla = list(heapq.merge(*listas, key=lambda i: i.clave, reverse=True))
+    items = mezcla[:limite]
+    siguiente = None
+    if len(mezcla) > limite:
+        fecha, fuente, pk = items[-1].clave
+        siguiente = f'{fecha.isoformat()}_{fuente}_{pk}'
+    return items, siguiente
+
+
+def agrupar_ids(ids) -> dict:
+    """['foro:3', 'evento:7', ...] -> {'foro': {3}, 'evento': {7}}; ignora lo que no sea válido."""
+    grupos = {}
+    for valor in ids:
+        fuente, _, pk = str(valor).partition(':')
+        if fuente in FUENTES and pk.isdigit():
+            grupos.setdefault(fuente, set()).add(int(pk))
+    return grupos
+
+
+def aplicar(accion: str, ids) -> int:
+    """Oculta, muestra o elimina los comentarios indicados. Devuelve cuántos de los elegidos cambió."""
+    if accion not in ACCIONES:
+        raise ValueError(accion)
+    total = 0
+    with transaction.atomic():
+        for nombre, pks in agrupar_ids(ids).items():
+            qs = FUENTES[nombre].modelo.objects.filter(pk__in=pks)
+            eventos = set(qs.values_list('evento_id', flat=True)) if nombre == 'evento' else set()
+            if accion == 'eliminar':
+                # Las respuestas y los likes caen en cascada (no se cuentan); las señales
+                # de borrado mantienen las estadísticas y las series del dashboard
+                total += qs.count()
+                qs.delete()
+            else:
+                total += qs.update(oculto=(accion == 'ocultar'))
+            # Los ocultos no cuentan en Evento.comentarios_count
+            contadores.recalcular(eventos)
+    return total
@@ -0,0 +1,104 @@
+"""
+Cache de la agenda pública.
+
+La lista de próximos eventos se guarda bajo una clave versionada: al guardar o
+borrar un Evento o una Inscripcion (ver signals.py) se incrementa la versión y
+las lecturas siguientes recalculan. El timeout nunca supera el inicio del
+próximo evento, de modo que el paso de "próximo" a "pasado" no sirve datos viejos.
+
+Nota: con el LocMemCache por defecto el cache es por proceso; en producción con
+varios workers configurar un CACHES compartido para que la invalidación aplique a todos.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from .models import Evento
+
+_VERSION_KEY = 'agenda:version'
+_ICS_KEY = 'agenda:ics:version'
+
+
+def version_agenda() -> int:
+    """Versión de las entradas de la agenda; cambia con cada invalidar_agenda."""
+    version = cache.get(_VERSION_KEY)
+    if version is None:
+        cache.add(_VERSION_KEY, 1, None)
+        version = cache.get(_VERSION_KEY, 1)
+    return version
+
+
+def invalidar_agenda() -> None:
+    """Invalida todas las entradas de la agenda (cambia la versión de las claves)."""
+    try:
+        cache.incr(_VERSION_KEY)
+    except ValueError:
+        cache.set(_VERSION_KEY, 2, None)
+
+
+def version_ics():
+    """Momento del último cambio en los eventos (alta, edición, borrado, repeticiones); None si no se conoce."""
+    return cache.get(_ICS_KEY)
+
+
+def invalidar_eventos() -> None:
+    """invalidar_agenda tras un cambio en los eventos; además mueve la versión del feed .ics público."""
+    invalidar_agenda()
+    cache.set(_ICS_KEY, timezone.now(), None)
+
+
+def version_evento(pk) -> int:
+    """Versión de las entradas cacheadas de un evento (snapshot del detalle)."""
+    key = f'agenda:evento:{pk}:version'
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, 1, None)
+        version = cache.get(key, 1)
+    return version
+
+
+def invalidar_evento(*pks) -> None:
+    """Invalida el snapshot de detalle de los eventos indicados."""
+    for pk in pks:
+        try:
+            cache.incr(f'agenda:evento:{pk}:version')
+        except ValueError:
+            cache.set(f'agenda:evento:{pk}:version', 2, None)
+
+
+def get_proximos(ahora=None) -> list:
+    """Eventos publicados que aún no empiezan (las series, una entrada por repetición), servidos desde cache."""
+    from .ocurrencias import instancias
+
+    ahora = ahora or timezone.now()
+    key = f'agenda:proximos:v{version_agenda()}'
+    eventos = cache.get(key)
+    if eventos is None:
+        eventos = instancias(Evento.objects.filter(publicado=True), ahora)
+        timeout = int(getattr(settings, 'AGENDA_CACHE_TIMEOUT', 300))
+        if eventos:
+            # Expirar como tarde cuando empiece el primer evento de la lista
+            hasta_inicio = (eventos[0].fecha - ahora).total_seconds()
+            timeout = max(1, min(timeout, int(hasta_inicio) + 1))
+        cache.set(key, eventos, timeout)
+    # Los que empezaron desde que se llenó el cache pasan a "pasados"
+    return [e for e in eventos if e.fecha >= ahora]
+
+
+def get_dashboard_listas(ahora=None) -> dict:
+    """Listas del dashboard (próximos, pasados, populares, historias recientes), cacheadas brevemente."""
+    from apps.foro.models import Historia
+
+    ahora = ahora or timezone.now()
+    key = f'agenda:dashboard:v{version_agenda()}'
+    listas = cache.get(key)
+    if listas is None:
+        listas = {
+            'proximos': list(Evento.objects.filter(fecha__gte=ahora).order_by('fecha')[:5]),
+            'pasados': list(Evento.objects.filter(fecha__lt=ahora).order_by('-fecha')[:5]),
+            'mas_populares': list(Evento.objects.order_by('-inscritos_count')[:3]),
+            'historias_recientes': list(Historia.objects.select_related('usuario').order_by('-fecha')[:5]),
+        }
+        # Los eventos invalidan por versión; las historias solo envejecen con el timeout
+        cache.set(key, listas, int(getattr(settings, 'DASHBOARD_CACHE_TIMEOUT', 60)))
+    return listas
@@ -0,0 +1,117 @@
+"""
+Vista de calendario de la agenda: eventos publicados agrupados por día.
+
+Cada día trae cuántos eventos tiene y los primeros TITULOS_POR_DIA (título,
+tipo y hora), con los días en hora de Colombia, igual que el filtro
+colombia_date. El cliente arma la cuadrícula del mes o la semana sin recibir
+la lista completa de eventos.
+
+- Los eventos únicos salen de una sola consulta agrupada por día
+  (TruncDate en la zona de Colombia): una ventana ROW_NUMBER() por día deja
+  solo los primeros y COUNT() sobre la misma partición da el total.
+- Las series (ocurrencias.py) se expanden para el mes, sin consultar cada
+  repetición.
+
+Se cachea un mes por idioma (los enlaces llevan el prefijo del idioma) bajo
+la versión de la agenda (cache.version_agenda), así que cualquier cambio en
+un evento o en una repetición lo invalida. La semana se arma con los días de
+uno o dos meses cacheados.
+"""
+from datetime import date, datetime, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, F, Window
+from django.db.models.functions import RowNumber, TruncDate
+from django.urls import reverse
+from django.utils import timezone, translation
+
+from . import ocurrencias
+from .cache import version_agenda
+from .models import Evento
+from .resumenes import ZONA, dia_local
+
+TITULOS_POR_DIA = int(getattr(settings, 'AGENDA_CALENDARIO_TITULOS', 3))
+_CAMPOS = ('pk', 'nombre', 'titulo', 'tipo_evento', 'fecha', 'cupo', 'recurrencia', 'recurrencia_hasta')
+
+
+def _inicio_mes(anio: int, mes: int) -> datetime:
+    return datetime(anio, mes, 1, tzinfo=ZONA)
+
+
+def _siguiente_mes(anio: int, mes: int) -> tuple:
+    return (anio + 1, 1) if mes == 12 else (anio, mes + 1)
+
+
+def _item(evento: Evento) -> dict:
+    url = reverse('agenda_evento_detalle', args=[evento.pk])
+    if evento.ocurrencia:
+        url += f'?ocurrencia={evento.ocurrencia_clave}'
+    return {
+        'id': evento.pk,
+        'titulo': str(evento),
+        'tipo': evento.tipo_evento,
+        'hora': timezone.localtime(evento.fecha, ZONA).strftime('%H:%M'),
+        'url': url,
+    }
+
+
+def _cargar_mes(anio: int, mes: int) -> dict:
+    desde = _inicio_mes(anio, mes)
+    hasta = _inicio_mes(*_siguiente_mes(anio, mes))
+    publicados = Evento.objects.filter(publicado=True).only(*_CAMPOS)
+
+    dia = TruncDate('fecha', tzinfo=ZONA)
+    unicos = (
+        publicados.filter(recurrencia='', fecha__gte=desde, fecha__lt=hasta)
+        .annotate(
+            dia=dia,
+            orden=Window(RowNumber(), partition_by=[dia], order_by=[F('fecha').asc(), F('pk').asc()]),
+            total=Window(Count('pk'), partition_by=[dia]),
+        )
+        .filter(orden__lte=TITULOS_POR_DIA)
+    )
+    dias = {}
+    for evento in unicos:
+        bucket = dias.setdefault(evento.dia, {'total': 0, 'eventos': []})
+        bucket['total'] = evento.total
+        bucket['eventos'].append(evento)
+
+    series = list(publicados.exclude(recurrencia='').filter(ocurrencias.q_en_ventana(desde, hasta)))
+    for evento in ocurrencias.expandir(series, desde, hasta - timedelta(microseconds=1)):
+        bucket = dias.setdefault(dia_local(evento.fecha), {'total': 0, 'eventos': []})
+        bucket['total'] += 1
+        bucket['eventos'].append(evento)
+
+    resultado = {}
+    for dia_bucket in sorted(dias):
+        bucket = dias[dia_bucket]
+        primeros = sorted(bucket['eventos'], key=lambda e: (e.fecha, e.pk))[:TITULOS_POR_DIA]
+        resultado[dia_bucket.isoformat()] = {
+            'total': bucket['total'],
+            'eventos': [_item(e) for e in primeros],
+            'mas': bucket['total'] - len(primeros),
+        }
+    return resultado
+
+
+def mes(anio: int, mes: int) -> dict:
+    """{'AAAA-MM-DD': {'total', 'eventos', 'mas'}} de los días del mes con eventos, desde cache."""
+    key = f'agenda:calendario:v{version_agenda()}:{anio}-{mes:02d}:{translation.get_language()}'
+    dias = cache.get(key)
+    if dias is None:
+        dias = _cargar_mes(anio, mes)
+        cache.set(key, dias, int(getattr(settings, 'AGENDA_CACHE_TIMEOUT', 300)))
+    return dias
+
+
+def dias(desde: date, hasta: date) -> dict:
+    """Días con eventos en [desde, hasta], tomados de los meses cacheados que cubren el rango."""
+    resultado = {}
+    anio_mes = (desde.year, desde.month)
+    while anio_mes <= (hasta.year, hasta.month):
+        for clave, bucket in mes(*anio_mes).items():
+            if desde.isoformat() <= clave <= hasta.isoformat():
+                resultado[clave] = bucket
+        anio_mes = _siguiente_mes(*anio_mes)
+    return resultado
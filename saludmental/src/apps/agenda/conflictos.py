@@ -0,0 +1,167 @@
+"""
+Detección de choques de lugar y horario entre eventos.
+
+`Evento.venue_key` guarda el lugar normalizado (minúsculas, sin tildes ni
+puntuación, espacios colapsados) y el índice (venue_key, fecha) permite
+resolver "¿hay otro evento en este lugar a ±1h?" con un único rango indexado,
+en lugar del `lugar__iexact` que obligaba a recorrer la tabla.
+
+Las series (recurrencia.py) se comparan sin generar sus repeticiones: contra un
+evento único se salta aritméticamente a la repetición más cercana a su fecha, y
+entre dos series basta revisar un ciclo del patrón combinado, porque después se
+repite igual: el mínimo común múltiplo de sus periodos en días (diarias y
+semanales) o en meses (dos mensuales que caen siempre en el mismo número de
+día). Si el patrón depende del calendario (n-ésimo día de la semana, días 28 a
+31, o una mensual contra una diaria o semanal) se revisa el ciclo gregoriano completo.
+"""
+import math
+import re
+import unicodedata
+from datetime import datetime, timedelta
+from typing import Optional
+
+from django.db.models import F, Q
+
+from . import recurrencia
+from .models import Evento, Ocurrencia
+from .resumenes import ZONA
+
+VENTANA = timedelta(hours=1)
+# 400 años gregorianos son 4800 meses y 146097 días (20871 semanas exactas): tras
+# ellos el calendario, y con él cualquier par de patrones, se repite igual
+CICLO_GREGORIANO_MESES = 4800
+_NO_ALFANUM = re.compile(r'[^0-9a-z]+')
+
+
+def clave_lugar(lugar: str) -> str:
+    """'  Auditorio   Central, Bogotá ' -> 'auditorio central bogota'"""
+    texto = unicodedata.normalize('NFKD', lugar or '')
+    texto = ''.join(c for c in texto if not unicodedata.combining(c)).lower()
+    return _NO_ALFANUM.sub(' ', texto).strip()[:200]
+
+
+def _series(clave: str, desde, hasta, excluir_pk=None):
+    """Series en el lugar vigentes en algún momento de [desde, hasta] (hasta=None: sin fin)."""
+    qs = Evento.objects.filter(venue_key=clave).exclude(recurrencia='').filter(
+        Q(recurrencia_hasta__isnull=True) | Q(recurrencia_hasta__gte=desde)
+    )
+    if hasta is not None:
+        qs = qs.filter(fecha__lte=hasta)
+    return qs.exclude(pk=excluir_pk) if excluir_pk else qs
+
+
+def _movidas(clave: str, desde, hasta, excluir_pk=None):
+    """Repeticiones movidas (y no canceladas) a [desde, hasta] en el lugar."""
+    qs = Ocurrencia.objects.filter(evento__venue_key=clave, cancelada=False, fecha__gte=desde).exclude(fecha=F('inicio'))
+    if hasta is not None:
+        qs = qs.filter(fecha__lte=hasta)
+    return qs.exclude(evento_id=excluir_pk) if excluir_pk else qs
+
+
+def _excepciones(evento_ids) -> set:
+    """{(evento_id, inicio)} de las repeticiones canceladas o movidas: ya no están en su inicio."""
+    return set(
+        Ocurrencia.objects.filter(evento_id__in=list(evento_ids))
+        .filter(Q(cancelada=True) | ~Q(fecha=F('inicio')))
+        .values_list('evento_id', 'inicio')
+    )
+
+
+def buscar_conflicto(lugar: str, fecha, excluir_pk=None, regla=None) -> Optional[Evento]:
+    """
+    Primer evento en el mismo lugar dentro de ±VENTANA de `fecha`, o None. Con `regla`
+    (recurrencia.Regla), `fecha` es el primer inicio de una serie y se revisa la serie entera.
+    """
+    clave = clave_lugar(lugar)
+    if not clave or fecha is None:
+        return None
+    if regla is not None:
+        return _conflicto_serie(clave, regla, fecha, excluir_pk)
+    desde, hasta = fecha - VENTANA, fecha + VENTANA
+    qs = Evento.objects.filter(venue_key=clave, recurrencia='', fecha__range=(desde, hasta))
+    if excluir_pk:
+        qs = qs.exclude(pk=excluir_pk)
+    choque = qs.order_by('fecha').first()
+    if choque is not None:
+        return choque
+    movida = _movidas(clave, desde, hasta, excluir_pk).select_related('evento').first()
+    if movida is not None:
+        return movida.evento
+    series = list(_series(clave, desde, hasta, excluir_pk))
+    excepciones = _excepciones(s.pk for s in series) if series else set()
+    for serie in series:
+        inicio = recurrencia.cerca(recurrencia.parse(serie.recurrencia), serie.fecha, serie.recurrencia_hasta, fecha, VENTANA)
+        if inicio is not None and (serie.pk, inicio) not in excepciones:
+            return serie
+    return None
+
+
+def _periodo_aprox(regla) -> int:
+    return regla.periodo_dias or 28 * regla.intervalo
+
+
+def _mismo_dia_cada_mes(regla, inicio) -> bool:
+    """
+    True si la serie mensual cae todos los meses en el mismo número de día, que además
+    nunca es el último del mes (el 28 de febrero choca a medianoche con el 1 de marzo).
+    """
+    return not regla.ordinal and (regla.dia_mes or inicio.astimezone(ZONA).day) <= 27
+
+
+def _ciclo(regla, inicio, regla_otra, inicio_otra) -> timedelta:
+    """Tramo tras el cual los choques entre dos series se repiten (un ciclo del patrón combinado más un periodo)."""
+    if regla.periodo_dias and regla_otra.periodo_dias:
+        return timedelta(days=math.lcm(regla.periodo_dias, regla_otra.periodo_dias) + 7)
+    if (not regla.periodo_dias and not regla_otra.periodo_dias
+            and _mismo_dia_cada_mes(regla, inicio) and _mismo_dia_cada_mes(regla_otra, inicio_otra)):
+        meses = math.lcm(regla.intervalo, regla_otra.intervalo)
+    else:
+        meses = CICLO_GREGORIANO_MESES
+    # Meses de hasta 31 días, más el periodo de la más espaciada
+    return timedelta(days=31 * (meses + max(regla.intervalo, regla_otra.intervalo)))
+
+
+def _choque_series(regla, inicio, fin, otra: Evento) -> Optional[datetime]:
+    """Primer inicio de la serie (regla, inicio, fin) que cae a ±VENTANA de una repetición de `otra`."""
+    regla_otra = recurrencia.parse(otra.recurrencia)
+    a = (regla, inicio, fin)
+    b = (regla_otra, otra.fecha, otra.recurrencia_hasta)
+    # Se recorre la más espaciada y se salta en la otra
+    if _periodo_aprox(regla) < _periodo_aprox(regla_otra):
+        a, b = b, a
+    desde = max(inicio, otra.fecha) - VENTANA
+    # Pasado un ciclo del patrón combinado, los choques se repiten: no hace falta seguir
+    try:
+        hasta = desde + _ciclo(regla, inicio, regla_otra, otra.fecha)
+    except OverflowError:
+        hasta = datetime.max.replace(tzinfo=ZONA) - timedelta(days=62)
+    fines = [f for f in (fin, otra.recurrencia_hasta) if f is not None]
+    if fines:
+        hasta = min(hasta, min(fines) + VENTANA)
+    for momento in recurrencia.expandir(a[0], a[1], desde, hasta, a[2]):
+        if recurrencia.cerca(b[0], b[1], b[2], momento, VENTANA) is not None:
+            return momento
+    return None
+
+
+def _conflicto_serie(clave: str, regla, inicio, excluir_pk=None) -> Optional[Evento]:
+    fin = recurrencia.ultimo_inicio(regla, inicio)
+    desde, hasta = inicio - VENTANA, (fin + VENTANA if fin else None)
+    # Eventos únicos y repeticiones movidas del lugar durante la serie: filas reales, una por una
+    unicos = Evento.objects.filter(venue_key=clave, recurrencia='', fecha__gte=desde)
+    if hasta is not None:
+        unicos = unicos.filter(fecha__lte=hasta)
+    if excluir_pk:
+        unicos = unicos.exclude(pk=excluir_pk)
+    for evento in unicos.order_by('fecha').only('pk', 'fecha', 'nombre', 'titulo').iterator():
+        if recurrencia.cerca(regla, inicio, fin, evento.fecha, VENTANA) is not None:
+            return evento
+    for movida in _movidas(clave, desde, hasta, excluir_pk).select_related('evento').iterator():
+        if recurrencia.cerca(regla, inicio, fin, movida.fecha, VENTANA) is not None:
+            return movida.evento
+    # Otras series: un choque del patrón se repite en cada ciclo, así que las
+    # cancelaciones sueltas de la otra serie no lo evitan y no se consultan
+    for otra in _series(clave, desde, hasta, excluir_pk):
+        if _choque_series(regla, inicio, fin, otra) is not None:
+            return otra
+    return None
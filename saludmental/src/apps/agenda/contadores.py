@@ -0,0 +1,65 @@
+"""
+Contadores desnormalizados de Evento (inscritos, calificaciones y comentarios).
+
+Las vistas los ajustan con UPDATE ... SET x = x + n dentro de la misma
+transacción que crea o borra la fila; `recalcular` los reconstruye desde las
+tablas de origen (comando reconcile_contadores, borrados en cascada).
+"""
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from . import estadisticas
+from .cache import invalidar_evento
+from .models import Evento, EventoCalificacion, EventoComentario, Inscripcion, Ocurrencia
+
+
+# Contadores de Evento que también llevan un total global en el dashboard
+_ESTADISTICAS = {'ratings_count': 'calificaciones', 'ratings_sum': 'calificaciones_suma'}
+
+
+def ajustar(evento_id, **deltas) -> None:
+    """Suma `deltas` (p. ej. inscritos_count=1) a los contadores del evento de forma atómica."""
+    Evento.objects.filter(pk=evento_id).update(**{campo: F(campo) + delta for campo, delta in deltas.items()})
+    transaction.on_commit(lambda: invalidar_evento(evento_id))
+    for campo, delta in deltas.items():
+        if campo in _ESTADISTICAS:
+            estadisticas.sumar_al_confirmar(_ESTADISTICAS[campo], delta)
+
+
+def _agregado(qs, expr):
+    sub = qs.filter(evento=OuterRef('pk')).order_by().values('evento').annotate(v=expr).values('v')
+    return Coalesce(Subquery(sub, output_field=IntegerField()), Value(0))
+
+
+def expresiones_recalculo(models=None) -> dict:
+    """Expresiones de UPDATE que recalculan cada contador a partir de las tablas de origen."""
+    m = models or {
+        'Inscripcion': Inscripcion,
+        'EventoCalificacion': EventoCalificacion,
+        'EventoComentario': EventoComentario,
+    }
+    return {
+        'inscritos_count': _agregado(m['Inscripcion'].objects.all(), Count('pk')),
+        'ratings_count': _agregado(m['EventoCalificacion'].objects.all(), Count('pk')),
+        'ratings_sum': _agregado(m['EventoCalificacion'].objects.all(), Sum('estrellas')),
+        # Solo comentarios visibles (los ocultados por moderación no cuentan)
+        'comentarios_count': _agregado(m['EventoComentario'].objects.filter(oculto=False), Count('pk')),
+    }
+
+
+def recalcular(evento_ids=None) -> int:
+    """Reconstruye los contadores en un único UPDATE. Sin ids, para todos los eventos."""
+    qs = Evento.objects.all()
+    ocurrencias = Ocurrencia.objects.all()
+    if evento_ids is not None:
+        evento_ids = set(evento_ids)
+        if not evento_ids:
+            return 0
+        qs = qs.filter(pk__in=evento_ids)
+        ocurrencias = ocurrencias.filter(evento_id__in=evento_ids)
+        transaction.on_commit(lambda: invalidar_evento(*evento_ids))
+    # En las series, inscritos_count del evento es el total y cada repetición lleva el suyo
+    sub = Inscripcion.objects.filter(ocurrencia=OuterRef('pk')).order_by().values('ocurrencia').annotate(v=Count('pk')).values('v')
+    ocurrencias.update(inscritos_count=Coalesce(Subquery(sub, output_field=IntegerField()), Value(0)))
+    return qs.update(**expresiones_recalculo())
@@ -0,0 +1,132 @@
+"""
+Totales del panel de administración materializados en la tabla Estadistica.
+
+Cada número del dashboard es una fila (clave, valor, estimado, actualizado:
+fecha del último recálculo) y el dashboard los lee todos con una sola consulta, en vez de contar tablas
+completas en cada carga. Se mantienen de dos formas:
+
+- incrementales: señales post_save/post_delete (signals.py) o
+  contadores.ajustar suman ±1 tras el commit, con un UPDATE de una fila;
+- por recálculo: `recalcular` los cuenta de nuevo. Lo corre el comando
+  recalcular_estadisticas (cron), y el dashboard lo lanza en segundo plano
+  cuando los que no tienen señal (p. ej. notificaciones marcadas como leídas
+  con .update()) superan ESTADISTICAS_MAX_EDAD. El recálculo también
+  corrige la deriva de los incrementales (bulk_create, borrados en cascada).
+
+Con ESTADISTICAS_ESTIMADAS (o --estimado) y PostgreSQL, las tablas grandes se
+cuentan con la estimación del planner (pg_class.reltuples) en lugar de COUNT(*).
+"""
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Optional
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Count, F, Sum
+from django.utils import timezone
+
+from .models import Estadistica
+from . import tareas
+
+MAX_EDAD = timedelta(seconds=int(getattr(settings, 'ESTADISTICAS_MAX_EDAD', 600)))
+ESTIMADAS = bool(getattr(settings, 'ESTADISTICAS_ESTIMADAS', False))
+
+
+@dataclass(frozen=True)
+class Metrica:
+    modelo: str
+    # 'senales': signals.py; 'contadores': contadores.ajustar; 'recalculo': solo recalcular
+    origen: str
+    filtro: Optional[dict] = None
+    suma: Optional[str] = None  # campo a sumar en vez de contar filas
+    estimable: bool = False
+
+
+METRICAS = {
+    'usuarios': Metrica(settings.AUTH_USER_MODEL, 'senales'),
+    'eventos': Metrica('agenda.Evento', 'senales'),
+    'inscripciones': Metrica('agenda.Inscripcion', 'senales', estimable=True),
+    'historias': Metrica('foro.Historia', 'senales'),
+    'comentarios_foro': Metrica('foro.Comentario', 'senales', estimable=True),
+    'comentarios_eventos': Metrica('agenda.EventoComentario', 'senales', estimable=True),
+    'calificaciones': Metrica('agenda.EventoCalificacion', 'contadores'),
+    'calificaciones_suma': Metrica('agenda.EventoCalificacion', 'contadores', suma='estrellas'),
+    'notificaciones_pendientes': Metrica('usuarios.Notificacion', 'recalculo', filtro={'leida': False}),
+}
+SOLO_RECALCULO = [clave for clave, m in METRICAS.items() if m.origen == 'recalculo']
+
+
+def _estimar(modelo) -> Optional[int]:
+    """Filas estimadas por el planner de PostgreSQL; None si no hay estimación."""
+    if connection.vendor != 'postgresql':
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass', [modelo._meta.db_table])
+        fila = cursor.fetchone()
+    # -1: la tabla nunca se analizó
+    return fila[0] if fila and fila[0] >= 0 else None
+
+
+def _calcular(metrica: Metrica, estimado: bool):
+    modelo = apps.get_model(metrica.modelo)
+    if estimado and metrica.estimable and not metrica.filtro:
+        valor = _estimar(modelo)
+        if valor is not None:
+            return valor, True
+    qs = modelo._default_manager.filter(**(metrica.filtro or {}))
+    if metrica.suma:
+        return qs.aggregate(v=Sum(metrica.suma))['v'] or 0, False
+    return qs.aggregate(v=Count('pk'))['v'], False
+
+
+def recalcular(claves=None, estimado=None) -> dict:
+    """Recalcula las métricas indicadas (todas por defecto) y las guarda. Devuelve {clave: Estadistica}."""
+    estimado = ESTIMADAS if estimado is None else estimado
+    claves = list(claves or METRICAS)
+    with transaction.atomic():
+        # Escribir primero: las filas quedan bloqueadas hasta el commit y un `sumar`
+        # concurrente espera y se aplica sobre el valor recalculado en vez de perderse
+        Estadistica.objects.filter(clave__in=claves).update(valor=F('valor'))
+        filas = []
+        for clave in claves:
+            valor, aproximado = _calcular(METRICAS[clave], estimado)
+            filas.append(Estadistica(clave=clave, valor=valor, estimado=aproximado, actualizado=timezone.now()))
+        Estadistica.objects.bulk_create(
+            filas, update_conflicts=True, unique_fields=['clave'], update_fields=['valor', 'estimado', 'actualizado'],
+        )
+    return {e.clave: e for e in filas}
+
+
+def sumar(clave: str, delta: int) -> None:
+    """Ajusta una métrica incremental. Si aún no existe, la creará el primer recálculo.
+
+    No toca `actualizado`: marca el último recálculo, que es lo que mira leer().
+    """
+    if delta:
+        Estadistica.objects.filter(clave=clave).update(valor=F('valor') + delta)
+
+
+def sumar_al_confirmar(clave: str, delta: int) -> None:
+    # Fuera de la transacción: la fila global no queda bloqueada mientras dura la escritura original
+    transaction.on_commit(lambda: sumar(clave, delta))
+
+
+def leer() -> dict:
+    """Todas las métricas en una consulta. Crea las que falten y refresca en segundo plano las viejas."""
+    stats = {e.clave: e for e in Estadistica.objects.all()}
+    faltantes = [clave for clave in METRICAS if clave not in stats]
+    if faltantes:
+        stats.update(recalcular(faltantes))
+    limite = timezone.now() - MAX_EDAD
+    viejas = [clave for clave in SOLO_RECALCULO if stats[clave].actualizado < limite]
+    # cache.add: un solo refresco en vuelo aunque el dashboard se recargue varias veces
+    if viejas and cache.add('agenda:estadisticas:refrescando', 1, 60):
+        tareas.encolar(recalcular, viejas)
+    return stats
+
+
+def rating_promedio(stats: dict) -> float:
+    cantidad = stats['calificaciones'].valor
+    return round(stats['calificaciones_suma'].valor / cantidad, 1) if cantidad else 0
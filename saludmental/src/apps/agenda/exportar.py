@@ -0,0 +1,263 @@
+"""
+Exportación en CSV y XLSX de inscripciones, usuarios y calificaciones.
+
+Las filas se leen con .values_list().iterator(chunk_size=LOTE) (sin instanciar
+modelos ni cargar el queryset completo) y se entregan a StreamingHttpResponse a
+medida que salen: el primer byte llega enseguida y la memoria no crece con el
+número de filas.
+
+El XLSX se genera sin dependencias: es un ZIP con unas pocas partes XML fijas y
+una hoja que se escribe fila a fila con celdas de texto en línea (inlineStr).
+zipfile acepta una salida no posicionable (usa descriptores de datos), así que
+cada bloque comprimido se entrega en cuanto está listo.
+"""
+import csv
+import io
+import re
+import zipfile
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, Optional
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+from django.db.models import F, Value
+from django.db.models.functions import Coalesce, NullIf
+from django.utils import timezone
+
+from apps.usuarios.models import CustomUser
+
+from .models import EventoCalificacion, Inscripcion
+from .resumenes import ZONA
+
+LOTE = int(getattr(settings, 'EXPORTAR_LOTE', 2000))
+FORMATOS = {
+    'csv': 'text/csv; charset=utf-8',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+
+def _texto(valor) -> str:
+    if valor is None:
+        return ''
+    if isinstance(valor, bool):
+        return 'Sí' if valor else 'No'
+    if isinstance(valor, datetime):
+        return timezone.localtime(valor, ZONA).strftime('%Y-%m-%d %H:%M')
+    return str(valor)
+
+
+@dataclass(frozen=True)
+class Exportacion:
+    nombre: str  # prefijo del archivo y nombre de la hoja
+    columnas: tuple  # (encabezado, lookup o expresión para values_list)
+    queryset: Callable  # filtros -> QuerySet
+    orden: tuple = ('pk',)
+
+    def encabezados(self) -> list:
+        return [titulo for titulo, _ in self.columnas]
+
+    def filas(self, filtros: Optional[dict] = None):
+        """Tuplas de valores, leídas por bloques sin cachear el queryset."""
+        lookups = [lookup for _, lookup in self.columnas]
+        qs = self.queryset(filtros or {}).order_by(*self.orden).values_list(*lookups)
+        return qs.iterator(chunk_size=LOTE)
+
+
+# Título del evento, o su nombre si no tiene título (como Evento.__str__)
+_TITULO_EVENTO = Coalesce(NullIf(F('evento__titulo'), Value('')), F('evento__nombre'))
+
+
+def _inscripciones(filtros):
+    qs = Inscripcion.objects.all()
+    if filtros.get('evento'):
+        qs = qs.filter(evento_id=filtros['evento'])
+    return qs
+
+
+EXPORTACIONES = {
+    'inscripciones': Exportacion(
+        nombre='inscripciones',
+        columnas=(
+            ('Evento', _TITULO_EVENTO),
+            ('Fecha del evento', 'evento__fecha'),
+            # Fecha real de la repetición en las series; vacía en los eventos únicos
+            ('Repetición', 'ocurrencia__fecha'),
+            ('Usuario', 'usuario__username'),
+            ('Email', 'usuario__email'),
+            ('Nombre completo', 'nombre_completo'),
+            ('Teléfono', 'telefono'),
+            ('Notas', 'notas'),
+            ('Fecha de inscripción', 'fecha_inscripcion'),
+        ),
+        queryset=_inscripciones,
+        orden=('evento_id', 'fecha_inscripcion', 'pk'),
+    ),
+    'usuarios': Exportacion(
+        nombre='usuarios',
+        columnas=(
+            ('ID', 'pk'),
+            ('Usuario', 'username'),
+            ('Email', 'email'),
+            ('Nombre', 'first_name'),
+            ('Apellido', 'last_name'),
+            ('Indicativo', 'phone_code'),
+            ('Teléfono', 'phone_number'),
+            ('Fecha de registro', 'date_joined'),
+            ('Activo', 'is_active'),
+            ('Admin', 'is_staff'),
+        ),
+        queryset=lambda filtros: CustomUser.objects.all(),
+    ),
+    'calificaciones': Exportacion(
+        nombre='calificaciones',
+        columnas=(
+            ('Evento', _TITULO_EVENTO),
+            ('Usuario', 'usuario__username'),
+            ('Email', 'usuario__email'),
+            ('Estrellas', 'estrellas'),
+            ('Fecha', 'fecha'),
+        ),
+        queryset=lambda filtros: (
+            EventoCalificacion.objects.filter(evento_id=filtros['evento'])
+            if filtros.get('evento') else EventoCalificacion.objects.all()
+        ),
+    ),
+}
+
+
+# ============ CSV ============
+
+def _celda_csv(valor) -> str:
+    texto = _texto(valor)
+    # Evita que Excel interprete como fórmula lo que escribió un usuario
+    if texto[:1] in ('=', '+', '-', '@', '\t', '\r') and not isinstance(valor, (int, float)):
+        return "'" + texto
+    return texto
+
+
+def csv_stream(exportacion: Exportacion, filtros=None, por_bloque=500):
+    """Genera el CSV en bloques de `por_bloque` filas (con BOM para que Excel lea UTF-8)."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    buffer.write('\ufeff')
+    writer.writerow(exportacion.encabezados())
+    for n, fila in enumerate(exportacion.filas(filtros), 1):
+        writer.writerow([_celda_csv(v) for v in fila])
+        if n % por_bloque == 0:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode('utf-8')
+
+
+# ============ XLSX ============
+
+_NS = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+_NS_REL = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+_NS_PKG = 'http://schemas.openxmlformats.org/package/2006/relationships'
+_XML = '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+_CONTROL = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+_PARTES = {
+    '[Content_Types].xml': (
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '<Override PartName="/xl/styles.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        f'<Relationships xmlns="{_NS_PKG}">'
+        f'<Relationship Id="rId1" Type="{_NS_REL}/officeDocument" Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        f'<Relationships xmlns="{_NS_PKG}">'
+        f'<Relationship Id="rId1" Type="{_NS_REL}/worksheet" Target="worksheets/sheet1.xml"/>'
+        f'<Relationship Id="rId2" Type="{_NS_REL}/styles" Target="styles.xml"/>'
+        '</Relationships>'
+    ),
+    # Estilo 1: encabezado en negrita
+    'xl/styles.xml': (
+        f'<styleSheet xmlns="{_NS}">'
+        '<fonts count="2"><font><sz val="11"/><name val="Calibri"/></font>'
+        '<font><b/><sz val="11"/><name val="Calibri"/></font></fonts>'
+        '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+        '<fill><patternFill patternType="gray125"/></fill></fills>'
+        '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+        '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+        '<cellXfs count="2"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+        '<xf numFmtId="0" fontId="1" fillId="0" borderId="0" xfId="0" applyFont="1"/></cellXfs>'
+        '</styleSheet>'
+    ),
+}
+
+
+class _Tubo:
+    """Salida no posicionable para zipfile: acumula lo escrito hasta que el generador lo entrega."""
+
+    def __init__(self):
+        self._partes = []
+
+    def write(self, datos):
+        self._partes.append(bytes(datos))
+        return len(datos)
+
+    def flush(self):
+        pass
+
+    def vaciar(self) -> bytes:
+        datos = b''.join(self._partes)
+        self._partes.clear()
+        return datos
+
+
+def _celda_xlsx(valor, estilo='') -> str:
+    if isinstance(valor, (int, float)) and not isinstance(valor, bool):
+        return f'<c{estilo}><v>{valor}</v></c>'
+    texto = escape(_CONTROL.sub('', _texto(valor)))
+    return f'<c t="inlineStr"{estilo}><is><t xml:space="preserve">{texto}</t></is></c>'
+
+
+def xlsx_stream(exportacion: Exportacion, filtros=None, por_bloque=500):
+    """Genera el XLSX comprimido a medida que se escriben las filas."""
+    tubo = _Tubo()
+    with zipfile.ZipFile(tubo, 'w', compression=zipfile.ZIP_DEFLATED) as libro:
+        for nombre, contenido in _PARTES.items():
+            libro.writestr(nombre, _XML + contenido)
+        libro.writestr('xl/workbook.xml', _XML + (
+            f'<workbook xmlns="{_NS}" xmlns:r="{_NS_REL}"><sheets>'
+            f'<sheet name="{escape(exportacion.nombre[:31])}" sheetId="1" r:id="rId1"/>'
+            '</sheets></workbook>'
+        ))
+        yield tubo.vaciar()
+
+        with libro.open('xl/worksheets/sheet1.xml', 'w') as hoja:
+            encabezado = ''.join(_celda_xlsx(t, ' s="1"') for t in exportacion.encabezados())
+            hoja.write(f'{_XML}<worksheet xmlns="{_NS}"><sheetData><row>{encabezado}</row>'.encode('utf-8'))
+            bloque = []
+            for fila in exportacion.filas(filtros):
+                bloque.append('<row>' + ''.join(_celda_xlsx(v) for v in fila) + '</row>')
+                if len(bloque) >= por_bloque:
+                    hoja.write(''.join(bloque).encode('utf-8'))
+                    bloque = []
+                    datos = tubo.vaciar()
+                    if datos:
+                        yield datos
+            hoja.write((''.join(bloque) + '</sheetData></worksheet>').encode('utf-8'))
+    yield tubo.vaciar()
+
+
+def stream(exportacion: Exportacion, formato: str, filtros=None):
+    return (xlsx_stream if formato == 'xlsx' else csv_stream)(exportacion, filtros)
+
+
+def nombre_archivo(exportacion: Exportacion, formato: str, filtros=None) -> str:
+    sufijo = f"-evento-{filtros['evento']}" if filtros and filtros.get('evento') else ''
+    return f"{exportacion.nombre}{sufijo}-{timezone.localtime(timezone.now(), ZONA):%Y%m%d-%H%M}.{formato}"
@@ -0,0 +1,157 @@
+"""
+Ingesta y paginación de fotos de eventos.
+
+Cada archivo se lee una sola vez: el MD5 se calcula mientras el storage lo
+copia a su destino. Después se deduplica todo el lote con una única consulta
+IN sobre el índice (evento, hash_md5), se borran del storage las copias
+duplicadas y las nuevas se insertan con bulk_create.
+
+Además se calcula el dHash de cada foto nueva y se busca en un BK-tree con
+las del evento: las que quedan a distancia <= FOTOS_PHASH_DISTANCIA se
+guardan igual, pero se informan como casi-duplicadas en la respuesta.
+
+La galería se pagina por keyset sobre (-fecha_subida, -id) con el índice
+(evento, -fecha_subida, -id): cada página es una consulta acotada.
+"""
+import hashlib
+from dataclasses import dataclass, field
+from typing import List
+
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from . import imagenes
+from .phash import BKTree, dhash
+from .cache import invalidar_evento
+from .models import EventoFoto
+
+FOTOS_POR_PAGINA = 24
+
+
+class _ArchivoConHash(File):
+    """Envuelve un archivo subido y va calculando su MD5 a medida que se lee."""
+
+    def __init__(self, archivo):
+        super().__init__(archivo, name=archivo.name)
+        self.md5 = hashlib.md5()
+
+    def chunks(self, chunk_size=None):
+        # Sin temporary_file_path el storage no mueve el archivo: lo copia por chunks
+        self.file.seek(0)
+        for chunk in self.file.chunks(chunk_size):
+            self.md5.update(chunk)
+            yield chunk
+
+
+@dataclass
+class ResultadoIngesta:
+    creadas: List[EventoFoto] = field(default_factory=list)
+    duplicadas: List[str] = field(default_factory=list)
+    # [{'nombre': ..., 'parecida_a': pk o nombre de otra foto del lote, 'distancia': bits}, ...]
+    similares: List[dict] = field(default_factory=list)
+
+
+def _dhash_o_vacio(archivo) -> str:
+    try:
+        return dhash(archivo)
+    except Exception:
+        return ''  # no decodificable por Pillow: solo se deduplica por MD5
+
+
+def _arbol_evento(evento) -> BKTree:
+    filas = EventoFoto.objects.filter(evento=evento).exclude(phash='').values_list('phash', 'pk')
+    return BKTree((int(h, 16), pk) for h, pk in filas)
+
+
+def ingestar_fotos(evento, archivos, usuario=None) -> ResultadoIngesta:
+    """Guarda las fotos subidas para `evento` omitiendo las que ya existen (mismo MD5)."""
+    campo = EventoFoto._meta.get_field('imagen')
+    storage = campo.storage
+    guardadas = []  # (archivo subido, ruta en storage, hash)
+    try:
+        for archivo in archivos:
+            envoltorio = _ArchivoConHash(archivo)
+            ruta = storage.save(
+                campo.generate_filename(None, archivo.name), envoltorio, max_length=campo.max_length
+            )
+            guardadas.append((archivo, ruta, envoltorio.md5.hexdigest()))
+
+        existentes = set(
+            EventoFoto.objects.filter(evento=evento, hash_md5__in={h for _, _, h in guardadas})
+            .values_list('hash_md5', flat=True)
+        )
+        resultado = ResultadoIngesta()
+        descartadas = []
+        arbol = None
+        distancia = int(getattr(settings, 'FOTOS_PHASH_DISTANCIA', 6))
+        for archivo, ruta, file_hash in guardadas:
+            if file_hash in existentes:
+                resultado.duplicadas.append(archivo.name)
+                descartadas.append(ruta)
+                continue
+            existentes.add(file_hash)  # repetidas dentro del mismo lote
+            phash = _dhash_o_vacio(archivo)
+            if phash:
+                if arbol is None:
+                    arbol = _arbol_evento(evento)
+                valor = int(phash, 16)
+                cercanas = arbol.buscar(valor, distancia)
+                if cercanas:
+                    d, parecida = cercanas[0]
+                    resultado.similares.append({'nombre': archivo.name, 'parecida_a': parecida, 'distancia': d})
+                arbol.agregar(valor, archivo.name)
+            resultado.creadas.append(
+                EventoFoto(evento=evento, imagen=ruta, subido_por=usuario, hash_md5=file_hash, phash=phash)
+            )
+        if resultado.creadas:
+            with transaction.atomic():
+                EventoFoto.objects.bulk_create(resultado.creadas)
+                # bulk_create no emite post_save: invalidar el detalle y encolar derivadas a mano
+                transaction.on_commit(lambda: invalidar_evento(evento.pk))
+                for foto in resultado.creadas:
+                    transaction.on_commit(lambda nombre=foto.imagen.name: imagenes.encolar(nombre, storage))
+    except Exception:
+        for _, ruta, _ in guardadas:
+            storage.delete(ruta)
+        raise
+    for ruta in descartadas:
+        storage.delete(ruta)
+    return resultado
+
+
+def pagina_fotos(evento_id, cursor=None, limite=FOTOS_POR_PAGINA):
+    """Devuelve (fotos, siguiente): una página de la galería y el cursor '<fecha ISO>_<id>' de la próxima."""
+    qs = (
+        EventoFoto.objects.filter(evento_id=evento_id)
+        .select_related('subido_por')
+        .order_by('-fecha_subida', '-id')
+    )
+    if cursor:
+        fecha, pk = cursor
+        qs = qs.filter(Q(fecha_subida__lt=fecha) | Q(fecha_subida=fecha, id__lt=pk))
+    fotos = list(qs[:limite + 1])
+    siguiente = None
+    if len(fotos) > limite:
+        fotos = fotos[:limite]
+        ultima = fotos[-1]
+        siguiente = f"{ultima.fecha_subida.isoformat()}_{ultima.pk}"
+    return fotos, siguiente
+
+
+def foto_json(foto) -> dict:
+    """Representación de una foto para la API de la galería (miniatura, srcset y dimensiones)."""
+    archivo = foto.imagen
+    indice = imagenes.info(archivo.name, archivo.storage)
+    return {
+        'id': foto.pk,
+        'url': archivo.url,
+        'miniatura': imagenes.url_miniatura(archivo, 320),
+        'srcset': imagenes.srcset(archivo.name, indice, 'webp', archivo.storage) if indice else '',
+        'ancho': indice['ancho'] if indice else None,
+        'alto': indice['alto'] if indice else None,
+        'fecha': timezone.localtime(foto.fecha_subida).strftime('%d/%m/%Y %H:%M'),
+        'subido_por': foto.subido_por.username if foto.subido_por else '',
+    }
@@ -0,0 +1,149 @@
+"""
+Búsqueda geográfica de eventos presenciales.
+
+Cada Evento con coordenadas guarda su geohash (columna indexada `geohash`,
+ver signals.py). Una consulta por radio o por caja:
+
+1. cubre la caja con unas pocas celdas geohash de la precisión adecuada y
+   filtra candidatos con rangos sobre el índice (geohash >= celda AND
+   geohash < celda + '{'), que la base de datos resuelve sin recorrer la tabla;
+2. calcula la distancia haversine en la propia consulta (Sin/Cos/ASin) para
+   todos los candidatos a la vez, filtra por radio y ordena.
+
+Para el mapa, `clusters` agrupa por prefijo de geohash según el zoom y
+devuelve un marcador por celda (centroide y total) calculado con GROUP BY.
+"""
+import math
+from decimal import Decimal
+
+from django.db.models import Avg, Count, FloatField, Max, Min, Q, Value
+from django.db.models.functions import ASin, Cast, Cos, Power, Radians, Sin, Sqrt, Substr
+
+RADIO_TIERRA_KM = 6371.0088
+PRECISION = 9  # ~5 m: la que se guarda en Evento.geohash
+_BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+# Tamaño aproximado (alto, ancho en grados) de una celda según su precisión
+_TAMANO_CELDA = {
+    p: (180.0 / 2 ** ((5 * p) // 2), 360.0 / 2 ** ((5 * p + 1) // 2)) for p in range(1, PRECISION + 1)
+}
+# Precisión del agrupamiento por nivel de zoom del mapa (0 = mundo, 18 = calle)
+_PRECISION_ZOOM = [1, 1, 2, 2, 2, 3, 3, 3, 4, 4, 5, 5, 5, 6, 6, 7, 7, 8, 8]
+
+
+def geohash(lat, lon, precision=PRECISION) -> str:
+    lat, lon = float(lat), float(lon)
+    lat_rango, lon_rango = [-90.0, 90.0], [-180.0, 180.0]
+    bits = []
+    par = True
+    while len(bits) < precision * 5:
+        rango, valor = (lon_rango, lon) if par else (lat_rango, lat)
+        medio = (rango[0] + rango[1]) / 2
+        if valor >= medio:
+            bits.append(1)
+            rango[0] = medio
+        else:
+            bits.append(0)
+            rango[1] = medio
+        par = not par
+    return ''.join(
+        _BASE32[int(''.join(map(str, bits[i:i + 5])), 2)] for i in range(0, len(bits), 5)
+    )
+
+
+def caja_radio(lat, lon, radio_km):
+    """Caja (min_lat, min_lon, max_lat, max_lon) que contiene el círculo de `radio_km`."""
+    lat, lon = float(lat), float(lon)
+    dlat = math.degrees(radio_km / RADIO_TIERRA_KM)
+    dlon = dlat / max(math.cos(math.radians(lat)), 1e-6)
+    return (max(lat - dlat, -90.0), max(lon - dlon, -180.0), min(lat + dlat, 90.0), min(lon + dlon, 180.0))
+
+
+def celdas_caja(min_lat, min_lon, max_lat, max_lon, max_celdas=16) -> list:
+    """Celdas geohash (la precisión más fina con <= max_celdas) que cubren la caja."""
+    for precision in range(PRECISION, 0, -1):
+        alto, ancho = _TAMANO_CELDA[precision]
+        filas = math.floor(max_lat / alto) - math.floor(min_lat / alto) + 1
+        columnas = math.floor(max_lon / ancho) - math.floor(min_lon / ancho) + 1
+        if filas * columnas <= max_celdas:
+            break
+    celdas = set()
+    for i in range(filas):
+        lat = min(min_lat + i * alto, max_lat)
+        for j in range(columnas):
+            celdas.add(geohash(lat, min(min_lon + j * ancho, max_lon), precision))
+        celdas.add(geohash(lat, max_lon, precision))
+    for j in range(columnas):
+        celdas.add(geohash(max_lat, min(min_lon + j * ancho, max_lon), precision))
+    celdas.add(geohash(max_lat, max_lon, precision))
+    return sorted(celdas)
+
+
+def filtro_celdas(celdas, campo='geohash') -> Q:
+    """Un rango indexado por celda: todos los geohash con ese prefijo."""
+    q = Q()
+    for celda in celdas:
+        # '{' es el carácter ASCII siguiente a 'z', el último del alfabeto geohash
+        q |= Q(**{f'{campo}__gte': celda, f'{campo}__lt': celda + '{'})
+    return q
+
+
+def distancia_km(lat, lon):
+    """Expresión haversine (km) desde el punto dado hasta Evento.latitud/longitud, evaluada en la base de datos."""
+    lat_r, lon_r = math.radians(float(lat)), math.radians(float(lon))
+    lat2 = Radians(Cast('latitud', FloatField()))
+    lon2 = Radians(Cast('longitud', FloatField()))
+    a = (
+        Power(Sin((lat2 - Value(lat_r)) / 2), 2)
+        + Value(math.cos(lat_r)) * Cos(lat2) * Power(Sin((lon2 - Value(lon_r)) / 2), 2)
+    )
+    return Value(2 * RADIO_TIERRA_KM) * ASin(Sqrt(a))
+
+
+def cerca(qs, lat, lon, radio_km):
+    """Eventos de `qs` a <= radio_km del punto, anotados con `distancia_km` y ordenados por cercanía."""
+    caja = caja_radio(lat, lon, radio_km)
+    return (
+        qs.filter(filtro_celdas(celdas_caja(*caja)))
+        .annotate(distancia_km=distancia_km(lat, lon))
+        .filter(distancia_km__lte=radio_km)
+        .order_by('distancia_km', 'fecha')
+    )
+
+
+def en_caja(qs, min_lat, min_lon, max_lat, max_lon):
+    """Eventos de `qs` dentro de la caja (candidatos por celdas, refinados por coordenadas)."""
+    return qs.filter(filtro_celdas(celdas_caja(min_lat, min_lon, max_lat, max_lon))).filter(
+        latitud__gte=Decimal(str(min_lat)), latitud__lte=Decimal(str(max_lat)),
+        longitud__gte=Decimal(str(min_lon)), longitud__lte=Decimal(str(max_lon)),
+    )
+
+
+def precision_zoom(zoom: int) -> int:
+    return _PRECISION_ZOOM[max(0, min(int(zoom), len(_PRECISION_ZOOM) - 1))]
+
+
+def clusters(qs, zoom: int) -> list:
+    """Un marcador por celda del zoom: centroide, total y, si la celda tiene un solo evento, su pk."""
+    precision = precision_zoom(zoom)
+    filas = (
+        qs.order_by()
+        .annotate(celda=Substr('geohash', 1, precision))
+        .values('celda')
+        .annotate(
+            total=Count('pk'),
+            lat=Avg(Cast('latitud', FloatField())),
+            lon=Avg(Cast('longitud', FloatField())),
+            evento_id=Max('pk'),
+            min_id=Min('pk'),
+        )
+    )
+    return [
+        {
+            'celda': f['celda'],
+            'total': f['total'],
+            'lat': round(f['lat'], 6),
+            'lon': round(f['lon'], 6),
+            'evento_id': f['evento_id'] if f['evento_id'] == f['min_id'] else None,
+        }
+        for f in filas
+    ]
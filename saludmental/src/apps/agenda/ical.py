@@ -0,0 +1,296 @@
+"""
+Feeds iCalendar (.ics) de la agenda, para suscribirse desde Google Calendar,
+Apple Calendar, Outlook...
+
+- Público: todos los eventos publicados (agenda/calendario.ics).
+- Personal: los eventos publicados en los que el usuario está inscrito, en una
+  URL con un token secreto (agenda/calendario/<token>.ics), porque los clientes
+  de calendario no envían la sesión. El token es el pk del usuario firmado
+  (HMAC con SECRET_KEY) junto con `CustomUser.token_calendario`: mostrarlo no
+  escribe nada, y regenerarlo cambia ese campo y anula la URL anterior.
+
+Las series (recurrencia.py) se publican como un VEVENT con su RRULE, que el
+cliente expande en la ventana que muestra: las canceladas van como EXDATE y las
+movidas como VEVENT con RECURRENCE-ID. En el personal, cada repetición inscrita
+es un VEVENT propio.
+
+Las series se repiten en hora de Colombia, así que su DTSTART, EXDATE y
+RECURRENCE-ID van con TZID=America/Bogota (definida en el VTIMEZONE de la
+cabecera: -05:00 fijo, sin horario de verano); UNTIL sigue en UTC, como pide
+el RFC. Los eventos únicos van en UTC.
+
+Los clientes consultan el feed cada pocos minutos, así que cada respuesta lleva
+ETag y Last-Modified y una petición condicional sin cambios recibe un 304:
+
+- el validador público sale de una consulta agregada (eventos publicados y
+  último `Evento.actualizado`) cacheada por la versión del feed
+  (cache.version_ics, el momento del último cambio en los eventos, que también
+  cubre los borrados): un 304 no toca la base de datos;
+- el personal es una consulta agregada sobre las inscripciones del usuario.
+
+El cuerpo se genera en streaming, leyendo los eventos por bloques.
+"""
+import hashlib
+import secrets
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone as dt_timezone
+from typing import Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, F, Max, Q
+from django.urls import reverse
+from django.utils import translation
+from django.utils.crypto import constant_time_compare, salted_hmac
+
+from apps.usuarios.models import CustomUser
+
+from .cache import version_ics
+from .recurrencia import clave as clave_ocurrencia
+from .models import Evento, Inscripcion, Ocurrencia
+from .resumenes import ZONA
+
+LOTE = 500
+DURACION = timedelta(minutes=int(getattr(settings, 'AGENDA_DURACION_EVENTO', 60)))
+# Frecuencia de consulta sugerida a los clientes
+REFRESCO = 'PT1H'
+TZID = 'America/Bogota'
+# Colombia no tiene horario de verano: un solo componente STANDARD
+VTIMEZONE = (
+    'BEGIN:VTIMEZONE',
+    f'TZID:{TZID}',
+    'BEGIN:STANDARD',
+    'DTSTART:19700101T000000',
+    'TZOFFSETFROM:-0500',
+    'TZOFFSETTO:-0500',
+    'TZNAME:-05',
+    'END:STANDARD',
+    'END:VTIMEZONE',
+)
+
+
+# ============ TOKEN PERSONAL ============
+
+def token_de(usuario) -> str:
+    """Token del calendario personal del usuario: '<pk>-<firma>', sin consultas ni escrituras."""
+    firma = salted_hmac('agenda.ical', f'{usuario.pk}:{usuario.token_calendario or ""}').hexdigest()
+    return f'{usuario.pk}-{firma[:32]}'
+
+
+def regenerar_token(usuario) -> str:
+    usuario.token_calendario = secrets.token_urlsafe(32)
+    usuario.save(update_fields=['token_calendario'])
+    return token_de(usuario)
+
+
+def usuario_de(token: str):
+    pk, _, _firma = token.partition('-')
+    if not pk.isdigit():
+        return None
+    usuario = CustomUser.objects.filter(pk=pk, is_active=True).only('pk', 'token_calendario').first()
+    if usuario is None or not constant_time_compare(token, token_de(usuario)):
+        return None
+    return usuario
+
+
+# ============ VALIDADORES (ETag / Last-Modified) ============
+
+@dataclass(frozen=True)
+class Validador:
+    etag: str
+    modificado: Optional[datetime]
+
+
+def _validador(*partes, modificado) -> Validador:
+    # El idioma cambia los textos del feed, así que entra en el ETag
+    clave = ':'.join(str(p) for p in (translation.get_language(), modificado, *partes))
+    return Validador(etag=f'"{hashlib.md5(clave.encode()).hexdigest()}"', modificado=modificado)
+
+
+def validador_publico() -> Validador:
+    version = version_ics()
+    key = f'agenda:ics:v{version.timestamp() if version else 0}'
+    datos = cache.get(key)
+    if datos is None:
+        # Max sobre todos los eventos: despublicar uno también mueve la fecha
+        datos = Evento.objects.aggregate(n=Count('pk', filter=Q(publicado=True)), ultimo=Max('actualizado'))
+        cache.set(key, datos, 24 * 3600)
+    # Un borrado no deja fila: la versión del feed guarda cuándo ocurrió
+    modificado = max(filter(None, [datos['ultimo'], version]), default=None)
+    return _validador(datos['n'], modificado=modificado)
+
+
+def validador_personal(usuario) -> Validador:
+    # Cancelar una inscripción no mueve la fecha, pero sí el conteo del ETag
+    datos = Inscripcion.objects.filter(usuario=usuario).aggregate(
+        n=Count('pk', filter=Q(evento__publicado=True)),
+        inscrito=Max('fecha_inscripcion'),
+        ultimo=Max('evento__actualizado'),
+    )
+    modificado = max(filter(None, [datos['inscrito'], datos['ultimo']]), default=None)
+    return _validador(usuario.pk, datos['n'], modificado=modificado)
+
+
+# ============ EVENTOS ============
+
+_CAMPOS = (
+    'pk', 'nombre', 'titulo', 'descripcion_corta', 'lugar', 'tipo_evento', 'latitud', 'longitud',
+    'link_virtual', 'plataforma_virtual', 'fecha', 'recurrencia', 'actualizado',
+)
+
+
+def _bloques(qs):
+    bloque = []
+    for fila in qs.iterator(chunk_size=LOTE):
+        bloque.append(fila)
+        if len(bloque) >= LOTE:
+            yield bloque
+            bloque = []
+    if bloque:
+        yield bloque
+
+
+def eventos_publicos(url, host):
+    """VEVENTs de los eventos publicados, por bloques; las excepciones de las series, una consulta por bloque."""
+    qs = Evento.objects.filter(publicado=True).only(*_CAMPOS).order_by('fecha', 'pk')
+    for bloque in _bloques(qs):
+        excepciones = {}
+        series = [e.pk for e in bloque if e.recurrencia]
+        if series:
+            for fila in Ocurrencia.objects.filter(evento_id__in=series).filter(Q(cancelada=True) | ~Q(fecha=F('inicio'))):
+                excepciones.setdefault(fila.evento_id, []).append(fila)
+        yield ''.join(vevento(e, url(e.pk), host, excepciones=excepciones.get(e.pk, ())) for e in bloque)
+
+
+def eventos_de(usuario):
+    """Generador de VEVENTs de las inscripciones de `usuario` (una por repetición en las series)."""
+    def generar(url, host):
+        qs = (
+            Inscripcion.objects.filter(usuario=usuario, evento__publicado=True)
+            .select_related('evento', 'ocurrencia')
+            .only(
+                *(f'evento__{c}' for c in _CAMPOS if c != 'pk'),
+                'ocurrencia__inicio', 'ocurrencia__fecha', 'ocurrencia__cancelada',
+            )
+            .order_by('evento__fecha', 'pk')
+        )
+        for bloque in _bloques(qs):
+            yield ''.join(
+                vevento(i.evento, url(i.evento_id), host, ocurrencia=i.ocurrencia) for i in bloque
+            )
+    return generar
+
+
+# ============ FORMATO (RFC 5545) ============
+
+def _escapar(texto: str) -> str:
+    texto = texto.replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+    return texto.replace('\r\n', '\\n').replace('\n', '\\n').replace('\r', '\\n')
+
+
+def _plegar(linea: str) -> str:
+    """Línea con CRLF, cortada cada 75 octetos sin partir caracteres UTF-8."""
+    if len(linea.encode('utf-8')) <= 75:
+        return linea + '\r\n'
+    partes, actual, octetos = [], '', 0
+    for caracter in linea:
+        n = len(caracter.encode('utf-8'))
+        if octetos + n > 75:
+            partes.append(actual)
+            actual, octetos = ' ', 1  # las líneas de continuación empiezan con un espacio
+        actual += caracter
+        octetos += n
+    partes.append(actual)
+    return '\r\n'.join(partes) + '\r\n'
+
+
+def _utc(valor: datetime) -> str:
+    return valor.astimezone(dt_timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def _local(propiedad: str, valor: datetime) -> str:
+    """Propiedad de fecha en hora de Colombia: 'DTSTART;TZID=America/Bogota:20261020T180000'."""
+    return f'{propiedad};TZID={TZID}:{valor.astimezone(ZONA):%Y%m%dT%H%M%S}'
+
+
+def _duracion() -> str:
+    return f'PT{int(DURACION.total_seconds() // 60)}M'
+
+
+def _componente(evento, url: str, uid: str, inicio, extra=(), local=False) -> str:
+    lugar = evento.lugar or (evento.plataforma_virtual if evento.tipo_evento == 'virtual' else '')
+    descripcion = '\n\n'.join(filter(None, [evento.descripcion_corta, evento.link_virtual, url]))
+    lineas = [
+        'BEGIN:VEVENT',
+        f'UID:{uid}',
+        f'DTSTAMP:{_utc(evento.actualizado)}',
+        f'LAST-MODIFIED:{_utc(evento.actualizado)}',
+        _local('DTSTART', inicio) if local else f'DTSTART:{_utc(inicio)}',
+        f'DURATION:{_duracion()}',
+        *extra,
+        f'SUMMARY:{_escapar(str(evento))}',
+        f'DESCRIPTION:{_escapar(descripcion)}',
+        f'URL:{url}',
+    ]
+    if lugar:
+        lineas.append(f'LOCATION:{_escapar(lugar)}')
+    if evento.latitud is not None and evento.longitud is not None:
+        lineas.append(f'GEO:{evento.latitud};{evento.longitud}')
+    lineas.append('END:VEVENT')
+    return ''.join(_plegar(linea) for linea in lineas)
+
+
+def vevento(evento, url: str, host: str, excepciones=(), ocurrencia=None) -> str:
+    """
+    VEVENT del evento. Una serie lleva su RRULE, con `excepciones` (filas de Ocurrencia
+    canceladas o movidas) como EXDATE / RECURRENCE-ID; con `ocurrencia` se emite solo esa repetición.
+    """
+    uid = f'evento-{evento.pk}@{host}'
+    if ocurrencia is not None:
+        clave = clave_ocurrencia(ocurrencia.inicio)
+        extra = ['STATUS:CANCELLED'] if ocurrencia.cancelada else []
+        return _componente(evento, f'{url}?ocurrencia={clave}', f'evento-{evento.pk}-{clave}@{host}', ocurrencia.fecha, extra)
+    if not evento.recurrencia:
+        return _componente(evento, url, uid, evento.fecha)
+    extra = [f'RRULE:{evento.recurrencia}']
+    extra += [_local('EXDATE', fila.inicio) for fila in excepciones if fila.cancelada]
+    partes = [_componente(evento, url, uid, evento.fecha, extra, local=True)]
+    for fila in excepciones:
+        if not fila.cancelada:
+            clave = clave_ocurrencia(fila.inicio)
+            partes.append(_componente(
+                evento, f'{url}?ocurrencia={clave}', uid, fila.fecha, [_local('RECURRENCE-ID', fila.inicio)], local=True,
+            ))
+    return ''.join(partes)
+
+
+def stream(request, vevents, nombre: str):
+    """Genera el VCALENDAR con los bloques de `vevents(url, host)` (eventos_publicos o eventos_de(usuario))."""
+    idioma = translation.get_language()
+    base = request.build_absolute_uri('/')[:-1]
+    host = request.get_host().split(':')[0]
+    cabecera = [
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        f'PRODID:-//Iterum//Agenda//{(idioma or "es").upper()}',
+        'CALSCALE:GREGORIAN',
+        'METHOD:PUBLISH',
+        f'X-WR-CALNAME:{_escapar(nombre)}',
+        'X-WR-TIMEZONE:America/Bogota',
+        f'REFRESH-INTERVAL;VALUE=DURATION:{REFRESCO}',
+        f'X-PUBLISHED-TTL:{REFRESCO}',
+        *VTIMEZONE,
+    ]
+
+    def url(pk):
+        return base + reverse('agenda_evento_detalle', args=[pk])
+
+    def generar():
+        # El cuerpo se consume después de que la vista retorna: los enlaces usan el idioma de la petición
+        with translation.override(idioma):
+            yield ''.join(_plegar(linea) for linea in cabecera).encode('utf-8')
+            for bloque in vevents(url, host):
+                yield bloque.encode('utf-8')
+            yield b'END:VCALENDAR\r\n'
+
+    return generar()
@@ -0,0 +1,285 @@
+"""
+Derivadas responsivas de imágenes (portadas de eventos, galería y fotos de perfil).
+
+Para cada original se generan anchos fijos en WebP y en un formato de respaldo
+(JPEG, o PNG si hay transparencia), con la orientación EXIF ya aplicada. Se
+guardan junto al original, direccionadas por contenido:
+
+    <dir>/_derivadas/<sha256 del original>/   anchos e indice.json
+    <dir>/_derivadas/nombres/<clave>          sha256 del original `<clave>`
+
+El sha256 es el mismo que usa config.storage para el blob, así que los
+originales idénticos de un directorio comparten un solo juego de derivadas; la
+clave es un digest de la ruta del original y el archivo de `nombres/` es el
+puntero de esa ruta a su contenido (se escribe el último: si existe, las
+derivadas existen).
+
+Un `indice.json` describe lo generado; los template tags
+(templatetags/imagenes.py) lo leen a través del cache para emitir `srcset`.
+El primer fallo de cache recorre una sola vez todos los `_derivadas/` del
+storage y carga sus índices (también lo hace el comando generar_derivadas);
+después, una imagen ausente queda en cache como pendiente un rato, sin
+consultar el storage en cada render. Las entradas caducan (INDICE_TIMEOUT) y
+media_gc borra las de los originales que recupera, para que un nombre
+reutilizado no apunte a derivadas ajenas. Si aún no existen, se sirve el
+original y la generación se encola en un pool de hilos (Pillow libera el GIL
+al decodificar, redimensionar y codificar).
+"""
+import hashlib
+import io
+import json
+import logging
+import posixpath
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+ANCHOS = tuple(getattr(settings, 'IMAGENES_ANCHOS', (64, 160, 320, 640, 1280)))
+CALIDAD_WEBP = 80
+CALIDAD_JPEG = 82
+DIR_DERIVADAS = '_derivadas'
+DIR_NOMBRES = 'nombres'
+TAM_BLOQUE = 1024 * 1024
+# Cuánto vive en cache un índice (y el recorrido completo del storage)
+INDICE_TIMEOUT = int(getattr(settings, 'IMAGENES_CACHE_TIMEOUT', 24 * 3600))
+# Valor cacheado para "sin derivadas todavía" y cuánto dura
+_PENDIENTE = 'pendiente'
+PENDIENTE_TIMEOUT = 300
+
+_pool = None
+_pendientes = set()
+_lock = threading.Lock()
+
+
+def _clave(nombre: str) -> str:
+    return hashlib.blake2b(nombre.encode('utf-8'), digest_size=12).hexdigest()
+
+
+def _base(nombre: str) -> str:
+    return posixpath.join(posixpath.dirname(nombre), DIR_DERIVADAS)
+
+
+def _directorio(nombre: str, contenido: str) -> str:
+    return f'{_base(nombre)}/{contenido}'
+
+
+def ruta_derivada(nombre: str, indice: dict, ancho: int, ext: str) -> str:
+    return f"{_directorio(nombre, indice['contenido'])}/{ancho}.{ext}"
+
+
+def _ruta_indice(nombre: str, contenido: str) -> str:
+    return f'{_directorio(nombre, contenido)}/indice.json'
+
+
+def _ruta_puntero(nombre: str) -> str:
+    return f'{_base(nombre)}/{DIR_NOMBRES}/{_clave(nombre)}'
+
+
+def cache_key(clave: str) -> str:
+    """Entrada de cache del original con clave `clave` (ver _clave); media_gc la borra con él."""
+    return f'imagenes:indice:{clave}'
+
+
+def _cache_key(nombre: str) -> str:
+    return cache_key(_clave(nombre))
+
+
+def _arbol_key(storage) -> str:
+    origen = f'{type(storage).__module__}.{type(storage).__name__}:{getattr(storage, "location", "")}'
+    return f'imagenes:indice:arbol:{_clave(origen)}'
+
+
+def _guardar(storage, ruta: str, contenido: bytes) -> None:
+    # Rutas deterministas: reemplazar en lugar de dejar que el storage renombre
+    if storage.exists(ruta):
+        storage.delete(ruta)
+    storage.save(ruta, ContentFile(contenido))
+
+
+def generar(nombre: str, storage=None, forzar: bool = False) -> dict:
+    """Genera (o reutiliza) las derivadas de `nombre` y devuelve su índice."""
+    storage = storage or default_storage
+    if not forzar:
+        indice = info(nombre, storage)
+        if indice is not None:
+            return indice
+
+    with storage.open(nombre, 'rb') as f:
+        sha = hashlib.sha256()
+        for chunk in f.chunks(TAM_BLOQUE):
+            sha.update(chunk)
+        contenido = sha.hexdigest()
+        # Mismo contenido ya procesado (otro nombre del directorio): solo falta el puntero
+        indice = None if forzar else _leer_indice(_ruta_indice(nombre, contenido), storage)
+        if indice is None:
+            f.seek(0)
+            indice = _generar_anchos(f, nombre, contenido, storage)
+    _guardar(storage, _ruta_puntero(nombre), contenido.encode('ascii'))
+    cache.set(_cache_key(nombre), indice, INDICE_TIMEOUT)
+    return indice
+
+
+def _generar_anchos(f, nombre: str, contenido: str, storage) -> dict:
+    """Escribe los anchos del original abierto `f` en su directorio de contenido y devuelve el índice."""
+    img = Image.open(f)
+    ancho_orig, alto_orig = img.size
+    if img.getexif().get(0x0112) in (5, 6, 7, 8):  # orientaciones que rotan 90°
+        ancho_orig, alto_orig = alto_orig, ancho_orig
+    # Decodificar los JPEG grandes directamente a una escala reducida
+    img.draft('RGB', (max(ANCHOS) * 2, max(ANCHOS) * 2))
+    img = ImageOps.exif_transpose(img)
+    img.load()
+
+    transparente = img.mode in ('RGBA', 'LA', 'PA') or (img.mode == 'P' and 'transparency' in img.info)
+    img = img.convert('RGBA' if transparente else 'RGB')
+    respaldo = 'png' if transparente else 'jpg'
+    ancho_dec, alto_dec = img.size
+
+    anchos = sorted({min(a, ancho_dec) for a in ANCHOS}, reverse=True)
+    indice = {
+        'ancho': ancho_orig, 'alto': alto_orig, 'anchos': sorted(anchos), 'respaldo': respaldo, 'contenido': contenido,
+    }
+    fuente = img
+    for ancho in anchos:
+        alto = max(1, round(alto_dec * ancho / ancho_dec))
+        # Cada tamaño se reduce desde el anterior (más barato que partir del original)
+        if fuente.size != (ancho, alto):
+            fuente = fuente.resize((ancho, alto), Image.LANCZOS)
+        buf = io.BytesIO()
+        fuente.save(buf, 'WEBP', quality=CALIDAD_WEBP, method=4)
+        _guardar(storage, ruta_derivada(nombre, indice, ancho, 'webp'), buf.getvalue())
+        buf = io.BytesIO()
+        if respaldo == 'png':
+            fuente.save(buf, 'PNG', optimize=True)
+        else:
+            fuente.save(buf, 'JPEG', quality=CALIDAD_JPEG, optimize=True, progressive=True)
+        _guardar(storage, ruta_derivada(nombre, indice, ancho, respaldo), buf.getvalue())
+
+    # El índice se escribe después de los anchos y el puntero al final (ver generar)
+    _guardar(storage, _ruta_indice(nombre, contenido), json.dumps(indice).encode('utf-8'))
+    return indice
+
+
+def _leer_indice(ruta: str, storage):
+    try:
+        with storage.open(ruta, 'rb') as f:
+            return json.loads(f.read().decode('utf-8'))
+    except (OSError, ValueError):  # sin índice (aún) o a medio escribir
+        return None
+
+
+def _leer_puntero(ruta: str, storage):
+    try:
+        with storage.open(ruta, 'rb') as f:
+            return f.read().decode('ascii').strip() or None
+    except (OSError, ValueError):
+        return None
+
+
+def _directorios_derivadas(storage, directorio: str = ''):
+    """Rutas de los directorios `_derivadas/` del storage (un listdir por directorio)."""
+    try:
+        subdirs, _archivos = storage.listdir(directorio)
+    except (OSError, NotImplementedError):
+        return
+    for sub in subdirs:
+        ruta = posixpath.join(directorio, sub)
+        if sub == DIR_DERIVADAS:
+            yield ruta
+        else:
+            yield from _directorios_derivadas(storage, ruta)
+
+
+def cargar_arbol(storage=None) -> int:
+    """Carga al cache los índices de todas las imágenes del storage de una vez; devuelve cuántos."""
+    storage = storage or default_storage
+    indices = {}
+    for directorio in _directorios_derivadas(storage):
+        try:
+            _dirs, claves = storage.listdir(f'{directorio}/{DIR_NOMBRES}')
+        except OSError:
+            continue
+        por_contenido = {}
+        for clave in claves:
+            contenido = _leer_puntero(f'{directorio}/{DIR_NOMBRES}/{clave}', storage)
+            if contenido is None:
+                continue
+            if contenido not in por_contenido:
+                por_contenido[contenido] = _leer_indice(f'{directorio}/{contenido}/indice.json', storage)
+            if por_contenido[contenido] is not None:
+                indices[cache_key(clave)] = por_contenido[contenido]
+    cache.set_many(indices, INDICE_TIMEOUT)
+    cache.set(_arbol_key(storage), True, INDICE_TIMEOUT)
+    return len(indices)
+
+
+def info(nombre: str, storage=None):
+    """Índice de derivadas de `nombre`, o None si todavía no se han generado."""
+    key = _cache_key(nombre)
+    indice = cache.get(key)
+    if indice is None:
+        storage = storage or default_storage
+        if not cache.get(_arbol_key(storage)):
+            cargar_arbol(storage)
+            # Tras el recorrido, lo que no está en cache no se ha generado
+            indice = cache.get(key)
+        elif storage.exists(_ruta_puntero(nombre)):
+            # La entrada salió del cache (LRU o caducó): releer solo esta
+            contenido = _leer_puntero(_ruta_puntero(nombre), storage)
+            indice = contenido and _leer_indice(_ruta_indice(nombre, contenido), storage)
+        if indice is None:
+            cache.set(key, _PENDIENTE, PENDIENTE_TIMEOUT)
+            return None
+        cache.set(key, indice, INDICE_TIMEOUT)
+    return None if indice == _PENDIENTE else indice
+
+
+def _trabajo(nombre, storage):
+    try:
+        generar(nombre, storage)
+    except Exception:
+        logger.exception('No se pudieron generar las derivadas de %s', nombre)
+    finally:
+        with _lock:
+            _pendientes.discard(nombre)
+
+
+def encolar(nombre: str, storage=None) -> None:
+    """Programa la generación en segundo plano (sin duplicar trabajos pendientes)."""
+    global _pool
+    if not nombre:
+        return
+    with _lock:
+        if nombre in _pendientes:
+            return
+        _pendientes.add(nombre)
+        if _pool is None:
+            _pool = ThreadPoolExecutor(
+                max_workers=int(getattr(settings, 'IMAGENES_WORKERS', 2)),
+                thread_name_prefix='imagenes',
+            )
+    _pool.submit(_trabajo, nombre, storage or default_storage)
+
+
+def srcset(nombre: str, indice: dict, ext: str, storage=None) -> str:
+    storage = storage or default_storage
+    return ', '.join(f'{storage.url(ruta_derivada(nombre, indice, a, ext))} {a}w' for a in indice['anchos'])
+
+
+def url_miniatura(archivo, ancho: int) -> str:
+    """URL de la derivada más pequeña que cubre `ancho` px (o el original si aún no hay derivadas)."""
+    if not archivo:
+        return ''
+    indice = info(archivo.name, archivo.storage)
+    if indice is None:
+        encolar(archivo.name, archivo.storage)
+        return archivo.url
+    elegido = next((a for a in indice['anchos'] if a >= ancho), indice['anchos'][-1])
+    return archivo.storage.url(ruta_derivada(archivo.name, indice, elegido, 'webp'))
@@ -0,0 +1,273 @@
+"""
+Inscripciones con cupo y lista de espera, seguras ante picos de concurrencia.
+
+El cupo se asigna con un único UPDATE condicional sobre el contador
+desnormalizado:
+
+    UPDATE evento SET inscritos_count = inscritos_count + 1
+    WHERE id = %s AND (cupo IS NULL OR inscritos_count < cupo)
+
+Si afecta una fila, el cupo es nuestro y se crea la Inscripcion en la misma
+transacción; si no, el usuario pasa a la lista de espera. No hay
+"exists() y luego save()": el índice único de Inscripcion resuelve los dobles
+envíos (la transacción se deshace entera, cupo incluido) y nunca se sobrevende.
+
+Cada transacción empieza escribiendo. En SQLite eso toma el bloqueo de
+escritura de entrada y las peticiones concurrentes esperan su turno (timeout
+de DATABASES) en vez de fallar con "database is locked" al intentar pasar de
+lectura a escritura; en PostgreSQL el UPDATE bloquea solo la fila del evento.
+
+Al cancelar se libera el cupo y `promover` lo entrega al primero de la lista.
+
+En una serie (ocurrencias.py) todo va por repetición: `ocurrencia_id` apunta a
+su fila de Ocurrencia, que lleva el cupo y el contador con el mismo UPDATE
+condicional; el contador del Evento queda como total de la serie. Al inscribir,
+la fila se crea dentro de la misma transacción, así que un intento fallido no
+deja filas sueltas.
+Las notificaciones al staff y a los promovidos se envían en segundo plano
+(tareas.py) después del commit.
+"""
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Exists, F, OuterRef, Q
+from django.urls import reverse
+from django.utils import translation
+
+from .cache import invalidar_evento
+from .models import Evento, Inscripcion, ListaEspera, Ocurrencia
+from . import ocurrencias, tareas
+
+# Resultados de inscribir / cancelar
+INSCRITO = 'inscrito'
+YA_INSCRITO = 'ya_inscrito'
+EN_ESPERA = 'en_espera'
+YA_EN_ESPERA = 'ya_en_espera'
+CANCELADO = 'cancelado'
+SALIO_DE_ESPERA = 'salio_de_espera'
+NO_INSCRITO = 'no_inscrito'
+NO_DISPONIBLE = 'no_disponible'
+
+CAMPOS_FORMULARIO = ('nombre_completo', 'telefono', 'notas')
+INSCRITOS_POR_PAGINA = 50
+
+
+class _Deshacer(Exception):
+    pass
+
+
+def _ocupar_cupo(evento_id, ocurrencia_id=None) -> bool:
+    """Toma un cupo si queda alguno. Debe ser la primera escritura de la transacción."""
+    if ocurrencia_id is None:
+        return Evento.objects.filter(
+            Q(cupo__isnull=True) | Q(inscritos_count__lt=F('cupo')), pk=evento_id,
+        ).update(inscritos_count=F('inscritos_count') + 1) == 1
+    if not Ocurrencia.objects.filter(
+        Q(cupo__isnull=True) | Q(inscritos_count__lt=F('cupo')), pk=ocurrencia_id, cancelada=False,
+    ).update(inscritos_count=F('inscritos_count') + 1):
+        return False
+    Evento.objects.filter(pk=evento_id).update(inscritos_count=F('inscritos_count') + 1)
+    return True
+
+
+def _liberar_cupo(evento_id, ocurrencia_id=None) -> None:
+    if ocurrencia_id is not None:
+        Ocurrencia.objects.filter(pk=ocurrencia_id).update(inscritos_count=F('inscritos_count') - 1)
+    Evento.objects.filter(pk=evento_id).update(inscritos_count=F('inscritos_count') - 1)
+
+
+def inscribir(evento_id, usuario, datos=None, lang_code=None, notificar=True, repeticion=None) -> str:
+    """
+    Inscribe a `usuario` si hay cupo o lo añade a la lista de espera. Devuelve el resultado.
+    En una serie, `repeticion` es la copia del Evento de ocurrencias.instancia.
+    """
+    datos = {campo: (datos or {}).get(campo, '') for campo in CAMPOS_FORMULARIO}
+    clave = {'evento_id': evento_id, 'ocurrencia_id': None, 'usuario': usuario}
+    try:
+        with transaction.atomic():
+            if repeticion is not None:
+                fila = ocurrencias.asegurar(repeticion, repeticion.ocurrencia)
+                if fila.cancelada:
+                    return NO_DISPONIBLE  # se canceló después de validar la repetición
+                clave['ocurrencia_id'] = fila.pk
+            if _ocupar_cupo(evento_id, clave['ocurrencia_id']):
+                Inscripcion.objects.create(**clave, **datos)
+                ListaEspera.objects.filter(**clave).delete()
+                transaction.on_commit(lambda: invalidar_evento(evento_id))
+                if notificar:
+                    tareas.encolar_al_confirmar(notificar_staff, evento_id, usuario.pk, lang_code)
+                return INSCRITO
+            if Inscripcion.objects.filter(**clave).exists():
+                return YA_INSCRITO
+            ListaEspera.objects.create(**clave, **datos)
+            return EN_ESPERA
+    except IntegrityError:
+        # Doble envío: la transacción (y el cupo tomado) ya se deshizo
+        if Inscripcion.objects.filter(**clave).exists():
+            return YA_INSCRITO
+        return YA_EN_ESPERA
+
+
+def cancelar(evento_id, usuario, lang_code=None, notificar=True, ocurrencia_id=None) -> str:
+    """Anula la inscripción (o la espera) de `usuario` y entrega el cupo liberado."""
+    clave = {'evento_id': evento_id, 'ocurrencia_id': ocurrencia_id, 'usuario': usuario}
+    with transaction.atomic():
+        # Se descuenta solo si la inscripción existe, escribiendo antes de leer
+        if ocurrencia_id is None:
+            liberado = Evento.objects.filter(pk=evento_id).filter(
+                Exists(Inscripcion.objects.filter(evento=OuterRef('pk'), ocurrencia=None, usuario=usuario))
+            ).update(inscritos_count=F('inscritos_count') - 1)
+        else:
+            liberado = Ocurrencia.objects.filter(pk=ocurrencia_id).filter(
+                Exists(Inscripcion.objects.filter(ocurrencia=OuterRef('pk'), usuario=usuario))
+            ).update(inscritos_count=F('inscritos_count') - 1)
+            if liberado:
+                Evento.objects.filter(pk=evento_id).update(inscritos_count=F('inscritos_count') - 1)
+        if not liberado:
+            borradas, _ = ListaEspera.objects.filter(**clave).delete()
+            return SALIO_DE_ESPERA if borradas else NO_INSCRITO
+        Inscripcion.objects.filter(**clave).delete()
+        transaction.on_commit(lambda: invalidar_evento(evento_id))
+        promover(evento_id, lang_code, notificar, ocurrencia_id)
+        return CANCELADO
+
+
+def promover(evento_id, lang_code=None, notificar=True, ocurrencia_id=None) -> int:
+    """Inscribe, en orden de llegada, a los primeros de la lista de espera mientras quede cupo."""
+    promovidos = 0
+    while True:
+        try:
+            with transaction.atomic():
+                if not _ocupar_cupo(evento_id, ocurrencia_id):
+                    break
+                primero = (
+                    ListaEspera.objects.filter(evento_id=evento_id, ocurrencia_id=ocurrencia_id)
+                    .order_by('fecha', 'id')
+                    .first()
+                )
+                if primero is None:
+                    raise _Deshacer  # nadie esperando: devolver el cupo
+                primero.delete()
+                try:
+                    with transaction.atomic():
+                        Inscripcion.objects.create(
+                            evento_id=evento_id,
+                            ocurrencia_id=ocurrencia_id,
+                            usuario_id=primero.usuario_id,
+                            **{campo: getattr(primero, campo) for campo in CAMPOS_FORMULARIO},
+                        )
+                except IntegrityError:
+                    # Ya estaba inscrito por otra vía: se descarta su espera y el cupo sigue libre
+                    _liberar_cupo(evento_id, ocurrencia_id)
+                    continue
+                promovidos += 1
+                transaction.on_commit(lambda: invalidar_evento(evento_id))
+                if notificar:
+                    tareas.encolar_al_confirmar(notificar_promocion, evento_id, primero.usuario_id, lang_code)
+                    tareas.encolar_al_confirmar(notificar_staff, evento_id, primero.usuario_id, lang_code)
+        except _Deshacer:
+            break
+    return promovidos
+
+
+def posicion_espera(evento_id, usuario, ocurrencia_id=None):
+    """Posición (1 = el siguiente) de `usuario` en la lista de espera, o None."""
+    espera = ListaEspera.objects.filter(evento_id=evento_id, ocurrencia_id=ocurrencia_id)
+    propia = espera.filter(usuario=usuario).values('fecha', 'id').first()
+    if propia is None:
+        return None
+    return espera.filter(
+        Q(fecha__lt=propia['fecha']) | Q(fecha=propia['fecha'], id__lt=propia['id']),
+    ).count() + 1
+
+
+# ============ NOTIFICACIONES (en segundo plano) ============
+
+def _url_admin(evento_id, lang_code=None) -> str:
+    with translation.override(lang_code or getattr(settings, 'LANGUAGE_CODE', 'es')):
+        return reverse('admin_evento_edit', kwargs={'pk': evento_id})
+
+
+def _nombre(usuario) -> str:
+    display = ''
+    try:
+        display = usuario.get_full_name().strip()
+    except Exception:
+        display = ''
+    return display or getattr(usuario, 'username', None) or getattr(usuario, 'email', 'usuario')
+
+
+def notificar_staff(evento_id, usuario_id, lang_code=None) -> int:
+    """Notifica a todo el staff que un usuario se inscribió a un evento."""
+    from apps.usuarios.email_utils import enviar_notificacion_inscripcion_evento
+    from apps.usuarios.models import CustomUser, Notificacion
+
+    evento = Evento.objects.filter(pk=evento_id).first()
+    usuario = CustomUser.objects.filter(pk=usuario_id).first()
+    if evento is None or usuario is None:
+        return 0
+    admin_url = _url_admin(evento_id, lang_code)
+    staff = [adm for adm in CustomUser.objects.filter(is_active=True, is_staff=True) if adm.pk != usuario.pk]
+    if not staff:
+        return 0
+    titulo = evento.titulo or evento.nombre
+    msg = f"{_nombre(usuario)} se inscribió a: {titulo}"
+    Notificacion.objects.bulk_create(
+        [Notificacion(usuario=adm, mensaje=msg, url=admin_url) for adm in staff], ignore_conflicts=True
+    )
+
+    url_completa = f"http://localhost:8000{admin_url}"  # Cambiar en producción
+    for adm in staff:
+        if adm.email:
+            enviar_notificacion_inscripcion_evento(
+                usuario_staff=adm,
+                usuario_inscrito=usuario,
+                evento_titulo=titulo,
+                url_evento=url_completa
+            )
+    return len(staff)
+
+
+def notificar_promocion(evento_id, usuario_id, lang_code=None) -> None:
+    """Avisa al usuario de que salió de la lista de espera y ya está inscrito."""
+    from apps.usuarios.email_utils import enviar_notificacion_cupo_liberado
+    from apps.usuarios.models import CustomUser, Notificacion
+
+    evento = Evento.objects.filter(pk=evento_id).first()
+    usuario = CustomUser.objects.filter(pk=usuario_id).first()
+    if evento is None or usuario is None:
+        return
+    with translation.override(lang_code or getattr(settings, 'LANGUAGE_CODE', 'es')):
+        url = reverse('agenda_evento_detalle', kwargs={'pk': evento_id})
+    titulo = evento.titulo or evento.nombre
+    Notificacion.objects.create(
+        usuario=usuario, mensaje=f"Se liberó un cupo: ya estás inscrito a {titulo}"[:255], url=url
+    )
+    if usuario.email:
+        enviar_notificacion_cupo_liberado(
+            usuario_destinatario=usuario,
+            evento_titulo=titulo,
+            url_evento=f"http://localhost:8000{url}",  # Cambiar en producción
+        )
+
+
+def pagina_inscritos(evento_id, cursor=None, limite=INSCRITOS_POR_PAGINA):
+    """Devuelve (inscripciones, siguiente): una página de inscritos por orden de llegada y el cursor de la próxima."""
+    qs = (
+        Inscripcion.objects.filter(evento_id=evento_id)
+        .select_related('usuario')
+        .only(
+            'id', 'fecha_inscripcion', 'nombre_completo', 'telefono',
+            'usuario__id', 'usuario__username', 'usuario__foto_perfil',
+        )
+        .order_by('fecha_inscripcion', 'id')
+    )
+    if cursor:
+        fecha, pk = cursor
+        qs = qs.filter(Q(fecha_inscripcion__gt=fecha) | Q(fecha_inscripcion=fecha, id__gt=pk))
+    filas = list(qs[:limite + 1])
+    siguiente = None
+    if len(filas) > limite:
+        filas = filas[:limite]
+        ultima = filas[-1]
+        siguiente = f"{ultima.fecha_inscripcion.isoformat()}_{ultima.pk}"
+    return filas, siguiente
@@ -0,0 +1,84 @@
+"""
+Comando de Django para calcular el hash perceptual (dHash) de las fotos existentes
+Usar: python manage.py backfill_phash [--workers 4] [--chunk 200] [--todas]
+
+Recorre EventoFoto por bloques de clave primaria, decodifica las imágenes en un
+pool de procesos y guarda los hashes con bulk_update.
+"""
+
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.agenda.models import EventoFoto
+from config.procesos import init_worker
+
+
+def _hashear_bloque(filas):
+    """Recibe [(pk, ruta), ...] y devuelve [(pk, phash), ...] ('' si no se pudo leer)."""
+    from django.core.files.storage import default_storage
+    from apps.agenda.phash import dhash
+    resultado = []
+    for pk, ruta in filas:
+        try:
+            with default_storage.open(ruta, 'rb') as f:
+                resultado.append((pk, dhash(f)))
+        except Exception:
+            resultado.append((pk, ''))
+    return resultado
+
+
+class Command(BaseCommand):
+    help = 'Calcula en paralelo el dHash de las fotos de eventos que aún no lo tienen'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 2, help='Procesos del pool')
+        parser.add_argument('--chunk', type=int, default=200, help='Fotos por bloque')
+        parser.add_argument('--todas', action='store_true', help='Recalcula también las que ya tienen hash')
+
+    def handle(self, *args, **options):
+        chunk = options['chunk']
+        workers = options['workers']
+        if chunk < 1 or workers < 1:
+            raise CommandError('--chunk y --workers deben ser mayores que 0')
+
+        qs = EventoFoto.objects.order_by('pk')
+        if not options['todas']:
+            qs = qs.filter(phash='')
+        filas = qs.values_list('pk', 'imagen').iterator(chunk_size=chunk)
+
+        total = fallidas = 0
+        inicio = time.monotonic()
+        en_vuelo = deque()
+
+        def aplicar(futuro):
+            nonlocal total, fallidas
+            hashes = futuro.result()
+            fotos = [EventoFoto(pk=pk, phash=h) for pk, h in hashes]
+            EventoFoto.objects.bulk_update(fotos, ['phash'])
+            total += len(hashes)
+            fallidas += sum(1 for _, h in hashes if not h)
+            transcurrido = time.monotonic() - inicio
+            self.stdout.write(f'  {total} fotos, {total / transcurrido if transcurrido else 0:.0f} fotos/s')
+
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_worker) as pool:
+            bloque = []
+            for fila in filas:
+                bloque.append(fila)
+                if len(bloque) >= chunk:
+                    en_vuelo.append(pool.submit(_hashear_bloque, bloque))
+                    bloque = []
+                    # Ventana acotada de bloques en vuelo: memoria constante
+                    if len(en_vuelo) >= workers * 2:
+                        aplicar(en_vuelo.popleft())
+            if bloque:
+                en_vuelo.append(pool.submit(_hashear_bloque, bloque))
+            while en_vuelo:
+                aplicar(en_vuelo.popleft())
+
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ dHash calculado para {total - fallidas} foto(s); {fallidas} no se pudieron leer'
+        ))
@@ -0,0 +1,50 @@
+"""
+Comando de Django para reconstruir las series diarias del dashboard
+Usar: python manage.py backfill_resumenes [--metrica inscripciones ...] [--desde 2025-01-01] [--hasta 2025-12-31]
+
+Recalcula la tabla ResumenDiario con un GROUP BY por día (hora de Colombia)
+sobre las tablas de origen (ver apps/agenda/resumenes.py). Sin --desde toma
+desde el primer registro; sin --hasta, hasta hoy. Se usa una vez al
+desplegar y, si se quiere, en cron para corregir la deriva de las señales
+(p. ej. filas creadas con bulk_create).
+"""
+
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.agenda import resumenes
+
+
+def _fecha(valor):
+    try:
+        return date.fromisoformat(valor)
+    except ValueError:
+        raise CommandError(f'Fecha inválida: {valor} (usar AAAA-MM-DD)')
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye las series diarias (ResumenDiario) desde las tablas de origen'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--metrica', nargs='+', metavar='CLAVE', help='Métricas a reconstruir')
+        parser.add_argument('--desde', help='Primer día (AAAA-MM-DD)')
+        parser.add_argument('--hasta', help='Último día (AAAA-MM-DD)')
+
+    def handle(self, *args, **options):
+        claves = options['metrica'] or list(resumenes.SERIES)
+        desconocidas = set(claves) - set(resumenes.SERIES)
+        if desconocidas:
+            raise CommandError(
+                f'Métricas desconocidas: {", ".join(sorted(desconocidas))}. '
+                f'Disponibles: {", ".join(resumenes.SERIES)}'
+            )
+        desde = _fecha(options['desde']) if options['desde'] else None
+        hasta = _fecha(options['hasta']) if options['hasta'] else None
+        if desde and hasta and desde > hasta:
+            raise CommandError('--desde debe ser anterior a --hasta')
+
+        for clave in claves:
+            filas = resumenes.reconstruir(clave, desde, hasta)
+            self.stdout.write(f'  {clave}: {filas} fila(s)')
+        self.stdout.write(self.style.SUCCESS(f'✓ {len(claves)} serie(s) reconstruidas'))
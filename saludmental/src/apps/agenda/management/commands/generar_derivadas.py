@@ -0,0 +1,54 @@
+"""
+Comando de Django para generar las derivadas responsivas de las imágenes existentes
+Usar: python manage.py generar_derivadas [--workers 4] [--forzar]
+
+Recorre portadas de eventos, fotos de galería y fotos de perfil y genera en
+paralelo los anchos WebP/JPEG que usan los template tags de templatetags/imagenes.py.
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from apps.agenda import imagenes
+from apps.agenda.models import Evento, EventoFoto
+
+
+class Command(BaseCommand):
+    help = 'Genera miniaturas y variantes WebP de las imágenes de eventos y perfiles'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 2, help='Hilos del pool')
+        parser.add_argument('--forzar', action='store_true', help='Regenera aunque ya existan')
+
+    def handle(self, *args, **options):
+        fuentes = (
+            (Evento, 'imagen'),
+            (EventoFoto, 'imagen'),
+            (get_user_model(), 'foto_perfil'),
+        )
+        generadas = errores = 0
+        with ThreadPoolExecutor(max_workers=max(1, options['workers'])) as pool:
+            for Model, campo in fuentes:
+                storage = Model._meta.get_field(campo).storage
+                # Índices existentes al cache de una vez: generar() no consulta el storage por imagen
+                imagenes.cargar_arbol(storage)
+                nombres = (
+                    Model.objects.exclude(**{f'{campo}__isnull': True}).exclude(**{campo: ''})
+                    .values_list(campo, flat=True).iterator(chunk_size=500)
+                )
+                futuros = {
+                    pool.submit(imagenes.generar, nombre, storage, options['forzar']): nombre
+                    for nombre in nombres
+                }
+                for futuro in as_completed(futuros):
+                    try:
+                        futuro.result()
+                        generadas += 1
+                    except Exception as e:
+                        errores += 1
+                        self.stderr.write(f'  ✗ {futuros[futuro]}: {e}')
+                self.stdout.write(f'→ {Model.__name__}.{campo}: {len(futuros)} imagen(es)')
+        self.stdout.write(self.style.SUCCESS(f'✓ Derivadas listas para {generadas} imagen(es), {errores} error(es)'))
@@ -0,0 +1,184 @@
+"""
+Comando de Django para recuperar espacio de MEDIA_ROOT
+Usar: python manage.py media_gc [--min-edad 24] [--dry-run] [--adoptar]
+
+1. Borra los archivos de los directorios upload_to que ya no referencia
+   ninguna fila (fotos eliminadas, fotos de perfil reemplazadas) y las
+   derivadas responsivas de originales que ya no existen, con su entrada de
+   cache (un nombre liberado puede volver a usarse).
+2. Borra los blobs de config.storage sin ningún nombre enlazado (st_nlink == 1).
+3. Con --adoptar, enlaza a su blob los archivos subidos antes de activar el
+   storage direccionado por contenido, deduplicando los que sean idénticos.
+
+Solo toca lo que lleva más de --min-edad horas sin cambios, para no competir
+con subidas en curso (archivo ya guardado, fila aún sin confirmar). Un blob
+que pierde su último nombre en una pasada se recupera en la siguiente.
+"""
+
+import hashlib
+import os
+import shutil
+import time
+
+from django.apps import apps
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import models
+
+from apps.agenda import imagenes
+from config.storage import DIR_BLOBS, ContentAddressedStorage
+
+
+def _edad(st):
+    # ctime cambia al crear o quitar enlaces: un blob recién reutilizado no es viejo
+    return time.time() - max(st.st_mtime, st.st_ctime)
+
+
+class Command(BaseCommand):
+    help = 'Elimina archivos de media sin referencias y blobs huérfanos del storage direccionado por contenido'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--min-edad', type=float, default=24, help='Horas mínimas sin cambios para borrar')
+        parser.add_argument('--dry-run', action='store_true', help='Solo informa, no borra')
+        parser.add_argument('--adoptar', action='store_true', help='Enlaza a blobs los archivos anteriores al storage')
+
+    def handle(self, *args, **options):
+        if not hasattr(default_storage, 'location'):
+            raise CommandError('media_gc solo funciona con storages en disco local')
+        self.root = default_storage.location
+        self.min_edad = options['min_edad'] * 3600
+        self.dry = options['dry_run']
+        self.borrados = 0
+        self.liberados = 0
+
+        referencias, directorios = self._referencias()
+        claves = {imagenes._clave(nombre) for nombre in referencias}
+        self.stdout.write(f'→ {len(referencias)} archivo(s) referenciados en {len(directorios)} directorio(s)')
+
+        for directorio in sorted(directorios):
+            self._barrer_directorio(directorio, referencias, claves)
+
+        if isinstance(default_storage, ContentAddressedStorage):
+            if options['adoptar']:
+                self._adoptar(referencias)
+            self._barrer_blobs()
+
+        accion = 'Se borrarían' if self.dry else 'Borrados'
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ {accion} {self.borrados} archivo(s), {self.liberados / 1024 / 1024:.1f} MB'
+        ))
+
+    def _referencias(self):
+        """Nombres referenciados por cualquier FileField y los directorios upload_to a revisar."""
+        referencias = set()
+        directorios = set()
+        for Model in apps.get_models():
+            for campo in Model._meta.get_fields():
+                if not isinstance(campo, models.FileField):
+                    continue
+                if isinstance(campo.upload_to, str) and campo.upload_to:
+                    # Primer componente fijo de upload_to (antes de cualquier %Y/%m)
+                    directorios.add(campo.upload_to.split('%')[0].strip('/').split('/')[0])
+                nombres = (
+                    Model._default_manager.exclude(**{campo.name: ''}).exclude(**{f'{campo.name}__isnull': True})
+                    .values_list(campo.name, flat=True).iterator(chunk_size=2000)
+                )
+                referencias.update(nombres)
+        return referencias, directorios
+
+    def _borrar(self, ruta, st):
+        self.borrados += 1
+        self.liberados += st.st_size if st.st_nlink <= 1 else 0
+        if self.dry:
+            self.stdout.write(f'  - {os.path.relpath(ruta, self.root)}')
+        else:
+            os.unlink(ruta)
+
+    def _barrer_directorio(self, directorio, referencias, claves):
+        base = os.path.join(self.root, directorio)
+        for actual, subdirs, archivos in os.walk(base):
+            if os.path.basename(actual) == imagenes.DIR_DERIVADAS:
+                self._barrer_derivadas(actual, subdirs, claves)
+                subdirs[:] = []
+                continue
+            for nombre in archivos:
+                ruta = os.path.join(actual, nombre)
+                relativo = os.path.relpath(ruta, self.root).replace(os.sep, '/')
+                if relativo in referencias:
+                    continue
+                st = os.stat(ruta)
+                if _edad(st) > self.min_edad:
+                    self._borrar(ruta, st)
+
+    def _barrer_derivadas(self, directorio, subdirs, claves):
+        """
+        <dir>/_derivadas/: borra los punteros de nombres/ de originales que ya no existen
+        (y su entrada de cache) y los directorios de contenido a los que no apunta ninguno.
+        """
+        vivos = set()
+        nombres = os.path.join(directorio, imagenes.DIR_NOMBRES)
+        for clave in (os.listdir(nombres) if os.path.isdir(nombres) else ()):
+            ruta = os.path.join(nombres, clave)
+            st = os.stat(ruta)
+            if clave not in claves and _edad(st) > self.min_edad:
+                self._borrar(ruta, st)
+                if not self.dry:
+                    cache.delete(imagenes.cache_key(clave))
+                continue
+            with open(ruta, encoding='ascii') as f:
+                vivos.add(f.read().strip())
+        for contenido in subdirs:
+            ruta = os.path.join(directorio, contenido)
+            if contenido == imagenes.DIR_NOMBRES or contenido in vivos or _edad(os.stat(ruta)) <= self.min_edad:
+                continue
+            for nombre in os.listdir(ruta):
+                st = os.stat(os.path.join(ruta, nombre))
+                self.borrados += 1
+                self.liberados += st.st_size if st.st_nlink <= 1 else 0
+            if self.dry:
+                self.stdout.write(f'  - {os.path.relpath(ruta, self.root)}/')
+            else:
+                shutil.rmtree(ruta)
+
+    def _barrer_blobs(self):
+        base = os.path.join(self.root, DIR_BLOBS)
+        for actual, subdirs, archivos in os.walk(base):
+            for nombre in archivos:
+                ruta = os.path.join(actual, nombre)
+                st = os.stat(ruta)
+                es_temporal = os.path.basename(actual) == 'tmp'
+                # Un blob con un solo enlace no tiene ningún nombre apuntándole
+                if (es_temporal or st.st_nlink == 1) and _edad(st) > self.min_edad:
+                    self._borrar(ruta, st)
+
+    def _adoptar(self, referencias):
+        adoptados = deduplicados = 0
+        for nombre in referencias:
+            ruta = default_storage.path(nombre)
+            try:
+                st = os.stat(ruta)
+            except FileNotFoundError:
+                continue
+            if st.st_nlink > 1:
+                continue  # ya enlazado a su blob
+            sha = hashlib.sha256()
+            with open(ruta, 'rb') as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                    sha.update(chunk)
+            blob = default_storage.ruta_blob(sha.hexdigest())
+            if self.dry:
+                adoptados += 1
+                continue
+            os.makedirs(os.path.dirname(blob), exist_ok=True)
+            try:
+                os.link(ruta, blob)
+                adoptados += 1
+            except FileExistsError:
+                # Mismo contenido ya almacenado: reemplazar la copia por un enlace al blob
+                tmp = ruta + '.gc-tmp'
+                os.link(blob, tmp)
+                os.replace(tmp, ruta)
+                deduplicados += 1
+                self.liberados += st.st_size
+        self.stdout.write(f'→ {adoptados} archivo(s) adoptados, {deduplicados} copia(s) reemplazadas por enlaces')
@@ -0,0 +1,59 @@
+"""
+Comando de Django para publicar los eventos programados y avisar a los usuarios
+Usar: python manage.py publicar_eventos [--loop] [--intervalo 60] [--lote 500]
+
+Sin --loop hace una pasada (para cron). Con --loop queda como worker: repite la
+pasada cada --intervalo segundos, o antes si la siguiente publicación
+programada llega primero.
+
+Se puede detener y reiniciar en cualquier momento, o correr en varias
+instancias a la vez: cada publicación y cada lote de avisos se reclama con un
+UPDATE condicional, así que nadie recibe el mismo aviso dos veces (ver
+apps/agenda/publicacion.py).
+"""
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+from django.utils import timezone
+
+from apps.agenda import publicacion
+
+
+class Command(BaseCommand):
+    help = 'Publica los eventos cuya fecha de publicación ya pasó y envía los avisos por lotes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help='Queda corriendo como worker')
+        parser.add_argument('--intervalo', type=float, default=60, help='Segundos máximos entre pasadas con --loop')
+        parser.add_argument('--lote', type=int, default=publicacion.LOTE, help='Usuarios por lote de avisos')
+
+    def handle(self, *args, **options):
+        if options['lote'] < 1 or options['intervalo'] <= 0:
+            raise CommandError('--lote y --intervalo deben ser mayores que 0')
+        if not options['loop']:
+            self._pasada(options['lote'])
+            return
+
+        self.stdout.write(f'→ Worker de publicación (cada {options["intervalo"]:.0f}s como máximo)')
+        try:
+            while True:
+                close_old_connections()
+                self._pasada(options['lote'])
+                time.sleep(self._espera(options['intervalo']))
+        except KeyboardInterrupt:
+            self.stdout.write('→ Worker detenido')
+
+    def _pasada(self, lote):
+        publicados, avisos = publicacion.procesar(lote=lote)
+        if publicados or avisos:
+            self.stdout.write(self.style.SUCCESS(
+                f'✓ {len(publicados)} evento(s) publicados, {avisos} aviso(s) enviados'
+            ))
+
+    def _espera(self, intervalo):
+        proxima = publicacion.proxima_publicacion()
+        if proxima is None:
+            return intervalo
+        return max(1.0, min(intervalo, (proxima - timezone.now()).total_seconds()))
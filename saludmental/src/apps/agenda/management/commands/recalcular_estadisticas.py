@@ -0,0 +1,36 @@
+"""
+Comando de Django para recalcular los totales del panel de administración
+Usar: python manage.py recalcular_estadisticas [--estimado] [--solo notificaciones_pendientes ...]
+
+Cuenta de nuevo cada métrica de apps/agenda/estadisticas.py y la guarda en la
+tabla Estadistica. Pensado para cron (p. ej. cada hora): corrige la deriva de
+los totales incrementales y refresca los que no tienen señal.
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.agenda import estadisticas
+
+
+class Command(BaseCommand):
+    help = 'Recalcula los totales materializados del dashboard de administración'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--estimado', action='store_true',
+            help='En PostgreSQL, usa la estimación del planner para las tablas grandes',
+        )
+        parser.add_argument('--solo', nargs='+', metavar='CLAVE', help='Métricas a recalcular')
+
+    def handle(self, *args, **options):
+        claves = options['solo']
+        desconocidas = set(claves or ()) - set(estadisticas.METRICAS)
+        if desconocidas:
+            raise CommandError(
+                f'Métricas desconocidas: {", ".join(sorted(desconocidas))}. '
+                f'Disponibles: {", ".join(estadisticas.METRICAS)}'
+            )
+        stats = estadisticas.recalcular(claves, estimado=options['estimado'] or None)
+        for clave, e in stats.items():
+            self.stdout.write(f'  {clave}: {"~" if e.estimado else ""}{e.valor}')
+        self.stdout.write(self.style.SUCCESS(f'✓ {len(stats)} métrica(s) recalculadas'))
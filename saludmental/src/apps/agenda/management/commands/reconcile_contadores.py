@@ -0,0 +1,35 @@
+"""
+Comando de Django para reconstruir los contadores desnormalizados de Evento
+Usar: python manage.py reconcile_contadores [--evento 12 15] [--chunk 1000]
+"""
+
+from django.core.management.base import BaseCommand
+
+from apps.agenda import contadores
+from apps.agenda.models import Evento
+
+
+class Command(BaseCommand):
+    help = 'Recalcula inscritos_count, ratings_count, ratings_sum y comentarios_count de los eventos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--evento', type=int, nargs='+', help='Solo estos eventos (pk)')
+        parser.add_argument('--chunk', type=int, default=1000, help='Eventos por UPDATE')
+
+    def handle(self, *args, **options):
+        if options.get('evento'):
+            total = contadores.recalcular(options['evento'])
+        else:
+            # Por bloques de pk para no bloquear toda la tabla en un solo UPDATE
+            total = 0
+            ultimo = 0
+            while True:
+                ids = list(
+                    Evento.objects.filter(pk__gt=ultimo).order_by('pk')
+                    .values_list('pk', flat=True)[:options['chunk']]
+                )
+                if not ids:
+                    break
+                total += contadores.recalcular(ids)
+                ultimo = ids[-1]
+        self.stdout.write(self.style.SUCCESS(f'✓ Contadores recalculados para {total} evento(s)'))
@@ -0,0 +1,157 @@
+"""
+Comando de Django para probar las inscripciones bajo concurrencia
+Usar: python manage.py stress_inscripciones [--usuarios 300] [--cupo 50] [--hilos 32] [--repetir 2] [--cancelar 10]
+
+Crea un evento y usuarios temporales, lanza todas las inscripciones a la vez
+desde un pool de hilos (cada usuario envía el formulario --repetir veces, como
+un doble clic) y comprueba que:
+
+- nunca se sobrevende: inscritos = min(cupo, usuarios) y el contador coincide
+  con las filas de Inscripcion;
+- el resto queda en la lista de espera, sin duplicados ni usuarios en ambas;
+- al cancelar --cancelar inscripciones a la vez, los primeros en espera pasan a
+  inscritos en orden de llegada y el cupo sigue lleno.
+
+Al terminar borra el evento y los usuarios (salvo --conservar). No envía
+notificaciones.
+"""
+
+import threading
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from apps.agenda import inscripciones
+from apps.agenda.models import Evento, Inscripcion, ListaEspera
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Lanza cientos de inscripciones simultáneas y verifica cupo, contador y lista de espera'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--usuarios', type=int, default=300, help='Usuarios que se inscriben a la vez')
+        parser.add_argument('--cupo', type=int, default=50, help='Cupo del evento de prueba')
+        parser.add_argument('--hilos', type=int, default=32, help='Hilos concurrentes')
+        parser.add_argument('--repetir', type=int, default=2, help='Envíos por usuario (dobles clics)')
+        parser.add_argument('--cancelar', type=int, default=10, help='Inscripciones a cancelar a la vez')
+        parser.add_argument('--conservar', action='store_true', help='No borra el evento ni los usuarios')
+
+    def handle(self, *args, **options):
+        n, cupo, hilos = options['usuarios'], options['cupo'], options['hilos']
+        if n < 1 or cupo < 1 or hilos < 1 or options['repetir'] < 1:
+            raise CommandError('--usuarios, --cupo, --hilos y --repetir deben ser mayores que 0')
+
+        prefijo = f'stress-{uuid.uuid4().hex[:8]}'
+        evento = Evento.objects.create(
+            nombre=prefijo, titulo='Prueba de carga', fecha=timezone.now() + timedelta(days=30), cupo=cupo,
+        )
+        User.objects.bulk_create([
+            User(username=f'{prefijo}-{i}', email=f'{prefijo}-{i}@example.invalid') for i in range(n)
+        ])
+        usuarios = list(User.objects.filter(username__startswith=f'{prefijo}-').order_by('pk'))
+        self.stdout.write(f'→ Evento {evento.pk} con cupo {cupo}; {n} usuario(s) x {options["repetir"]} envío(s), {hilos} hilo(s)')
+
+        try:
+            self._inscribir_todos(evento, usuarios, hilos, options['repetir'])
+            self._verificar(evento, min(cupo, n), n - min(cupo, n))
+            if options['cancelar']:
+                self._cancelar(evento, hilos, options['cancelar'])
+        finally:
+            if not options['conservar']:
+                Evento.objects.filter(pk=evento.pk).delete()
+                User.objects.filter(username__startswith=f'{prefijo}-').delete()
+
+    def _concurrente(self, hilos, trabajos):
+        """Ejecuta trabajos [(func, args)] en `hilos` hilos que arrancan a la vez. Devuelve resultados y errores."""
+        hilos = min(hilos, len(trabajos))
+        barrera = threading.Barrier(hilos)
+        resultados = Counter()
+        errores = []
+        lock = threading.Lock()
+
+        def hilo(lote):
+            try:
+                barrera.wait()
+                for funcion, args in lote:
+                    try:
+                        r = funcion(*args)
+                        with lock:
+                            resultados[r] += 1
+                    except Exception as e:
+                        with lock:
+                            errores.append(repr(e))
+            finally:
+                connection.close()
+
+        inicio = time.monotonic()
+        with ThreadPoolExecutor(max_workers=hilos) as pool:
+            for futuro in [pool.submit(hilo, trabajos[i::hilos]) for i in range(hilos)]:
+                futuro.result()
+        return resultados, errores, time.monotonic() - inicio
+
+    def _inscribir_todos(self, evento, usuarios, hilos, repetir):
+        trabajos = [
+            (inscripciones.inscribir, (evento.pk, u, {'nombre_completo': u.username}, None, False))
+            for _ in range(repetir) for u in usuarios
+        ]
+        # Intercalado: los envíos repetidos de un usuario caen en hilos distintos
+        resultados, errores, segundos = self._concurrente(hilos, trabajos)
+        self.stdout.write(
+            f'  {len(trabajos)} envíos en {segundos:.2f}s ({len(trabajos) / segundos:.0f}/s): '
+            + ', '.join(f'{k}={v}' for k, v in sorted(resultados.items()))
+        )
+        if errores:
+            raise CommandError(f'{len(errores)} envío(s) fallaron, p. ej. {errores[0]}')
+
+    def _verificar(self, evento, inscritos_esperados, espera_esperada):
+        evento.refresh_from_db()
+        filas = Inscripcion.objects.filter(evento=evento).count()
+        espera = ListaEspera.objects.filter(evento=evento).count()
+        en_ambas = ListaEspera.objects.filter(
+            evento=evento, usuario__in=Inscripcion.objects.filter(evento=evento).values('usuario')
+        ).count()
+        problemas = []
+        if filas != inscritos_esperados:
+            problemas.append(f'{filas} inscritos, se esperaban {inscritos_esperados}')
+        if evento.inscritos_count != filas:
+            problemas.append(f'inscritos_count={evento.inscritos_count} pero hay {filas} inscripciones')
+        if espera != espera_esperada:
+            problemas.append(f'{espera} en espera, se esperaban {espera_esperada}')
+        if en_ambas:
+            problemas.append(f'{en_ambas} usuario(s) inscritos y en espera a la vez')
+        if problemas:
+            raise CommandError('; '.join(problemas))
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ {filas} inscritos (contador {evento.inscritos_count}), {espera} en espera, sin sobreventa'
+        ))
+
+    def _cancelar(self, evento, hilos, cuantos):
+        inscritos = list(Inscripcion.objects.filter(evento=evento).select_related('usuario')[:cuantos])
+        siguientes = list(
+            ListaEspera.objects.filter(evento=evento).order_by('fecha', 'id').values_list('usuario_id', flat=True)[:len(inscritos)]
+        )
+        espera_antes = ListaEspera.objects.filter(evento=evento).count()
+        cupo_ocupado = Inscripcion.objects.filter(evento=evento).count()
+
+        trabajos = [(inscripciones.cancelar, (evento.pk, i.usuario, None, False)) for i in inscritos]
+        resultados, errores, segundos = self._concurrente(hilos, trabajos)
+        if errores:
+            raise CommandError(f'{len(errores)} cancelación(es) fallaron, p. ej. {errores[0]}')
+        self.stdout.write(f'  {len(trabajos)} cancelaciones en {segundos:.2f}s')
+
+        promovidos = set(
+            Inscripcion.objects.filter(evento=evento, usuario_id__in=siguientes).values_list('usuario_id', flat=True)
+        )
+        if promovidos != set(siguientes):
+            raise CommandError(f'Se promovieron {len(promovidos)} de los {len(siguientes)} primeros en espera')
+        self._verificar(evento, cupo_ocupado - len(inscritos) + len(siguientes), espera_antes - len(siguientes))
+        self.stdout.write(self.style.SUCCESS(f'✓ {len(siguientes)} promovido(s) desde la lista de espera en orden'))
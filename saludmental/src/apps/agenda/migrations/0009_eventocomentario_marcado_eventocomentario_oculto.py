@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-18 22:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agenda', '0008_eventofoto_hash_md5_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='eventocomentario',
+            name='marcado',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='eventocomentario',
+            name='oculto',
+            field=models.BooleanField(default=False),
+        ),
+    ]
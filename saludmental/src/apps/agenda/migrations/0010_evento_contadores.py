@@ -0,0 +1,54 @@
+# Generated by Django 4.2.7 on 2026-10-18 22:16
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def poblar_contadores(apps, schema_editor):
+    Evento = apps.get_model('agenda', 'Evento')
+    Inscripcion = apps.get_model('agenda', 'Inscripcion')
+    EventoCalificacion = apps.get_model('agenda', 'EventoCalificacion')
+    EventoComentario = apps.get_model('agenda', 'EventoComentario')
+
+    def agregado(qs, expr):
+        sub = qs.filter(evento=OuterRef('pk')).order_by().values('evento').annotate(v=expr).values('v')
+        return Coalesce(Subquery(sub, output_field=models.IntegerField()), Value(0))
+
+    Evento.objects.update(
+        inscritos_count=agregado(Inscripcion.objects.all(), Count('pk')),
+        ratings_count=agregado(EventoCalificacion.objects.all(), Count('pk')),
+        ratings_sum=agregado(EventoCalificacion.objects.all(), Sum('estrellas')),
+        comentarios_count=agregado(EventoComentario.objects.filter(oculto=False), Count('pk')),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agenda', '0009_eventocomentario_marcado_eventocomentario_oculto'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='evento',
+            name='comentarios_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='evento',
+            name='inscritos_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='evento',
+            name='ratings_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='evento',
+            name='ratings_sum',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(poblar_contadores, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-18 22:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agenda', '0010_evento_contadores'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='eventofoto',
+            index=models.Index(fields=['evento', '-fecha_subida', '-id'], name='agenda_even_evento__f223f6_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 22:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agenda', '0011_eventofoto_galeria_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='eventofoto',
+            name='phash',
+            field=models.CharField(blank=True, default='', max_length=16),
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 4.2.7 on 2026-10-18 22:29
+
+from django.db import migrations, models
+
+_BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+
+def _geohash(lat, lon, precision=9):
+    lat_rango, lon_rango = [-90.0, 90.0], [-180.0, 180.0]
+    resultado, bits, n, par = [], 0, 0, True
+    while len(resultado) < precision:
+        rango, valor = (lon_rango, float(lon)) if par else (lat_rango, float(lat))
+        medio = (rango[0] + rango[1]) / 2
+        bits <<= 1
+        if valor >= medio:
+            bits |= 1
+            rango[0] = medio
+        else:
+            rango[1] = medio
+        par = not par
+        n += 1
+        if n == 5:
+            resultado.append(_BASE32[bits])
+            bits, n = 0, 0
+    return ''.join(resultado)
+
+
+def poblar_geohash(apps, schema_editor):
+    Evento = apps.get_model('agenda', 'Evento')
+    eventos = list(Evento.objects.filter(latitud__isnull=False, longitud__isnull=False).only('latitud', 'longitud'))
+    for e in eventos:
+        e.geohash = _geohash(e.latitud, e.longitud)
+    Evento.objects.bulk_update(eventos, ['geohash'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agenda', '0012_eventofoto_phash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='evento',
+            name='geohash',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=12),
+        ),
+        migrations.RunPython(poblar_geohash, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 4.2.7 on 2026-10-18 22:31
+
+import re
+import unicodedata
+
+from django.db import migrations, models
+
+
+def poblar_venue_key(apps, schema_editor):
+    Evento = apps.get_model('agenda', 'Evento')
+    eventos = list(Evento.objects.exclude(lugar='').only('lugar'))
+    for e in eventos:
+        texto = unicodedata.normalize('NFKD', e.lugar)
+        texto = ''.join(c for c in texto if not unicodedata.combining(c)).lower()
+        e.venue_key = re.sub(r'[^0-9a-z]+', ' ', texto).strip()[:200]
+    Evento.objects.bulk_update(eventos, ['venue_key'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agenda', '0013_evento_geohash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='evento',
+            name='venue_key',
+            field=models.CharField(blank=True, default='', editable=False, max_length=200),
+        ),
+        migrations.AlterField(
+            model_name='evento',
+            name='nombre',
+            field=models.CharField(db_index=True, max_length=200),
+        ),
+        migrations.AddIndex(
+            model_name='evento',
+            index=models.Index(fields=['venue_key', 'fecha'], name='agenda_even_venue_k_7e174f_idx'),
+        ),
+        migrations.RunPython(poblar_venue_key, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 4.2.7 on 2026-10-18 22:36
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('agenda', '0014_evento_venue_key'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='evento',
+            name='cupo',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='ListaEspera',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateTimeField(auto_now_add=True)),
+                ('nombre_completo', models.CharField(blank=True, default='', max_length=200)),
+                ('telefono', models.CharField(blank=True, default='', max_length=20)),
+                ('notas', models.TextField(blank=True, default='')),
+                ('evento', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lista_espera', to='agenda.evento')),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['evento', 'fecha', 'id'], name='agenda_list_evento__cb35cb_idx')],
+                'unique_together': {('usuario', 'evento')},
+            },
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 4.2.7 on 2026-10-18 22:38
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models.functions import Coalesce, Now
+
+
+def marcar_ya_notificados(apps, schema_editor):
+    # Los eventos ya publicados se avisaron al publicarse desde el admin
+    Evento = apps.get_model('agenda', 'Evento')
+    Evento.objects.filter(publicado=True).update(notificado_en=Coalesce('fecha_publicacion', Now()))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('agenda', '0015_evento_cupo_listaespera'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='evento',
+            name='notificado_en',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='evento',
+            name='notificados_hasta',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='evento',
+            name='publicado_por',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='evento',
+            index=models.Index(fields=['publicado', 'fecha_publicacion'], name='agenda_even_publica_c2eca2_idx'),
+        ),
+        migrations.RunPython(marcar_ya_notificados, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 4.2.7 on 2026-10-18 22:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agenda', '0016_evento_publicacion_programada'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Estadistica',
+            fields=[
+                ('clave', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('valor', models.BigIntegerField(default=0)),
+                ('estimado', models.BooleanField(default=False)),
+                ('actualizado', models.DateTimeField()),
+            ],
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 4.2.7 on 2026-10-18 22:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agenda', '0017_estadistica'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenDiario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('metrica', models.CharField(max_length=40)),
+                ('dimension', models.CharField(blank=True, default='', max_length=40)),
+                ('dia', models.DateField()),
+                ('valor', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['metrica', 'dia'], name='agenda_resu_metrica_7ddfd4_idx')],
+                'unique_together': {('metrica', 'dimension', 'dia')},
+            },
+        ),
+    ]
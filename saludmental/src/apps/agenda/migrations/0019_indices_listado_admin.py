@@ -0,0 +1,21 @@
+# Generated by Django 4.2.7 on 2026-10-18 22:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agenda', '0018_resumendiario'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='evento',
+            index=models.Index(fields=['fecha', 'id'], name='agenda_even_fecha_f5edff_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='inscripcion',
+            index=models.Index(fields=['evento', 'fecha_inscripcion', 'id'], name='agenda_insc_evento__de0eb3_idx'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.7 on 2026-10-18 22:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agenda', '0019_indices_listado_admin'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='eventocalificacion',
+            index=models.Index(fields=['fecha', 'id'], name='agenda_even_fecha_f6c430_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='inscripcion',
+            index=models.Index(fields=['fecha_inscripcion', 'id'], name='agenda_insc_fecha_i_3fa293_idx'),
+        ),
+    ]
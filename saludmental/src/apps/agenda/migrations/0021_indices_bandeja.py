@@ -0,0 +1,21 @@
+# Generated by Django 4.2.7 on 2026-10-18 22:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agenda', '0020_indices_tablas_admin'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='eventocomentario',
+            index=models.Index(fields=['fecha', 'id'], name='agenda_even_fecha_a9d14e_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='eventocomentario',
+            index=models.Index(condition=models.Q(('marcado', True)), fields=['fecha', 'id'], name='agenda_comentario_marcado_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 23:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agenda', '0021_indices_bandeja'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='evento',
+            name='actualizado',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
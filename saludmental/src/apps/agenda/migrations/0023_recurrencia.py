@@ -0,0 +1,78 @@
+# Generated by Django 4.2.7 on 2026-10-18 23:09
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agenda', '0022_evento_actualizado'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='evento',
+            name='recurrencia',
+            field=models.CharField(blank=True, default='', max_length=200),
+        ),
+        migrations.AddField(
+            model_name='evento',
+            name='recurrencia_hasta',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.CreateModel(
+            name='Ocurrencia',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('inicio', models.DateTimeField()),
+                ('fecha', models.DateTimeField()),
+                ('cancelada', models.BooleanField(default=False)),
+                ('cupo', models.PositiveIntegerField(blank=True, null=True)),
+                ('inscritos_count', models.PositiveIntegerField(default=0)),
+                ('evento', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ocurrencias', to='agenda.evento')),
+            ],
+            options={
+                'unique_together': {('evento', 'inicio')},
+            },
+        ),
+        migrations.AddIndex(
+            model_name='ocurrencia',
+            index=models.Index(fields=['fecha'], name='agenda_ocur_fecha_f7d9b6_idx'),
+        ),
+        migrations.AddField(
+            model_name='inscripcion',
+            name='ocurrencia',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='inscripciones', to='agenda.ocurrencia'),
+        ),
+        migrations.AddField(
+            model_name='listaespera',
+            name='ocurrencia',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='lista_espera', to='agenda.ocurrencia'),
+        ),
+        # Las restricciones nuevas se crean antes de quitar las anteriores: nunca queda sin unicidad
+        migrations.AddConstraint(
+            model_name='inscripcion',
+            constraint=models.UniqueConstraint(condition=models.Q(('ocurrencia__isnull', True)), fields=('usuario', 'evento'), name='agenda_inscripcion_unica'),
+        ),
+        migrations.AddConstraint(
+            model_name='inscripcion',
+            constraint=models.UniqueConstraint(fields=('usuario', 'ocurrencia'), name='agenda_inscripcion_ocurrencia_unica'),
+        ),
+        migrations.AddConstraint(
+            model_name='listaespera',
+            constraint=models.UniqueConstraint(condition=models.Q(('ocurrencia__isnull', True)), fields=('usuario', 'evento'), name='agenda_espera_unica'),
+        ),
+        migrations.AddConstraint(
+            model_name='listaespera',
+            constraint=models.UniqueConstraint(fields=('usuario', 'ocurrencia'), name='agenda_espera_ocurrencia_unica'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='inscripcion',
+            unique_together=set(),
+        ),
+        migrations.AlterUniqueTogether(
+            name='listaespera',
+            unique_together=set(),
+        ),
+    ]
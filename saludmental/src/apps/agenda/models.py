@@ -7,29 +7,116 @@ class Evento(models.Model):
         ('virtual', 'Virtual'),
     ]
     
-    nombre = models.CharField(max_length=200)
+    nombre = models.CharField(max_length=200, db_index=True)
     # Campos nuevos para administración y visualización
     titulo = models.CharField(max_length=200, blank=True, default="")
     descripcion_corta = models.CharField(max_length=280, blank=True, default="")
     lugar = models.CharField(max_length=200, blank=True, default="")
+    # Lugar normalizado para detectar choques de horario (ver conflictos.py)
+    venue_key = models.CharField(max_length=200, blank=True, default="", editable=False)
     # Nuevos campos para geolocalización y eventos virtuales
     tipo_evento = models.CharField(max_length=20, choices=TIPO_EVENTO_CHOICES, default='presencial')
     latitud = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
     longitud = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
+    # Geohash de (latitud, longitud) para búsquedas por cercanía (ver geo.py); vacío sin coordenadas
+    geohash = models.CharField(max_length=12, blank=True, default="", db_index=True, editable=False)
     link_virtual = models.URLField(max_length=500, blank=True, default="")  # Zoom, Meet, etc.
     plataforma_virtual = models.CharField(max_length=50, blank=True, default="")  # "Zoom", "Google Meet", etc.
     imagen = models.ImageField(upload_to="eventos/", null=True, blank=True)
     precio = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     fecha = models.DateTimeField()
+    # Serie: regla RRULE de repetición (ver recurrencia.py); vacía = evento único
+    recurrencia = models.CharField(max_length=200, blank=True, default="")
+    # Último inicio posible de la serie (COUNT/UNTIL); vacío si no termina o no es serie
+    recurrencia_hasta = models.DateTimeField(null=True, blank=True, editable=False)
     publicado = models.BooleanField(default=False)
+    # Publicación programada (ver publicacion.py y el comando publicar_eventos)
     fecha_publicacion = models.DateTimeField(null=True, blank=True)
+    publicado_por = models.ForeignKey(
+        settings.AUTH_USER_MODEL, null=True, blank=True, on_delete=models.SET_NULL, related_name="+", editable=False
+    )
+    # Aviso a usuarios por lotes: último pk de usuario avisado y fin del aviso
+    notificados_hasta = models.PositiveIntegerField(default=0, editable=False)
+    notificado_en = models.DateTimeField(null=True, blank=True, editable=False)
+    # Cupo máximo de inscritos; vacío = sin límite (ver inscripciones.py)
+    cupo = models.PositiveIntegerField(null=True, blank=True)
+    # Contadores desnormalizados (ver contadores.py y el comando reconcile_contadores)
+    inscritos_count = models.PositiveIntegerField(default=0)
+    ratings_count = models.PositiveIntegerField(default=0)
+    ratings_sum = models.PositiveIntegerField(default=0)
+    comentarios_count = models.PositiveIntegerField(default=0)
+    # Último cambio del evento; valida el cache HTTP de los feeds .ics (ver ical.py)
+    actualizado = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['venue_key', 'fecha']),
+            models.Index(fields=['publicado', 'fecha_publicacion']),
+            models.Index(fields=['fecha', 'id']),
+        ]
+
+    # Repetición que representa la instancia cuando se expande una serie (ocurrencias.py):
+    # su inicio según la regla y la fila de Ocurrencia, si la tiene
+    ocurrencia = None
+    ocurrencia_pk = None
 
     def __str__(self) -> str:
         return self.titulo or self.nombre
 
-class Inscripcion(models.Model):
+    @property
+    def rating_promedio(self) -> float:
+        return round(self.ratings_sum / self.ratings_count, 2) if self.ratings_count else 0
+
+    @property
+    def ultima_fecha(self):
+        """Inicio del evento o cota de la última repetición de la serie; None si la serie no termina."""
+        return self.recurrencia_hasta if self.recurrencia else self.fecha
+
+    @property
+    def ocurrencia_clave(self) -> str:
+        from .recurrencia import clave
+        return clave(self.ocurrencia) if self.ocurrencia else ''
+
+
+class Ocurrencia(models.Model):
+    """
+    Repetición de una serie guardada en la tabla. Solo se materializan las
+    excepciones (cancelada o movida) y las que tienen inscripciones, que llevan
+    su propio cupo; el resto se calcula desde la regla (ver ocurrencias.py).
+    """
+    evento = models.ForeignKey(Evento, on_delete=models.CASCADE, related_name='ocurrencias')
+    # Inicio según la regla: identifica la repetición aunque se mueva
+    inicio = models.DateTimeField()
+    # Inicio real (distinto de `inicio` si se movió)
+    fecha = models.DateTimeField()
+    cancelada = models.BooleanField(default=False)
+    cupo = models.PositiveIntegerField(null=True, blank=True)
+    inscritos_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ("evento", "inicio")
+        indexes = [
+            models.Index(fields=['fecha']),
+        ]
+
+    def __str__(self):
+        return f"{self.evento} ({self.inicio:%Y-%m-%d %H:%M})"
+
+class ValoresCargadosMixin:
+    """Guarda en `_valores_cargados` los valores leídos de la base (ver signals._resumen_alta)."""
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._valores_cargados = dict(zip(field_names, values))
+        return instance
+
+
+class Inscripcion(ValoresCargadosMixin, models.Model):
     usuario = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     evento = models.ForeignKey(Evento, on_delete=models.CASCADE)
+    # Repetición de la serie; vacía en los eventos únicos
+    ocurrencia = models.ForeignKey(Ocurrencia, null=True, blank=True, on_delete=models.CASCADE, related_name='inscripciones')
     fecha_inscripcion = models.DateTimeField(auto_now_add=True)
     # Campos adicionales del formulario
     nombre_completo = models.CharField(max_length=200, blank=True, default="")
@@ -37,7 +124,42 @@ class Inscripcion(models.Model):
     notas = models.TextField(blank=True, default="")
 
     class Meta:
-        unique_together = ("usuario", "evento")
+        constraints = [
+            # Una inscripción por evento único, o por repetición de una serie
+            models.UniqueConstraint(
+                fields=['usuario', 'evento'], condition=models.Q(ocurrencia__isnull=True), name='agenda_inscripcion_unica',
+            ),
+            models.UniqueConstraint(fields=['usuario', 'ocurrencia'], name='agenda_inscripcion_ocurrencia_unica'),
+        ]
+        indexes = [
+            # Lista de inscritos por evento en orden de llegada (paginada por keyset)
+            models.Index(fields=['evento', 'fecha_inscripcion', 'id']),
+            # Lista global del panel (tablas.py)
+            models.Index(fields=['fecha_inscripcion', 'id']),
+        ]
+
+
+class ListaEspera(models.Model):
+    """Usuarios en espera de un cupo; se promueven en orden de llegada al liberarse uno."""
+    usuario = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    evento = models.ForeignKey(Evento, on_delete=models.CASCADE, related_name="lista_espera")
+    ocurrencia = models.ForeignKey(Ocurrencia, null=True, blank=True, on_delete=models.CASCADE, related_name='lista_espera')
+    fecha = models.DateTimeField(auto_now_add=True)
+    # Datos del formulario de inscripción, para crear la Inscripcion al promover
+    nombre_completo = models.CharField(max_length=200, blank=True, default="")
+    telefono = models.CharField(max_length=20, blank=True, default="")
+    notas = models.TextField(blank=True, default="")
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['usuario', 'evento'], condition=models.Q(ocurrencia__isnull=True), name='agenda_espera_unica',
+            ),
+            models.UniqueConstraint(fields=['usuario', 'ocurrencia'], name='agenda_espera_ocurrencia_unica'),
+        ]
+        indexes = [
+            models.Index(fields=['evento', 'fecha', 'id']),
+        ]
 
 
 class EventoFoto(models.Model):
@@ -46,17 +168,21 @@ class EventoFoto(models.Model):
     subido_por = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True)
     fecha_subida = models.DateTimeField(auto_now_add=True)
     hash_md5 = models.CharField(max_length=32, blank=True, default="", db_index=True)
+    # dHash perceptual (16 hex) para detectar casi-duplicados; vacío si no se pudo calcular
+    phash = models.CharField(max_length=16, blank=True, default="")
 
     class Meta:
         indexes = [
             models.Index(fields=['evento', 'hash_md5']),
+            # Paginación por keyset de la galería
+            models.Index(fields=['evento', '-fecha_subida', '-id']),
         ]
 
     def __str__(self):
         return f"Foto {self.pk} de {self.evento}"
 
 
-class EventoCalificacion(models.Model):
+class EventoCalificacion(ValoresCargadosMixin, models.Model):
     evento = models.ForeignKey(Evento, on_delete=models.CASCADE, related_name='calificaciones')
     usuario = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     estrellas = models.PositiveSmallIntegerField(default=5)
@@ -64,6 +190,9 @@ class EventoCalificacion(models.Model):
 
     class Meta:
         unique_together = ("evento", "usuario")
+        indexes = [
+            models.Index(fields=['fecha', 'id']),
+        ]
 
     def __str__(self):
         return f"{self.estrellas}★ por {self.usuario} en {self.evento}"
@@ -75,6 +204,16 @@ class EventoComentario(models.Model):
     texto = models.TextField()
     fecha = models.DateTimeField(auto_now_add=True)
     parent = models.ForeignKey('self', null=True, blank=True, related_name='respuestas', on_delete=models.CASCADE)
+    # Moderación: marcado por el reescaneo y ocultado al público
+    oculto = models.BooleanField(default=False)
+    marcado = models.BooleanField(default=False)
+
+    class Meta:
+        indexes = [
+            # Bandeja de moderación (bandeja.py): todo y solo lo marcado
+            models.Index(fields=['fecha', 'id']),
+            models.Index(fields=['fecha', 'id'], condition=models.Q(marcado=True), name='agenda_comentario_marcado_idx'),
+        ]
 
     def __str__(self):
         return f"Comentario de {self.usuario} en {self.evento}: {self.texto[:30]}..."
@@ -87,3 +226,30 @@ class EventoLikeComentario(models.Model):
 
     class Meta:
         unique_together = ("usuario", "comentario")
+
+
+class Estadistica(models.Model):
+    """Un total del panel de administración, mantenido por estadisticas.py."""
+    clave = models.CharField(max_length=50, primary_key=True)
+    valor = models.BigIntegerField(default=0)
+    # True si viene de la estimación del planner y no de un COUNT exacto
+    estimado = models.BooleanField(default=False)
+    actualizado = models.DateTimeField()
+
+    def __str__(self) -> str:
+        return f"{self.clave}={self.valor}"
+
+
+class ResumenDiario(models.Model):
+    """Total diario de una métrica (y dimensión) para las gráficas del dashboard; ver resumenes.py."""
+    metrica = models.CharField(max_length=40)
+    # Subserie: id de evento, estrellas...; vacía para el total
+    dimension = models.CharField(max_length=40, blank=True, default="")
+    dia = models.DateField()
+    valor = models.BigIntegerField(default=0)
+
+    class Meta:
+        unique_together = ("metrica", "dimension", "dia")
+        indexes = [
+            models.Index(fields=['metrica', 'dia']),
+        ]
@@ -0,0 +1,173 @@
+"""
+Series de eventos expandidas bajo demanda (reglas en recurrencia.py).
+
+Una serie es un solo Evento. En la tabla Ocurrencia solo se guardan las
+repeticiones que lo necesitan: las excepciones (canceladas o movidas) y las que
+tienen inscripciones, que llevan su propio cupo y contador. El resto se calcula
+para la ventana pedida:
+
+- `instancias` lee los eventos que tocan la ventana (los únicos por `fecha`, las
+  series por [fecha, recurrencia_hasta]) y las filas de Ocurrencia de esas series
+  en la ventana: dos consultas. Devuelve una copia del Evento por repetición,
+  con su `fecha` real y su `ocurrencia` (inicio según la regla).
+- Las inscripciones de una serie van contra su fila de Ocurrencia, que se crea
+  al inscribirse el primero (`asegurar`, en la misma transacción que el cupo).
+
+Cancelar o mover una repetición marca el evento como actualizado e invalida la
+agenda, igual que editarlo.
+"""
+import copy
+from datetime import timedelta
+from typing import Optional
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from . import recurrencia
+from .cache import invalidar_evento, invalidar_eventos
+from .models import Evento, Inscripcion, Ocurrencia
+
+# Sin `hasta`, hasta dónde se expanden las series (los eventos únicos no tienen límite)
+VENTANA = timedelta(days=int(getattr(settings, 'AGENDA_VENTANA_DIAS', 90)))
+
+
+def q_en_ventana(desde, hasta=None) -> Q:
+    """Eventos con algún inicio en [desde, hasta]: los únicos por fecha, las series por su vigencia."""
+    unicos = Q(recurrencia='', fecha__gte=desde)
+    series = ~Q(recurrencia='') & (Q(recurrencia_hasta__isnull=True) | Q(recurrencia_hasta__gte=desde))
+    if hasta is not None:
+        unicos &= Q(fecha__lte=hasta)
+        series &= Q(fecha__lte=hasta)
+    return unicos | series
+
+
+def _copia(evento: Evento, inicio, fila: Optional[Ocurrencia] = None) -> Evento:
+    instancia = copy.copy(evento)
+    instancia.ocurrencia = inicio
+    instancia.ocurrencia_pk = fila.pk if fila else None
+    instancia.fecha = fila.fecha if fila else inicio
+    instancia.cupo = fila.cupo if fila else evento.cupo
+    instancia.inscritos_count = fila.inscritos_count if fila else 0
+    return instancia
+
+
+def expandir(eventos, desde, hasta) -> list:
+    """Eventos únicos y repeticiones de las series de `eventos` que empiezan en [desde, hasta], por fecha."""
+    series = {e.pk: e for e in eventos if e.recurrencia}
+    filas = {}
+    if series:
+        for fila in Ocurrencia.objects.filter(evento_id__in=list(series)).filter(
+            Q(inicio__range=(desde, hasta)) | Q(fecha__range=(desde, hasta))
+        ):
+            filas[(fila.evento_id, fila.inicio)] = fila
+
+    resultado = []
+    for evento in eventos:
+        if not evento.recurrencia:
+            if desde <= evento.fecha <= hasta:
+                resultado.append(evento)
+            continue
+        regla = recurrencia.parse(evento.recurrencia)
+        for inicio in recurrencia.expandir(regla, evento.fecha, desde, hasta, evento.recurrencia_hasta):
+            fila = filas.pop((evento.pk, inicio), None)
+            if fila is None:
+                resultado.append(_copia(evento, inicio))
+            elif not fila.cancelada and desde <= fila.fecha <= hasta:
+                resultado.append(_copia(evento, inicio, fila))
+    # Repeticiones de fuera de la ventana que se movieron dentro
+    for (evento_id, inicio), fila in filas.items():
+        if not fila.cancelada and desde <= fila.fecha <= hasta and not desde <= inicio <= hasta:
+            resultado.append(_copia(series[evento_id], inicio, fila))
+    resultado.sort(key=lambda e: (e.fecha, e.pk))
+    return resultado
+
+
+def instancias(qs, desde, hasta=None) -> list:
+    """
+    Expande `qs` (p. ej. los eventos publicados) en [desde, hasta]. Sin `hasta`, los
+    eventos únicos no tienen límite y las series se expanden VENTANA a partir de `desde`.
+    """
+    eventos = list(qs.filter(q_en_ventana(desde, hasta)))
+    if hasta is not None:
+        return expandir(eventos, desde, hasta)
+    unicos = [e for e in eventos if not e.recurrencia]
+    return sorted(
+        unicos + expandir([e for e in eventos if e.recurrencia], desde, desde + VENTANA),
+        key=lambda e: (e.fecha, e.pk),
+    )
+
+
+def es_repeticion(evento: Evento, inicio, regla=None) -> bool:
+    """True si `inicio` es uno de los inicios de la serie según su regla."""
+    if not evento.recurrencia or inicio is None:
+        return False
+    regla = regla or recurrencia.parse(evento.recurrencia)
+    return next(recurrencia.expandir(regla, evento.fecha, inicio, inicio, evento.recurrencia_hasta), None) == inicio
+
+
+def instancia(evento: Evento, inicio) -> Optional[Evento]:
+    """La repetición `inicio` de la serie, con su fecha real; None si no existe o está cancelada."""
+    if not es_repeticion(evento, inicio):
+        return None
+    fila = Ocurrencia.objects.filter(evento=evento, inicio=inicio).first()
+    if fila is not None and fila.cancelada:
+        return None
+    return _copia(evento, inicio, fila)
+
+
+def proxima(evento: Evento, ahora=None, ventanas=4) -> Optional[Evento]:
+    """Siguiente repetición que aún no empieza, buscando por tramos de VENTANA; None si no hay."""
+    desde = ahora or timezone.now()
+    for _ in range(ventanas):
+        if evento.recurrencia_hasta and evento.recurrencia_hasta < desde:
+            return None
+        siguientes = expandir([evento], desde, desde + VENTANA)
+        if siguientes:
+            return siguientes[0]
+        desde += VENTANA
+    return None
+
+
+def asegurar(evento: Evento, inicio) -> Ocurrencia:
+    """
+    Fila de la repetición (la crea con el cupo del evento si no existe). Escribe antes
+    de leer (INSERT que ignora el conflicto), así que puede abrir una transacción.
+    """
+    Ocurrencia.objects.bulk_create(
+        [Ocurrencia(evento_id=evento.pk, inicio=inicio, fecha=inicio, cupo=evento.cupo)], ignore_conflicts=True,
+    )
+    return Ocurrencia.objects.get(evento_id=evento.pk, inicio=inicio)
+
+
+def _tocar(evento_id) -> None:
+    Evento.objects.filter(pk=evento_id).update(actualizado=timezone.now())
+    transaction.on_commit(invalidar_eventos)
+    transaction.on_commit(lambda: invalidar_evento(evento_id))
+
+
+def excepcion(evento: Evento, inicio, cancelada=False, fecha=None) -> Ocurrencia:
+    """Cancela, mueve (`fecha`) o restaura (sin argumentos) la repetición `inicio` de la serie."""
+    with transaction.atomic():
+        fila = asegurar(evento, inicio)
+        fila.cancelada = cancelada
+        fila.fecha = fecha or inicio
+        fila.save(update_fields=['cancelada', 'fecha'])
+        _tocar(evento.pk)
+    return fila
+
+
+def podar(evento: Evento) -> int:
+    """Tras cambiar la regla o el inicio, borra las filas sin inscritos que ya no son repeticiones."""
+    regla = recurrencia.parse(evento.recurrencia) if evento.recurrencia else None
+    sobrantes = []
+    con_inscritos = set(
+        Inscripcion.objects.filter(ocurrencia__evento=evento).values_list('ocurrencia_id', flat=True).distinct()
+    )
+    for fila in Ocurrencia.objects.filter(evento=evento).only('pk', 'inicio'):
+        if not es_repeticion(evento, fila.inicio, regla) and fila.pk not in con_inscritos:
+            sobrantes.append(fila.pk)
+    if sobrantes:
+        Ocurrencia.objects.filter(pk__in=sobrantes).delete()
+    return len(sobrantes)
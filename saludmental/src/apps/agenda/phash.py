@@ -0,0 +1,73 @@
+"""
+Hash perceptual (dHash) de fotos y búsqueda por distancia de Hamming.
+
+dHash: la imagen se reduce a 9x8 en escala de grises y cada bit indica si un
+píxel es más claro que su vecino de la derecha. Sobrevive a recompresión,
+cambio de tamaño y reexportación (p. ej. fotos reenviadas por WhatsApp), a
+diferencia del MD5 que solo detecta archivos idénticos.
+
+Los hashes de un evento se indexan en un BK-tree, que permite buscar los que
+están a distancia <= d sin comparar contra todos.
+"""
+from PIL import Image, ImageOps
+
+
+def dhash(archivo) -> str:
+    """dHash de 64 bits de un archivo de imagen, como 16 caracteres hexadecimales."""
+    archivo.seek(0)
+    with Image.open(archivo) as img:
+        # Decodificar a escala reducida (JPEG): solo se necesitan 9x8 píxeles
+        img.draft('L', (64, 64))
+        img = ImageOps.exif_transpose(img).convert('L').resize((9, 8), Image.LANCZOS)
+        pixeles = list(img.getdata())
+    valor = 0
+    for fila in range(8):
+        for col in range(8):
+            valor = (valor << 1) | (pixeles[fila * 9 + col] > pixeles[fila * 9 + col + 1])
+    return f'{valor:016x}'
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count('1')
+
+
+class BKTree:
+    """Árbol de Burkhard-Keller sobre enteros con la distancia de Hamming."""
+
+    __slots__ = ('raiz',)
+
+    def __init__(self, elementos=()):
+        self.raiz = None  # [hash, valor, {distancia: hijo}]
+        for h, valor in elementos:
+            self.agregar(h, valor)
+
+    def agregar(self, h: int, valor) -> None:
+        if self.raiz is None:
+            self.raiz = [h, valor, {}]
+            return
+        nodo = self.raiz
+        while True:
+            d = hamming(h, nodo[0])
+            hijo = nodo[2].get(d)
+            if hijo is None:
+                nodo[2][d] = [h, valor, {}]
+                return
+            nodo = hijo
+
+    def buscar(self, h: int, distancia: int) -> list:
+        """Devuelve [(distancia, valor), ...] de los elementos a distancia <= `distancia`, del más cercano al más lejano."""
+        if self.raiz is None:
+            return []
+        encontrados = []
+        pendientes = [self.raiz]
+        while pendientes:
+            nodo = pendientes.pop()
+            d = hamming(h, nodo[0])
+            if d <= distancia:
+                encontrados.append((d, nodo[1]))
+            # Desigualdad triangular: solo los hijos en [d - distancia, d + distancia]
+            for dh, hijo in nodo[2].items():
+                if d - distancia <= dh <= d + distancia:
+                    pendientes.append(hijo)
+        encontrados.sort(key=lambda x: x[0])
+        return encontrados
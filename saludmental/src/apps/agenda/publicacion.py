@@ -0,0 +1,163 @@
+"""
+Publicación programada de eventos y aviso a los usuarios por lotes.
+
+El admin solo guarda el evento con su `fecha_publicacion` (vacía = ahora). Si
+ya venció, una tarea en segundo plano tras guardar publica ese evento
+(`publicar`); el aviso a los usuarios queda siempre para el comando
+publicar_eventos (cron o `--loop`), que llama a `procesar`:
+
+1. `publicar_vencidos`: cada evento con fecha_publicacion vencida se reclama
+   con un UPDATE condicional (publicado=False -> True). Solo un proceso lo
+   gana, y en esa misma transacción se crea el aviso al publicador.
+2. `notificar_pendientes`: recorre los usuarios por pk en lotes. Cada lote
+   crea sus Notificacion y avanza `Evento.notificados_hasta` en la misma
+   transacción, con un UPDATE condicional sobre el valor anterior. Si otro
+   proceso ya avanzó el cursor, el lote se deshace. Los correos se envían
+   después del commit.
+
+Reiniciar el worker continúa desde el cursor: ninguna notificación se repite.
+Si el proceso muere a mitad de un envío de correos, ese lote pierde correos
+en lugar de duplicarlos (como mucho una vez).
+"""
+import logging
+
+from django.conf import settings
+from django.db import transaction
+from django.urls import reverse
+from django.utils import timezone, translation
+from django.utils.formats import date_format
+
+from .cache import invalidar_evento, invalidar_eventos
+from .models import Evento
+
+logger = logging.getLogger(__name__)
+
+LOTE = int(getattr(settings, 'PUBLICACION_LOTE', 500))
+
+
+def _urls(evento_id):
+    with translation.override(getattr(settings, 'LANGUAGE_CODE', 'es')):
+        return (
+            reverse('agenda_evento_detalle', kwargs={'pk': evento_id}),
+            reverse('admin_evento_edit', kwargs={'pk': evento_id}),
+        )
+
+
+_CAMPOS_RECLAMO = ('pk', 'publicado_por_id', 'titulo', 'nombre', 'fecha')
+
+
+def _reclamar(pk, publicador_id, titulo, nombre, fecha, ahora) -> bool:
+    """Pasa el evento a publicado si nadie lo hizo antes y avisa al publicador. True si lo publicó esta llamada."""
+    from apps.usuarios.models import Notificacion
+
+    with transaction.atomic():
+        # Reclamo: solo un proceso pasa el evento de no publicado a publicado
+        if not Evento.objects.filter(pk=pk, publicado=False).update(publicado=True, actualizado=ahora):
+            return False
+        if publicador_id:
+            admin_url = _urls(pk)[1]
+            with translation.override(getattr(settings, 'LANGUAGE_CODE', 'es')):
+                fecha_fmt = date_format(timezone.localtime(fecha), 'D d M Y, H:i')
+            Notificacion.objects.create(
+                usuario_id=publicador_id,
+                mensaje=f"Publicaste el evento: {titulo or nombre} para {fecha_fmt}"[:255],
+                url=admin_url,
+            )
+        transaction.on_commit(lambda: invalidar_evento(pk))
+        transaction.on_commit(invalidar_eventos)
+    return True
+
+
+def publicar_vencidos(ahora=None) -> list:
+    """Publica los eventos cuya fecha_publicacion ya pasó. Devuelve los pk publicados por esta llamada."""
+    ahora = ahora or timezone.now()
+    candidatos = Evento.objects.filter(publicado=False, fecha_publicacion__lte=ahora).values_list(*_CAMPOS_RECLAMO)
+    return [fila[0] for fila in candidatos if _reclamar(*fila, ahora)]
+
+
+def publicar(evento_id, ahora=None) -> bool:
+    """Publica solo `evento_id` si su fecha_publicacion ya venció (tarea tras guardarlo en el admin)."""
+    ahora = ahora or timezone.now()
+    fila = (
+        Evento.objects.filter(pk=evento_id, publicado=False, fecha_publicacion__lte=ahora)
+        .values_list(*_CAMPOS_RECLAMO)
+        .first()
+    )
+    return fila is not None and _reclamar(*fila, ahora)
+
+
+def _destinatarios():
+    from apps.usuarios.models import CustomUser
+    return CustomUser.objects.filter(is_active=True, is_staff=False)
+
+
+def notificar_lote(evento_id, lote=LOTE) -> int:
+    """Avisa al siguiente lote de usuarios del evento. Devuelve cuántos avisó (0 = terminado o ya tomado)."""
+    from apps.usuarios.email_utils import enviar_notificacion_evento_publicado
+    from apps.usuarios.models import Notificacion
+
+    fila = (
+        Evento.objects.filter(pk=evento_id, publicado=True, notificado_en__isnull=True)
+        .values('notificados_hasta', 'titulo', 'nombre')
+        .first()
+    )
+    if fila is None:
+        return 0
+    cursor = fila['notificados_hasta']
+    usuarios = list(_destinatarios().filter(pk__gt=cursor).order_by('pk').only('pk', 'email')[:lote])
+    user_url = _urls(evento_id)[0]
+    titulo = fila['titulo'] or fila['nombre']
+
+    with transaction.atomic():
+        avance = Evento.objects.filter(pk=evento_id, notificados_hasta=cursor, notificado_en__isnull=True)
+        if not usuarios:
+            avance.update(notificado_en=timezone.now())
+            return 0
+        if not avance.update(notificados_hasta=usuarios[-1].pk):
+            return 0  # otro proceso ya tomó este lote
+        msg = f"Nuevo evento publicado: {titulo}"[:255]
+        Notificacion.objects.bulk_create(
+            [Notificacion(usuario_id=u.pk, mensaje=msg, url=user_url) for u in usuarios], ignore_conflicts=True
+        )
+
+    url_completa = f"http://localhost:8000{user_url}"  # Cambiar en producción
+    for u in usuarios:
+        if u.email:
+            try:
+                enviar_notificacion_evento_publicado(
+                    usuario_destinatario=u,
+                    evento_titulo=titulo,
+                    url_evento=url_completa
+                )
+            except Exception:
+                logger.exception('No se pudo enviar el aviso del evento %s a %s', evento_id, u.email)
+    return len(usuarios)
+
+
+def notificar_pendientes(lote=LOTE) -> int:
+    """Completa el aviso de todos los eventos publicados que aún no terminaron. Devuelve avisos creados."""
+    total = 0
+    for pk in Evento.objects.filter(publicado=True, notificado_en__isnull=True).values_list('pk', flat=True):
+        while True:
+            avisados = notificar_lote(pk, lote)
+            if not avisados:
+                break
+            total += avisados
+    return total
+
+
+def procesar(ahora=None, lote=LOTE):
+    """Una pasada completa: publica lo vencido y avanza los avisos pendientes."""
+    publicados = publicar_vencidos(ahora)
+    return publicados, notificar_pendientes(lote)
+
+
+def proxima_publicacion():
+    """Fecha de la siguiente publicación programada, o None."""
+    return (
+        Evento.objects.filter(publicado=False, fecha_publicacion__isnull=False)
+        .order_by('fecha_publicacion')
+        .values_list('fecha_publicacion', flat=True)
+        .first()
+    )
+
@@ -0,0 +1,216 @@
+"""
+Reglas de repetición de eventos (subconjunto de RRULE, RFC 5545).
+
+Un Evento con `recurrencia` es una serie: `fecha` es el primer inicio y la
+regla dice cómo se repite. Se admite:
+
+    FREQ=DAILY|WEEKLY|MONTHLY     INTERVAL=n
+    BYDAY=MO,WE (semanal)         BYDAY=2TU / -1FR (mensual: n-ésimo día de la semana)
+    BYMONTHDAY=15 (mensual)       COUNT=n  o  UNTIL=AAAAMMDD[THHMMSSZ]
+
+p. ej. "FREQ=WEEKLY;BYDAY=TU;COUNT=12" o "FREQ=MONTHLY;BYDAY=-1FR". El texto
+normalizado es un RRULE válido, así que los feeds .ics lo publican tal cual.
+
+Las repeticiones se calculan en hora de Colombia (la hora local se mantiene)
+y nunca se recorren desde el principio: `expandir` salta aritméticamente al
+periodo que contiene el inicio de la ventana, de modo que el costo depende del
+tamaño de la ventana y no de la antigüedad ni de la longitud de la serie.
+"""
+import math
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
+from typing import Iterator, Optional
+
+from .resumenes import ZONA
+
+FRECUENCIAS = ('DAILY', 'WEEKLY', 'MONTHLY')
+DIAS = ('MO', 'TU', 'WE', 'TH', 'FR', 'SA', 'SU')
+MAX_CUENTA = 1000
+
+
+@dataclass(frozen=True)
+class Regla:
+    frecuencia: str
+    intervalo: int = 1
+    dias: tuple = ()  # días de la semana (0 = lunes)
+    ordinal: Optional[int] = None  # mensual: 2 = segundo, -1 = último (con un solo día en `dias`)
+    dia_mes: Optional[int] = None
+    cuenta: Optional[int] = None
+    hasta: Optional[datetime] = None
+
+    def __str__(self) -> str:
+        partes = [f'FREQ={self.frecuencia}']
+        if self.intervalo != 1:
+            partes.append(f'INTERVAL={self.intervalo}')
+        if self.dias:
+            prefijo = str(self.ordinal) if self.ordinal else ''
+            partes.append('BYDAY=' + ','.join(prefijo + DIAS[d] for d in self.dias))
+        if self.dia_mes:
+            partes.append(f'BYMONTHDAY={self.dia_mes}')
+        if self.cuenta:
+            partes.append(f'COUNT={self.cuenta}')
+        if self.hasta:
+            partes.append(f'UNTIL={clave(self.hasta)}')
+        return ';'.join(partes)
+
+    @property
+    def periodo_dias(self) -> Optional[int]:
+        """Días tras los que el patrón se repite exactamente; None para las mensuales."""
+        if self.frecuencia == 'DAILY':
+            return self.intervalo
+        if self.frecuencia == 'WEEKLY':
+            return 7 * self.intervalo
+        return None
+
+
+def clave(valor: datetime) -> str:
+    """Inicio de una repetición en UTC, como en iCalendar: 20261020T230000Z."""
+    return valor.astimezone(dt_timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def desde_clave(texto: str) -> Optional[datetime]:
+    try:
+        return datetime.strptime(texto, '%Y%m%dT%H%M%SZ').replace(tzinfo=dt_timezone.utc)
+    except (TypeError, ValueError):
+        return None
+
+
+def _hasta(valor: str) -> datetime:
+    if 'T' in valor:
+        return datetime.strptime(valor, '%Y%m%dT%H%M%SZ').replace(tzinfo=dt_timezone.utc)
+    # Solo fecha: hasta el final de ese día en Colombia
+    dia = datetime.strptime(valor, '%Y%m%d').date()
+    return datetime.combine(dia, time.max, tzinfo=ZONA)
+
+
+def parse(texto: str) -> Regla:
+    """'FREQ=WEEKLY;BYDAY=TU' -> Regla. ValueError si no es válida o no está soportada."""
+    campos = {}
+    for parte in (texto or '').strip().upper().removeprefix('RRULE:').split(';'):
+        if not parte:
+            continue
+        nombre, _, valor = parte.partition('=')
+        if not valor or nombre in campos:
+            raise ValueError(parte)
+        campos[nombre] = valor
+    desconocidos = set(campos) - {'FREQ', 'INTERVAL', 'BYDAY', 'BYMONTHDAY', 'COUNT', 'UNTIL'}
+    if desconocidos or campos.get('FREQ') not in FRECUENCIAS:
+        raise ValueError(texto)
+    if 'COUNT' in campos and 'UNTIL' in campos:
+        raise ValueError('COUNT y UNTIL')
+
+    frecuencia = campos['FREQ']
+    intervalo = int(campos.get('INTERVAL', 1))
+    cuenta = int(campos['COUNT']) if 'COUNT' in campos else None
+    if not (1 <= intervalo <= 99) or (cuenta is not None and not (1 <= cuenta <= MAX_CUENTA)):
+        raise ValueError(texto)
+
+    dias, ordinal = (), None
+    if 'BYDAY' in campos:
+        if frecuencia == 'DAILY':
+            raise ValueError('BYDAY')
+        for item in campos['BYDAY'].split(','):
+            numero, dia = item[:-2], item[-2:]
+            if dia not in DIAS:
+                raise ValueError(item)
+            if numero:
+                if frecuencia != 'MONTHLY' or ordinal is not None or int(numero) not in (1, 2, 3, 4, 5, -1):
+                    raise ValueError(item)
+                ordinal = int(numero)
+            dias += (DIAS.index(dia),)
+        if frecuencia == 'MONTHLY' and (ordinal is None or len(dias) != 1):
+            raise ValueError('BYDAY')
+        dias = tuple(sorted(set(dias)))
+    dia_mes = None
+    if 'BYMONTHDAY' in campos:
+        dia_mes = int(campos['BYMONTHDAY'])
+        if frecuencia != 'MONTHLY' or dias or not (1 <= dia_mes <= 31):
+            raise ValueError('BYMONTHDAY')
+    return Regla(
+        frecuencia=frecuencia, intervalo=intervalo, dias=dias, ordinal=ordinal, dia_mes=dia_mes,
+        cuenta=cuenta, hasta=_hasta(campos['UNTIL']) if 'UNTIL' in campos else None,
+    )
+
+
+# ============ FECHAS ============
+
+def _local(valor: datetime) -> datetime:
+    return valor.astimezone(ZONA)
+
+
+def _dia_del_mes(regla: Regla, inicio: date, anio: int, mes: int) -> Optional[date]:
+    if regla.ordinal:
+        primero = date(anio, mes, 1)
+        dias_mes = ((primero.replace(day=28) + timedelta(days=4)).replace(day=1) - primero).days
+        if regla.ordinal > 0:
+            dia = 1 + (regla.dias[0] - primero.weekday()) % 7 + 7 * (regla.ordinal - 1)
+        else:
+            ultimo = primero.replace(day=dias_mes)
+            dia = dias_mes - (ultimo.weekday() - regla.dias[0]) % 7
+        return date(anio, mes, dia) if dia <= dias_mes else None
+    try:
+        return date(anio, mes, regla.dia_mes or inicio.day)
+    except ValueError:
+        return None  # p. ej. el 31 en un mes de 30 días: ese mes no hay repetición
+
+
+def _dias(regla: Regla, inicio: date, desde: date) -> Iterator[date]:
+    """Días de la regla a partir del periodo que contiene `desde`, sin recorrer los anteriores."""
+    n = regla.intervalo
+    if regla.frecuencia == 'DAILY':
+        dia = inicio + timedelta(days=n * max(0, math.ceil((desde - inicio).days / n)))
+        while True:
+            yield dia
+            dia += timedelta(days=n)
+    elif regla.frecuencia == 'WEEKLY':
+        lunes_inicio = inicio - timedelta(days=inicio.weekday())
+        semanas = max(0, (desde - lunes_inicio).days // 7)
+        lunes = lunes_inicio + timedelta(weeks=semanas - semanas % n)
+        while True:
+            for dia_semana in regla.dias or (inicio.weekday(),):
+                dia = lunes + timedelta(days=dia_semana)
+                if dia >= inicio:
+                    yield dia
+            lunes += timedelta(weeks=n)
+    else:
+        meses = max(0, (desde.year - inicio.year) * 12 + desde.month - inicio.month)
+        mes = meses - meses % n
+        while True:
+            anio, mes0 = divmod(inicio.month - 1 + mes, 12)
+            dia = _dia_del_mes(regla, inicio, inicio.year + anio, mes0 + 1)
+            if dia and dia >= inicio:
+                yield dia
+            mes += n
+
+
+def coincide(regla: Regla, inicio: datetime) -> bool:
+    """True si el primer inicio de la serie es una de sus repeticiones (requisito de COUNT en RFC 5545)."""
+    local = _local(inicio).date()
+    return next(_dias(regla, local, local)) == local
+
+
+def expandir(regla: Regla, inicio: datetime, desde: datetime, hasta: datetime, fin=None) -> Iterator[datetime]:
+    """Inicios de la serie dentro de [desde, hasta]; `fin` es el último inicio posible (ver `ultimo_inicio`)."""
+    tope = min(filter(None, [hasta, fin, regla.hasta]))
+    local = _local(inicio)
+    for dia in _dias(regla, local.date(), _local(max(desde, inicio)).date()):
+        valor = datetime.combine(dia, local.time(), tzinfo=ZONA)
+        if valor > tope:
+            return
+        if valor >= desde:
+            yield valor
+
+
+def ultimo_inicio(regla: Regla, inicio: datetime) -> Optional[datetime]:
+    """Cota del último inicio de la serie: la última repetición con COUNT, UNTIL, o None si no termina."""
+    if regla.cuenta:
+        local = _local(inicio)
+        for n, dia in enumerate(_dias(regla, local.date(), local.date()), 1):
+            if n == regla.cuenta:
+                return datetime.combine(dia, local.time(), tzinfo=ZONA)
+    return regla.hasta
+
+
+def cerca(regla: Regla, inicio: datetime, fin, momento: datetime, ventana: timedelta) -> Optional[datetime]:
+    """Primera repetición a ±`ventana` de `momento`, o None. Salta directo a esa fecha."""
+    return next(expandir(regla, inicio, momento - ventana, momento + ventana, fin), None)
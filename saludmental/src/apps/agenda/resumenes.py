@@ -0,0 +1,183 @@
+"""
+Series diarias para las gráficas del dashboard (tabla ResumenDiario).
+
+Cada fila es (métrica, dimensión, día, valor): p. ej. ('inscripciones', '', 2026-10-18, 42),
+('inscripciones_evento', '<evento_id>', ...) o ('calificaciones', '<estrellas>', ...).
+Los días son días de calendario en ESTADISTICAS_ZONA (hora de Colombia).
+
+- Incremental: signals.py suma ±1 tras el commit al crear o borrar una fila de
+  origen (y mueve la calificación de dimensión si cambian las estrellas).
+- Reconstrucción: `reconstruir` recalcula un rango de días con un GROUP BY
+  sobre la tabla de origen (comando backfill_resumenes).
+
+`consultar` responde cualquier rango leyendo solo las filas de esos días por el
+índice (metrica, dia): el costo depende de los días, no de las filas de origen.
+"""
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta
+from typing import Optional
+from zoneinfo import ZoneInfo
+
+from django.apps import apps
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Min
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import ResumenDiario
+
+ZONA = ZoneInfo(getattr(settings, 'ESTADISTICAS_ZONA', 'America/Bogota'))
+MAX_DIAS = 1100  # ~3 años por consulta
+AGRUPACIONES = ('dia', 'semana', 'mes')
+
+
+@dataclass(frozen=True)
+class Serie:
+    modelo: str
+    campo_fecha: str
+    dimension: Optional[str] = None  # campo que separa la serie en varias (evento_id, estrellas)
+
+
+SERIES = {
+    'registros': Serie(settings.AUTH_USER_MODEL, 'date_joined'),
+    'inscripciones': Serie('agenda.Inscripcion', 'fecha_inscripcion'),
+    'inscripciones_evento': Serie('agenda.Inscripcion', 'fecha_inscripcion', 'evento_id'),
+    'comentarios_foro': Serie('foro.Comentario', 'fecha'),
+    'comentarios_eventos': Serie('agenda.EventoComentario', 'fecha'),
+    'calificaciones': Serie('agenda.EventoCalificacion', 'fecha', 'estrellas'),
+}
+
+
+def dia_local(valor) -> date:
+    return timezone.localtime(valor, ZONA).date()
+
+
+def _inicio_dia(dia: date) -> datetime:
+    return datetime.combine(dia, time.min, tzinfo=ZONA)
+
+
+# ============ ESCRITURA ============
+
+def sumar(metrica: str, dimension: str, dia: date, delta: int) -> None:
+    """UPDATE +delta sobre la fila del día; si no existe se crea (con reintento si otro la creó antes)."""
+    filtro = {'metrica': metrica, 'dimension': dimension, 'dia': dia}
+    if ResumenDiario.objects.filter(**filtro).update(valor=F('valor') + delta):
+        return
+    try:
+        with transaction.atomic():
+            ResumenDiario.objects.create(valor=delta, **filtro)
+    except IntegrityError:
+        ResumenDiario.objects.filter(**filtro).update(valor=F('valor') + delta)
+
+
+def registrar(instance, delta: int, dimensiones=None) -> None:
+    """Suma `delta` en todas las series del modelo de `instance`, tras el commit."""
+    label = instance._meta.label_lower
+    for clave, serie in SERIES.items():
+        if serie.modelo.lower() != label:
+            continue
+        valor_fecha = getattr(instance, serie.campo_fecha, None)
+        if valor_fecha is None:
+            continue
+        dia = dia_local(valor_fecha)
+        if serie.dimension:
+            dimension = str((dimensiones or {}).get(serie.dimension, getattr(instance, serie.dimension)))
+        else:
+            dimension = ''
+        transaction.on_commit(lambda c=clave, d=dimension, dia=dia: sumar(c, d, dia, delta))
+
+
+def campos_dimension(modelo) -> list:
+    label = modelo._meta.label_lower
+    return [s.dimension for s in SERIES.values() if s.modelo.lower() == label and s.dimension]
+
+
+def reconstruir(clave: str, desde: Optional[date] = None, hasta: Optional[date] = None) -> int:
+    """Recalcula la métrica para los días [desde, hasta] desde la tabla de origen. Devuelve filas escritas."""
+    serie = SERIES[clave]
+    modelo = apps.get_model(serie.modelo)
+    qs = modelo._default_manager.all()
+    if desde is None:
+        primera = qs.aggregate(v=Min(serie.campo_fecha))['v']
+        if primera is None:
+            return 0
+        desde = dia_local(primera)
+    hasta = hasta or dia_local(timezone.now())
+    campos = ['dia'] + ([serie.dimension] if serie.dimension else [])
+    filas = (
+        qs.filter(**{
+            f'{serie.campo_fecha}__gte': _inicio_dia(desde),
+            f'{serie.campo_fecha}__lt': _inicio_dia(hasta + timedelta(days=1)),
+        })
+        .annotate(dia=TruncDate(serie.campo_fecha, tzinfo=ZONA))
+        .values(*campos)
+        .annotate(n=Count('pk'))
+        .order_by()
+    )
+    nuevas = [
+        ResumenDiario(
+            metrica=clave,
+            dimension=str(f[serie.dimension]) if serie.dimension else '',
+            dia=f['dia'],
+            valor=f['n'],
+        )
+        for f in filas
+    ]
+    with transaction.atomic():
+        ResumenDiario.objects.filter(metrica=clave, dia__range=(desde, hasta)).delete()
+        ResumenDiario.objects.bulk_create(nuevas, batch_size=1000)
+    return len(nuevas)
+
+
+# ============ LECTURA ============
+
+def _periodo(dia: date, agrupar: str) -> date:
+    if agrupar == 'semana':
+        return dia - timedelta(days=dia.weekday())  # lunes
+    if agrupar == 'mes':
+        return dia.replace(day=1)
+    return dia
+
+
+def _periodos(desde: date, hasta: date, agrupar: str) -> list:
+    periodos = []
+    dia = _periodo(desde, agrupar)
+    while dia <= hasta:
+        periodos.append(dia)
+        if agrupar == 'semana':
+            dia += timedelta(days=7)
+        elif agrupar == 'mes':
+            dia = (dia.replace(day=28) + timedelta(days=4)).replace(day=1)
+        else:
+            dia += timedelta(days=1)
+    return periodos
+
+
+def consultar(clave: str, desde: date, hasta: date, dimension=None, agrupar='dia', top=10) -> dict:
+    """
+    Series de la métrica entre `desde` y `hasta` (inclusive), con ceros en los días sin datos.
+    Sin `dimension`, una métrica con dimensiones devuelve las `top` de mayor total.
+    """
+    qs = ResumenDiario.objects.filter(metrica=clave, dia__range=(desde, hasta))
+    if dimension is not None:
+        qs = qs.filter(dimension=str(dimension))
+    valores = defaultdict(lambda: defaultdict(int))
+    for dim, dia, valor in qs.values_list('dimension', 'dia', 'valor'):
+        valores[dim][_periodo(dia, agrupar)] += valor
+
+    periodos = _periodos(desde, hasta, agrupar)
+    if not SERIES[clave].dimension:
+        dims = ['']
+    elif dimension is not None:
+        dims = [str(dimension)]
+    else:
+        dims = sorted(valores, key=lambda d: -sum(valores[d].values()))[:top]
+    return {
+        'etiquetas': [p.isoformat() for p in periodos],
+        'series': [
+            {'dimension': dim, 'datos': [valores[dim].get(p, 0) for p in periodos]}
+            for dim in dims
+        ],
+    }
@@ -0,0 +1,148 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from apps.foro.signals import contenido_oculto
+
+from . import contadores, estadisticas, geo, imagenes, recurrencia, resumenes
+from .cache import invalidar_agenda, invalidar_evento, invalidar_eventos
+from .conflictos import clave_lugar
+from .models import Evento, EventoCalificacion, EventoComentario, EventoFoto, Inscripcion
+
+
+@receiver(pre_save, sender=Evento)
+def _actualizar_claves(sender, instance, **kwargs):
+    if instance.latitud is not None and instance.longitud is not None:
+        instance.geohash = geo.geohash(instance.latitud, instance.longitud)
+    else:
+        instance.geohash = ''
+    instance.venue_key = clave_lugar(instance.lugar)
+    # Cota de la serie para filtrar por ventana sin expandirla (ver ocurrencias.q_en_ventana)
+    if instance.recurrencia:
+        instance.recurrencia_hasta = recurrencia.ultimo_inicio(recurrencia.parse(instance.recurrencia), instance.fecha)
+    else:
+        instance.recurrencia_hasta = None
+
+
+@receiver(post_save, sender=Inscripcion)
+@receiver(post_delete, sender=Inscripcion)
+def _invalidar_agenda(sender, **kwargs):
+    # Tras el commit, para que ninguna lectura concurrente recachee datos sin confirmar
+    transaction.on_commit(invalidar_agenda)
+
+
+@receiver(post_save, sender=Evento)
+@receiver(post_delete, sender=Evento)
+def _invalidar_eventos(sender, **kwargs):
+    # También el feed .ics: un borrado no deja fila que mueva Max(actualizado)
+    transaction.on_commit(invalidar_eventos)
+
+
+@receiver(post_save, sender=Evento)
+@receiver(post_delete, sender=Evento)
+def _invalidar_detalle_evento(sender, instance, **kwargs):
+    pk = instance.pk  # tras el borrado la instancia pierde el pk
+    transaction.on_commit(lambda: invalidar_evento(pk))
+
+
+@receiver(post_save, sender=Inscripcion)
+@receiver(post_delete, sender=Inscripcion)
+@receiver(post_save, sender=EventoCalificacion)
+@receiver(post_delete, sender=EventoCalificacion)
+@receiver(post_save, sender=EventoComentario)
+@receiver(post_delete, sender=EventoComentario)
+@receiver(post_save, sender=EventoFoto)
+@receiver(post_delete, sender=EventoFoto)
+def _invalidar_detalle_relacionado(sender, instance, **kwargs):
+    evento_id = instance.evento_id
+    transaction.on_commit(lambda: invalidar_evento(evento_id))
+
+
+def _encolar_derivadas(instance, campo, update_fields):
+    if update_fields is not None and campo not in update_fields:
+        return  # p. ej. el guardado de last_login en cada inicio de sesión
+    archivo = getattr(instance, campo)
+    if archivo:
+        nombre, storage = archivo.name, archivo.storage
+        transaction.on_commit(lambda: imagenes.encolar(nombre, storage))
+
+
+@receiver(post_save, sender=Evento)
+def _derivadas_evento(sender, instance, update_fields=None, **kwargs):
+    _encolar_derivadas(instance, 'imagen', update_fields)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def _derivadas_perfil(sender, instance, update_fields=None, **kwargs):
+    _encolar_derivadas(instance, 'foto_perfil', update_fields)
+
+
+@receiver(contenido_oculto, sender=EventoComentario)
+def _comentarios_ocultos(sender, pks, **kwargs):
+    # Los comentarios ocultos no cuentan en Evento.comentarios_count
+    contadores.recalcular(EventoComentario.objects.filter(pk__in=pks).values_list('evento_id', flat=True).distinct())
+
+
+# Borrar un usuario (vista o admin) arrastra sus inscripciones, calificaciones y comentarios
+@receiver(pre_delete, sender=settings.AUTH_USER_MODEL)
+def _eventos_del_usuario(sender, instance, **kwargs):
+    eventos = set(Inscripcion.objects.filter(usuario=instance).values_list('evento_id', flat=True))
+    eventos |= set(EventoCalificacion.objects.filter(usuario=instance).values_list('evento_id', flat=True))
+    eventos |= set(EventoComentario.objects.filter(usuario=instance).values_list('evento_id', flat=True))
+    instance._contadores_eventos = eventos
+
+
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def _recalcular_contadores_usuario(sender, instance, **kwargs):
+    contadores.recalcular(getattr(instance, '_contadores_eventos', ()))
+
+
+# Totales del dashboard con señal (ver estadisticas.py); los modelos van por etiqueta, como en METRICAS
+_CLAVE_ESTADISTICA = {
+    m.modelo.lower(): clave for clave, m in estadisticas.METRICAS.items() if m.origen == 'senales'
+}
+
+
+def _estadistica_alta(sender, created, raw=False, **kwargs):
+    if created and not raw:
+        estadisticas.sumar_al_confirmar(_CLAVE_ESTADISTICA[sender._meta.label_lower], 1)
+
+
+def _estadistica_baja(sender, **kwargs):
+    estadisticas.sumar_al_confirmar(_CLAVE_ESTADISTICA[sender._meta.label_lower], -1)
+
+
+for _modelo in _CLAVE_ESTADISTICA:
+    post_save.connect(_estadistica_alta, sender=_modelo, dispatch_uid=f'estadistica-alta-{_modelo}')
+    post_delete.connect(_estadistica_baja, sender=_modelo, dispatch_uid=f'estadistica-baja-{_modelo}')
+
+
+# Series diarias del dashboard (ver resumenes.py)
+def _resumen_alta(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    if raw:
+        return
+    campos = resumenes.campos_dimension(sender)
+    if created:
+        resumenes.registrar(instance, 1)
+    else:
+        # Solo en actualizaciones de modelos con dimensión (p. ej. cambiar las estrellas); el valor
+        # anterior es el leído de la base (ValoresCargadosMixin), sin otra consulta
+        cargados = getattr(instance, '_valores_cargados', {})
+        if update_fields is not None:
+            campos = [c for c in campos if c in update_fields or c.removesuffix('_id') in update_fields]
+        previo = {c: cargados[c] for c in campos if c in cargados}
+        if any(previo[c] != getattr(instance, c) for c in previo):
+            resumenes.registrar(instance, -1, dimensiones=previo)
+            resumenes.registrar(instance, 1)
+    if campos:
+        instance._valores_cargados = {**getattr(instance, '_valores_cargados', {}), **{c: getattr(instance, c) for c in campos}}
+
+
+def _resumen_baja(sender, instance, **kwargs):
+    resumenes.registrar(instance, -1)
+
+
+for _modelo in {s.modelo for s in resumenes.SERIES.values()}:
+    post_save.connect(_resumen_alta, sender=_modelo, dispatch_uid=f'resumen-alta-{_modelo}')
+    post_delete.connect(_resumen_baja, sender=_modelo, dispatch_uid=f'resumen-baja-{_modelo}')
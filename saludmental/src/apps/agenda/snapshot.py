@@ -0,0 +1,156 @@
+"""
+Carga en bloque de todo lo que necesita la página de detalle de un evento.
+
+La parte compartida (evento, árbol de comentarios visibles y fotos) no
+depende del usuario y se cachea por evento; se invalida con
+cache.invalidar_evento desde las señales y los contadores. Los likes de cada
+comentario van en claves aparte (agenda:comentario:<pk>:likes) que la vista de
+like reescribe, para que un like no tire el snapshot entero. La parte del
+visitante (inscrito o en espera, su calificación, sus likes) se calcula aparte en dos
+consultas; en una serie, la inscripción y la espera son las de la repetición mostrada.
+
+Consultas: 3 para la parte compartida (4 si la galería tiene más de una página;
+0 si está en cache) + 1 si falta algún conteo de likes + 2 por visitante.
+"""
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Iterator, List, Optional, Set
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Exists, OuterRef, Subquery
+
+from .cache import version_evento
+from .fotos import pagina_fotos
+from .models import Evento, EventoCalificacion, EventoComentario, EventoLikeComentario, Inscripcion, ListaEspera
+
+FOTOS_DETALLE = 12
+
+
+@dataclass
+class EventoSnapshot:
+    evento: Evento
+    comentarios: List[EventoComentario] = field(default_factory=list)
+    fotos: List = field(default_factory=list)
+    fotos_siguiente: Optional[str] = None
+    fotos_total: int = 0
+
+
+@dataclass
+class VistaVisitante:
+    inscrito: bool = False
+    en_espera: bool = False
+    user_rating: Optional[int] = None
+    user_likes: Set[int] = field(default_factory=set)
+
+
+def _armar_arbol(filas: List[EventoComentario]) -> List[EventoComentario]:
+    """Enlaza respuestas con su padre en memoria (`respuestas_list`, la usa el template)."""
+    hijos = {}
+    for c in filas:
+        hijos.setdefault(c.parent_id, []).append(c)
+    for c in filas:
+        c.respuestas_list = hijos.get(c.pk, [])
+        c.replies_count = len(c.respuestas_list)
+    return hijos.get(None, [])
+
+
+def _recorrer(comentarios: Iterable[EventoComentario]) -> Iterator[EventoComentario]:
+    for c in comentarios:
+        yield c
+        yield from _recorrer(c.respuestas_list)
+
+
+def _cargar_snapshot(pk) -> Optional[EventoSnapshot]:
+    evento = Evento.objects.filter(pk=pk).first()
+    if evento is None:
+        return None
+    # Todos los comentarios visibles en una consulta; el árbol se arma en Python
+    filas = list(
+        EventoComentario.objects.filter(evento=evento, oculto=False)
+        .select_related('usuario')
+        .order_by('pk')
+    )
+    # Primera página de la galería; el resto se pide a la API con el cursor
+    fotos, siguiente = pagina_fotos(evento.pk, limite=FOTOS_DETALLE)
+    return EventoSnapshot(
+        evento=evento,
+        comentarios=_armar_arbol(filas),
+        fotos=fotos,
+        fotos_siguiente=siguiente,
+        fotos_total=evento.fotos.count() if siguiente else len(fotos),
+    )
+
+
+def get_snapshot(pk) -> Optional[EventoSnapshot]:
+    key = f'agenda:evento:{pk}:snapshot:v{version_evento(pk)}'
+    snap = cache.get(key)
+    if snap is None:
+        snap = _cargar_snapshot(pk)
+        if snap is not None:
+            cache.set(key, snap, int(getattr(settings, 'AGENDA_CACHE_TIMEOUT', 300)))
+    return snap
+
+
+def _likes_key(comentario_id) -> str:
+    return f'agenda:comentario:{comentario_id}:likes'
+
+
+def guardar_likes(comentario_id, total: int) -> None:
+    """Reescribe el conteo de likes de un comentario (vista de like)."""
+    cache.set(_likes_key(comentario_id), total, int(getattr(settings, 'AGENDA_CACHE_TIMEOUT', 300)))
+
+
+def contar_likes(ids: List[int]) -> Dict[int, int]:
+    """{comentario_id: likes} desde cache; los que falten, en una sola consulta agrupada."""
+    claves = {_likes_key(pk): pk for pk in ids}
+    likes = {claves[k]: v for k, v in cache.get_many(list(claves)).items()}
+    faltan = [pk for pk in ids if pk not in likes]
+    if faltan:
+        contados = dict(
+            EventoLikeComentario.objects.filter(comentario_id__in=faltan)
+            .values_list('comentario_id').annotate(n=Count('pk')).order_by()
+        )
+        nuevos = {pk: contados.get(pk, 0) for pk in faltan}
+        cache.set_many(
+            {_likes_key(pk): n for pk, n in nuevos.items()}, int(getattr(settings, 'AGENDA_CACHE_TIMEOUT', 300))
+        )
+        likes.update(nuevos)
+    return likes
+
+
+def comentarios_ordenados(snap: EventoSnapshot) -> List[EventoComentario]:
+    """Raíces del árbol con `likes_count` en cada comentario, las más votadas primero."""
+    todos = list(_recorrer(snap.comentarios))
+    likes = contar_likes([c.pk for c in todos])
+    for c in todos:
+        c.likes_count = likes[c.pk]
+    return sorted(snap.comentarios, key=lambda c: (-c.likes_count, -c.replies_count, -c.fecha.timestamp()))
+
+
+def get_vista_visitante(evento: Evento, user) -> VistaVisitante:
+    if not getattr(user, 'is_authenticated', False):
+        return VistaVisitante()
+    # En los eventos únicos ocurrencia_pk es None, igual que la ocurrencia de sus inscripciones
+    ocurrencia_id = evento.ocurrencia_pk
+    fila = (
+        Evento.objects.filter(pk=evento.pk)
+        .annotate(
+            _inscrito=Exists(Inscripcion.objects.filter(evento=OuterRef('pk'), ocurrencia_id=ocurrencia_id, usuario=user)),
+            _en_espera=Exists(ListaEspera.objects.filter(evento=OuterRef('pk'), ocurrencia_id=ocurrencia_id, usuario=user)),
+            _rating=Subquery(
+                EventoCalificacion.objects.filter(evento=OuterRef('pk'), usuario=user).values('estrellas')[:1]
+            ),
+        )
+        .values('_inscrito', '_en_espera', '_rating')
+        .first()
+    ) or {}
+    likes = set(
+        EventoLikeComentario.objects.filter(usuario=user, comentario__evento_id=evento.pk)
+        .values_list('comentario_id', flat=True)
+    )
+    return VistaVisitante(
+        inscrito=bool(fila.get('_inscrito')),
+        en_espera=bool(fila.get('_en_espera')),
+        user_rating=fila.get('_rating'),
+        user_likes=likes,
+    )
@@ -0,0 +1,236 @@
+"""
+Backend común de las listas del panel de administración (usuarios,
+inscripciones, historias, calificaciones y notificaciones).
+
+Cada lista se declara como una `Tabla`: el queryset base, las columnas por las
+que se puede ordenar (solo campos con índice, desempatando siempre por pk), los
+campos de búsqueda por prefijo y los filtros exactos permitidos. `pagina`
+responde una página por keyset, sin OFFSET:
+
+    ?orden=-fecha&q=ana&estrellas=5&antes=<valor>_<pk>&limite=25
+
+Cada petición trae como mucho `limite + 1` filas, esté en la página que esté.
+El total sale de la tabla Estadistica cuando la lista no está filtrada (sin
+COUNT sobre la tabla completa); con filtros no se cuenta.
+"""
+from dataclasses import dataclass, field
+from datetime import datetime, timezone as dt_timezone
+from typing import Callable, Optional
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.utils import timezone
+
+from apps.foro.models import Historia
+from apps.usuarios.models import CustomUser, Notificacion
+
+from .models import Estadistica, EventoCalificacion, Inscripcion
+
+POR_PAGINA = 25
+MAX_POR_PAGINA = 100
+
+
+def _booleano(valor: str) -> bool:
+    if valor.lower() in {'1', 'true', 'si', 'sí', 'yes'}:
+        return True
+    if valor.lower() in {'0', 'false', 'no'}:
+        return False
+    raise ValueError(valor)
+
+
+def _fecha(valor) -> str:
+    return timezone.localtime(valor).strftime('%d/%m/%Y %H:%M')
+
+
+def _foto(usuario) -> str:
+    return usuario.foto_perfil.url if usuario.foto_perfil else ''
+
+
+@dataclass(frozen=True)
+class Tabla:
+    base: Callable  # request -> QuerySet (select_related/only y filtros fijos)
+    orden: dict  # nombre público -> campo del modelo con índice
+    orden_defecto: str  # p. ej. '-fecha'
+    fila: Callable  # objeto -> dict para la respuesta JSON
+    busqueda: tuple = ()  # campos para ?q= (prefijo, sin distinguir mayúsculas)
+    filtros: dict = field(default_factory=dict)  # nombre público -> (lookup, conversor)
+    total: Optional[str] = None  # clave de Estadistica con el total sin filtros
+
+
+@dataclass
+class Pagina:
+    filas: list
+    siguiente: Optional[str]
+    total: Optional[int]
+    orden: str
+    q: str
+    filtros: dict
+
+
+def _valor_cursor(modelo, campo: str, crudo: str):
+    try:
+        valor = modelo._meta.get_field(campo).to_python(crudo)
+    except ValidationError:
+        raise ValueError('antes')
+    if isinstance(valor, datetime) and timezone.is_naive(valor):
+        valor = timezone.make_aware(valor, dt_timezone.utc)
+    return valor
+
+
+def _cursor(obj, campo: str) -> str:
+    valor = getattr(obj, campo)
+    return f"{valor.isoformat() if isinstance(valor, datetime) else valor}_{obj.pk}"
+
+
+def pagina(tabla: Tabla, request, params=None) -> Pagina:
+    """Una página de la tabla según los parámetros GET. ValueError si alguno no es válido."""
+    params = request.GET if params is None else params
+    orden = params.get('orden') or tabla.orden_defecto
+    nombre = orden.lstrip('-')
+    if nombre not in tabla.orden:
+        raise ValueError('orden')
+    campo, descendente = tabla.orden[nombre], orden.startswith('-')
+    limite = int(params.get('limite') or POR_PAGINA)
+    if not (1 <= limite <= MAX_POR_PAGINA):
+        raise ValueError('limite')
+
+    qs = tabla.base(request)
+    filtros = {}
+    for publico, (lookup, conversor) in tabla.filtros.items():
+        if params.get(publico, '') != '':
+            filtros[publico] = params[publico]
+            qs = qs.filter(**{lookup: conversor(params[publico])})
+    q = (params.get('q') or '').strip()
+    if q and tabla.busqueda:
+        condicion = Q()
+        for campo_busqueda in tabla.busqueda:
+            condicion |= Q(**{f'{campo_busqueda}__istartswith': q})
+        qs = qs.filter(condicion)
+
+    antes = params.get('antes')
+    if antes:
+        crudo, pk = antes.rsplit('_', 1)
+        valor = _valor_cursor(qs.model, campo, crudo)
+        sentido = 'lt' if descendente else 'gt'
+        qs = qs.filter(Q(**{f'{campo}__{sentido}': valor}) | Q(**{campo: valor, f'pk__{sentido}': int(pk)}))
+    signo = '-' if descendente else ''
+    filas = list(qs.order_by(f'{signo}{campo}', f'{signo}pk')[:limite + 1])
+    siguiente = None
+    if len(filas) > limite:
+        filas = filas[:limite]
+        siguiente = _cursor(filas[-1], campo)
+
+    total = None
+    if not filtros and not q:
+        if tabla.total:
+            total = Estadistica.objects.filter(clave=tabla.total).values_list('valor', flat=True).first()
+        else:
+            total = tabla.base(request).count()
+    return Pagina(filas=filas, siguiente=siguiente, total=total, orden=orden, q=q, filtros=filtros)
+
+
+def respuesta_json(tabla: Tabla, p: Pagina) -> dict:
+    return {
+        'ok': True,
+        'filas': [tabla.fila(obj) for obj in p.filas],
+        'siguiente': p.siguiente,
+        'total': p.total,
+        'orden': p.orden,
+    }
+
+
+TABLAS = {
+    'usuarios': Tabla(
+        base=lambda request: CustomUser.objects.only(
+            'pk', 'username', 'email', 'first_name', 'last_name', 'date_joined', 'is_active', 'is_staff', 'foto_perfil',
+        ),
+        orden={'fecha': 'date_joined', 'usuario': 'username', 'email': 'email'},
+        orden_defecto='-fecha',
+        busqueda=('username', 'email'),
+        filtros={'activo': ('is_active', _booleano), 'staff': ('is_staff', _booleano)},
+        total='usuarios',
+        fila=lambda u: {
+            'id': u.pk,
+            'usuario': u.username,
+            'email': u.email,
+            'nombre': u.get_full_name(),
+            'fecha': _fecha(u.date_joined),
+            'activo': u.is_active,
+            'staff': u.is_staff,
+            'foto': _foto(u),
+        },
+    ),
+    'inscripciones': Tabla(
+        base=lambda request: Inscripcion.objects.select_related('usuario', 'evento').only(
+            'pk', 'fecha_inscripcion', 'usuario', 'evento', 'usuario__username', 'usuario__foto_perfil',
+            'evento__nombre', 'evento__titulo', 'evento__fecha',
+        ),
+        orden={'fecha': 'fecha_inscripcion'},
+        orden_defecto='-fecha',
+        busqueda=('usuario__username', 'usuario__email'),
+        filtros={'evento': ('evento_id', int)},
+        total='inscripciones',
+        fila=lambda i: {
+            'id': i.pk,
+            'usuario': i.usuario.username,
+            'foto': _foto(i.usuario),
+            'evento_id': i.evento_id,
+            'evento': str(i.evento),
+            'fecha': _fecha(i.fecha_inscripcion),
+            'fecha_evento': _fecha(i.evento.fecha),
+        },
+    ),
+    'historias': Tabla(
+        base=lambda request: Historia.objects.select_related('usuario').only(
+            'pk', 'titulo', 'fecha', 'oculto', 'usuario', 'usuario__username', 'usuario__foto_perfil',
+        ),
+        orden={'fecha': 'fecha'},
+        orden_defecto='-fecha',
+        busqueda=('titulo', 'usuario__username'),
+        filtros={'oculto': ('oculto', _booleano)},
+        total='historias',
+        fila=lambda h: {
+            'id': h.pk,
+            'titulo': h.titulo,
+            'usuario': h.usuario.username,
+            'foto': _foto(h.usuario),
+            'fecha': _fecha(h.fecha),
+            'oculto': h.oculto,
+        },
+    ),
+    'calificaciones': Tabla(
+        base=lambda request: EventoCalificacion.objects.select_related('usuario', 'evento').only(
+            'pk', 'estrellas', 'fecha', 'usuario', 'evento', 'usuario__username', 'usuario__foto_perfil',
+            'evento__nombre', 'evento__titulo',
+        ),
+        orden={'fecha': 'fecha'},
+        orden_defecto='-fecha',
+        busqueda=('usuario__username',),
+        filtros={'estrellas': ('estrellas', int), 'evento': ('evento_id', int)},
+        total='calificaciones',
+        fila=lambda c: {
+            'id': c.pk,
+            'usuario': c.usuario.username,
+            'foto': _foto(c.usuario),
+            'evento_id': c.evento_id,
+            'evento': str(c.evento),
+            'estrellas': c.estrellas,
+            'fecha': _fecha(c.fecha),
+        },
+    ),
+    'notificaciones': Tabla(
+        # Solo las del admin actual; el total se cuenta por el índice (usuario, fecha)
+        base=lambda request: Notificacion.objects.filter(usuario=request.user),
+        orden={'fecha': 'fecha'},
+        orden_defecto='-fecha',
+        busqueda=('mensaje',),
+        filtros={'leida': ('leida', _booleano)},
+        fila=lambda n: {
+            'id': n.pk,
+            'mensaje': n.mensaje,
+            'url': n.url,
+            'leida': n.leida,
+            'fecha': _fecha(n.fecha),
+        },
+    ),
+}
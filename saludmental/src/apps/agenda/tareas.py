@@ -0,0 +1,46 @@
+"""
+Trabajo en segundo plano fuera del ciclo de la petición (notificaciones, correos).
+
+Un ThreadPoolExecutor por proceso, igual que imagenes.encolar: suficiente para
+sacar el envío de correos del tiempo de respuesta sin añadir un broker. Cada
+tarea cierra su conexión a la base de datos al terminar, porque los hilos del
+pool no pasan por las señales de petición que lo hacen en las vistas.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+
+logger = logging.getLogger(__name__)
+
+_pool = None
+_lock = threading.Lock()
+
+
+def _ejecutar(funcion, args, kwargs):
+    close_old_connections()
+    try:
+        funcion(*args, **kwargs)
+    except Exception:
+        logger.exception('Falló la tarea en segundo plano %s', getattr(funcion, '__name__', funcion))
+    finally:
+        connection.close()
+
+
+def encolar(funcion, *args, **kwargs):
+    """Ejecuta `funcion(*args, **kwargs)` en el pool de tareas."""
+    global _pool
+    with _lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(
+                max_workers=int(getattr(settings, 'TAREAS_WORKERS', 2)),
+                thread_name_prefix='tareas',
+            )
+    return _pool.submit(_ejecutar, funcion, args, kwargs)
+
+
+def encolar_al_confirmar(funcion, *args, **kwargs) -> None:
+    """Como `encolar`, pero solo si la transacción actual se confirma."""
+    transaction.on_commit(lambda: encolar(funcion, *args, **kwargs))
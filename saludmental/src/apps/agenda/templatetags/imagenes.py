@@ -0,0 +1,44 @@
+# Template tags para imágenes responsivas (derivadas con srcset)
+from django import template
+from django.forms.utils import flatatt
+from django.utils.html import format_html
+
+from apps.agenda import imagenes
+
+register = template.Library()
+
+
+@register.simple_tag
+def imagen_responsive(archivo, sizes='100vw', **attrs):
+    """
+    Emite un <picture> con fuente WebP y respaldo JPEG/PNG en varios anchos.
+    Uso: {% imagen_responsive user.foto_perfil sizes="38px" class="rounded-circle" alt="Perfil" %}
+
+    Si las derivadas aún no existen se muestra el original y se encola su generación.
+    """
+    if not archivo:
+        return ''
+    attrs.setdefault('loading', 'lazy')
+    indice = imagenes.info(archivo.name, archivo.storage)
+    if indice is None:
+        imagenes.encolar(archivo.name, archivo.storage)
+        return format_html('<img src="{}"{}>', archivo.url, flatatt(attrs))
+    respaldo = indice['respaldo']
+    mayor = indice['anchos'][-1]
+    return format_html(
+        '<picture><source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}" width="{}" height="{}"{}></picture>',
+        imagenes.srcset(archivo.name, indice, 'webp', archivo.storage), sizes,
+        archivo.storage.url(imagenes.ruta_derivada(archivo.name, indice, mayor, respaldo)),
+        imagenes.srcset(archivo.name, indice, respaldo, archivo.storage), sizes,
+        indice['ancho'], indice['alto'], flatatt(attrs),
+    )
+
+
+@register.filter(name='miniatura')
+def miniatura(archivo, ancho=320):
+    """URL de la derivada WebP más pequeña que cubre `ancho` px: {{ foto.imagen|miniatura:320 }}"""
+    try:
+        return imagenes.url_miniatura(archivo, int(ancho))
+    except (TypeError, ValueError):
+        return archivo.url if archivo else ''
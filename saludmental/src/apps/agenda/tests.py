@@ -1,3 +1,1220 @@
-from django.test import TestCase
+import csv
+import hashlib
+import io
+import os
+import random
+import shutil
+import tempfile
+import threading
+import zipfile
+from datetime import datetime, timedelta, timezone as dt_timezone
+from unittest import mock
+from xml.etree import ElementTree
 
-# Create your tests here.
+from django.contrib import admin
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from django.db import IntegrityError, connection
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone, translation
+from PIL import Image, ImageDraw
+
+from config.storage import ContentAddressedStorage
+
+from apps.foro.models import Comentario, Historia
+from apps.foro.signals import contenido_oculto
+from apps.usuarios.models import CustomUser, Notificacion
+
+from . import (
+    bandeja, calendario, conflictos, estadisticas, exportar, geo, ical, imagenes, inscripciones, ocurrencias, phash,
+    publicacion, recurrencia, tablas,
+)
+from .cache import get_proximos, version_agenda, version_evento
+from .fotos import FOTOS_POR_PAGINA
+from .management.commands.media_gc import Command as MediaGC
+from .models import (
+    Estadistica, Evento, EventoCalificacion, EventoComentario, EventoFoto, Inscripcion, ListaEspera, Ocurrencia,
+    ResumenDiario,
+)
+from .resumenes import ZONA
+from .snapshot import comentarios_ordenados, get_snapshot
+
+
+def crear_usuario(nombre, **extra):
+    return CustomUser.objects.create_user(username=nombre, email=f'{nombre}@example.com', password='x', **extra)
+
+
+def crear_evento(**extra):
+    datos = {'nombre': 'Taller', 'fecha': timezone.now() + timedelta(days=7), 'publicado': True}
+    datos.update(extra)
+    return Evento.objects.create(**datos)
+
+
+class ContadoresBorradoTests(TestCase):
+    def setUp(self):
+        self.evento = crear_evento()
+        self.ana = crear_usuario('ana')
+        self.beto = crear_usuario('beto')
+        for usuario, estrellas in ((self.ana, 5), (self.beto, 3)):
+            Inscripcion.objects.create(evento=self.evento, usuario=usuario)
+            EventoCalificacion.objects.create(evento=self.evento, usuario=usuario, estrellas=estrellas)
+        padre = EventoComentario.objects.create(evento=self.evento, usuario=self.ana, texto='hola')
+        EventoComentario.objects.create(evento=self.evento, usuario=self.beto, texto='re', parent=padre)
+        Evento.objects.filter(pk=self.evento.pk).update(
+            inscritos_count=2, ratings_count=2, ratings_sum=8, comentarios_count=2,
+        )
+        self.request = RequestFactory().post('/')
+        self.request.user = crear_usuario('staff', is_staff=True)
+
+    def contadores(self):
+        return Evento.objects.values_list(
+            'inscritos_count', 'ratings_count', 'ratings_sum', 'comentarios_count',
+        ).get(pk=self.evento.pk)
+
+    def test_borrado_desde_el_admin(self):
+        admin.site._registry[EventoCalificacion].delete_model(
+            self.request, EventoCalificacion.objects.get(usuario=self.ana),
+        )
+        admin.site._registry[Inscripcion].delete_queryset(self.request, Inscripcion.objects.all())
+        # El comentario padre arrastra su respuesta
+        admin.site._registry[EventoComentario].delete_queryset(
+            self.request, EventoComentario.objects.filter(parent__isnull=True),
+        )
+        self.assertEqual(self.contadores(), (0, 1, 3, 0))
+
+    def test_borrar_usuario_recalcula_sus_eventos(self):
+        self.beto.delete()
+        self.assertEqual(self.contadores(), (1, 1, 5, 1))
+
+    def test_comentarios_ocultos_por_moderacion(self):
+        respuesta = EventoComentario.objects.get(parent__isnull=False)
+        EventoComentario.objects.filter(pk=respuesta.pk).update(oculto=True)
+        contenido_oculto.send(sender=EventoComentario, pks=[respuesta.pk])
+        self.assertEqual(self.contadores()[3], 1)
+
+
+class SnapshotTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.evento = crear_evento()
+        self.ana = crear_usuario('ana')
+        self.primero = EventoComentario.objects.create(evento=self.evento, usuario=self.ana, texto='primero')
+        self.segundo = EventoComentario.objects.create(evento=self.evento, usuario=self.ana, texto='segundo')
+        self.respuesta = EventoComentario.objects.create(
+            evento=self.evento, usuario=self.ana, texto='respuesta', parent=self.primero,
+        )
+
+    def test_arbol_en_listas_simples(self):
+        raices = comentarios_ordenados(get_snapshot(self.evento.pk))
+        self.assertEqual([c.pk for c in raices], [self.primero.pk, self.segundo.pk])
+        self.assertEqual(raices[0].respuestas_list, [self.respuesta])
+        self.assertEqual(raices[0].replies_count, 1)
+        respuesta = self.client.get(reverse('agenda_evento_detalle', args=[self.evento.pk]))
+        self.assertContains(respuesta, 'respuesta')
+
+    def test_like_no_invalida_el_snapshot(self):
+        get_snapshot(self.evento.pk)
+        version = version_evento(self.evento.pk)
+        self.client.force_login(self.ana)
+        r = self.client.post(
+            reverse('agenda_like_comentario', args=[self.segundo.pk]), HTTP_X_REQUESTED_WITH='XMLHttpRequest',
+        )
+        self.assertEqual(r.json()['likes_count'], 1)
+        self.assertEqual(version_evento(self.evento.pk), version)
+        # El más votado sube, con el conteo leído de su clave
+        raices = comentarios_ordenados(get_snapshot(self.evento.pk))
+        self.assertEqual([(c.pk, c.likes_count) for c in raices], [(self.segundo.pk, 1), (self.primero.pk, 0)])
+
+
+class AdminFotosTests(TestCase):
+    def test_post_sin_ajax_vuelve_a_la_pagina_de_fotos(self):
+        evento = crear_evento()
+        self.client.force_login(crear_usuario('staff', is_staff=True))
+        respuesta = self.client.post(reverse('admin_evento_fotos', args=[evento.pk]))
+        self.assertRedirects(respuesta, reverse('admin_evento_fotos', args=[evento.pk]), fetch_redirect_response=False)
+
+
+class GaleriaJsonTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        directorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directorio, ignore_errors=True)
+        ajustes = override_settings(MEDIA_ROOT=directorio)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+        # Sin generar derivadas en segundo plano mientras corre la prueba
+        encolar = mock.patch.object(imagenes, 'encolar')
+        encolar.start()
+        self.addCleanup(encolar.stop)
+        self.evento = crear_evento()
+        self.ana = crear_usuario('ana')
+
+    def foto(self, nombre='foto.jpg'):
+        buf = io.BytesIO()
+        Image.new('RGB', (400, 200), 'blue').save(buf, 'JPEG')
+        return EventoFoto.objects.create(
+            evento=self.evento, imagen=ContentFile(buf.getvalue(), name=nombre), subido_por=self.ana,
+        )
+
+    def pagina(self, evento=None, **params):
+        return self.client.get(reverse('agenda_evento_fotos', args=[(evento or self.evento).pk]), params)
+
+    def test_scroll_por_keyset(self):
+        fotos = [self.foto(f'f{i}.jpg') for i in range(5)]
+        # Dos subidas en el mismo instante: desempata el id
+        EventoFoto.objects.filter(pk__in=[fotos[1].pk, fotos[2].pk]).update(fecha_subida=fotos[1].fecha_subida)
+        vistos, antes = [], None
+        while True:
+            datos = self.pagina(limite=2, **({'antes': antes} if antes else {})).json()
+            self.assertTrue(datos['ok'])
+            self.assertLessEqual(len(datos['fotos']), 2)
+            vistos += [f['id'] for f in datos['fotos']]
+            antes = datos['siguiente']
+            if antes is None:
+                break
+        self.assertEqual(vistos, [f.pk for f in reversed(fotos)])
+
+    def test_limite_acotado(self):
+        with mock.patch('apps.agenda.views.pagina_fotos', return_value=([], None)) as pagina:
+            for limite, esperado in (('0', 1), ('500', 60), ('abc', FOTOS_POR_PAGINA)):
+                self.pagina(limite=limite)
+                self.assertEqual(pagina.call_args.args[2], esperado)
+
+    def test_evento_no_publicado(self):
+        self.foto()
+        oculto = crear_evento(nombre='Borrador', publicado=False)
+        for evento in (oculto, Evento(pk=self.evento.pk + 100)):
+            respuesta = self.pagina(evento)
+            self.assertEqual(respuesta.status_code, 404)
+            self.assertFalse(respuesta.json()['ok'])
+        self.client.force_login(crear_usuario('staff', is_staff=True))
+        self.assertEqual(self.pagina(oculto).json()['fotos'], [])
+
+    def test_foto_con_y_sin_derivadas(self):
+        foto = self.foto()
+        datos = self.pagina().json()['fotos'][0]
+        self.assertEqual((datos['srcset'], datos['ancho'], datos['miniatura']), ('', None, foto.imagen.url))
+        self.assertEqual(datos['subido_por'], 'ana')
+        imagenes.generar(foto.imagen.name)
+        datos = self.pagina().json()['fotos'][0]
+        self.assertEqual((datos['ancho'], datos['alto']), (400, 200))
+        self.assertIn('320w', datos['srcset'])
+        self.assertTrue(datos['miniatura'].endswith('/320.webp'))
+
+
+class IndiceDerivadasTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        directorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directorio)
+        self.storage = FileSystemStorage(location=directorio)
+        for nombre in ('eventos/a.jpg', 'perfiles/b.jpg'):
+            buf = io.BytesIO()
+            Image.new('RGB', (200, 100), 'red').save(buf, 'JPEG')
+            self.storage.save(nombre, ContentFile(buf.getvalue()))
+        imagenes.generar('eventos/a.jpg', self.storage)
+        cache.clear()
+
+    def test_primer_fallo_carga_todo_el_arbol(self):
+        with mock.patch.object(self.storage, 'exists', wraps=self.storage.exists) as exists:
+            indice = imagenes.info('eventos/a.jpg', self.storage)
+            self.assertEqual(indice['anchos'], [64, 160, 200])
+            exists.assert_not_called()
+
+    def test_pendiente_cacheado(self):
+        imagenes.cargar_arbol(self.storage)
+        with mock.patch.object(self.storage, 'exists', wraps=self.storage.exists) as exists, \
+                mock.patch.object(self.storage, 'listdir', wraps=self.storage.listdir) as listdir:
+            for _ in range(3):
+                self.assertIsNone(imagenes.info('perfiles/b.jpg', self.storage))
+            self.assertEqual(exists.call_count, 1)
+            listdir.assert_not_called()
+        # Al generarse, el pendiente se reemplaza
+        imagenes.generar('perfiles/b.jpg', self.storage)
+        self.assertIsNotNone(imagenes.info('perfiles/b.jpg', self.storage))
+
+    def test_mismo_contenido_comparte_derivadas(self):
+        with self.storage.open('eventos/a.jpg') as f:
+            datos = f.read()
+        self.storage.save('eventos/c.jpg', ContentFile(datos))
+        with mock.patch.object(imagenes, '_generar_anchos', wraps=imagenes._generar_anchos) as generar_anchos:
+            indice = imagenes.generar('eventos/c.jpg', self.storage)
+            generar_anchos.assert_not_called()
+        self.assertEqual(indice['contenido'], hashlib.sha256(datos).hexdigest())
+        self.assertEqual(
+            imagenes.ruta_derivada('eventos/c.jpg', indice, 64, 'webp'),
+            imagenes.ruta_derivada('eventos/a.jpg', imagenes.info('eventos/a.jpg', self.storage), 64, 'webp'),
+        )
+
+    def test_indice_cacheado_con_caducidad(self):
+        with mock.patch.object(cache, 'set', wraps=cache.set) as cache_set:
+            imagenes.generar('perfiles/b.jpg', self.storage)
+        clave, indice, timeout = cache_set.call_args.args
+        self.assertEqual(clave, imagenes._cache_key('perfiles/b.jpg'))
+        self.assertEqual(indice['anchos'], [64, 160, 200])
+        self.assertEqual(timeout, imagenes.INDICE_TIMEOUT)
+        self.assertGreater(imagenes.INDICE_TIMEOUT, 0)
+
+    def test_media_gc_borra_puntero_cache_y_contenido_huerfano(self):
+        imagenes.generar('perfiles/b.jpg', self.storage)
+        indice = imagenes.info('perfiles/b.jpg', self.storage)
+        clave = imagenes._clave('perfiles/b.jpg')
+        puntero = self.storage.path(imagenes._ruta_puntero('perfiles/b.jpg'))
+        contenido = os.path.dirname(self.storage.path(imagenes.ruta_derivada('perfiles/b.jpg', indice, 64, 'webp')))
+        gc = MediaGC(stdout=io.StringIO())
+        gc.root, gc.min_edad, gc.dry, gc.borrados, gc.liberados = self.storage.location, 0, False, 0, 0
+        derivadas = os.path.join(self.storage.location, 'perfiles', imagenes.DIR_DERIVADAS)
+        gc._barrer_derivadas(derivadas, os.listdir(derivadas), claves=set())
+        self.assertFalse(os.path.exists(puntero))
+        self.assertFalse(os.path.exists(contenido))
+        self.assertIsNone(cache.get(imagenes.cache_key(clave)))
+        # Con el original aún referenciado no se toca nada
+        imagenes.generar('eventos/a.jpg', self.storage)
+        derivadas = os.path.join(self.storage.location, 'eventos', imagenes.DIR_DERIVADAS)
+        gc._barrer_derivadas(derivadas, os.listdir(derivadas), claves={imagenes._clave('eventos/a.jpg')})
+        self.assertIsNotNone(imagenes.info('eventos/a.jpg', self.storage))
+        self.assertTrue(self.storage.exists(imagenes._ruta_puntero('eventos/a.jpg')))
+
+
+class PhashTests(SimpleTestCase):
+    @staticmethod
+    def jpeg(tamano=(400, 300), calidad=90):
+        img = Image.new('RGB', (400, 300), 'white')
+        dibujo = ImageDraw.Draw(img)
+        dibujo.rectangle((40, 40, 200, 220), fill='navy')
+        dibujo.ellipse((220, 60, 380, 260), fill='orange')
+        buf = io.BytesIO()
+        img.resize(tamano).save(buf, 'JPEG', quality=calidad)
+        return buf
+
+    def test_dhash_sobrevive_recompresion_y_redimension(self):
+        original = int(phash.dhash(self.jpeg()), 16)
+        reexportada = int(phash.dhash(self.jpeg((160, 120), calidad=40)), 16)
+        self.assertLessEqual(phash.hamming(original, reexportada), 6)
+        buf = io.BytesIO()
+        Image.new('RGB', (400, 300), 'white').save(buf, 'JPEG')
+        self.assertGreater(phash.hamming(original, int(phash.dhash(buf), 16)), 10)
+
+    def test_bktree_igual_que_busqueda_lineal(self):
+        azar = random.Random(7)
+        elementos = [(azar.getrandbits(64), str(i)) for i in range(300)]
+        # Vecinos cercanos de algunos elementos para que haya aciertos
+        elementos += [(h ^ (1 << azar.randrange(64)), f'{i}b') for h, i in elementos[:30]]
+        arbol = phash.BKTree(elementos)
+        for h, _ in elementos[:50]:
+            esperado = sorted((phash.hamming(h, otro), v) for otro, v in elementos if phash.hamming(h, otro) <= 4)
+            encontrado = arbol.buscar(h, 4)
+            self.assertEqual(sorted(encontrado), esperado)
+            self.assertEqual([d for d, _ in encontrado], sorted(d for d, _ in encontrado))
+
+    def test_bktree_vacio(self):
+        self.assertEqual(phash.BKTree().buscar(0, 10), [])
+
+
+class ContentAddressedStorageTests(SimpleTestCase):
+    def setUp(self):
+        directorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directorio)
+        self.storage = ContentAddressedStorage(location=directorio)
+
+    def test_subida_temporal_se_mueve_y_deduplica(self):
+        datos = os.urandom(3 * 1024 * 1024)
+        subida = TemporaryUploadedFile('foto.jpg', 'image/jpeg', len(datos), None)
+        subida.write(datos)
+        subida.flush()
+        temporal = subida.temporary_file_path()
+        a = self.storage.save('eventos/fotos/foto.jpg', subida)
+        self.assertFalse(os.path.exists(temporal))
+        subida.close()
+        b = self.storage.save('eventos/fotos/foto.jpg', ContentFile(datos))
+        self.assertNotEqual(a, b)
+        self.assertTrue(os.path.samefile(self.storage.path(a), self.storage.path(b)))
+        self.assertEqual(self.storage.referencias(a), 2)
+        with self.storage.open(b, 'rb') as f:
+            self.assertEqual(f.read(), datos)
+
+
+class GeoTests(TestCase):
+    def test_geohash_valores_conocidos(self):
+        self.assertEqual(geo.geohash(57.64911, 10.40744, 11), 'u4pruydqqvj')
+        self.assertEqual(geo.geohash(42.6, -5.6, 5), 'ezs42')
+        self.assertTrue(geo.geohash(57.64911, 10.40744).startswith(geo.geohash(57.64911, 10.40744, 4)))
+
+    def test_celdas_cubren_la_caja(self):
+        azar = random.Random(3)
+        for lat, lon, radio in ((4.65, -74.08, 5), (6.24, -75.58, 40), (0.01, 179.9, 20)):
+            caja = geo.caja_radio(lat, lon, radio)
+            celdas = geo.celdas_caja(*caja)
+            self.assertLessEqual(len(celdas), 16)
+            for _ in range(200):
+                punto = geo.geohash(azar.uniform(caja[0], caja[2]), azar.uniform(caja[1], caja[3]))
+                self.assertTrue(any(punto.startswith(c) for c in celdas), punto)
+
+    def test_cerca_filtra_y_ordena_por_distancia(self):
+        lejos = crear_evento(nombre='Medellín', latitud='6.244203', longitud='-75.581212')
+        centro = crear_evento(nombre='Centro', latitud='4.598056', longitud='-74.075833')
+        norte = crear_evento(nombre='Usaquén', latitud='4.694950', longitud='-74.030640')
+        crear_evento(nombre='Virtual', tipo_evento='virtual')
+        encontrados = list(geo.cerca(Evento.objects.all(), 4.6097, -74.0817, 15))
+        self.assertEqual([e.pk for e in encontrados], [centro.pk, norte.pk])
+        self.assertAlmostEqual(encontrados[0].distancia_km, 1.45, delta=0.1)
+        self.assertNotIn(lejos, encontrados)
+        self.assertEqual(
+            sorted(c['total'] for c in geo.clusters(Evento.objects.exclude(geohash=''), zoom=5)), [1, 2],
+        )
+
+
+class InscripcionesTests(TestCase):
+    def setUp(self):
+        self.evento = crear_evento(cupo=2)
+        self.usuarios = [crear_usuario(f'u{i}') for i in range(5)]
+
+    def inscribir(self, usuario):
+        return inscripciones.inscribir(self.evento.pk, usuario, notificar=False)
+
+    def inscritos(self):
+        self.evento.refresh_from_db(fields=['inscritos_count'])
+        filas = Inscripcion.objects.filter(evento=self.evento).count()
+        self.assertEqual(self.evento.inscritos_count, filas)
+        return filas
+
+    def test_nunca_supera_el_cupo(self):
+        resultados = [self.inscribir(u) for u in self.usuarios]
+        self.assertEqual(resultados, [inscripciones.INSCRITO] * 2 + [inscripciones.EN_ESPERA] * 3)
+        self.assertEqual(self.inscritos(), 2)
+        # El UPDATE condicional no toca el contador con el evento lleno
+        self.assertFalse(inscripciones._ocupar_cupo(self.evento.pk))
+        self.assertEqual(self.inscritos(), 2)
+
+    def test_doble_envio(self):
+        self.assertEqual(self.inscribir(self.usuarios[0]), inscripciones.INSCRITO)
+        self.assertEqual(self.inscribir(self.usuarios[0]), inscripciones.YA_INSCRITO)
+        for u in self.usuarios[1:3]:
+            self.inscribir(u)
+        self.assertEqual(self.inscribir(self.usuarios[2]), inscripciones.YA_EN_ESPERA)
+        self.assertEqual(self.inscritos(), 2)
+        self.assertEqual(ListaEspera.objects.filter(evento=self.evento).count(), 1)
+
+    def test_cancelar_promueve_en_orden_de_llegada(self):
+        for u in self.usuarios:
+            self.inscribir(u)
+        espera = self.usuarios[2:]
+        self.assertEqual([inscripciones.posicion_espera(self.evento.pk, u) for u in espera], [1, 2, 3])
+
+        self.assertEqual(
+            inscripciones.cancelar(self.evento.pk, self.usuarios[0], notificar=False), inscripciones.CANCELADO,
+        )
+        inscritos = set(Inscripcion.objects.filter(evento=self.evento).values_list('usuario_id', flat=True))
+        self.assertEqual(inscritos, {self.usuarios[1].pk, espera[0].pk})
+        self.assertEqual(self.inscritos(), 2)
+        self.assertEqual([inscripciones.posicion_espera(self.evento.pk, u) for u in espera[1:]], [1, 2])
+
+        # Salir de la espera no libera cupo; ampliar el cupo promueve al resto por orden
+        self.assertEqual(
+            inscripciones.cancelar(self.evento.pk, espera[1], notificar=False), inscripciones.SALIO_DE_ESPERA,
+        )
+        Evento.objects.filter(pk=self.evento.pk).update(cupo=5)
+        self.assertEqual(inscripciones.promover(self.evento.pk, notificar=False), 1)
+        self.assertTrue(Inscripcion.objects.filter(evento=self.evento, usuario=espera[2]).exists())
+        self.assertFalse(ListaEspera.objects.filter(evento=self.evento).exists())
+        self.assertEqual(self.inscritos(), 3)
+
+    def test_cancelar_sin_inscripcion(self):
+        self.assertEqual(
+            inscripciones.cancelar(self.evento.pk, self.usuarios[0], notificar=False), inscripciones.NO_INSCRITO,
+        )
+        self.assertEqual(self.inscritos(), 0)
+
+
+class InscripcionesConcurrentesTests(TransactionTestCase):
+    """Hilos reales con su propia conexión: los bloqueos de la base son los de producción."""
+
+    def setUp(self):
+        self.evento = crear_evento(cupo=5)
+        self.usuarios = self.crear_usuarios('u', 20)
+
+    @staticmethod
+    def crear_usuarios(prefijo, n):
+        # Sin contraseña: el hash de create_user domina el tiempo de la prueba
+        CustomUser.objects.bulk_create([
+            CustomUser(username=f'{prefijo}{i}', email=f'{prefijo}{i}@example.com') for i in range(n)
+        ])
+        return list(CustomUser.objects.filter(username__startswith=prefijo).order_by('pk'))
+
+    def concurrente(self, trabajos, hilos=8):
+        """Lanza [(funcion, args)] desde `hilos` hilos que arrancan a la vez; devuelve {usuario_id: resultados}."""
+        barrera = threading.Barrier(hilos)
+        resultados, errores = {}, []
+        lock = threading.Lock()
+
+        def hilo(lote):
+            try:
+                barrera.wait()
+                for funcion, args in lote:
+                    try:
+                        r = funcion(*args)
+                    except Exception as e:
+                        with lock:
+                            errores.append(e)
+                    else:
+                        with lock:
+                            resultados.setdefault(args[1].pk, []).append(r)
+            finally:
+                connection.close()
+
+        hilos = [threading.Thread(target=hilo, args=(trabajos[i::hilos],)) for i in range(hilos)]
+        for h in hilos:
+            h.start()
+        for h in hilos:
+            h.join()
+        self.assertEqual(errores, [])
+        return resultados
+
+    def inscribir(self, usuarios, veces=1):
+        return self.concurrente([
+            (inscripciones.inscribir, (self.evento.pk, u, None, None, False)) for _ in range(veces) for u in usuarios
+        ])
+
+    def estado(self):
+        self.evento.refresh_from_db(fields=['inscritos_count'])
+        inscritos = set(Inscripcion.objects.filter(evento=self.evento).values_list('usuario_id', flat=True))
+        espera = list(
+            ListaEspera.objects.filter(evento=self.evento).order_by('fecha', 'id').values_list('usuario_id', flat=True)
+        )
+        self.assertEqual(self.evento.inscritos_count, len(inscritos))
+        self.assertFalse(inscritos & set(espera))
+        return inscritos, espera
+
+    def test_sin_sobreventa_con_dobles_envios(self):
+        resultados = self.inscribir(self.usuarios, veces=2)
+        inscritos, espera = self.estado()
+        self.assertEqual(len(inscritos), 5)
+        self.assertEqual(len(espera), 15)
+        # Cada usuario queda en un solo sitio, y su segundo envío lo reconoce
+        for usuario in self.usuarios:
+            primero, segundo = sorted(resultados[usuario.pk])
+            if usuario.pk in inscritos:
+                self.assertIn(primero, (inscripciones.INSCRITO, inscripciones.YA_INSCRITO))
+                self.assertEqual({primero, segundo}, {inscripciones.INSCRITO, inscripciones.YA_INSCRITO})
+            else:
+                self.assertEqual({primero, segundo}, {inscripciones.EN_ESPERA, inscripciones.YA_EN_ESPERA})
+
+    def test_cancelaciones_promueven_en_orden_de_llegada(self):
+        for usuario in self.usuarios:
+            inscripciones.inscribir(self.evento.pk, usuario, notificar=False)
+        inscritos, espera = self.estado()
+        nuevos = self.crear_usuarios('n', 6)
+        # Cancelan tres inscritos mientras llegan usuarios nuevos: el cupo liberado es de la lista
+        resultados = self.concurrente(
+            [(inscripciones.cancelar, (self.evento.pk, u, None, False)) for u in self.usuarios[:3]]
+            + [(inscripciones.inscribir, (self.evento.pk, u, None, None, False)) for u in nuevos],
+        )
+        self.assertEqual([resultados[u.pk] for u in self.usuarios[:3]], [[inscripciones.CANCELADO]] * 3)
+        self.assertEqual([resultados[u.pk] for u in nuevos], [[inscripciones.EN_ESPERA]] * 6)
+        despues, espera_despues = self.estado()
+        self.assertEqual(despues, (inscritos - {u.pk for u in self.usuarios[:3]}) | set(espera[:3]))
+        self.assertEqual(espera_despues[:len(espera) - 3], espera[3:])
+        self.assertEqual(set(espera_despues[len(espera) - 3:]), {u.pk for u in nuevos})
+
+
+class PublicacionTests(TestCase):
+    def setUp(self):
+        self.staff = crear_usuario('staff', is_staff=True)
+        self.lectores = [crear_usuario(f'lector{i}') for i in range(3)]
+        hace_rato = timezone.now() - timedelta(minutes=5)
+        self.evento = crear_evento(publicado=False, fecha_publicacion=hace_rato, publicado_por=self.staff)
+        self.otro = crear_evento(publicado=False, fecha_publicacion=hace_rato)
+
+    def test_publicar_solo_el_evento_guardado_y_sin_avisos(self):
+        self.assertTrue(publicacion.publicar(self.evento.pk))
+        self.assertFalse(publicacion.publicar(self.evento.pk))
+        self.assertEqual(
+            dict(Evento.objects.values_list('pk', 'publicado')), {self.evento.pk: True, self.otro.pk: False},
+        )
+        # Solo el aviso al publicador; el reparto a los usuarios queda para el comando
+        self.assertEqual(list(Notificacion.objects.values_list('usuario_id', flat=True)), [self.staff.pk])
+
+    def test_procesar_publica_y_avisa_por_lotes(self):
+        publicados, avisos = publicacion.procesar(lote=2)
+        self.assertEqual(sorted(publicados), sorted([self.evento.pk, self.otro.pk]))
+        self.assertEqual(avisos, 2 * len(self.lectores))
+        self.assertEqual(publicacion.procesar(lote=2), ([], 0))
+
+
+class EstadisticasTests(TestCase):
+    def test_sumar_no_marca_actualizado(self):
+        crear_evento()
+        antes = estadisticas.recalcular(['eventos'])['eventos']
+        self.assertEqual(antes.valor, 1)
+        estadisticas.sumar('eventos', 2)
+        fila = Estadistica.objects.get(clave='eventos')
+        self.assertEqual((fila.valor, fila.actualizado), (3, antes.actualizado))
+
+    def test_leer_refresca_las_de_solo_recalculo_viejas(self):
+        estadisticas.leer()
+        viejo = timezone.now() - estadisticas.MAX_EDAD - timedelta(seconds=1)
+        Estadistica.objects.update(actualizado=viejo)
+        cache.delete('agenda:estadisticas:refrescando')
+        with mock.patch.object(estadisticas.tareas, 'encolar') as encolar:
+            estadisticas.sumar('eventos', 1)
+            estadisticas.leer()
+        encolar.assert_called_once_with(estadisticas.recalcular, estadisticas.SOLO_RECALCULO)
+
+
+class ResumenesTests(TestCase):
+    def _valores(self):
+        return dict(
+            ResumenDiario.objects.filter(metrica='calificaciones').values_list('dimension', 'valor')
+        )
+
+    def test_cambiar_dimension_sin_consulta_previa(self):
+        evento, ana = crear_evento(), crear_usuario('ana')
+        with self.captureOnCommitCallbacks(execute=True):
+            EventoCalificacion.objects.create(evento=evento, usuario=ana, estrellas=3)
+        calificacion = EventoCalificacion.objects.get(evento=evento, usuario=ana)
+        calificacion.estrellas = 5
+        with self.captureOnCommitCallbacks(execute=True):
+            # Solo el UPDATE: el valor anterior viene de la carga
+            with self.assertNumQueries(1):
+                calificacion.save()
+        self.assertEqual(self._valores(), {'3': 0, '5': 1})
+        # Un segundo cambio parte del valor recién guardado
+        calificacion.estrellas = 4
+        with self.captureOnCommitCallbacks(execute=True):
+            calificacion.save(update_fields=['estrellas'])
+        self.assertEqual(self._valores(), {'3': 0, '4': 1, '5': 0})
+
+    def test_update_fields_sin_dimension_no_mueve(self):
+        evento, ana = crear_evento(), crear_usuario('ana')
+        with self.captureOnCommitCallbacks(execute=True):
+            EventoCalificacion.objects.create(evento=evento, usuario=ana, estrellas=3)
+        calificacion = EventoCalificacion.objects.only('pk', 'fecha').get(evento=evento, usuario=ana)
+        calificacion.fecha = timezone.now()
+        with self.captureOnCommitCallbacks(execute=True):
+            calificacion.save(update_fields=['fecha'])
+        self.assertEqual(self._valores(), {'3': 1})
+
+
+class TablasTests(TestCase):
+    def setUp(self):
+        self.staff = crear_usuario('staff', is_staff=True)
+        self.evento = crear_evento()
+        for i, estrellas in enumerate([5, 3, 5, 4, 5]):
+            EventoCalificacion.objects.create(evento=self.evento, usuario=crear_usuario(f'u{i}'), estrellas=estrellas)
+        self.factory = RequestFactory()
+
+    def _pagina(self, **params):
+        request = self.factory.get('/', params)
+        request.user = self.staff
+        return tablas.pagina(tablas.TABLAS['calificaciones'], request)
+
+    def test_recorre_por_keyset_sin_repetir(self):
+        esperados = list(EventoCalificacion.objects.order_by('-fecha', '-pk').values_list('pk', flat=True))
+        vistos, antes = [], ''
+        while True:
+            p = self._pagina(limite=2, antes=antes)
+            vistos += [c.pk for c in p.filas]
+            if not p.siguiente:
+                break
+            antes = p.siguiente
+        self.assertEqual(vistos, esperados)
+
+    def test_filtros_y_total(self):
+        p = self._pagina(estrellas=5, orden='fecha')
+        self.assertEqual([c.estrellas for c in p.filas], [5, 5, 5])
+        self.assertEqual(p.filtros, {'estrellas': '5'})
+        # Con filtros no se cuenta; sin filtros el total sale de Estadistica
+        self.assertIsNone(p.total)
+        estadisticas.recalcular(['calificaciones'])
+        self.assertEqual(self._pagina().total, 5)
+
+    def test_parametros_invalidos(self):
+        for params in (
+            {'orden': 'estrellas'}, {'limite': '0'}, {'limite': 'x'}, {'estrellas': 'x'},
+            {'antes': 'garbage_5'}, {'antes': '2026-13-45T00:00_3'}, {'antes': 'sinpk'},
+        ):
+            with self.subTest(params=params), self.assertRaises(ValueError):
+                self._pagina(**params)
+
+    def test_cursor_malformado_en_la_vista(self):
+        self.client.force_login(self.staff)
+        url = reverse('admin_calificaciones_list')
+        for antes in ('garbage_5', '2026-13-45T00:00_3'):
+            with self.subTest(antes=antes):
+                respuesta = self.client.get(url, {'antes': antes, 'formato': 'json'})
+                self.assertEqual(respuesta.status_code, 400)
+                self.assertFalse(respuesta.json()['ok'])
+                # En HTML se avisa y se muestra la primera página
+                respuesta = self.client.get(url, {'antes': antes})
+                self.assertEqual(respuesta.status_code, 200)
+                self.assertEqual(len(respuesta.context['calificaciones']), 5)
+
+
+class BandejaTests(TestCase):
+    def setUp(self):
+        self.ana = crear_usuario('ana')
+        self.evento = crear_evento()
+        self.historia = Historia.objects.create(usuario=self.ana, titulo='Mi historia', contenido='...')
+        base = timezone.now() - timedelta(hours=1)
+        # Fechas repetidas entre y dentro de las fuentes para probar los desempates
+        for i, minutos in enumerate([0, 5, 5, 10, 10, 20]):
+            fecha = base + timedelta(minutes=minutos)
+            c = Comentario.objects.create(usuario=self.ana, historia=self.historia, texto=f'foro {i}')
+            e = EventoComentario.objects.create(usuario=self.ana, evento=self.evento, texto=f'evento {i}')
+            Comentario.objects.filter(pk=c.pk).update(fecha=fecha)
+            EventoComentario.objects.filter(pk=e.pk).update(fecha=fecha)
+
+    def _esperados(self, **filtros):
+        todos = [(c.fecha, 'foro', c.pk) for c in Comentario.objects.filter(**filtros)]
+        todos += [(c.fecha, 'evento', c.pk) for c in EventoComentario.objects.filter(**filtros)]
+        return [f'{fuente}:{pk}' for _fecha, fuente, pk in sorted(todos, reverse=True)]
+
+    def _recorrer(self, limite, **kwargs):
+        vistos, cursor = [], None
+        while True:
+            items, siguiente = bandeja.pagina(cursor, limite, **kwargs)
+            self.assertLessEqual(len(items), limite)
+            vistos += [i.id for i in items]
+            if not siguiente:
+                return vistos
+            cursor = bandeja.parse_cursor(siguiente)
+
+    def test_mezcla_por_keyset_sin_repetir_ni_saltar(self):
+        for limite in (1, 2, 3, 5, 12, 50):
+            with self.subTest(limite=limite):
+                self.assertEqual(self._recorrer(limite), self._esperados())
+
+    def test_filtros(self):
+        EventoComentario.objects.filter(texto__in=['evento 1', 'evento 4']).update(marcado=True)
+        Comentario.objects.filter(texto='foro 2').update(marcado=True)
+        self.assertEqual(self._recorrer(2, estado='marcados'), self._esperados(marcado=True))
+        self.assertEqual(
+            self._recorrer(2, fuentes=['foro']), [i for i in self._esperados() if i.startswith('foro:')],
+        )
+
+    def test_parse_cursor(self):
+        self.assertEqual(
+            bandeja.parse_cursor('2026-10-18T20:15:00+00:00_foro_812')[1:], ('foro', 812),
+        )
+        for crudo in ('garbage', '2026-13-45T00:00_foro_1', '2026-10-18T20:15:00_otra_1', '2026-10-18_foro_x'):
+            with self.subTest(crudo=crudo):
+                self.assertIsNone(bandeja.parse_cursor(crudo))
+
+    def test_cursor_invalido_en_la_vista(self):
+        self.client.force_login(crear_usuario('staff', is_staff=True))
+        respuesta = self.client.get(reverse('admin_comentarios_list'), {'antes': 'garbage', 'formato': 'json'})
+        self.assertEqual(respuesta.status_code, 400)
+
+    def test_eliminar_cuenta_solo_los_elegidos(self):
+        raiz = EventoComentario.objects.get(texto='evento 0')
+        for i in range(2):
+            EventoComentario.objects.create(usuario=self.ana, evento=self.evento, texto=f'resp {i}', parent=raiz)
+        foro = Comentario.objects.get(texto='foro 0')
+        total = bandeja.aplicar('eliminar', [f'evento:{raiz.pk}', f'foro:{foro.pk}', 'foro:999999', 'otra:1'])
+        self.assertEqual(total, 2)
+        self.assertFalse(EventoComentario.objects.filter(texto__startswith='resp').exists())
+
+
+class ICalTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.ana = crear_usuario('ana')
+        self.evento = crear_evento()
+
+    def test_token_sin_escribir_en_el_indice(self):
+        self.client.force_login(self.ana)
+        respuesta = self.client.get(reverse('agenda_index'))
+        self.ana.refresh_from_db()
+        self.assertIsNone(self.ana.token_calendario)
+        token = ical.token_de(self.ana)
+        self.assertIn(reverse('agenda_ics_personal', args=[token]), respuesta.context['ical_personal'])
+        self.assertEqual(ical.usuario_de(token), self.ana)
+
+    def test_token_invalido_o_regenerado(self):
+        anterior = ical.token_de(self.ana)
+        for token in ('', 'x-y', f'{self.ana.pk}-0000', f'{crear_usuario("beto").pk}{anterior[anterior.index("-"):]}'):
+            with self.subTest(token=token):
+                self.assertIsNone(ical.usuario_de(token))
+        nuevo = ical.regenerar_token(self.ana)
+        self.assertNotEqual(nuevo, anterior)
+        self.assertEqual(self.client.get(reverse('agenda_ics_personal', args=[anterior])).status_code, 410)
+        self.assertEqual(self.client.get(reverse('agenda_ics_personal', args=[nuevo])).status_code, 200)
+
+    def test_validador_publico_cambia_al_borrar(self):
+        otro = crear_evento(nombre='Otro')
+        with self.captureOnCommitCallbacks(execute=True):
+            crear_evento(nombre='Nuevo')
+        antes = ical.validador_publico()
+        # Cacheado: un 304 no consulta la base
+        with self.assertNumQueries(0):
+            self.assertEqual(ical.validador_publico(), antes)
+        with self.captureOnCommitCallbacks(execute=True):
+            otro.delete()
+        despues = ical.validador_publico()
+        self.assertNotEqual(despues.etag, antes.etag)
+        self.assertGreaterEqual(despues.modificado, antes.modificado)
+
+    def test_inscribirse_no_cambia_el_feed_publico(self):
+        antes = ical.validador_publico()
+        with self.captureOnCommitCallbacks(execute=True):
+            Inscripcion.objects.create(usuario=self.ana, evento=self.evento)
+        with self.assertNumQueries(0):
+            self.assertEqual(ical.validador_publico(), antes)
+
+
+def _inicios(regla, inicio, desde, hasta, fin=None):
+    return [v.astimezone(ZONA).strftime('%Y-%m-%d %H:%M') for v in recurrencia.expandir(regla, inicio, desde, hasta, fin)]
+
+
+class RecurrenciaTests(SimpleTestCase):
+    INICIO = datetime(2026, 1, 31, 18, 0, tzinfo=ZONA)
+
+    def test_parse_normaliza_y_rechaza(self):
+        self.assertEqual(str(recurrencia.parse('rrule:freq=weekly;byday=we,mo;interval=1')), 'FREQ=WEEKLY;BYDAY=MO,WE')
+        self.assertEqual(
+            str(recurrencia.parse('FREQ=MONTHLY;BYDAY=-1FR;UNTIL=20261231')),
+            'FREQ=MONTHLY;BYDAY=-1FR;UNTIL=20270101T045959Z',
+        )
+        for texto in (
+            '', 'FREQ=YEARLY', 'FREQ=DAILY;BYDAY=MO', 'FREQ=WEEKLY;BYDAY=2TU', 'FREQ=MONTHLY;BYDAY=MO',
+            'FREQ=MONTHLY;BYDAY=6MO', 'FREQ=MONTHLY;BYMONTHDAY=32', 'FREQ=DAILY;COUNT=2;UNTIL=20261231',
+            'FREQ=DAILY;COUNT=0', 'FREQ=DAILY;INTERVAL=100', 'FREQ=DAILY;FREQ=WEEKLY', 'FREQ=DAILY;BYHOUR=9',
+        ):
+            with self.subTest(texto=texto), self.assertRaises(ValueError):
+                recurrencia.parse(texto)
+
+    def test_fin_de_mes(self):
+        regla = recurrencia.parse('FREQ=MONTHLY')
+        hasta = datetime(2026, 8, 1, tzinfo=ZONA)
+        # Los meses sin día 31 no tienen repetición
+        self.assertEqual(
+            [d[:10] for d in _inicios(regla, self.INICIO, self.INICIO, hasta)],
+            ['2026-01-31', '2026-03-31', '2026-05-31', '2026-07-31'],
+        )
+
+    def test_ultimo_viernes(self):
+        regla = recurrencia.parse('FREQ=MONTHLY;BYDAY=-1FR')
+        inicio = datetime(2026, 1, 30, 18, 0, tzinfo=ZONA)
+        self.assertTrue(recurrencia.coincide(regla, inicio))
+        self.assertEqual(
+            [d[:10] for d in _inicios(regla, inicio, inicio, datetime(2026, 6, 1, tzinfo=ZONA))],
+            ['2026-01-30', '2026-02-27', '2026-03-27', '2026-04-24', '2026-05-29'],
+        )
+
+    def test_count_y_until(self):
+        inicio = datetime(2026, 1, 5, 18, 0, tzinfo=ZONA)  # lunes
+        regla = recurrencia.parse('FREQ=WEEKLY;BYDAY=MO,WE;COUNT=5')
+        fin = recurrencia.ultimo_inicio(regla, inicio)
+        self.assertEqual(fin, datetime(2026, 1, 19, 18, 0, tzinfo=ZONA))
+        self.assertEqual(len(_inicios(regla, inicio, inicio, datetime(2027, 1, 1, tzinfo=ZONA), fin)), 5)
+        # UNTIL con solo fecha incluye ese día completo en hora de Colombia
+        regla = recurrencia.parse('FREQ=DAILY;UNTIL=20260108')
+        self.assertEqual(
+            _inicios(regla, inicio, inicio, datetime(2027, 1, 1, tzinfo=ZONA), recurrencia.ultimo_inicio(regla, inicio))[-1],
+            '2026-01-08 18:00',
+        )
+
+    def test_hora_local_y_salto_a_la_ventana(self):
+        regla = recurrencia.parse('FREQ=WEEKLY;INTERVAL=2')
+        inicio = datetime(2026, 1, 5, 18, 0, tzinfo=ZONA)
+        desde = datetime(2036, 1, 1, tzinfo=ZONA)
+        inicios = list(recurrencia.expandir(regla, inicio, desde, desde + timedelta(days=30)))
+        self.assertEqual(len(inicios), 2)
+        for valor in inicios:
+            self.assertEqual(valor.astimezone(dt_timezone.utc).strftime('%H:%M'), '23:00')
+            self.assertEqual((valor - inicio).days % 14, 0)
+        self.assertEqual(recurrencia.desde_clave(recurrencia.clave(inicios[0])), inicios[0])
+
+
+class SeriesTests(TestCase):
+    INICIO = datetime(2030, 1, 7, 18, 0, tzinfo=ZONA)  # lunes
+
+    def setUp(self):
+        self.evento = crear_evento(fecha=self.INICIO, recurrencia='FREQ=WEEKLY;COUNT=10', cupo=1)
+        self.ana, self.beto = crear_usuario('ana'), crear_usuario('beto')
+
+    def _repeticion(self, semanas):
+        return ocurrencias.instancia(self.evento, self.INICIO + timedelta(weeks=semanas))
+
+    def inscribir(self, usuario, repeticion):
+        return inscripciones.inscribir(self.evento.pk, usuario, notificar=False, repeticion=repeticion)
+
+    def test_inscribir_crea_la_fila_con_el_cupo(self):
+        repeticion = self._repeticion(1)
+        self.assertEqual(self.inscribir(self.ana, repeticion), inscripciones.INSCRITO)
+        fila = Ocurrencia.objects.get(evento=self.evento)
+        self.assertEqual((fila.inicio, fila.inscritos_count), (repeticion.ocurrencia, 1))
+        # Llena: a la espera de esa misma repetición
+        self.assertEqual(self.inscribir(self.beto, self._repeticion(1)), inscripciones.EN_ESPERA)
+        self.assertEqual(ListaEspera.objects.get().ocurrencia, fila)
+
+    def test_sin_filas_sueltas(self):
+        repeticion = self._repeticion(2)
+        with mock.patch.object(Inscripcion.objects, 'create', side_effect=IntegrityError):
+            self.inscribir(self.ana, repeticion)
+        self.assertFalse(Ocurrencia.objects.exists())
+        ocurrencias.excepcion(self.evento, repeticion.ocurrencia, cancelada=True)
+        self.assertEqual(self.inscribir(self.ana, repeticion), inscripciones.NO_DISPONIBLE)
+        self.assertFalse(Inscripcion.objects.exists())
+        self.assertFalse(ListaEspera.objects.exists())
+
+    def _feed(self):
+        contenido = b''.join(self.client.get(reverse('agenda_ics')).streaming_content).decode()
+        lineas = contenido.replace('\r\n ', '').split('\r\n')
+        self.assertIn(f'TZID:{ical.TZID}', lineas)
+        self.assertIn('TZOFFSETTO:-0500', lineas)
+        # Solo los VEVENT (el VTIMEZONE también tiene DTSTART)
+        lineas = lineas[lineas.index('BEGIN:VEVENT'):]
+        return [linea for linea in lineas if linea.startswith(('DTSTART', 'RRULE', 'EXDATE', 'RECURRENCE-ID', 'END:VEVENT'))]
+
+    def _fecha(self, linea):
+        nombre, _, valor = linea.partition(':')
+        # Las repeticiones de la serie van en hora local con TZID, nunca en UTC
+        self.assertTrue(nombre.endswith(f';TZID={ical.TZID}'), linea)
+        return datetime.strptime(valor, '%Y%m%dT%H%M%S').replace(tzinfo=ZONA)
+
+    def test_feed_expande_igual_que_la_agenda(self):
+        ocurrencias.excepcion(self.evento, self.INICIO + timedelta(weeks=2), cancelada=True)
+        ocurrencias.excepcion(self.evento, self.INICIO + timedelta(weeks=4), fecha=self.INICIO + timedelta(weeks=4, hours=2))
+        self.evento.refresh_from_db()
+        cache.clear()
+
+        dtstart, regla, exdates, movidas, actual = None, None, set(), {}, {}
+        for linea in self._feed():
+            if linea == 'END:VEVENT':
+                if 'RECURRENCE-ID' in actual:
+                    movidas[actual['RECURRENCE-ID']] = actual['DTSTART']
+                actual = {}
+            elif linea.startswith('RRULE:'):
+                regla = recurrencia.parse(linea)
+            elif linea.startswith('EXDATE'):
+                exdates.add(self._fecha(linea))
+            else:
+                actual[linea.partition(';')[0]] = self._fecha(linea)
+                if linea.startswith('DTSTART') and dtstart is None:
+                    dtstart = actual['DTSTART']
+        self.assertEqual(dtstart, self.INICIO)
+
+        desde, hasta = self.INICIO, self.INICIO + timedelta(weeks=20)
+        feed = sorted(
+            movidas.get(inicio, inicio)
+            for inicio in recurrencia.expandir(regla, dtstart, desde, hasta, recurrencia.ultimo_inicio(regla, dtstart))
+            if inicio not in exdates
+        )
+        agenda = [e.fecha for e in ocurrencias.expandir([self.evento], desde, hasta)]
+        self.assertEqual(feed, agenda)
+        self.assertEqual(len(agenda), 9)
+        # Independiente de la regla: semanal, a las 18:00 de Colombia
+        self.assertEqual(agenda[0].astimezone(ZONA).strftime('%a %H:%M'), 'Mon 18:00')
+
+
+class ConflictosTests(TestCase):
+    LUGAR = 'Auditorio Central, Bogotá'
+
+    def serie(self, texto, fecha, **extra):
+        return crear_evento(fecha=fecha, recurrencia=texto, lugar=self.LUGAR, **extra)
+
+    def test_evento_unico(self):
+        fecha = datetime(2030, 3, 4, 18, 0, tzinfo=ZONA)
+        existente = crear_evento(fecha=fecha, lugar='  auditorio CENTRAL bogota ')
+        crear_evento(fecha=fecha, lugar='Otro lugar')
+        self.assertEqual(conflictos.buscar_conflicto(self.LUGAR, fecha + timedelta(minutes=45)), existente)
+        self.assertIsNone(conflictos.buscar_conflicto(self.LUGAR, fecha + timedelta(minutes=61)))
+        self.assertIsNone(conflictos.buscar_conflicto(self.LUGAR, fecha, excluir_pk=existente.pk))
+        self.assertIsNone(conflictos.buscar_conflicto('', fecha))
+
+    def test_unico_contra_serie(self):
+        inicio = datetime(2030, 1, 7, 18, 0, tzinfo=ZONA)
+        existente = self.serie('FREQ=WEEKLY;COUNT=10', inicio)
+        self.assertEqual(conflictos.buscar_conflicto(self.LUGAR, inicio + timedelta(weeks=6, minutes=30)), existente)
+        self.assertIsNone(conflictos.buscar_conflicto(self.LUGAR, inicio + timedelta(weeks=6, hours=3)))
+        self.assertIsNone(conflictos.buscar_conflicto(self.LUGAR, inicio + timedelta(weeks=10)))
+        # La repetición cancelada libera su hora; la movida ocupa la nueva
+        ocurrencias.excepcion(existente, inicio + timedelta(weeks=6), cancelada=True)
+        self.assertIsNone(conflictos.buscar_conflicto(self.LUGAR, inicio + timedelta(weeks=6)))
+        ocurrencias.excepcion(existente, inicio + timedelta(weeks=7), fecha=inicio + timedelta(weeks=7, days=1))
+        self.assertIsNone(conflictos.buscar_conflicto(self.LUGAR, inicio + timedelta(weeks=7)))
+        self.assertEqual(conflictos.buscar_conflicto(self.LUGAR, inicio + timedelta(weeks=7, days=1)), existente)
+
+    def test_serie_contra_unico(self):
+        inicio = datetime(2030, 1, 7, 18, 0, tzinfo=ZONA)
+        unico = crear_evento(fecha=inicio + timedelta(weeks=20, minutes=-30), lugar=self.LUGAR)
+        regla = recurrencia.parse('FREQ=WEEKLY')
+        self.assertEqual(conflictos.buscar_conflicto(self.LUGAR, inicio, regla=regla), unico)
+        # La serie termina antes del evento
+        regla = recurrencia.parse('FREQ=WEEKLY;COUNT=20')
+        self.assertIsNone(conflictos.buscar_conflicto(self.LUGAR, inicio, regla=regla))
+        # Una repetición movida de otra serie también cuenta
+        otra = self.serie('FREQ=MONTHLY;COUNT=3', datetime(2030, 1, 2, 9, 0, tzinfo=ZONA))
+        ocurrencias.excepcion(otra, otra.fecha, fecha=inicio + timedelta(weeks=1))
+        regla = recurrencia.parse('FREQ=WEEKLY;COUNT=4')
+        self.assertEqual(conflictos.buscar_conflicto(self.LUGAR, inicio, regla=regla), otra)
+
+    def test_series_mensuales_chocan_tras_el_ciclo_combinado(self):
+        existente = self.serie('FREQ=MONTHLY;INTERVAL=5;BYMONTHDAY=15', datetime(2026, 2, 15, 18, 0, tzinfo=ZONA))
+        regla = recurrencia.parse('FREQ=MONTHLY;INTERVAL=12;BYMONTHDAY=15')
+        inicio = datetime(2026, 1, 15, 18, 0, tzinfo=ZONA)
+        self.assertEqual(
+            conflictos._choque_series(regla, inicio, None, existente), datetime(2029, 1, 15, 18, 0, tzinfo=ZONA),
+        )
+        self.assertEqual(conflictos.buscar_conflicto('auditorio central bogota', inicio, regla=regla), existente)
+        # Terminada antes del primer choque, no hay conflicto
+        regla = recurrencia.parse('FREQ=MONTHLY;INTERVAL=12;BYMONTHDAY=15;COUNT=3')
+        self.assertIsNone(conflictos.buscar_conflicto(self.LUGAR, inicio, regla=regla))
+
+    def test_mensual_contra_semanal(self):
+        existente = self.serie('FREQ=WEEKLY;INTERVAL=5;BYDAY=WE', datetime(2026, 1, 7, 18, 0, tzinfo=ZONA))
+        regla = recurrencia.parse('FREQ=MONTHLY;BYMONTHDAY=15')
+        inicio = datetime(2026, 1, 15, 18, 0, tzinfo=ZONA)
+        self.assertEqual(
+            conflictos._choque_series(regla, inicio, None, existente), datetime(2038, 12, 15, 18, 0, tzinfo=ZONA),
+        )
+        # A otra hora no chocan nunca, y el recorrido termina
+        self.assertIsNone(conflictos.buscar_conflicto(self.LUGAR, inicio + timedelta(hours=3), regla=regla))
+
+    def test_series_semanales(self):
+        existente = self.serie('FREQ=WEEKLY;INTERVAL=3;BYDAY=MO', datetime(2026, 1, 5, 18, 0, tzinfo=ZONA))
+        regla = recurrencia.parse('FREQ=WEEKLY;INTERVAL=4;BYDAY=MO')
+        inicio = datetime(2026, 1, 12, 18, 30, tzinfo=ZONA)
+        # Lunes 5 + 3k semanas = lunes 12 + 4j semanas: k = 3, j = 2
+        self.assertEqual(conflictos._choque_series(regla, inicio, None, existente), inicio + timedelta(weeks=8))
+        self.assertEqual(conflictos.buscar_conflicto(self.LUGAR, inicio, regla=regla), existente)
+        self.assertIsNone(conflictos.buscar_conflicto(self.LUGAR, inicio, regla=regla, excluir_pk=existente.pk))
+
+
+class AdminEventosTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(crear_usuario('staff', is_staff=True))
+
+    def test_lista_por_keyset_con_total_materializado(self):
+        base = timezone.now() + timedelta(days=3)
+        eventos = [crear_evento(nombre=f'E{i}', fecha=base + timedelta(days=i // 2)) for i in range(5)]
+        estadisticas.recalcular(['eventos'])
+        Estadistica.objects.filter(clave='eventos').update(valor=42)
+        vistos, antes = [], None
+        with mock.patch('apps.agenda.views.ADMIN_EVENTOS_POR_PAGINA', 2):
+            for _ in range(3):
+                respuesta = self.client.get(reverse('admin_evento_list'), {'antes': antes} if antes else {})
+                self.assertEqual(respuesta.context['eventos_total'], 42)
+                vistos += [e.pk for e in respuesta.context['eventos']]
+                antes = respuesta.context['eventos_siguiente']
+        self.assertIsNone(antes)
+        # Más recientes primero; a igual fecha, el pk mayor
+        esperado = sorted(eventos, key=lambda e: (e.fecha, e.pk), reverse=True)
+        self.assertEqual(vistos, [e.pk for e in esperado])
+
+    def test_inscritos_por_cursor(self):
+        evento = crear_evento()
+        usuarios = [crear_usuario(f'u{i}') for i in range(5)]
+        for usuario in usuarios:
+            Inscripcion.objects.create(evento=evento, usuario=usuario, nombre_completo=usuario.username)
+        url = reverse('admin_evento_inscritos', args=[evento.pk])
+        vistos, despues = [], None
+        while True:
+            datos = self.client.get(url, {'limite': 2, **({'despues': despues} if despues else {})}).json()
+            self.assertLessEqual(len(datos['inscritos']), 2)
+            vistos += [i['usuario'] for i in datos['inscritos']]
+            despues = datos['siguiente']
+            if despues is None:
+                break
+        self.assertEqual(vistos, [u.username for u in usuarios])
+
+    def test_inscritos_limite_y_404(self):
+        evento = crear_evento()
+        url = reverse('admin_evento_inscritos', args=[evento.pk])
+        with mock.patch.object(inscripciones, 'pagina_inscritos', return_value=([], None)) as pagina:
+            for limite, esperado in (('0', 1), ('5000', 200), ('abc', inscripciones.INSCRITOS_POR_PAGINA)):
+                self.client.get(url, {'limite': limite})
+                self.assertEqual(pagina.call_args.args[2], esperado)
+        respuesta = self.client.get(reverse('admin_evento_inscritos', args=[evento.pk + 1]))
+        self.assertEqual(respuesta.status_code, 404)
+        self.assertFalse(respuesta.json()['ok'])
+
+
+class ExportarTests(TestCase):
+    def setUp(self):
+        self.client.force_login(crear_usuario('staff', is_staff=True))
+        self.evento = crear_evento(titulo='Taller <A&B>')
+        self.otro = crear_evento(nombre='Otro')
+        self.usuarios = [crear_usuario(f'u{i}') for i in range(3)]
+        for usuario, nombre in zip(self.usuarios, ('=HYPERLINK("http://x")', '+57 300', '@SUMA(A1)')):
+            Inscripcion.objects.create(
+                evento=self.evento, usuario=usuario, nombre_completo=nombre, telefono='-1', notas='ok\x07',
+            )
+        Inscripcion.objects.create(evento=self.otro, usuario=self.usuarios[0], nombre_completo='Otra')
+
+    def descargar(self, tipo='inscripciones', **params):
+        respuesta = self.client.get(reverse('admin_exportar', args=[tipo]), params)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta['Cache-Control'], 'no-store')
+        return respuesta, b''.join(respuesta.streaming_content)
+
+    def test_csv_escapa_formulas_y_filtra_por_evento(self):
+        respuesta, contenido = self.descargar(evento=self.evento.pk)
+        self.assertIn(f'-evento-{self.evento.pk}-', respuesta['Content-Disposition'])
+        texto = contenido.decode('utf-8')
+        self.assertTrue(texto.startswith('\ufeff'))
+        filas = list(csv.reader(io.StringIO(texto[1:])))
+        self.assertEqual(filas[0], exportar.EXPORTACIONES['inscripciones'].encabezados())
+        self.assertEqual(len(filas), 4)
+        self.assertEqual(
+            [f[5] for f in filas[1:]], ['\'=HYPERLINK("http://x")', "'+57 300", "'@SUMA(A1)"],
+        )
+        self.assertEqual({f[0] for f in filas[1:]}, {'Taller <A&B>'})
+        self.assertEqual({f[6] for f in filas[1:]}, {"'-1"})
+        self.assertEqual(exportar._celda_csv('\tx'), "'\tx")
+        # Los números propios no se tocan
+        self.assertEqual(exportar._celda_csv(-3), '-3')
+
+    def test_xlsx_valido_en_streaming(self):
+        bloques = list(exportar.xlsx_stream(exportar.EXPORTACIONES['inscripciones'], {}, por_bloque=2))
+        self.assertGreater(len(bloques), 2)
+        libro = zipfile.ZipFile(io.BytesIO(b''.join(bloques)))
+        self.assertIsNone(libro.testzip())
+        self.assertTrue({
+            '[Content_Types].xml', '_rels/.rels', 'xl/workbook.xml', 'xl/_rels/workbook.xml.rels',
+            'xl/styles.xml', 'xl/worksheets/sheet1.xml',
+        } <= set(libro.namelist()))
+        ns = {'x': exportar._NS}
+        hoja = ElementTree.fromstring(libro.read('xl/worksheets/sheet1.xml'))
+        filas = hoja.findall('x:sheetData/x:row', ns)
+        self.assertEqual(len(filas), 5)
+        celdas = filas[1].findall('x:c', ns)
+        # Texto en línea, nunca fórmulas; los caracteres de control no válidos en XML se quitan
+        self.assertTrue(all(c.get('t') == 'inlineStr' and c.find('x:f', ns) is None for c in celdas))
+        textos = [c.findtext('x:is/x:t', namespaces=ns) for c in celdas]
+        self.assertEqual(textos[0], 'Taller <A&B>')
+        self.assertEqual(textos[7], 'ok')
+
+    def test_xlsx_por_la_vista(self):
+        respuesta, contenido = self.descargar('usuarios', formato='xlsx')
+        self.assertEqual(respuesta['Content-Type'], exportar.FORMATOS['xlsx'])
+        hoja = ElementTree.fromstring(zipfile.ZipFile(io.BytesIO(contenido)).read('xl/worksheets/sheet1.xml'))
+        ns = {'x': exportar._NS}
+        ids = [fila.find('x:c/x:v', ns).text for fila in hoja.findall('x:sheetData/x:row', ns)[1:]]
+        self.assertEqual(ids, [str(pk) for pk in CustomUser.objects.order_by('pk').values_list('pk', flat=True)])
+
+    def test_parametros_invalidos(self):
+        for tipo, params in (
+            ('otra', {}), ('usuarios', {'formato': 'pdf'}), ('inscripciones', {'evento': 'x'}),
+        ):
+            with self.subTest(tipo=tipo, params=params):
+                respuesta = self.client.get(reverse('admin_exportar', args=[tipo]), params)
+                self.assertEqual(respuesta.status_code, 400)
+        self.client.logout()
+        self.assertEqual(self.client.get(reverse('admin_exportar', args=['usuarios'])).status_code, 302)
+
+
+class CalendarioTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def dias(self, **params):
+        respuesta = self.client.get(reverse('agenda_calendario'), params)
+        self.assertEqual(respuesta.status_code, 200)
+        return respuesta.json()['dias']
+
+    def test_fechas_fuera_de_rango(self):
+        for params in (
+            {'mes': '9999-12'}, {'semana': '9999-12-31'}, {'semana': '0001-01-01'}, {'mes': '0001-01'},
+            {'mes': '1999-12'}, {'mes': '2026-13'}, {'semana': 'ayer'},
+        ):
+            with self.subTest(params=params):
+                respuesta = self.client.get(reverse('agenda_calendario'), params)
+                self.assertEqual(respuesta.status_code, 400)
+                self.assertFalse(respuesta.json()['ok'])
+
+    def test_dias_de_un_mes(self):
+        base = datetime(2030, 3, 12, 9, 0, tzinfo=ZONA)
+        for horas in (5, 0, 3, 1):
+            crear_evento(fecha=base + timedelta(hours=horas), titulo=f'A las {9 + horas}')
+        crear_evento(fecha=base + timedelta(days=1), publicado=False)
+        # 23:30 en Bogotá es ya 1 de abril en UTC: cuenta para el 31 de marzo
+        tarde = crear_evento(fecha=datetime(2030, 3, 31, 23, 30, tzinfo=ZONA))
+        serie = crear_evento(fecha=datetime(2030, 3, 4, 18, 0, tzinfo=ZONA), recurrencia='FREQ=WEEKLY;COUNT=3')
+        ocurrencias.excepcion(serie, serie.fecha + timedelta(weeks=1), cancelada=True)
+
+        dias = self.dias(mes='2030-03')
+        self.assertEqual(sorted(dias), ['2030-03-04', '2030-03-12', '2030-03-18', '2030-03-31'])
+        dia = dias['2030-03-12']
+        self.assertEqual((dia['total'], dia['mas']), (4, 1))
+        self.assertEqual([e['hora'] for e in dia['eventos']], ['09:00', '10:00', '12:00'])
+        self.assertEqual(dias['2030-03-31']['eventos'][0]['id'], tarde.pk)
+        self.assertEqual(dias['2030-03-18']['eventos'][0]['id'], serie.pk)
+        self.assertIn('?ocurrencia=', dias['2030-03-18']['eventos'][0]['url'])
+        self.assertEqual(self.dias(mes='2030-04'), {})
+        # La semana del 25 de marzo toma los días del mes cacheado
+        self.assertEqual(list(self.dias(semana='2030-03-27')), ['2030-03-31'])
+
+    def test_cache_por_mes_e_idioma(self):
+        crear_evento(fecha=datetime(2030, 3, 12, 9, 0, tzinfo=ZONA))
+        calendario.mes(2030, 3)
+        with self.assertNumQueries(0):
+            self.assertEqual(list(calendario.mes(2030, 3)), ['2030-03-12'])
+        # Otro idioma tiene sus propios enlaces
+        with translation.override('en'), self.assertNumQueries(2):
+            url = calendario.mes(2030, 3)['2030-03-12']['eventos'][0]['url']
+        self.assertTrue(url.startswith('/en/'))
+        with self.captureOnCommitCallbacks(execute=True):
+            crear_evento(fecha=datetime(2030, 3, 20, 9, 0, tzinfo=ZONA))
+        self.assertEqual(list(calendario.mes(2030, 3)), ['2030-03-12', '2030-03-20'])
+
+
+class AgendaIndexTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.ahora = timezone.now()
+
+    def test_timeout_hasta_el_inicio_del_primero(self):
+        crear_evento(fecha=self.ahora + timedelta(seconds=90))
+        crear_evento(fecha=self.ahora + timedelta(days=2))
+        with mock.patch.object(cache, 'set', wraps=cache.set) as guardar:
+            self.assertEqual(len(get_proximos(self.ahora)), 2)
+        (_key, _eventos, timeout), _ = guardar.call_args
+        self.assertEqual(timeout, 91)
+
+    def test_el_que_empieza_pasa_a_pasados_sin_consultar(self):
+        primero = crear_evento(fecha=self.ahora + timedelta(minutes=5))
+        crear_evento(fecha=self.ahora + timedelta(days=1))
+        get_proximos(self.ahora)
+        with self.assertNumQueries(0):
+            proximos = get_proximos(self.ahora + timedelta(minutes=6))
+        self.assertNotIn(primero.pk, [e.pk for e in proximos])
+        self.assertEqual(len(proximos), 1)
+
+    def test_cambios_invalidan_la_version(self):
+        get_proximos(self.ahora)
+        version = version_agenda()
+        with self.captureOnCommitCallbacks(execute=True):
+            nuevo = crear_evento(fecha=self.ahora + timedelta(days=3))
+        self.assertGreater(version_agenda(), version)
+        self.assertEqual([e.pk for e in get_proximos(self.ahora)], [nuevo.pk])
+        with self.captureOnCommitCallbacks(execute=True):
+            Evento.objects.get(pk=nuevo.pk).delete()
+        self.assertEqual(get_proximos(self.ahora), [])
+
+    def test_pasados_por_keyset(self):
+        from .views import PASADOS_POR_PAGINA
+
+        for i in range(PASADOS_POR_PAGINA + 2):
+            crear_evento(nombre=f'Pasado {i}', fecha=self.ahora - timedelta(days=1 + i % 3))
+        crear_evento(nombre='Borrador', fecha=self.ahora - timedelta(days=1), publicado=False)
+        url = reverse('agenda_index')
+        respuesta = self.client.get(url)
+        primera = [e.pk for e in respuesta.context['pasados']]
+        self.assertEqual(len(primera), PASADOS_POR_PAGINA)
+        respuesta = self.client.get(url, {'antes': respuesta.context['pasados_siguiente']})
+        segunda = [e.pk for e in respuesta.context['pasados']]
+        self.assertIsNone(respuesta.context['pasados_siguiente'])
+        esperados = list(
+            Evento.objects.filter(publicado=True).order_by('-fecha', '-pk').values_list('pk', flat=True)
+        )
+        self.assertEqual(primera + segunda, esperados)
+        # Un cursor inválido muestra la primera página
+        self.assertEqual(
+            [e.pk for e in self.client.get(url, {'antes': 'x_y'}).context['pasados']], primera,
+        )
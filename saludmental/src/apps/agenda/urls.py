@@ -3,7 +3,13 @@ from . import views
 
 urlpatterns = [
     path('', views.index, name='agenda_index'),
+    path('cerca/', views.eventos_cerca, name='agenda_eventos_cerca'),
+    path('calendario.ics', views.calendario_ics, name='agenda_ics'),
+    path('calendario/<str:token>.ics', views.calendario_personal_ics, name='agenda_ics_personal'),
+    path('calendario/regenerar/', views.regenerar_token_calendario, name='agenda_regenerar_token_calendario'),
+    path('calendario/dias/', views.calendario_json, name='agenda_calendario'),
     path('evento/<int:pk>/', views.evento_detalle, name='agenda_evento_detalle'),
+    path('evento/<int:pk>/fotos/', views.evento_fotos_json, name='agenda_evento_fotos'),
     path('evento/<int:pk>/calificar/', views.calificar_evento, name='agenda_calificar_evento'),
     path('evento/<int:pk>/comentar/', views.comentar_evento, name='agenda_comentar_evento'),
     path('comentarios/<int:pk>/like/', views.like_evento_comentario, name='agenda_like_comentario'),
@@ -12,20 +18,26 @@ urlpatterns = [
     path('comentarios/<int:pk>/eliminar/', views.eliminar_evento_comentario, name='agenda_eliminar_comentario'),
     # Admin
     path('admin/', views.admin_dashboard, name='agenda_admin_dashboard'),
+    path('admin/estadisticas/series/', views.admin_estadisticas_series, name='agenda_admin_series'),
     path('admin/eventos/', views.admin_evento_list, name='admin_evento_list'),
     path('admin/eventos/nuevo/', views.admin_evento_create, name='admin_evento_create'),
     path('admin/eventos/<int:pk>/editar/', views.admin_evento_edit, name='admin_evento_edit'),
     path('admin/eventos/<int:pk>/eliminar/', views.admin_evento_delete, name='admin_evento_delete'),
     path('admin/eventos/<int:pk>/fotos/', views.admin_evento_fotos, name='admin_evento_fotos'),
+    path('admin/eventos/<int:pk>/inscritos/', views.admin_evento_inscritos, name='admin_evento_inscritos'),
+    path('admin/eventos/<int:pk>/ocurrencias/', views.admin_evento_ocurrencias, name='admin_evento_ocurrencias'),
     path('foto/<int:pk>/eliminar/', views.eliminar_evento_foto, name='eliminar_evento_foto'),
     # Admin - Gestión de datos
+    path('admin/exportar/<str:tipo>/', views.admin_exportar, name='admin_exportar'),
     path('admin/usuarios/', views.admin_usuarios_list, name='admin_usuarios_list'),
     path('admin/usuarios/<int:pk>/eliminar/', views.admin_usuario_delete, name='admin_usuario_delete'),
     path('admin/inscripciones/', views.admin_inscripciones_list, name='admin_inscripciones_list'),
     path('admin/historias/', views.admin_historias_list, name='admin_historias_list'),
     path('admin/comentarios/', views.admin_comentarios_list, name='admin_comentarios_list'),
+    path('admin/comentarios/accion/', views.admin_comentarios_accion, name='admin_comentarios_accion'),
     path('admin/notificaciones/', views.admin_notificaciones_list, name='admin_notificaciones_list'),
     path('admin/calificaciones/', views.admin_calificaciones_list, name='admin_calificaciones_list'),
     # Inscripciones
     path('inscribirme/<int:pk>/', views.inscribirme, name='agenda_inscribirme'),
+    path('inscribirme/<int:pk>/cancelar/', views.cancelar_inscripcion, name='agenda_cancelar_inscripcion'),
 ]
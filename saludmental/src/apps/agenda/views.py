@@ -1,33 +1,36 @@
 from django.shortcuts import render, redirect, get_object_or_404
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
 from django.template.loader import render_to_string
 from django.utils import timezone
 from django.contrib.auth.decorators import user_passes_test, login_required
 from django.contrib import messages
 from django.utils.translation import gettext as _, get_language_from_request
-from django.utils import translation
-from django.conf import settings
 from django.urls import reverse
 from django.utils.formats import date_format
-from .models import Evento, Inscripcion, EventoFoto, EventoCalificacion, EventoComentario, EventoLikeComentario
-from apps.usuarios.models import Notificacion, CustomUser
+from .models import Evento, Inscripcion, EventoFoto, EventoCalificacion, EventoComentario, EventoLikeComentario, ListaEspera, Ocurrencia
+from .cache import get_dashboard_listas, get_proximos
+from .conflictos import buscar_conflicto
+from .fotos import FOTOS_POR_PAGINA, foto_json, ingestar_fotos, pagina_fotos
+from .snapshot import comentarios_ordenados, get_snapshot, get_vista_visitante, guardar_likes
+from . import bandeja, calendario, contadores, estadisticas, exportar, geo, ical, inscripciones, ocurrencias, publicacion, recurrencia, resumenes, tablas, tareas
+from apps.usuarios.models import CustomUser
 from apps.usuarios.email_utils import (
-    enviar_notificacion_evento_publicado,
-    enviar_notificacion_inscripcion_evento,
     enviar_notificacion_comentario_evento,
     enviar_notificacion_like_comentario,
     enviar_notificacion_respuesta_comentario
 )
 from django import forms
-from django.db.models import Count
+from django.db.models import Count, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
 from django.core.exceptions import ValidationError
 from django.utils.text import slugify
 from decimal import Decimal, InvalidOperation
-from datetime import timedelta
-from django.db.models import Avg
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from django.db import transaction
 from django.views.decorators.http import require_POST
-import hashlib
-from django.http import HttpResponseForbidden
+from django.http import HttpResponseForbidden, HttpResponseGone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
 import requests
 try:
     # Reusar detección de lenguaje inapropiado si existe
@@ -35,18 +38,196 @@ try:
 except Exception:  # pragma: no cover - fallback si no existe
     def contains_banned_words(_text: str) -> bool:
         return False
+from apps.foro.antispam import rechazo_flood, registrar
+
+PASADOS_POR_PAGINA = 12
+ADMIN_EVENTOS_POR_PAGINA = 25
+
+
+def _parse_cursor(raw):
+    """Cursor de paginación por keyset: '<fecha ISO>_<pk>'. Devuelve (fecha, pk) o None."""
+    try:
+        fecha_iso, pk = raw.rsplit('_', 1)
+        fecha = datetime.fromisoformat(fecha_iso)
+        if timezone.is_naive(fecha):
+            fecha = timezone.make_aware(fecha, dt_timezone.utc)
+        return fecha, int(pk)
+    except (AttributeError, ValueError):
+        return None
+
 
 def index(request):
     ahora = timezone.now()
-    eventos = Evento.objects.filter(publicado=True).order_by('fecha').annotate(inscritos=Count('inscripcion'))
-    proximos = eventos.filter(fecha__gte=ahora)
-    pasados = eventos.filter(fecha__lt=ahora).order_by('-fecha')
+    proximos = get_proximos(ahora)
+
+    # Pasados: keyset sobre (-fecha, -pk), nunca se recorre el histórico completo
+    # Una serie pasa a "pasados" cuando termina; mientras tanto sus repeticiones están en próximos
+    pasados_qs = Evento.objects.filter(
+        Q(recurrencia='') | Q(recurrencia_hasta__lt=ahora), publicado=True, fecha__lt=ahora,
+    ).order_by('-fecha', '-pk')
+    cursor = _parse_cursor(request.GET.get('antes'))
+    if cursor:
+        fecha_c, pk_c = cursor
+        pasados_qs = pasados_qs.filter(Q(fecha__lt=fecha_c) | Q(fecha=fecha_c, pk__lt=pk_c))
+    pasados = list(pasados_qs[:PASADOS_POR_PAGINA + 1])
+    siguiente = None
+    if len(pasados) > PASADOS_POR_PAGINA:
+        pasados = pasados[:PASADOS_POR_PAGINA]
+        ultimo = pasados[-1]
+        siguiente = f"{ultimo.fecha.isoformat()}_{ultimo.pk}"
+    ical_personal = None
+    if request.user.is_authenticated:
+        ical_personal = _webcal(request, reverse('agenda_ics_personal', args=[ical.token_de(request.user)]))
     return render(request, 'agenda/index.html', {
         'proximos': proximos,
         'pasados': pasados,
+        'pasados_siguiente': siguiente,
+        'pasados_paginado': cursor is not None,
+        'ical_publico': _webcal(request, reverse('agenda_ics')),
+        'ical_personal': ical_personal,
     })
 
 
+def _webcal(request, path):
+    # webcal:// abre la suscripción directamente en la app de calendario
+    return 'webcal://' + request.build_absolute_uri(path).split('://', 1)[1]
+
+
+def _respuesta_ics(request, validador, vevents, nombre, privada=False):
+    modificado = int(validador.modificado.timestamp()) if validador.modificado else None
+    response = get_conditional_response(request, etag=validador.etag, last_modified=modificado)
+    if response is None:
+        response = StreamingHttpResponse(
+            ical.stream(request, vevents, nombre), content_type='text/calendar; charset=utf-8',
+        )
+        response['Content-Disposition'] = 'inline; filename="agenda.ics"'
+    response['ETag'] = validador.etag
+    if modificado:
+        response['Last-Modified'] = http_date(modificado)
+    response['Cache-Control'] = f"{'private' if privada else 'public'}, max-age=300"
+    return response
+
+
+def calendario_ics(request):
+    """Feed .ics con todos los eventos publicados."""
+    return _respuesta_ics(request, ical.validador_publico(), ical.eventos_publicos, _('Agenda Iterum'))
+
+
+def calendario_personal_ics(request, token):
+    """Feed .ics con los eventos en los que está inscrito el dueño del token."""
+    usuario = ical.usuario_de(token)
+    if usuario is None:
+        # 410: el token se regeneró o nunca existió; los clientes dejan de consultar
+        return HttpResponseGone()
+    return _respuesta_ics(
+        request, ical.validador_personal(usuario), ical.eventos_de(usuario), _('Mis eventos - Iterum'), privada=True,
+    )
+
+
+@login_required
+@require_POST
+def regenerar_token_calendario(request):
+    ical.regenerar_token(request.user)
+    messages.success(request, _('Creamos una nueva dirección para tu calendario. La anterior dejó de funcionar.'))
+    return redirect(reverse('agenda_index') + '#suscribirse')
+
+
+def calendario_json(request):
+    """
+    Días con eventos de un mes o una semana, en JSON para la vista de calendario.
+    ?mes=2026-11  o  ?semana=2026-11-18 (cualquier día de la semana). Sin parámetros, el mes actual.
+    """
+    hoy = resumenes.dia_local(timezone.now())
+    por_semana = bool(request.GET.get('semana'))
+    try:
+        if por_semana:
+            dia = date.fromisoformat(request.GET['semana'])
+        else:
+            dia = datetime.strptime(request.GET['mes'], '%Y-%m').date() if request.GET.get('mes') else hoy.replace(day=1)
+    except ValueError:
+        dia = None
+    # Antes de cualquier aritmética: cerca de date.min/date.max los saltos de semana o mes desbordan
+    if dia is None or not (2000 <= dia.year <= 2100):
+        return JsonResponse({'ok': False, 'error': _('Fecha inválida.')}, status=400)
+    if por_semana:
+        desde = dia - timedelta(days=dia.weekday())  # lunes
+        hasta = desde + timedelta(days=6)
+        vista, anterior, siguiente = 'semana', desde - timedelta(days=7), desde + timedelta(days=7)
+    else:
+        desde = dia
+        hasta = (desde + timedelta(days=31)).replace(day=1) - timedelta(days=1)
+        vista, anterior, siguiente = 'mes', (desde - timedelta(days=1)).replace(day=1), hasta + timedelta(days=1)
+    formato = '%Y-%m' if vista == 'mes' else '%Y-%m-%d'
+    return JsonResponse({
+        'ok': True,
+        'vista': vista,
+        'desde': desde.isoformat(),
+        'hasta': hasta.isoformat(),
+        'anterior': anterior.strftime(formato),
+        'siguiente': siguiente.strftime(formato),
+        'dias': calendario.dias(desde, hasta),
+    })
+
+
+EVENTOS_CERCA_MAX = 200
+
+
+def _float_param(request, nombre, minimo, maximo):
+    valor = float(request.GET[nombre])
+    if not (minimo <= valor <= maximo):
+        raise ValueError(nombre)
+    return valor
+
+
+def eventos_cerca(request):
+    """
+    Eventos presenciales publicados cerca de un punto o dentro de una caja, en JSON.
+    ?lat=4.6&lon=-74.08&radio_km=10  o  ?bbox=oeste,sur,este,norte (formato de Leaflet)
+    Con &zoom=N devuelve marcadores agrupados por celda en lugar de cada evento.
+    Por defecto solo próximos; &pasados=1 incluye los ya realizados.
+    """
+    qs = Evento.objects.filter(publicado=True, tipo_evento='presencial').exclude(geohash='')
+    if request.GET.get('pasados') != '1':
+        qs = qs.filter(ocurrencias.q_en_ventana(timezone.now()))
+    try:
+        if request.GET.get('bbox'):
+            oeste, sur, este, norte = (float(v) for v in request.GET['bbox'].split(','))
+            if not (-90 <= sur <= norte <= 90 and -180 <= oeste <= este <= 180):
+                raise ValueError('bbox')
+            qs = geo.en_caja(qs, sur, oeste, norte, este)
+            lat = lon = None
+        else:
+            lat = _float_param(request, 'lat', -90, 90)
+            lon = _float_param(request, 'lon', -180, 180)
+            radio = float(request.GET.get('radio_km', 10))
+            if not (0 < radio <= 500):
+                raise ValueError('radio_km')
+            qs = geo.cerca(qs, lat, lon, radio)
+        zoom = int(request.GET['zoom']) if request.GET.get('zoom') else None
+    except (KeyError, ValueError):
+        return JsonResponse({'ok': False, 'error': _('Parámetros de ubicación inválidos.')}, status=400)
+
+    if zoom is not None:
+        return JsonResponse({'ok': True, 'zoom': zoom, 'clusters': geo.clusters(qs, zoom)})
+
+    if lat is None:
+        qs = qs.order_by('fecha', 'pk')
+    eventos = [
+        {
+            'id': e.pk,
+            'titulo': str(e),
+            'lugar': e.lugar,
+            'fecha': e.fecha.isoformat(),
+            'lat': float(e.latitud),
+            'lon': float(e.longitud),
+            'distancia_km': round(e.distancia_km, 3) if lat is not None else None,
+            'url': reverse('agenda_evento_detalle', args=[e.pk]),
+        }
+        for e in qs.only('pk', 'nombre', 'titulo', 'lugar', 'fecha', 'latitud', 'longitud')[:EVENTOS_CERCA_MAX]
+    ]
+    return JsonResponse({'ok': True, 'eventos': eventos})
+
+
 # ============ ADMIN ============
 def _is_staff(u):
     return u.is_authenticated and u.is_staff
@@ -79,7 +260,8 @@ class EventoForm(forms.ModelForm):
         fields = [
             'imagen', 'titulo', 'nombre', 'descripcion_corta',
             'tipo_evento', 'lugar', 'latitud', 'longitud',
-            'link_virtual', 'plataforma_virtual', 'fecha', 'precio'
+            'link_virtual', 'plataforma_virtual', 'fecha', 'recurrencia', 'precio', 'cupo',
+            'fecha_publicacion'
         ]
         # No definir widgets aquí para que se configuren en __init__ con traducciones actualizadas
         
@@ -154,10 +336,38 @@ class EventoForm(forms.ModelForm):
         # Deshabilitar localization para fecha (evita problemas de timezone)
         self.fields['fecha'].input_formats = ['%Y-%m-%dT%H:%M']
         
+        # Serie: regla RRULE (ver recurrencia.py); vacío = evento único
+        self.fields['recurrencia'].widget = forms.TextInput(attrs={
+            'placeholder': 'FREQ=WEEKLY;BYDAY=TU;COUNT=12',
+            'maxlength': 200,
+            'class': 'form-control',
+            'spellcheck': 'false',
+        })
+        self.fields['recurrencia'].help_text = _(
+            'Opcional. Repite el evento: FREQ=DAILY|WEEKLY|MONTHLY, INTERVAL, BYDAY (p. ej. TU o -1FR), '
+            'BYMONTHDAY, COUNT o UNTIL=AAAAMMDD.'
+        )
+        
+        # Publicación programada: vacío = publicar al guardar
+        self.fields['fecha_publicacion'].widget = forms.DateTimeInput(attrs={
+            'type': 'datetime-local',
+            'class': 'form-control',
+        }, format='%Y-%m-%dT%H:%M')
+        self.fields['fecha_publicacion'].input_formats = ['%Y-%m-%dT%H:%M']
+        if self.instance and self.instance.publicado:
+            # Ya publicado: la fecha de publicación queda solo como referencia
+            self.fields['fecha_publicacion'].disabled = True
+        
         # Precio por defecto 0 (COP)
         if not getattr(self.instance, 'pk', None) or self.instance.precio is None:
             self.fields['precio'].initial = 0
         
+        self.fields['cupo'].widget = forms.NumberInput(attrs={
+            'min': 1,
+            'placeholder': _('Sin límite'),
+            'class': 'form-control'
+        })
+        
         # Formatear fecha para datetime-local
         if self.instance and self.instance.pk and self.instance.fecha:
             # Al editar: convertir de UTC a Colombia
@@ -165,6 +375,10 @@ class EventoForm(forms.ModelForm):
             fecha_colombia = self.instance.fecha.astimezone(tz_colombia)
             # Formato: YYYY-MM-DDTHH:MM (sin segundos ni zona horaria)
             self.initial['fecha'] = fecha_colombia.strftime('%Y-%m-%dT%H:%M')
+        if self.instance and self.instance.pk and self.instance.fecha_publicacion:
+            self.initial['fecha_publicacion'] = (
+                self.instance.fecha_publicacion.astimezone(tz_colombia).strftime('%Y-%m-%dT%H:%M')
+            )
 
     def clean_titulo(self):
         titulo = (self.cleaned_data.get('titulo') or '').strip()
@@ -233,6 +447,34 @@ class EventoForm(forms.ModelForm):
         # Por ejemplo: 70000 → Decimal('70000.00')
         return Decimal(str(valor) + '.00')
 
+    def clean_cupo(self):
+        cupo = self.cleaned_data.get('cupo')
+        if cupo is None:
+            return None
+        if cupo < 1:
+            raise ValidationError(_('El cupo debe ser al menos 1 o quedar vacío (sin límite).'))
+        inscritos = self.instance.inscritos_count if self.instance and self.instance.pk else 0
+        if self.instance and self.instance.pk and self.instance.recurrencia:
+            # En una serie el cupo es por repetición
+            inscritos = (
+                Ocurrencia.objects.filter(evento=self.instance, fecha__gte=timezone.now())
+                .order_by('-inscritos_count').values_list('inscritos_count', flat=True).first()
+            ) or 0
+        if cupo < inscritos:
+            raise ValidationError(_('El cupo no puede ser menor que los inscritos actuales (%(n)s).') % {'n': inscritos})
+        return cupo
+
+    def clean_fecha_publicacion(self):
+        import pytz
+        
+        fecha_pub = self.cleaned_data.get('fecha_publicacion')
+        if not fecha_pub or self.fields['fecha_publicacion'].disabled:
+            return fecha_pub
+        # El input datetime-local trae la hora de Colombia
+        if timezone.is_aware(fecha_pub):
+            fecha_pub = timezone.make_naive(fecha_pub, dt_timezone.utc)
+        return pytz.timezone('America/Bogota').localize(fecha_pub).astimezone(pytz.UTC)
+
     def clean_fecha(self):
         import pytz
         from datetime import datetime as dt
@@ -258,13 +500,24 @@ class EventoForm(forms.ModelForm):
         # Calcular diferencia en minutos
         diferencia = (fecha_colombia - ahora_colombia).total_seconds() / 60
         
-        # Rechazar fechas en el pasado (con margen de 1 minuto para evitar problemas de sincronización)
-        if diferencia < -1:
+        # Rechazar fechas en el pasado (con margen de 1 minuto para evitar problemas de sincronización);
+        # una serie en curso conserva su primer inicio
+        sin_cambio = self.instance and self.instance.pk and self.instance.recurrencia and fecha_colombia == self.instance.fecha
+        if diferencia < -1 and not sin_cambio:
             raise ValidationError(_('No puedes crear eventos en el pasado. La hora seleccionada ya pasó.'))
         
         # Convertir a UTC para guardar en la base de datos
         return fecha_colombia.astimezone(pytz.UTC)
 
+    def clean_recurrencia(self):
+        texto = (self.cleaned_data.get('recurrencia') or '').strip()
+        if not texto:
+            return ''
+        try:
+            return str(recurrencia.parse(texto))
+        except ValueError:
+            raise ValidationError(_('Regla de repetición inválida o no soportada.'))
+
     def clean_imagen(self):
         imagen = self.cleaned_data.get('imagen')
         if not imagen:
@@ -283,213 +536,288 @@ class EventoForm(forms.ModelForm):
         cleaned = super().clean()
         fecha = cleaned.get('fecha')
         lugar = (cleaned.get('lugar') or '').strip()
+        regla = recurrencia.parse(cleaned['recurrencia']) if cleaned.get('recurrencia') else None
+        if fecha and regla and not recurrencia.coincide(regla, fecha):
+            self.add_error('recurrencia', _('La fecha del evento debe ser la primera repetición de la regla.'))
+            regla = None
         if fecha and lugar:
-            ventana = timedelta(hours=1)
-            qs = Evento.objects.filter(
-                lugar__iexact=lugar,
-                fecha__range=(fecha - ventana, fecha + ventana)
-            )
-            if self.instance and self.instance.pk:
-                qs = qs.exclude(pk=self.instance.pk)
-            if qs.exists():
+            # Un rango sobre el índice (venue_key, fecha); las series se comparan por su patrón
+            excluir = self.instance.pk if self.instance else None
+            if buscar_conflicto(lugar, fecha, excluir_pk=excluir, regla=regla):
                 raise ValidationError(_('Ya existe un evento en el mismo lugar y horario cercano (±1h).'))
+        fecha_pub = cleaned.get('fecha_publicacion')
+        if fecha and fecha_pub and fecha_pub > fecha:
+            self.add_error('fecha_publicacion', _('La publicación debe ser anterior a la fecha del evento.'))
         return cleaned
 
-def _notificar_publicacion(evento: Evento, lang_code: str | None = None, publisher=None) -> int:
-    """Envía notificaciones: a usuarios (no staff) anuncio; al publicador (staff) mensaje de confirmación."""
-    # Construir URLs
-    if lang_code:
-        with translation.override(lang_code):
-            user_url = reverse('agenda_evento_detalle', kwargs={'pk': evento.pk})
-            admin_url = reverse('admin_evento_edit', kwargs={'pk': evento.pk})
-    else:
-        with translation.override(getattr(settings, 'LANGUAGE_CODE', 'es')):
-            user_url = reverse('agenda_evento_detalle', kwargs={'pk': evento.pk})
-            admin_url = reverse('admin_evento_edit', kwargs={'pk': evento.pk})
-
-    # Usuarios finales (excluir staff)
-    usuarios = CustomUser.objects.filter(is_active=True, is_staff=False)
-    msg_user = f"Nuevo evento publicado: {evento.titulo or evento.nombre}"
-    objs = [Notificacion(usuario=u, mensaje=msg_user, url=user_url) for u in usuarios]
-
-    # Publicador (si está autenticado)
-    if publisher is not None and getattr(publisher, 'is_authenticated', False):
-        with translation.override(lang_code or getattr(settings, 'LANGUAGE_CODE', 'es')):
-            fecha_fmt = date_format(evento.fecha, 'D d M Y, H:i')
-        msg_admin = f"Publicaste el evento: {evento.titulo or evento.nombre} para {fecha_fmt}"
-        objs.append(Notificacion(usuario=publisher, mensaje=msg_admin, url=admin_url))
-
-    if not objs:
-        return 0
-    Notificacion.objects.bulk_create(objs, ignore_conflicts=True)
-    
-    # Enviar emails a los usuarios (no staff)
-    from django.contrib.sites.shortcuts import get_current_site
-    from django.http import HttpRequest
-    
-    # Crear una request falsa para build_absolute_uri si no hay publisher
-    if publisher and hasattr(publisher, '_request'):
-        request_obj = publisher._request
-    else:
-        # Construir URL completa manualmente
-        url_completa = f"https://iterum.com{user_url}"  # Ajusta el dominio según tu configuración
-    
-    for u in usuarios:
-        if hasattr(u, 'email') and u.email:
-            # Construir URL absoluta (ajustar según configuración)
-            url_completa = f"http://localhost:8000{user_url}"  # Cambiar en producción
-            enviar_notificacion_evento_publicado(
-                usuario_destinatario=u,
-                evento_titulo=evento.titulo or evento.nombre,
-                url_evento=url_completa
-            )
-    
-    return len(objs)
+@user_passes_test(_is_staff)
+def admin_dashboard(request):
+    # Totales materializados (una consulta) y listas desde cache; ver estadisticas.py
+    stats = estadisticas.leer()
+    return render(request, 'agenda/admin_dashboard.html', {
+        'stats': stats,
+        'usuarios_count': stats['usuarios'].valor,
+        'inscripciones_count': stats['inscripciones'].valor,
+        'eventos_count': stats['eventos'].valor,
+        'historias_count': stats['historias'].valor,
+        'comentarios_total': stats['comentarios_foro'].valor + stats['comentarios_eventos'].valor,
+        'notificaciones_pendientes': stats['notificaciones_pendientes'].valor,
+        'rating_promedio': estadisticas.rating_promedio(stats),
+        **get_dashboard_listas(),
+    })
 
-def _notificar_inscripcion(evento: Evento, usuario, lang_code: str | None = None) -> int:
-    """Notifica a todo el staff que un usuario se inscribió a un evento."""
-    if lang_code:
-        with translation.override(lang_code):
-            admin_url = reverse('admin_evento_edit', kwargs={'pk': evento.pk})
-    else:
-        with translation.override(getattr(settings, 'LANGUAGE_CODE', 'es')):
-            admin_url = reverse('admin_evento_edit', kwargs={'pk': evento.pk})
-    staff = CustomUser.objects.filter(is_active=True, is_staff=True)
-    display = ''
-    try:
-        display = usuario.get_full_name().strip()
-    except Exception:
-        display = ''
-    if not display:
-        display = getattr(usuario, 'username', None) or getattr(usuario, 'email', 'usuario')
-    msg = f"{display} se inscribió a: {evento.titulo or evento.nombre}"
-    objs = [Notificacion(usuario=adm, mensaje=msg, url=admin_url) for adm in staff if getattr(adm, 'pk', None) != getattr(usuario, 'pk', None)]
-    if not objs:
-        return 0
-    Notificacion.objects.bulk_create(objs, ignore_conflicts=True)
-    
-    # Enviar emails al staff
-    url_completa = f"http://localhost:8000{admin_url}"  # Cambiar en producción
-    for adm in staff:
-        if getattr(adm, 'pk', None) != getattr(usuario, 'pk', None) and hasattr(adm, 'email') and adm.email:
-            enviar_notificacion_inscripcion_evento(
-                usuario_staff=adm,
-                usuario_inscrito=usuario,
-                evento_titulo=evento.titulo or evento.nombre,
-                url_evento=url_completa
-            )
-    
-    return len(objs)
+
+def _nombres_dimension(clave, dimensiones):
+    """Etiquetas legibles para las subseries: título del evento o estrellas."""
+    campo = resumenes.SERIES[clave].dimension
+    if campo == 'evento_id':
+        ids = [int(d) for d in dimensiones if d.isdigit()]
+        titulos = {
+            pk: titulo or nombre
+            for pk, titulo, nombre in Evento.objects.filter(pk__in=ids).values_list('pk', 'titulo', 'nombre')
+        }
+        return {d: titulos.get(int(d), d) if d.isdigit() else d for d in dimensiones}
+    if campo == 'estrellas':
+        return {d: f'★{d}' for d in dimensiones}
+    return {d: d for d in dimensiones}
 
 
 @user_passes_test(_is_staff)
-def admin_dashboard(request):
-    from apps.foro.models import Historia, Comentario as ForoComentario
-    from django.db.models import Avg, Sum
-    
-    ahora = timezone.now()
-    
-    # Estadísticas generales
-    usuarios_count = request.user.__class__.objects.count()
-    inscripciones_count = Inscripcion.objects.count()
-    eventos_count = Evento.objects.count()
-    historias_count = Historia.objects.count()
-    comentarios_foro = ForoComentario.objects.count()
-    comentarios_eventos = EventoComentario.objects.count()
-    notificaciones_pendientes = Notificacion.objects.filter(leida=False).count()
-    
-    # Eventos próximos (futuros) ordenados por fecha ascendente (más cercanos primero)
-    proximos = Evento.objects.filter(fecha__gte=ahora).annotate(inscritos=Count('inscripcion')).order_by('fecha')[:5]
-    
-    # Eventos pasados (recientes) ordenados por fecha descendente (más recientes primero)
-    pasados = Evento.objects.filter(fecha__lt=ahora).annotate(inscritos=Count('inscripcion')).order_by('-fecha')[:5]
-    
-    # Calificaciones promedio
-    rating_promedio = EventoCalificacion.objects.aggregate(promedio=Avg('estrellas'))['promedio'] or 0
-    
-    # Eventos más populares (por inscripciones)
-    mas_populares = Evento.objects.annotate(inscritos=Count('inscripcion')).order_by('-inscritos')[:3]
-    
-    # Actividad reciente
-    historias_recientes = Historia.objects.select_related('usuario').order_by('-fecha')[:5]
-    
-    return render(request, 'agenda/admin_dashboard.html', {
-        'usuarios_count': usuarios_count,
-        'inscripciones_count': inscripciones_count,
-        'eventos_count': eventos_count,
-        'historias_count': historias_count,
-        'comentarios_total': comentarios_foro + comentarios_eventos,
-        'notificaciones_pendientes': notificaciones_pendientes,
-        'rating_promedio': round(rating_promedio, 1),
-        'proximos': proximos,
-        'pasados': pasados,
-        'mas_populares': mas_populares,
-        'historias_recientes': historias_recientes,
+def admin_estadisticas_series(request):
+    """
+    Series diarias para las gráficas del dashboard, en JSON (ver resumenes.py).
+    ?metrica=inscripciones&desde=2026-01-01&hasta=2026-01-31&agrupar=dia|semana|mes
+    Por defecto los últimos 30 días. Las métricas con dimensión aceptan &dimension=<valor>
+    o devuelven las &top=N subseries con más actividad.
+    """
+    clave = request.GET.get('metrica', 'inscripciones')
+    try:
+        if clave not in resumenes.SERIES:
+            raise ValueError('metrica')
+        hoy = resumenes.dia_local(timezone.now())
+        hasta = date.fromisoformat(request.GET['hasta']) if request.GET.get('hasta') else hoy
+        desde = date.fromisoformat(request.GET['desde']) if request.GET.get('desde') else hasta - timedelta(days=29)
+        if not (0 <= (hasta - desde).days < resumenes.MAX_DIAS):
+            raise ValueError('rango')
+        agrupar = request.GET.get('agrupar', 'dia')
+        if agrupar not in resumenes.AGRUPACIONES:
+            raise ValueError('agrupar')
+        top = int(request.GET.get('top', 10))
+        if not (1 <= top <= 50):
+            raise ValueError('top')
+    except ValueError:
+        return JsonResponse({'ok': False, 'error': _('Parámetros de la serie inválidos.')}, status=400)
+
+    datos = resumenes.consultar(clave, desde, hasta, request.GET.get('dimension') or None, agrupar, top)
+    nombres = _nombres_dimension(clave, [s['dimension'] for s in datos['series']])
+    for s in datos['series']:
+        s['nombre'] = nombres.get(s['dimension'], s['dimension'])
+    return JsonResponse({
+        'ok': True,
+        'metrica': clave,
+        'desde': desde.isoformat(),
+        'hasta': hasta.isoformat(),
+        'agrupar': agrupar,
+        **datos,
     })
 
 
 @user_passes_test(_is_staff)
 def admin_evento_list(request):
-    eventos = Evento.objects.order_by('-fecha').prefetch_related('inscripcion_set__usuario')
+    # Página por keyset (?antes=<fecha>_<pk>): los inscritos salen del contador
+    # desnormalizado y la lista de cada evento se pide aparte (admin_evento_inscritos)
+    espera = (
+        ListaEspera.objects.filter(evento=OuterRef('pk'))
+        .order_by().values('evento').annotate(n=Count('pk')).values('n')
+    )
+    qs = (
+        Evento.objects.only(
+            'pk', 'nombre', 'titulo', 'lugar', 'fecha', 'imagen', 'publicado', 'fecha_publicacion',
+            'inscritos_count', 'cupo',
+        )
+        .annotate(espera_count=Coalesce(Subquery(espera), 0))
+        .order_by('-fecha', '-pk')
+    )
+    cursor = _parse_cursor(request.GET.get('antes'))
+    if cursor:
+        fecha_c, pk_c = cursor
+        qs = qs.filter(Q(fecha__lt=fecha_c) | Q(fecha=fecha_c, pk__lt=pk_c))
+    eventos = list(qs[:ADMIN_EVENTOS_POR_PAGINA + 1])
+    siguiente = None
+    if len(eventos) > ADMIN_EVENTOS_POR_PAGINA:
+        eventos = eventos[:ADMIN_EVENTOS_POR_PAGINA]
+        ultimo = eventos[-1]
+        siguiente = f"{ultimo.fecha.isoformat()}_{ultimo.pk}"
     return render(request, 'agenda/admin_evento_list.html', {
         'eventos': eventos,
+        # Total materializado (estadisticas.py) en vez de un COUNT(*) por página
+        'eventos_total': estadisticas.leer()['eventos'].valor,
+        'eventos_siguiente': siguiente,
+        'eventos_paginado': cursor is not None,
         'now': timezone.now()
     })
 
 
+@user_passes_test(_is_staff)
+def admin_evento_inscritos(request, pk):
+    """Inscritos de un evento en JSON, por orden de llegada: ?despues=<cursor>&limite=50"""
+    if not Evento.objects.filter(pk=pk).exists():
+        return JsonResponse({'ok': False, 'error': _('El evento no existe.')}, status=404)
+    try:
+        limite = max(1, min(int(request.GET.get('limite', inscripciones.INSCRITOS_POR_PAGINA)), 200))
+    except ValueError:
+        limite = inscripciones.INSCRITOS_POR_PAGINA
+    filas, siguiente = inscripciones.pagina_inscritos(pk, _parse_cursor(request.GET.get('despues')), limite)
+    return JsonResponse({
+        'ok': True,
+        'inscritos': [
+            {
+                'id': i.pk,
+                'usuario': i.usuario.username,
+                'foto': i.usuario.foto_perfil.url if i.usuario.foto_perfil else '',
+                'fecha': timezone.localtime(i.fecha_inscripcion).strftime('%d/%m/%Y'),
+                'nombre_completo': i.nombre_completo,
+                'telefono': i.telefono,
+            }
+            for i in filas
+        ],
+        'siguiente': siguiente,
+    })
+
+
+@user_passes_test(_is_staff)
+def admin_evento_ocurrencias(request, pk):
+    """
+    Repeticiones próximas de una serie en JSON (GET, incluidas las canceladas).
+    POST inicio=<clave>&accion=cancelar|mover|restaurar[&fecha=AAAA-MM-DDTHH:MM] para una repetición.
+    """
+    evento = Evento.objects.filter(pk=pk).exclude(recurrencia='').first()
+    if evento is None:
+        return JsonResponse({'ok': False, 'error': _('El evento no es una serie.')}, status=400)
+
+    if request.method == 'POST':
+        inicio = recurrencia.desde_clave(request.POST.get('inicio'))
+        accion = request.POST.get('accion')
+        if not ocurrencias.es_repeticion(evento, inicio) or accion not in ('cancelar', 'mover', 'restaurar'):
+            return JsonResponse({'ok': False, 'error': _('Repetición o acción inválida.')}, status=400)
+        fecha = None
+        if accion == 'mover':
+            try:
+                fecha = datetime.strptime(request.POST.get('fecha', ''), '%Y-%m-%dT%H:%M').replace(tzinfo=resumenes.ZONA)
+            except ValueError:
+                return JsonResponse({'ok': False, 'error': _('Fecha inválida.')}, status=400)
+            if fecha < timezone.now():
+                return JsonResponse({'ok': False, 'error': _('La fecha debe ser futura.')}, status=400)
+            if buscar_conflicto(evento.lugar, fecha, excluir_pk=evento.pk):
+                return JsonResponse({'ok': False, 'error': _('Ya existe un evento en el mismo lugar y horario cercano (±1h).')}, status=400)
+        ocurrencias.excepcion(evento, inicio, cancelada=accion == 'cancelar', fecha=fecha)
+
+    ahora = timezone.now()
+    hasta = ahora + ocurrencias.VENTANA
+    regla = recurrencia.parse(evento.recurrencia)
+    filas = {f.inicio: f for f in Ocurrencia.objects.filter(evento=evento, inicio__range=(ahora, hasta))}
+    datos = []
+    for inicio in recurrencia.expandir(regla, evento.fecha, ahora, hasta, evento.recurrencia_hasta):
+        fila = filas.get(inicio)
+        datos.append({
+            'inicio': recurrencia.clave(inicio),
+            'fecha': timezone.localtime(fila.fecha if fila else inicio, resumenes.ZONA).strftime('%Y-%m-%dT%H:%M'),
+            'cancelada': bool(fila and fila.cancelada),
+            'movida': bool(fila and fila.fecha != inicio),
+            'inscritos': fila.inscritos_count if fila else 0,
+        })
+    return JsonResponse({'ok': True, 'ocurrencias': datos})
+
+
 @user_passes_test(_is_staff)
 def admin_evento_create(request):
     if request.method == 'POST':
         form = EventoForm(request.POST, request.FILES)
         if form.is_valid():
             evento = form.save(commit=False)
-            evento.publicado = True
-            evento.fecha_publicacion = timezone.now()
+            # Lo publica y avisa publicacion.py (comando publicar_eventos), fuera de esta petición
+            evento.publicado = False
+            evento.fecha_publicacion = evento.fecha_publicacion or timezone.now()
+            evento.publicado_por = request.user
             evento.save()
             
             # Las coordenadas vienen del Google Places Autocomplete en el formulario
             # Ya no necesitamos buscarlas con Nominatim
             
-            lang_code = get_language_from_request(request)
-            _notificar_publicacion(evento, lang_code, publisher=request.user)
-            messages.success(request, _("Evento creado y publicado."))
+            _mensaje_publicacion(request, evento)
             return redirect('admin_evento_list')
     else:
         form = EventoForm()
     return render(request, 'agenda/admin_evento_form.html', {'form': form, 'modo': 'crear'})
 
 
+# Campos de Evento que mantienen contadores.py y publicacion.py, no el formulario
+_CAMPOS_GESTIONADOS = {
+    'publicado', 'notificados_hasta', 'notificado_en',
+    'inscritos_count', 'ratings_count', 'ratings_sum', 'comentarios_count',
+}
+
+
+def _mensaje_publicacion(request, evento):
+    """Mensaje tras guardar; si la publicación ya venció se publica en segundo plano (los avisos, con el cron)."""
+    if evento.publicado:
+        messages.success(request, _("Evento actualizado."))
+    elif evento.fecha_publicacion <= timezone.now():
+        tareas.encolar_al_confirmar(publicacion.publicar, evento.pk)
+        messages.success(request, _("Evento guardado. Se publicará y se avisará a los usuarios en unos instantes."))
+    else:
+        messages.success(request, _("Evento guardado. Se publicará el %(fecha)s.") % {
+            'fecha': date_format(timezone.localtime(evento.fecha_publicacion, resumenes.ZONA), 'DATETIME_FORMAT'),
+        })
+
+
 @user_passes_test(_is_staff)
 def admin_evento_edit(request, pk):
     evento = get_object_or_404(Evento, pk=pk)
     
-    # Bloquear edición de eventos pasados
-    if evento.fecha < timezone.now():
+    # Bloquear edición de eventos pasados (una serie, cuando pasa su última repetición)
+    if evento.ultima_fecha and evento.ultima_fecha < timezone.now():
         messages.error(request, _("No se pueden editar eventos que ya finalizaron."))
         return redirect('admin_evento_list')
     
     if request.method == 'POST':
+        # is_valid() ya copia los datos del form en la instancia
+        antes_cupo, antes_serie = evento.cupo, (evento.fecha, evento.recurrencia)
         form = EventoForm(request.POST, request.FILES, instance=evento)
         if form.is_valid():
-            antes_publicado = bool(evento.publicado)
             evento = form.save(commit=False)
-            evento.publicado = True
-            
-            # Publicación transicional
-            if not antes_publicado and evento.publicado:
-                evento.fecha_publicacion = timezone.now()
-            
-            evento.save()
+            if not evento.publicado:
+                evento.fecha_publicacion = evento.fecha_publicacion or timezone.now()
+                evento.publicado_por = request.user
+            # Sin pisar lo que actualizan otros procesos mientras el form estaba abierto
+            evento.save(update_fields=[
+                f.name for f in Evento._meta.concrete_fields
+                if not f.primary_key and f.name not in _CAMPOS_GESTIONADOS
+            ])
             
             # Las coordenadas vienen del Google Places Autocomplete en el formulario
             # Ya no necesitamos buscarlas con Nominatim
             
-            # Notificar si es necesario
-            if not antes_publicado and evento.publicado:
+            # Cambió la serie: fuera las filas de repeticiones que ya no existen (sin inscritos)
+            if (evento.fecha, evento.recurrencia) != antes_serie:
+                ocurrencias.podar(evento)
+            
+            # En una serie cada repetición próxima lleva su copia del cupo
+            futuras = Ocurrencia.objects.filter(evento=evento, fecha__gte=timezone.now())
+            if evento.recurrencia and evento.cupo != antes_cupo:
+                futuras.update(cupo=evento.cupo)
+            
+            # Más cupo (o sin límite): entregarlo a la lista de espera
+            if antes_cupo is not None and (evento.cupo is None or evento.cupo > antes_cupo):
                 lang_code = get_language_from_request(request)
-                _notificar_publicacion(evento, lang_code, publisher=request.user)
+                if evento.recurrencia:
+                    con_espera = futuras.filter(cancelada=False, lista_espera__isnull=False).values_list('pk', flat=True)
+                    for ocurrencia_id in set(con_espera):
+                        inscripciones.promover(evento.pk, lang_code, ocurrencia_id=ocurrencia_id)
+                else:
+                    inscripciones.promover(evento.pk, lang_code)
             
-            messages.success(request, _("Evento actualizado y publicado."))
+            _mensaje_publicacion(request, evento)
             return redirect('admin_evento_list')
     else:
         form = EventoForm(instance=evento)
@@ -508,100 +836,54 @@ def admin_evento_delete(request, pk):
 
 @user_passes_test(_is_staff)
 def admin_evento_fotos(request, pk):
-    """Vista para que el admin suba fotos desde el modal del detalle del evento"""
+    """Subida de fotos del evento (modal del detalle por AJAX o formulario normal)"""
     evento = get_object_or_404(Evento, pk=pk)
-    
-    # Solo acepta POST para subir fotos
-    if request.method == 'POST':
-        fotos = request.FILES.getlist('fotos')
-        
-        # Si es AJAX, devolver JSON
-        if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
-            if not fotos:
-                return JsonResponse({
-                    'success': False,
-                    'message': _("No seleccionaste ninguna foto.")
-                })
-            else:
-                count = 0
-                duplicadas = []
-                
-                for foto in fotos:
-                    # Calcular hash MD5 del archivo
-                    foto.seek(0)  # Asegurar que estamos al inicio del archivo
-                    md5_hash = hashlib.md5()
-                    for chunk in foto.chunks():
-                        md5_hash.update(chunk)
-                    file_hash = md5_hash.hexdigest()
-                    
-                    # Verificar si ya existe una foto con el mismo hash en este evento
-                    if EventoFoto.objects.filter(evento=evento, hash_md5=file_hash).exists():
-                        duplicadas.append(foto.name)
-                        continue
-                    
-                    # Crear la foto con el hash
-                    EventoFoto.objects.create(
-                        evento=evento,
-                        imagen=foto,
-                        subido_por=request.user,
-                        hash_md5=file_hash
-                    )
-                    count += 1
-                
-                # Preparar mensaje
-                if count > 0 and len(duplicadas) > 0:
-                    mensaje = _(f"{count} foto(s) agregada(s). {len(duplicadas)} foto(s) duplicada(s) omitida(s).")
-                elif count > 0:
-                    mensaje = _(f"{count} foto(s) agregada(s) exitosamente.")
-                elif len(duplicadas) > 0:
-                    mensaje = _("Todas las fotos ya existen en este evento.")
-                else:
-                    mensaje = _("No se agregaron fotos.")
-                
-                return JsonResponse({
-                    'success': count > 0,
-                    'message': mensaje,
-                    'count': count,
-                    'duplicadas': duplicadas
-                })
-        else:
-            # Fallback para requests normales
-            if not fotos:
-                messages.warning(request, _("No seleccionaste ninguna foto."))
-            else:
-                count = 0
-                duplicadas = []
-                
-                for foto in fotos:
-                    # Calcular hash MD5
-                    foto.seek(0)
-                    md5_hash = hashlib.md5()
-                    for chunk in foto.chunks():
-                        md5_hash.update(chunk)
-                    file_hash = md5_hash.hexdigest()
-                    
-                    # Verificar duplicados
-                    if EventoFoto.objects.filter(evento=evento, hash_md5=file_hash).exists():
-                        duplicadas.append(foto.name)
-                        continue
-                    
-                    EventoFoto.objects.create(
-                        evento=evento,
-                        imagen=foto,
-                        subido_por=request.user,
-                        hash_md5=file_hash
-                    )
-                    count += 1
-                
-                if count > 0 and len(duplicadas) > 0:
-                    messages.success(request, _(f"{count} foto(s) agregada(s). {len(duplicadas)} duplicada(s) omitida(s)."))
-                elif count > 0:
-                    messages.success(request, _(f"{count} foto(s) agregada(s) exitosamente."))
-                elif len(duplicadas) > 0:
-                    messages.warning(request, _("Todas las fotos ya existen en este evento."))
-    
-    # Siempre redirigir al detalle del evento (no hay página de fotos)
-    return redirect('agenda_evento_detalle', pk=pk)
+    es_ajax = request.headers.get('X-Requested-With') == 'XMLHttpRequest'
+
+    if request.method != 'POST':
+        cursor = _parse_cursor(request.GET.get('antes'))
+        fotos, siguiente = pagina_fotos(evento.pk, cursor)
+        return render(request, 'agenda/admin_evento_fotos.html', {
+            'evento': evento,
+            'fotos': fotos,
+            'fotos_total': evento.fotos.count(),
+            'fotos_siguiente': siguiente,
+            'fotos_paginado': cursor is not None,
+        })
+
+    archivos = request.FILES.getlist('fotos')
+    if not archivos:
+        if es_ajax:
+            return JsonResponse({'success': False, 'message': _("No seleccionaste ninguna foto.")})
+        messages.warning(request, _("No seleccionaste ninguna foto."))
+        return redirect('admin_evento_fotos', pk=pk)
+
+    resultado = ingestar_fotos(evento, archivos, request.user)
+    count = len(resultado.creadas)
+    duplicadas = resultado.duplicadas
+
+    if count > 0 and duplicadas:
+        mensaje = _(f"{count} foto(s) agregada(s). {len(duplicadas)} foto(s) duplicada(s) omitida(s).")
+    elif count > 0:
+        mensaje = _(f"{count} foto(s) agregada(s) exitosamente.")
+    else:
+        mensaje = _("Todas las fotos ya existen en este evento.")
+    if resultado.similares:
+        mensaje += ' ' + _(f"{len(resultado.similares)} foto(s) parecen repetidas (misma imagen reexportada o redimensionada).")
+
+    if es_ajax:
+        return JsonResponse({
+            'success': count > 0,
+            'message': mensaje,
+            'count': count,
+            'duplicadas': duplicadas,
+            'similares': resultado.similares,
+        })
+    if count > 0:
+        messages.success(request, mensaje)
+    else:
+        messages.warning(request, mensaje)
+    return redirect('admin_evento_fotos', pk=pk)
 
 
 @user_passes_test(_is_staff)
@@ -670,26 +952,58 @@ class InscripcionForm(forms.ModelForm):
             }),
         }
 
+def _repeticion(request, evento, siguiente=True):
+    """
+    En una serie, la repetición de ?ocurrencia=<clave> (con `siguiente`, la próxima si
+    no viene o no existe). None si el evento es único o la serie no tiene repetición.
+    """
+    if not evento.recurrencia:
+        return None
+    repeticion = ocurrencias.instancia(evento, recurrencia.desde_clave(request.GET.get('ocurrencia')))
+    if repeticion is None and siguiente:
+        repeticion = ocurrencias.proxima(evento)
+    return repeticion
+
+
+def _a_detalle(evento):
+    url = reverse('agenda_evento_detalle', args=[evento.pk])
+    return redirect(f'{url}?ocurrencia={evento.ocurrencia_clave}' if evento.ocurrencia else url)
+
+
 @login_required
 def inscribirme(request, pk):
     evento = get_object_or_404(Evento, pk=pk)
+    if evento.recurrencia:
+        # Series: la inscripción es a una repetición concreta que aún no empieza
+        evento = _repeticion(request, evento, siguiente=False)
+        if evento is None or evento.fecha < timezone.now():
+            messages.error(request, _("Esa fecha del evento no está disponible."))
+            return redirect('agenda_evento_detalle', pk=pk)
     
-    # Verificar si ya está inscrito
-    if Inscripcion.objects.filter(usuario=request.user, evento=evento).exists():
+    # Atajo sin bloqueos; la garantía real la dan inscripciones.inscribir y el índice único
+    if Inscripcion.objects.filter(usuario=request.user, evento_id=pk, ocurrencia_id=evento.ocurrencia_pk).exists():
         messages.info(request, _("Ya estás inscrito en este evento."))
-        return redirect('agenda_evento_detalle', pk=pk)
+        return _a_detalle(evento)
     
     if request.method == 'POST':
         form = InscripcionForm(request.POST)
         if form.is_valid():
-            inscripcion = form.save(commit=False)
-            inscripcion.usuario = request.user
-            inscripcion.evento = evento
-            inscripcion.save()
-            messages.success(request, _("¡Inscripción confirmada! Ahora puedes ver toda la información del evento."))
-            lang_code = get_language_from_request(request)
-            _notificar_inscripcion(evento, request.user, lang_code)
-            return redirect('agenda_evento_detalle', pk=pk)
+            resultado = inscripciones.inscribir(
+                evento.pk, request.user, form.cleaned_data, get_language_from_request(request),
+                repeticion=evento if evento.ocurrencia else None,
+            )
+            if resultado == inscripciones.NO_DISPONIBLE:
+                messages.error(request, _("Esa fecha del evento no está disponible."))
+                return redirect('agenda_evento_detalle', pk=pk)
+            if resultado == inscripciones.INSCRITO:
+                messages.success(request, _("¡Inscripción confirmada! Ahora puedes ver toda la información del evento."))
+            elif resultado == inscripciones.YA_INSCRITO:
+                messages.info(request, _("Ya estás inscrito en este evento."))
+            elif resultado == inscripciones.EN_ESPERA:
+                messages.info(request, _("El evento está lleno. Te agregamos a la lista de espera y te avisaremos si se libera un cupo."))
+            else:
+                messages.info(request, _("Ya estás en la lista de espera de este evento."))
+            return _a_detalle(evento)
     else:
         # Pre-llenar con datos del usuario
         initial_data = {
@@ -700,68 +1014,100 @@ def inscribirme(request, pk):
     
     return render(request, 'agenda/inscripcion_form.html', {
         'form': form,
-        'evento': evento
+        'evento': evento,
+        'lleno': evento.cupo is not None and evento.inscritos_count >= evento.cupo,
     })
 
 
+@login_required
+@require_POST
+def cancelar_inscripcion(request, pk):
+    """Anula la inscripción o la espera del usuario; el cupo pasa al primero de la lista."""
+    evento = get_object_or_404(Evento, pk=pk)
+    if evento.recurrencia:
+        evento = _repeticion(request, evento, siguiente=False)
+        if evento is None:
+            messages.error(request, _("Esa fecha del evento no está disponible."))
+            return redirect('agenda_evento_detalle', pk=pk)
+    if evento.fecha < timezone.now():
+        messages.error(request, _("Este evento ya finalizó."))
+        return _a_detalle(evento)
+    resultado = inscripciones.cancelar(
+        evento.pk, request.user, get_language_from_request(request), ocurrencia_id=evento.ocurrencia_pk,
+    )
+    if resultado == inscripciones.CANCELADO:
+        messages.success(request, _("Cancelaste tu inscripción."))
+    elif resultado == inscripciones.SALIO_DE_ESPERA:
+        messages.success(request, _("Saliste de la lista de espera."))
+    else:
+        messages.info(request, _("No estabas inscrito en este evento."))
+    return _a_detalle(evento)
+
+
 # ============ DETALLE PÚBLICO ============
+REPETICIONES_DETALLE = 6
+
+
 def evento_detalle(request, pk):
+    # Parte compartida desde cache (evento, comentarios, fotos) + parte del visitante
+    snap = get_snapshot(pk)
     # Si el evento no existe o no está publicado, no 404: redirige al home con aviso
-    evento = Evento.objects.filter(pk=pk).first()
-    if not evento or not evento.publicado:
+    if not snap or not snap.evento.publicado:
         messages.info(request, _("El evento no está disponible."))
         return redirect('home')
+    evento = snap.evento
+    repeticiones = []
+    if evento.recurrencia:
+        # Serie: se muestra la repetición pedida (o la próxima) y las siguientes fechas para elegir
+        ahora = timezone.now()
+        repeticiones = ocurrencias.expandir([evento], ahora, ahora + ocurrencias.VENTANA)[:REPETICIONES_DETALLE]
+        evento = (
+            _repeticion(request, evento, siguiente=False)
+            or (repeticiones[0] if repeticiones else ocurrencias.proxima(evento))
+            or evento
+        )
+    visitante = get_vista_visitante(evento, request.user)
     
     # Determinar si el evento ya pasó
     evento_pasado = evento.fecha < timezone.now()
     
-    # Verificar si el usuario está inscrito
-    inscrito = False
-    if request.user.is_authenticated:
-        inscrito = Inscripcion.objects.filter(usuario=request.user, evento=evento).exists()
-        try:
-            user_rating = EventoCalificacion.objects.filter(evento=evento, usuario=request.user).values_list('estrellas', flat=True).first()
-        except Exception:
-            user_rating = None
-    else:
-        user_rating = None
-    # Datos de rating y comentarios
-    avg_rating = evento.calificaciones.aggregate(avg=Avg('estrellas'))['avg'] or 0
-    comentarios = (
-        evento.comentarios.filter(parent__isnull=True)
-        .annotate(
-            likes_count=Count('eventolikecomentario', distinct=True),
-            replies_count=Count('respuestas', distinct=True),
-        )
-        .select_related('usuario')
-        .prefetch_related('respuestas__usuario')
-        .order_by('-likes_count', '-replies_count', '-fecha')
-    )
-    # Total de comentarios incluyendo respuestas
-    comentarios_total = EventoComentario.objects.filter(evento=evento).count()
-    fotos = evento.fotos.order_by('-fecha_subida')[:12]
-    inscritos_count = Inscripcion.objects.filter(evento=evento).count()
-    user_likes = set()
-    if request.user.is_authenticated:
-        user_likes = set(
-            EventoLikeComentario.objects.filter(usuario=request.user, comentario__evento=evento)
-            .values_list('comentario_id', flat=True)
-        )
     return render(request, 'agenda/evento_detalle.html', {
         'evento': evento,
-        'inscrito': inscrito,
+        'repeticiones': repeticiones,
+        'q_ocurrencia': f'?ocurrencia={evento.ocurrencia_clave}' if evento.ocurrencia else '',
+        'inscrito': visitante.inscrito,
+        'en_espera': visitante.en_espera,
+        'posicion_espera': (
+            inscripciones.posicion_espera(evento.pk, request.user, evento.ocurrencia_pk) if visitante.en_espera else None
+        ),
+        'lleno': evento.cupo is not None and evento.inscritos_count >= evento.cupo,
         'evento_pasado': evento_pasado,
-        'avg_rating': round(float(avg_rating), 2),
-        'user_rating': user_rating or 0,
-        'comentarios': comentarios,
-        'comentarios_total': comentarios_total,
-        'user_likes': user_likes,
-        'fotos': fotos,
-        'inscritos_count': inscritos_count,
+        # Datos de rating y comentarios (contadores desnormalizados en Evento)
+        'avg_rating': evento.rating_promedio,
+        'user_rating': visitante.user_rating or 0,
+        'comentarios': comentarios_ordenados(snap),
+        'comentarios_total': evento.comentarios_count,
+        'user_likes': visitante.user_likes,
+        'fotos': snap.fotos,
+        'fotos_siguiente': snap.fotos_siguiente,
+        'fotos_total': snap.fotos_total,
+        'inscritos_count': evento.inscritos_count,
         'now': timezone.now(),
     })
 
 
+def evento_fotos_json(request, pk):
+    """Página de la galería en JSON para el scroll infinito: ?antes=<cursor>&limite=24"""
+    if not Evento.objects.filter(pk=pk, publicado=True).exists() and not _is_staff(request.user):
+        return JsonResponse({'ok': False, 'error': _('El evento no está disponible.')}, status=404)
+    try:
+        limite = max(1, min(int(request.GET.get('limite', FOTOS_POR_PAGINA)), 60))
+    except ValueError:
+        limite = FOTOS_POR_PAGINA
+    fotos, siguiente = pagina_fotos(pk, _parse_cursor(request.GET.get('antes')), limite)
+    return JsonResponse({'ok': True, 'fotos': [foto_json(f) for f in fotos], 'siguiente': siguiente})
+
+
 @login_required
 def calificar_evento(request, pk):
     evento = get_object_or_404(Evento, pk=pk)
@@ -787,10 +1133,16 @@ def calificar_evento(request, pk):
     
     # Si estrellas = 0, eliminar calificación (descalificar)
     if estrellas == 0:
-        EventoCalificacion.objects.filter(evento=evento, usuario=request.user).delete()
+        with transaction.atomic():
+            previa = (EventoCalificacion.objects.select_for_update()
+                      .filter(evento=evento, usuario=request.user)
+                      .values_list('estrellas', flat=True).first())
+            if previa is not None:
+                EventoCalificacion.objects.filter(evento=evento, usuario=request.user).delete()
+                contadores.ajustar(evento.pk, ratings_count=-1, ratings_sum=-previa)
         if request.headers.get('x-requested-with') == 'XMLHttpRequest':
-            avg = evento.calificaciones.aggregate(avg=Avg('estrellas'))['avg'] or 0
-            return JsonResponse({'ok': True, 'avg_rating': round(float(avg), 2), 'estrellas': 0})
+            evento.refresh_from_db(fields=['ratings_count', 'ratings_sum'])
+            return JsonResponse({'ok': True, 'avg_rating': evento.rating_promedio, 'estrellas': 0})
         messages.info(request, _("Calificación eliminada."))
         return redirect('agenda_evento_detalle', pk=pk)
     
@@ -801,15 +1153,23 @@ def calificar_evento(request, pk):
         messages.error(request, _("Calificación inválida (1 a 5)."))
         return redirect('agenda_evento_detalle', pk=pk)
     
-    # Guardar o actualizar calificación
-    obj, _ = EventoCalificacion.objects.update_or_create(
-        evento=evento, usuario=request.user, defaults={'estrellas': estrellas}
-    )
+    # Guardar o actualizar calificación y ajustar suma/cantidad en la misma transacción
+    with transaction.atomic():
+        previa = (EventoCalificacion.objects.select_for_update()
+                  .filter(evento=evento, usuario=request.user)
+                  .values_list('estrellas', flat=True).first())
+        EventoCalificacion.objects.update_or_create(
+            evento=evento, usuario=request.user, defaults={'estrellas': estrellas}
+        )
+        if previa is None:
+            contadores.ajustar(evento.pk, ratings_count=1, ratings_sum=estrellas)
+        elif previa != estrellas:
+            contadores.ajustar(evento.pk, ratings_sum=estrellas - previa)
     
     # Responder AJAX con promedio actualizado
     if request.headers.get('x-requested-with') == 'XMLHttpRequest':
-        avg = evento.calificaciones.aggregate(avg=Avg('estrellas'))['avg'] or 0
-        return JsonResponse({'ok': True, 'avg_rating': round(float(avg), 2), 'estrellas': estrellas})
+        evento.refresh_from_db(fields=['ratings_count', 'ratings_sum'])
+        return JsonResponse({'ok': True, 'avg_rating': evento.rating_promedio, 'estrellas': estrellas})
     messages.success(request, _("¡Gracias por calificar!"))
     return redirect('agenda_evento_detalle', pk=pk)
 
@@ -838,6 +1198,10 @@ def comentar_evento(request, pk):
             return JsonResponse({'ok': False, 'error': _('El comentario es muy corto.')}, status=400)
         messages.error(request, _("El comentario es muy corto."))
         return redirect('agenda_evento_detalle', pk=pk)
+    # Prefiltro anti-spam (flood y duplicados) antes de moderar o escribir en BD
+    rechazo = rechazo_flood(request, texto, reverse('agenda_evento_detalle', args=[pk]))
+    if rechazo:
+        return rechazo
     # Moderación básica reutilizando detector local
     try:
         from apps.foro.moderation import moderate_text
@@ -856,7 +1220,10 @@ def comentar_evento(request, pk):
                 return redirect('agenda_evento_detalle', pk=pk)
         except Exception:
             pass
-    comentario = EventoComentario.objects.create(evento=evento, usuario=request.user, texto=texto)
+    with transaction.atomic():
+        comentario = EventoComentario.objects.create(evento=evento, usuario=request.user, texto=texto)
+        contadores.ajustar(evento.pk, comentarios_count=1)
+    registrar(request.user, texto)
     
     # Notificar a los administradores del evento cuando alguien comenta
     staff_usuarios = CustomUser.objects.filter(is_active=True, is_staff=True).exclude(pk=request.user.pk)
@@ -874,7 +1241,7 @@ def comentar_evento(request, pk):
     # Responder AJAX con el HTML del comentario para prepend en el feed
     if request.headers.get('x-requested-with') == 'XMLHttpRequest':
         html = render_to_string('agenda/_comentario_item.html', {'c': comentario, 'user_likes': set()}, request=request)
-        total = EventoComentario.objects.filter(evento=evento).count()
+        total = Evento.objects.values_list('comentarios_count', flat=True).get(pk=evento.pk)
         return JsonResponse({'ok': True, 'html': html, 'total': total})
     messages.success(request, _("Comentario publicado."))
     return redirect('agenda_evento_detalle', pk=pk)
@@ -907,6 +1274,8 @@ def like_evento_comentario(request, pk):
                 url_comentario=url_completa
             )
     likes_count = EventoLikeComentario.objects.filter(comentario=comentario).count()
+    # El conteo va en su propia clave: el snapshot del detalle sigue valiendo
+    guardar_likes(comentario.pk, likes_count)
     if request.headers.get('x-requested-with') == 'XMLHttpRequest':
         return JsonResponse({'liked': liked, 'likes_count': likes_count, 'comentario_id': comentario.pk})
     return redirect('agenda_evento_detalle', pk=comentario.evento_id)
@@ -922,6 +1291,9 @@ def responder_evento_comentario(request, pk):
             return JsonResponse({'ok': False, 'error': _("El texto no puede estar vacío.")}, status=400)
         messages.error(request, _("El texto no puede estar vacío."))
     else:
+        rechazo = rechazo_flood(request, texto, reverse('agenda_evento_detalle', args=[parent.evento_id]))
+        if rechazo:
+            return rechazo
         try:
             from apps.foro.moderation import moderate_text
             res = moderate_text(texto)
@@ -939,7 +1311,10 @@ def responder_evento_comentario(request, pk):
                     return redirect('agenda_evento_detalle', pk=parent.evento_id)
             except Exception:
                 pass
-        reply = EventoComentario.objects.create(evento=parent.evento, usuario=request.user, texto=texto, parent=parent)
+        with transaction.atomic():
+            reply = EventoComentario.objects.create(evento=parent.evento, usuario=request.user, texto=texto, parent=parent)
+            contadores.ajustar(parent.evento_id, comentarios_count=1)
+        registrar(request.user, texto)
         
         # Enviar notificación por email al autor del comentario padre
         if parent.usuario != request.user:
@@ -953,7 +1328,7 @@ def responder_evento_comentario(request, pk):
         
         if request.headers.get('x-requested-with') == 'XMLHttpRequest':
             html = render_to_string('agenda/_comentario_item.html', {'c': reply, 'user_likes': set()}, request=request)
-            total = EventoComentario.objects.filter(evento=parent.evento).count()
+            total = Evento.objects.values_list('comentarios_count', flat=True).get(pk=parent.evento_id)
             return JsonResponse({'ok': True, 'html': html, 'parent_id': parent.pk, 'total': total})
         messages.success(request, _("Respuesta publicada."))
     return redirect('agenda_evento_detalle', pk=parent.evento_id)
@@ -975,6 +1350,11 @@ def editar_evento_comentario(request, pk):
             return JsonResponse({'ok': False, 'error': _("El texto no puede estar vacío.")}, status=400)
         messages.error(request, _("El texto no puede estar vacío."))
     else:
+        # Editar sin cambiar el texto no cuenta como nueva publicación
+        cambio = texto != comentario.texto
+        rechazo = rechazo_flood(request, texto, reverse('agenda_evento_detalle', args=[comentario.evento_id])) if cambio else None
+        if rechazo:
+            return rechazo
         try:
             from apps.foro.moderation import moderate_text
             res = moderate_text(texto)
@@ -994,6 +1374,8 @@ def editar_evento_comentario(request, pk):
                 pass
         comentario.texto = texto
         comentario.save()
+        if cambio:
+            registrar(request.user, texto)
         if request.headers.get('x-requested-with') == 'XMLHttpRequest':
             return JsonResponse({'ok': True, 'comentario_id': comentario.pk, 'texto': comentario.texto})
         messages.success(request, _("Comentario actualizado."))
@@ -1014,9 +1396,12 @@ def eliminar_evento_comentario(request, pk):
         return HttpResponseForbidden()
     evento_pk = comentario.evento_id
     parent_id = getattr(comentario.parent, 'pk', None)
-    comentario.delete()
+    with transaction.atomic():
+        # El borrado arrastra respuestas anidadas: recalcular en lugar de restar 1
+        comentario.delete()
+        contadores.recalcular([evento_pk])
     if request.headers.get('x-requested-with') == 'XMLHttpRequest':
-        total = EventoComentario.objects.filter(evento_id=evento_pk).count()
+        total = Evento.objects.values_list('comentarios_count', flat=True).get(pk=evento_pk)
         # Si es respuesta, recalcular cantidad de respuestas del padre
         replies_count = None
         if parent_id:
@@ -1026,24 +1411,61 @@ def eliminar_evento_comentario(request, pk):
     return redirect('agenda_evento_detalle', pk=evento_pk)
 
 
+# ============ VISTAS ADMIN PERSONALIZADAS ============
+def _tabla_admin(request, clave, template, nombre):
+    """
+    Lista del panel paginada por keyset (ver tablas.py). Con ?formato=json responde
+    la página en JSON (400 si algún parámetro no es válido); si no, la renderiza.
+    """
+    tabla = tablas.TABLAS[clave]
+    como_json = request.GET.get('formato') == 'json'
+    try:
+        p = tablas.pagina(tabla, request)
+    except ValueError:
+        if como_json:
+            return JsonResponse({'ok': False, 'error': _('Parámetros de la lista inválidos.')}, status=400)
+        messages.warning(request, _('Parámetros de la lista inválidos.'))
+        p = tablas.pagina(tabla, request, params={})
+    if como_json:
+        return JsonResponse(tablas.respuesta_json(tabla, p))
+    params = request.GET.copy()
+    params.pop('antes', None)
+    params.pop('formato', None)
+    return render(request, template, {
+        nombre: p.filas,
+        'pagina': p,
+        # Filtros y orden actuales para armar los enlaces de paginación
+        'params_lista': params.urlencode(),
+    })
+
+
 @user_passes_test(_is_staff)
-def admin_evento_fotos(request, pk):
-    evento = get_object_or_404(Evento, pk=pk)
-    if request.method == 'POST':
-        # Subida de múltiples imágenes
-        for f in request.FILES.getlist('fotos'):
-            EventoFoto.objects.create(evento=evento, imagen=f, subido_por=request.user)
-        messages.success(request, _("Fotos subidas."))
-        return redirect('admin_evento_fotos', pk=pk)
-    fotos = evento.fotos.order_by('-fecha_subida')
-    return render(request, 'agenda/admin_evento_fotos.html', {'evento': evento, 'fotos': fotos})
+def admin_exportar(request, tipo):
+    """
+    Descarga en streaming (ver exportar.py): admin/exportar/<inscripciones|usuarios|calificaciones>/
+    ?formato=csv|xlsx y, para inscripciones y calificaciones, &evento=<pk>.
+    """
+    exportacion = exportar.EXPORTACIONES.get(tipo)
+    formato = request.GET.get('formato', 'csv')
+    filtros = {}
+    try:
+        if exportacion is None or formato not in exportar.FORMATOS:
+            raise ValueError(tipo)
+        if request.GET.get('evento'):
+            filtros['evento'] = int(request.GET['evento'])
+    except ValueError:
+        return JsonResponse({'ok': False, 'error': _('Exportación no válida.')}, status=400)
+    response = StreamingHttpResponse(
+        exportar.stream(exportacion, formato, filtros), content_type=exportar.FORMATOS[formato],
+    )
+    response['Content-Disposition'] = f'attachment; filename="{exportar.nombre_archivo(exportacion, formato, filtros)}"'
+    response['Cache-Control'] = 'no-store'
+    return response
 
 
-# ============ VISTAS ADMIN PERSONALIZADAS ============
 @user_passes_test(_is_staff)
 def admin_usuarios_list(request):
-    usuarios = CustomUser.objects.order_by('-date_joined')
-    return render(request, 'agenda/admin_usuarios_list.html', {'usuarios': usuarios})
+    return _tabla_admin(request, 'usuarios', 'agenda/admin_usuarios_list.html', 'usuarios')
 
 
 @user_passes_test(_is_staff)
@@ -1064,36 +1486,89 @@ def admin_usuario_delete(request, pk):
 
 @user_passes_test(_is_staff)
 def admin_inscripciones_list(request):
-    inscripciones = Inscripcion.objects.select_related('usuario', 'evento').order_by('-fecha_inscripcion')
-    return render(request, 'agenda/admin_inscripciones_list.html', {'inscripciones': inscripciones})
+    return _tabla_admin(request, 'inscripciones', 'agenda/admin_inscripciones_list.html', 'inscripciones')
 
 
 @user_passes_test(_is_staff)
 def admin_historias_list(request):
-    from apps.foro.models import Historia
-    historias = Historia.objects.select_related('usuario').order_by('-fecha')
-    return render(request, 'agenda/admin_historias_list.html', {'historias': historias})
+    return _tabla_admin(request, 'historias', 'agenda/admin_historias_list.html', 'historias')
 
 
 @user_passes_test(_is_staff)
 def admin_comentarios_list(request):
-    from apps.foro.models import Comentario as ForoComentario
-    comentarios_foro = ForoComentario.objects.select_related('usuario', 'historia').order_by('-fecha')
-    comentarios_eventos = EventoComentario.objects.select_related('usuario', 'evento').order_by('-fecha')
+    """
+    Bandeja de moderación: comentarios del foro y de eventos mezclados por fecha (ver bandeja.py).
+    ?estado=marcados|ocultos|visibles&fuente=foro|evento&autor=<prefijo>&antes=<cursor>; &formato=json
+    """
+    como_json = request.GET.get('formato') == 'json'
+    estado = request.GET.get('estado') or None
+    fuente = request.GET.get('fuente') or None
+    autor = (request.GET.get('autor') or '').strip()
+    try:
+        if estado not in (None, *bandeja.ESTADOS) or fuente not in (None, *bandeja.FUENTES):
+            raise ValueError('filtro')
+        limite = int(request.GET.get('limite') or bandeja.POR_PAGINA)
+        if not (1 <= limite <= bandeja.MAX_POR_PAGINA):
+            raise ValueError('limite')
+        cursor = None
+        if request.GET.get('antes'):
+            cursor = bandeja.parse_cursor(request.GET['antes'])
+            if cursor is None:
+                raise ValueError('antes')
+    except ValueError:
+        if como_json:
+            return JsonResponse({'ok': False, 'error': _('Parámetros de la bandeja inválidos.')}, status=400)
+        messages.warning(request, _('Parámetros de la bandeja inválidos.'))
+        return redirect('admin_comentarios_list')
+
+    items, siguiente = bandeja.pagina(cursor, limite, [fuente] if fuente else None, estado, autor)
+    if como_json:
+        return JsonResponse({'ok': True, 'comentarios': [i.json() for i in items], 'siguiente': siguiente})
+    params = request.GET.copy()
+    params.pop('antes', None)
     return render(request, 'agenda/admin_comentarios_list.html', {
-        'comentarios_foro': comentarios_foro,
-        'comentarios_eventos': comentarios_eventos,
+        'comentarios': [i.json() for i in items],
+        'siguiente': siguiente,
+        'paginado': cursor is not None,
+        'estado': estado or '',
+        'fuente': fuente or '',
+        'autor': autor,
+        'params_lista': params.urlencode(),
     })
 
 
+@user_passes_test(_is_staff)
+@require_POST
+def admin_comentarios_accion(request):
+    """Acción masiva sobre la bandeja: accion=ocultar|mostrar|eliminar, ids=foro:12&ids=evento:5..."""
+    accion = request.POST.get('accion')
+    ids = request.POST.getlist('ids')
+    es_ajax = request.headers.get('x-requested-with') == 'XMLHttpRequest'
+    if accion not in bandeja.ACCIONES or not ids:
+        if es_ajax:
+            return JsonResponse({'ok': False, 'error': _('Selecciona comentarios y una acción.')}, status=400)
+        messages.warning(request, _('Selecciona comentarios y una acción.'))
+    else:
+        total = bandeja.aplicar(accion, ids)
+        if es_ajax:
+            return JsonResponse({'ok': True, 'accion': accion, 'total': total})
+        mensajes = {
+            'ocultar': _('%(n)s comentario(s) ocultado(s).'),
+            'mostrar': _('%(n)s comentario(s) visible(s) de nuevo.'),
+            'eliminar': _('%(n)s comentario(s) eliminado(s).'),
+        }
+        messages.success(request, mensajes[accion] % {'n': total})
+    # Volver a la misma página y filtros de la bandeja
+    volver = request.POST.get('volver', '')
+    return redirect(reverse('admin_comentarios_list') + (f'?{volver}' if volver else ''))
+
+
 @user_passes_test(_is_staff)
 def admin_notificaciones_list(request):
     # Solo notificaciones del admin actual
-    notificaciones = Notificacion.objects.filter(usuario=request.user).order_by('-fecha')
-    return render(request, 'agenda/admin_notificaciones_list.html', {'notificaciones': notificaciones})
+    return _tabla_admin(request, 'notificaciones', 'agenda/admin_notificaciones_list.html', 'notificaciones')
 
 
 @user_passes_test(_is_staff)
 def admin_calificaciones_list(request):
-    calificaciones = EventoCalificacion.objects.select_related('usuario', 'evento').order_by('-fecha')
-    return render(request, 'agenda/admin_calificaciones_list.html', {'calificaciones': calificaciones})
+    return _tabla_admin(request, 'calificaciones', 'agenda/admin_calificaciones_list.html', 'calificaciones')
@@ -0,0 +1,194 @@
+"""
+Prefiltro anti-spam previo a la moderación de comentarios.
+
+Dos comprobaciones baratas, ambas sobre el cache de Django (sin tocar la BD):
+  - Ritmo de publicación por usuario (ventana deslizante de dos contadores).
+  - Duplicados y casi-duplicados: hash exacto del texto normalizado y un
+    simhash de 64 bits indexado en 4 bandas de 16 bits (si dos textos están a
+    distancia de hamming <= 3, al menos una banda coincide).
+
+Configuración en settings (todas opcionales):
+  ANTISPAM_ENABLED, ANTISPAM_RATE_LIMIT, ANTISPAM_RATE_WINDOW,
+  ANTISPAM_DUP_WINDOW, ANTISPAM_DUP_MAX_USUARIO, ANTISPAM_DUP_MAX_GLOBAL,
+  ANTISPAM_HAMMING, ANTISPAM_MIN_LEN
+"""
+from __future__ import annotations
+
+import hashlib
+import re
+import time
+from typing import List, Tuple
+
+from django.conf import settings
+from django.contrib import messages
+from django.core.cache import cache
+from django.http import JsonResponse
+from django.shortcuts import redirect
+from django.utils.translation import gettext as _
+
+from .moderation import ModerationResult
+from .profanity import _normalize, _squeeze_repeats
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+_BANDAS = 4
+_BITS_BANDA = 16
+_MAX_SHINGLES = 256
+_MAX_POR_BANDA = 32
+
+
+def _cfg(nombre: str, default):
+    return getattr(settings, nombre, default)
+
+
+def _hash64(valor: str) -> int:
+    return int.from_bytes(hashlib.blake2b(valor.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def _simhash(tokens: List[str]) -> int:
+    """Simhash de 64 bits sobre bigramas de palabras (acotado a los primeros _MAX_SHINGLES)."""
+    shingles = ([f"{a} {b}" for a, b in zip(tokens, tokens[1:])] or tokens)[:_MAX_SHINGLES]
+    if not shingles:
+        return 0
+    # Transponer las firmas en binario y contar unos por columna (bit 63 primero)
+    columnas = zip(*(format(_hash64(sh), "064b") for sh in shingles))
+    mitad = len(shingles) / 2
+    firma = 0
+    for col in columnas:
+        firma = (firma << 1) | (col.count("1") > mitad)
+    return firma
+
+
+def fingerprint(texto: str) -> Tuple[str, List[str]]:
+    """Devuelve (hash exacto del texto canónico, tokens). Normaliza como el filtro de profanidad."""
+    tokens = _WORD_RE.findall(_squeeze_repeats(_normalize(texto), keep=2))
+    canon = " ".join(tokens)
+    return hashlib.blake2b(canon.encode("utf-8"), digest_size=16).hexdigest(), tokens
+
+
+def _incr(clave: str, timeout: int) -> int:
+    """Incremento atómico de un contador del cache (lo crea en 0 si no existe)."""
+    cache.add(clave, 0, timeout)
+    try:
+        return cache.incr(clave)
+    except ValueError:  # expiró entre add e incr
+        cache.set(clave, 1, timeout)
+        return 1
+
+
+def _clave_ritmo(uid, ahora: float, atras: int = 0) -> str:
+    ventana = int(_cfg("ANTISPAM_RATE_WINDOW", 60))
+    return f"antispam:rate:{uid}:{int(ahora // ventana) - atras}"
+
+
+def _ritmo_excedido(uid, ahora: float) -> bool:
+    ventana = int(_cfg("ANTISPAM_RATE_WINDOW", 60))
+    limite = int(_cfg("ANTISPAM_RATE_LIMIT", 5))
+    k_actual, k_previo = _clave_ritmo(uid, ahora), _clave_ritmo(uid, ahora, atras=1)
+    conteos = cache.get_many([k_actual, k_previo])
+    # Ventana deslizante aproximada: el bucket anterior pesa según lo que queda de él,
+    # y se cuenta la publicación que se está comprobando
+    estimado = conteos.get(k_previo, 0) * (1 - (ahora % ventana) / ventana) + conteos.get(k_actual, 0) + 1
+    return estimado > limite
+
+
+def _claves_bandas(firma: int) -> List[str]:
+    mascara = (1 << _BITS_BANDA) - 1
+    return [f"antispam:sh:{i}:{(firma >> (i * _BITS_BANDA)) & mascara}" for i in range(_BANDAS)]
+
+
+def _entradas_bandas(claves: List[str]) -> set:
+    """Entradas (firma, uid, ts) de las bandas: cada banda es un anillo de _MAX_POR_BANDA posiciones."""
+    cabezas = cache.get_many([f"{clave}:n" for clave in claves])
+    posiciones = []
+    for clave in claves:
+        n = cabezas.get(f"{clave}:n", 0)
+        posiciones.extend(f"{clave}:{j % _MAX_POR_BANDA}" for j in range(max(0, n - _MAX_POR_BANDA), n))
+    return set(cache.get_many(posiciones).values()) if posiciones else set()
+
+
+def _es_corto(tokens: List[str]) -> bool:
+    # Textos cortos ("gracias", "me encantó") se repiten legítimamente
+    return len(" ".join(tokens)) < int(_cfg("ANTISPAM_MIN_LEN", 20))
+
+
+def check_flood(usuario, texto: str) -> ModerationResult:
+    """Comprueba ritmo y duplicados sin escribir nada; registrar() anota el texto ya publicado."""
+    if not _cfg("ANTISPAM_ENABLED", True):
+        return ModerationResult(True)
+    uid = getattr(usuario, "pk", None) or 0
+    ahora = time.time()
+
+    if _ritmo_excedido(uid, ahora):
+        return ModerationResult(False, reason="flood")
+
+    exacto, tokens = fingerprint(texto)
+    if _es_corto(tokens):
+        return ModerationResult(True)
+
+    ventana = int(_cfg("ANTISPAM_DUP_WINDOW", 3600))
+    max_usuario = int(_cfg("ANTISPAM_DUP_MAX_USUARIO", 2))
+    max_global = int(_cfg("ANTISPAM_DUP_MAX_GLOBAL", 5))
+
+    # 1) Hash exacto: una sola lectura multiple
+    k_user, k_global = f"antispam:ex:{uid}:{exacto}", f"antispam:ex:{exacto}"
+    conteos = cache.get_many([k_user, k_global])
+    if conteos.get(k_user, 0) >= max_usuario or conteos.get(k_global, 0) >= max_global:
+        return ModerationResult(False, reason="duplicado", details={"tipo": "exacto"})
+
+    # 2) Casi-duplicados por simhash
+    firma = _simhash(tokens)
+    umbral = int(_cfg("ANTISPAM_HAMMING", 3))
+    vistos = [
+        (sh, autor) for sh, autor, ts in _entradas_bandas(_claves_bandas(firma))
+        if ts >= ahora - ventana and bin(sh ^ firma).count("1") <= umbral
+    ]
+    propios = sum(1 for _sh, autor in vistos if autor == uid)
+    if propios >= max_usuario or len(vistos) >= max_global:
+        return ModerationResult(False, reason="duplicado", details={"tipo": "similar"})
+    return ModerationResult(True)
+
+
+def registrar(usuario, texto: str) -> None:
+    """Anota un texto ya guardado: cuenta para el ritmo y entra en el índice de duplicados.
+
+    Solo usa add/incr y escrituras en posiciones reservadas con incr, así que dos
+    publicaciones simultáneas no se pisan.
+    """
+    if not _cfg("ANTISPAM_ENABLED", True):
+        return
+    uid = getattr(usuario, "pk", None) or 0
+    ahora = time.time()
+    _incr(_clave_ritmo(uid, ahora), int(_cfg("ANTISPAM_RATE_WINDOW", 60)) * 2)
+
+    exacto, tokens = fingerprint(texto)
+    if _es_corto(tokens):
+        return
+    ventana = int(_cfg("ANTISPAM_DUP_WINDOW", 3600))
+    for clave in (f"antispam:ex:{uid}:{exacto}", f"antispam:ex:{exacto}"):
+        _incr(clave, ventana)
+    firma = _simhash(tokens)
+    entrada = (firma, uid, ahora)
+    for clave in _claves_bandas(firma):
+        n = _incr(f"{clave}:n", ventana)
+        cache.set(f"{clave}:{(n - 1) % _MAX_POR_BANDA}", entrada, ventana)
+
+
+def rechazo_flood(request, texto: str, destino: str):
+    """Respuesta 4xx si el texto no pasa check_flood (JSON en AJAX, redirect a destino si no); None si pasa."""
+    flood = check_flood(request.user, texto)
+    if flood.allowed:
+        return None
+    if request.headers.get("x-requested-with") == "XMLHttpRequest":
+        return JsonResponse({"ok": False, "error": mensaje_rechazo(flood)}, status=status_rechazo(flood))
+    messages.error(request, mensaje_rechazo(flood))
+    return redirect(destino)
+
+
+def mensaje_rechazo(resultado: ModerationResult) -> str:
+    if resultado.reason == "flood":
+        return _("Estás publicando demasiado rápido. Espera un momento e inténtalo de nuevo.")
+    return _("Ya publicaste un comentario igual o muy parecido.")
+
+
+def status_rechazo(resultado: ModerationResult) -> int:
+    return 429 if resultado.reason == "flood" else 400
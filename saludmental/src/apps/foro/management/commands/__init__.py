@@ -0,0 +1 @@
+# Management commands for foro app
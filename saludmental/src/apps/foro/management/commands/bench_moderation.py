@@ -0,0 +1,138 @@
+"""
+Comando de Django para medir el coste y la precisión de la moderación
+Usar: python manage.py bench_moderation [--baseline bench.json] [--guardar]
+                                        [--max-regresion 1.5] [--tiempo 0.2] [--rondas 3]
+
+Mide ops/s y p99 de moderate_text, contains_banned_words, censor_text y scan_text por
+backend, categoría (limpio, ofuscado, adversario) y tamaño (50 B a 50 KB).
+Con --baseline compara contra una ejecución guardada y falla si el tiempo o la
+precisión empeoran más allá del umbral.
+"""
+
+import json
+import time
+from contextlib import nullcontext
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from apps.foro import moderation
+from apps.foro.moderation_corpus import build_corpus
+from apps.foro.profanity import censor_text, contains_banned_words, scan_text
+
+
+def _p99(tiempos):
+    orden = sorted(tiempos)
+    return orden[min(len(orden) - 1, int(len(orden) * 0.99))]
+
+
+class Command(BaseCommand):
+    help = 'Benchmark y corpus de regresión para la moderación de texto'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--baseline', type=str, help='Archivo JSON con resultados de referencia')
+        parser.add_argument('--guardar', action='store_true', help='Guarda los resultados en --baseline')
+        parser.add_argument(
+            '--max-regresion', type=float, default=1.5,
+            help='Factor máximo permitido sobre el p99 de referencia (por defecto 1.5)',
+        )
+        parser.add_argument(
+            '--max-ms', type=float, default=1000.0,
+            help='Tope absoluto por llamada en ms; detecta backtracking catastrófico',
+        )
+        parser.add_argument('--tiempo', type=float, default=0.2, help='Segundos mínimos por medición')
+        parser.add_argument('--rondas', type=int, default=3, help='Rondas por medición (se toma la mejor)')
+        parser.add_argument('--seed', type=int, default=1234)
+
+    def handle(self, *args, **options):
+        corpus = build_corpus(seed=options['seed'])
+        # Se mide moderate_text, la función que llaman las vistas, con cada backend en MODERATION_BACKEND
+        backends = ['local']
+        if getattr(settings, 'AZURE_CONTENT_SAFETY_ENDPOINT', '') and getattr(settings, 'AZURE_CONTENT_SAFETY_KEY', ''):
+            backends.append('azure')
+        else:
+            self.stdout.write('Azure no configurado: solo se mide el backend local.')
+
+        # nombre -> (función, backend o None)
+        funciones = {
+            'contains_banned_words': (contains_banned_words, None),
+            'censor_text': (censor_text, None),
+            'scan_text': (scan_text, None),
+        }
+        for nombre in backends:
+            funciones[f'moderate_text[{nombre}]'] = (moderation.moderate_text, nombre)
+
+        resultados = {'tiempos': {}, 'precision': {}}
+        fallos = []
+
+        # Precisión: veredicto contra la etiqueta esperada del corpus
+        for nombre in backends:
+            with override_settings(MODERATION_BACKEND=nombre):
+                aciertos = sum(1 for m in corpus if (not moderation.moderate_text(m.texto).allowed) == m.esperado)
+            resultados['precision'][nombre] = aciertos / len(corpus)
+            self.stdout.write(f'Precisión {nombre}: {aciertos}/{len(corpus)} ({aciertos / len(corpus):.1%})')
+
+        grupos = {}
+        for m in corpus:
+            grupos.setdefault((m.categoria, m.tamano), []).append(m.texto)
+
+        self.stdout.write(f"\n{'función':<28}{'categoría':<12}{'tamaño':>8}{'ops/s':>12}{'p99 ms':>10}")
+        for fnombre, (fn, backend) in funciones.items():
+            for (categoria, tamano), textos in sorted(grupos.items()):
+                # Varias rondas y nos quedamos con la mejor, como timeit, para filtrar ruido del sistema
+                ops = p99_ms = peor_ms = None
+                for _ronda in range(options['rondas']):
+                    with override_settings(MODERATION_BACKEND=backend) if backend else nullcontext():
+                        tiempos = self._medir(fn, textos, options['tiempo'])
+                    r_ops = len(tiempos) / sum(tiempos)
+                    r_p99 = _p99(tiempos) * 1000
+                    ops = r_ops if ops is None else max(ops, r_ops)
+                    p99_ms = r_p99 if p99_ms is None else min(p99_ms, r_p99)
+                    peor_ms = max(peor_ms or 0, max(tiempos) * 1000)
+                clave = f'{fnombre}|{categoria}|{tamano}'
+                resultados['tiempos'][clave] = {'ops': ops, 'p99_ms': p99_ms}
+                self.stdout.write(f'{fnombre:<28}{categoria:<12}{tamano:>8}{ops:>12.0f}{p99_ms:>10.3f}')
+                if peor_ms > options['max_ms']:
+                    fallos.append(f'{clave}: {peor_ms:.1f} ms supera el tope de {options["max_ms"]} ms')
+
+        baseline_path = Path(options['baseline']) if options.get('baseline') else None
+        if baseline_path and options['guardar']:
+            baseline_path.write_text(json.dumps(resultados, indent=2), encoding='utf-8')
+            self.stdout.write(self.style.SUCCESS(f'\nResultados guardados en {baseline_path}'))
+        elif baseline_path:
+            if not baseline_path.exists():
+                raise CommandError(f'No existe el baseline {baseline_path}; ejecútalo antes con --guardar')
+            fallos += self._comparar(json.loads(baseline_path.read_text(encoding='utf-8')), resultados, options)
+
+        if fallos:
+            for f in fallos:
+                self.stdout.write(self.style.ERROR(f'✗ {f}'))
+            raise CommandError(f'{len(fallos)} regresión(es) de moderación detectada(s)')
+        self.stdout.write(self.style.SUCCESS('\nSin regresiones.'))
+
+    def _medir(self, fn, textos, segundos):
+        tiempos = []
+        inicio = time.perf_counter()
+        while time.perf_counter() - inicio < segundos or not tiempos:
+            for texto in textos:
+                t0 = time.perf_counter()
+                fn(texto)
+                tiempos.append(time.perf_counter() - t0)
+        return tiempos
+
+    def _comparar(self, base, actual, options):
+        fallos = []
+        for backend, precision in base.get('precision', {}).items():
+            nueva = actual['precision'].get(backend)
+            if nueva is not None and nueva < precision:
+                fallos.append(f'precisión {backend}: {nueva:.1%} < {precision:.1%}')
+        for clave, ref in base.get('tiempos', {}).items():
+            nuevo = actual['tiempos'].get(clave)
+            if nuevo and ref['p99_ms'] > 0 and nuevo['p99_ms'] > ref['p99_ms'] * options['max_regresion']:
+                fallos.append(
+                    f"{clave}: p99 {nuevo['p99_ms']:.3f} ms vs {ref['p99_ms']:.3f} ms "
+                    f"(x{nuevo['p99_ms'] / ref['p99_ms']:.2f})"
+                )
+        return fallos
@@ -0,0 +1,167 @@
+"""
+Comando de Django para volver a moderar el contenido existente
+Usar: python manage.py rescan_moderation [--modelos historia comentario evento_comentario]
+                                         [--workers 4] [--chunk 500] [--ocultar]
+                                         [--checkpoint rescan.json] [--reiniciar]
+
+Recorre las filas por bloques de clave primaria con .iterator(), reparte la
+moderación en un pool de procesos y escribe los resultados con UPDATE masivos.
+El progreso se guarda en un archivo de checkpoint para poder reanudar: el
+último pk del modelo en curso y los modelos ya terminados. Al completar el
+reescaneo el checkpoint se borra, así que la siguiente ejecución (p. ej. tras
+cambiar la lista de palabras o el umbral de Azure) vuelve a revisar todo.
+"""
+
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, transaction
+
+from apps.foro.signals import contenido_oculto
+from config.procesos import init_worker
+
+
+# modelo -> (app_label.Model, campos de texto a moderar)
+OBJETIVOS = {
+    'historia': ('foro.Historia', ('titulo', 'contenido')),
+    'comentario': ('foro.Comentario', ('texto',)),
+    'evento_comentario': ('agenda.EventoComentario', ('texto',)),
+}
+
+
+def _moderar_bloque(filas):
+    """Recibe [(pk, texto), ...] y devuelve los pk que no pasan la moderación."""
+    from apps.foro.moderation import moderate_text
+    marcados = []
+    for pk, texto in filas:
+        if not moderate_text(texto).allowed:
+            marcados.append(pk)
+    return marcados
+
+
+class Command(BaseCommand):
+    help = 'Vuelve a moderar historias y comentarios existentes en paralelo y marca/oculta lo que no pase'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--modelos', nargs='+', choices=list(OBJETIVOS), default=list(OBJETIVOS),
+            help='Modelos a reescanear (por defecto todos)',
+        )
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 2, help='Procesos del pool')
+        parser.add_argument('--chunk', type=int, default=500, help='Filas por bloque')
+        parser.add_argument(
+            '--ocultar', action='store_true',
+            help='Además de marcar, ocultar al público el contenido marcado',
+        )
+        parser.add_argument(
+            '--checkpoint', type=str, default='rescan_moderation.json',
+            help='Archivo donde se guarda el último pk procesado por modelo',
+        )
+        parser.add_argument(
+            '--reiniciar', action='store_true',
+            help='Ignora el checkpoint existente y empieza desde el principio',
+        )
+
+    def handle(self, *args, **options):
+        chunk = options['chunk']
+        workers = options['workers']
+        if chunk < 1 or workers < 1:
+            raise CommandError('--chunk y --workers deben ser mayores que 0')
+
+        checkpoint_path = Path(options['checkpoint'])
+        estado = {}
+        if checkpoint_path.exists() and not options['reiniciar']:
+            try:
+                estado = json.loads(checkpoint_path.read_text(encoding='utf-8'))
+            except ValueError:
+                raise CommandError(f'Checkpoint inválido: {checkpoint_path}')
+
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_worker) as pool:
+            for nombre in options['modelos']:
+                self._reescanear(pool, nombre, estado, checkpoint_path, chunk, workers, options['ocultar'])
+
+        # Solo una ejecución interrumpida reanuda
+        checkpoint_path.unlink(missing_ok=True)
+        self.stdout.write(self.style.SUCCESS('Reescaneo completado.'))
+
+    def _reescanear(self, pool, nombre, estado, checkpoint_path, chunk, workers, ocultar):
+        label, campos = OBJETIVOS[nombre]
+        Model = apps.get_model(label)
+        if nombre in estado.get('completos', []):
+            self.stdout.write(f'→ {label}: ya completado en la ejecución interrumpida')
+            return
+        desde = int(estado.get(nombre, 0))
+        self.stdout.write(f'→ {label}: reanudando desde pk>{desde}' if desde else f'→ {label}: desde el inicio')
+
+        filas = (
+            Model.objects.filter(pk__gt=desde)
+            .order_by('pk')
+            .values_list('pk', *campos)
+            .iterator(chunk_size=chunk)
+        )
+
+        # Ventana acotada de bloques en vuelo: memoria constante y resultados en orden
+        en_vuelo = deque()
+        total = marcados_total = 0
+        inicio = time.monotonic()
+
+        def aplicar(futuro, primero, ultimo, n):
+            nonlocal total, marcados_total
+            marcados = futuro.result()
+            cambios = {'marcado': True}
+            if ocultar:
+                cambios['oculto'] = True
+            with transaction.atomic():
+                if marcados:
+                    Model.objects.filter(pk__in=marcados).update(**cambios)
+                # Lo que ya no infringe pierde la marca (no se vuelve a mostrar automáticamente)
+                (Model.objects.filter(pk__gte=primero, pk__lte=ultimo, marcado=True)
+                 .exclude(pk__in=marcados).update(marcado=False))
+                if ocultar and marcados:
+                    # El UPDATE no dispara post_save: avisar para que se ajusten contadores derivados
+                    contenido_oculto.send(sender=Model, pks=marcados)
+            total += n
+            marcados_total += len(marcados)
+            estado[nombre] = ultimo
+            self._guardar_checkpoint(checkpoint_path, estado)
+            transcurrido = time.monotonic() - inicio
+            self.stdout.write(
+                f'  {label}: {total} filas, {marcados_total} marcadas, '
+                f'{total / transcurrido if transcurrido else 0:.0f} filas/s (pk≤{ultimo})'
+            )
+
+        bloque = []
+        for fila in filas:
+            pk = fila[0]
+            texto = '\n'.join(v or '' for v in fila[1:])
+            bloque.append((pk, texto))
+            if len(bloque) >= chunk:
+                en_vuelo.append((pool.submit(_moderar_bloque, bloque), bloque[0][0], pk, len(bloque)))
+                bloque = []
+                if len(en_vuelo) >= workers * 2:
+                    aplicar(*en_vuelo.popleft())
+        if bloque:
+            en_vuelo.append((pool.submit(_moderar_bloque, bloque), bloque[0][0], bloque[-1][0], len(bloque)))
+        while en_vuelo:
+            aplicar(*en_vuelo.popleft())
+        close_old_connections()
+        estado.pop(nombre, None)
+        estado.setdefault('completos', []).append(nombre)
+        self._guardar_checkpoint(checkpoint_path, estado)
+
+        transcurrido = time.monotonic() - inicio
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ {label}: {total} filas en {transcurrido:.1f}s, {marcados_total} marcadas'
+        ))
+
+    def _guardar_checkpoint(self, path, estado):
+        # Escritura atómica para no dejar un checkpoint corrupto si el proceso muere
+        tmp = path.with_suffix(path.suffix + '.tmp')
+        tmp.write_text(json.dumps(estado), encoding='utf-8')
+        os.replace(tmp, path)
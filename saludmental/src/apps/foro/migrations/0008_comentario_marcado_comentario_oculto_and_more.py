@@ -0,0 +1,28 @@
+# Generated by Django 4.2.7 on 2026-10-18 22:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foro', '0007_likecomentario_unique'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comentario',
+            name='marcado',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='comentario',
+            name='oculto',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='historia',
+            name='marcado',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-18 22:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foro', '0008_comentario_marcado_comentario_oculto_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='historia',
+            index=models.Index(fields=['fecha', 'id'], name='foro_histor_fecha_5dcd2e_idx'),
+        ),
+    ]
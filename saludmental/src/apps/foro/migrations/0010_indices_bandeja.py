@@ -0,0 +1,21 @@
+# Generated by Django 4.2.7 on 2026-10-18 22:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foro', '0009_historia_indice_fecha'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='comentario',
+            index=models.Index(fields=['fecha', 'id'], name='foro_coment_fecha_c0b531_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='comentario',
+            index=models.Index(condition=models.Q(('marcado', True)), fields=['fecha', 'id'], name='foro_comentario_marcado_idx'),
+        ),
+    ]
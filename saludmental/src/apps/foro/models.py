@@ -7,6 +7,13 @@ class Historia(models.Model):
     contenido = models.TextField()
     fecha = models.DateTimeField(auto_now_add=True)
     oculto = models.BooleanField(default=False)
+    # Marcado por la moderación (p. ej. reescaneo con rescan_moderation)
+    marcado = models.BooleanField(default=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['fecha', 'id']),
+        ]
 
 class Comentario(models.Model):
     usuario = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
@@ -14,6 +21,15 @@ class Comentario(models.Model):
     texto = models.TextField()
     fecha = models.DateTimeField(auto_now_add=True)
     parent = models.ForeignKey('self', null=True, blank=True, related_name='respuestas', on_delete=models.CASCADE)
+    oculto = models.BooleanField(default=False)
+    marcado = models.BooleanField(default=False)
+
+    class Meta:
+        indexes = [
+            # Bandeja de moderación (apps/agenda/bandeja.py): todo y solo lo marcado
+            models.Index(fields=['fecha', 'id']),
+            models.Index(fields=['fecha', 'id'], condition=models.Q(marcado=True), name='foro_comentario_marcado_idx'),
+        ]
 
 class LikeComentario(models.Model):
     usuario = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
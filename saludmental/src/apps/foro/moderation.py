@@ -3,7 +3,7 @@ from __future__ import annotations
 from dataclasses import dataclass
 from typing import Optional, Literal, Tuple
 from django.conf import settings
-from .profanity import contains_banned_words, get_banned_matches
+from .profanity import scan_text
 import json
 from urllib import request as _urlreq
 from urllib.error import URLError, HTTPError
@@ -19,9 +19,14 @@ class ModerationResult:
 
 
 def _moderate_local(text: str) -> ModerationResult:
-    if contains_banned_words(text):
-        matches = get_banned_matches(text)
-        return ModerationResult(False, reason="profanity", details={"matches": matches})
+    # Un solo escaneo: veredicto, coincidencias y texto original censurado
+    scan = scan_text(text)
+    if not scan.allowed:
+        return ModerationResult(False, reason="profanity", details={
+            "matches": scan.matches,
+            "spans": scan.spans,
+            "censored": scan.censored,
+        })
     return ModerationResult(True)
 
 
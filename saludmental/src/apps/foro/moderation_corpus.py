@@ -0,0 +1,90 @@
+"""
+Corpus de regresión para la moderación local (ver bench_moderation).
+
+Cada muestra es (categoria, tamaño_objetivo, texto, esperado) donde `esperado`
+indica si el texto debería bloquearse. El corpus es determinista (semilla fija)
+para que los resultados sean comparables entre ejecuciones.
+"""
+import random
+from typing import List, NamedTuple
+
+TAMANOS = (50, 500, 5_000, 50_000)
+
+# Frases limpias en varios idiomas. Evitar palabras cortas que colisionan con
+# la lista (p. ej. "con" en español es una prohibida en francés).
+_LIMPIAS = {
+    "es": [
+        "Hoy fuimos al parque y hablamos sobre la semana.",
+        "Gracias por compartir tu historia, me sentí identificado.",
+        "El taller de respiración me ayudó a dormir mejor.",
+        "Mañana hay reunión del grupo a las siete de la noche.",
+    ],
+    "en": [
+        "Thank you for listening, the session was really helpful.",
+        "I went for a long walk and felt much calmer afterwards.",
+        "The class was great and everyone shared something personal.",
+    ],
+    "pt": [
+        "Obrigado pela conversa, foi muito importante para mim.",
+        "Hoje caminhei na praia e pensei na minha familia.",
+    ],
+    "fr": [
+        "Merci beaucoup pour la soirée, à la semaine prochaine.",
+        "Nous avons parlé de la fatigue et du sommeil.",
+    ],
+}
+
+# Profanidad ofuscada que el filtro agresivo debe detectar
+_OFUSCADAS = [
+    "m1erd@", "p.u.t.a", "hijueputa", "h.i.j.o d.e p.u.t.a", "g0n0rr3a",
+    "sh1t", "b!tch", "a$$hole", "c@r@lho", "m3rd3", "pendejooo", "idi0ta",
+]
+
+# Entradas hostiles: muchos separadores y casi-coincidencias que obligan al
+# motor de regex a explorar alternativas sin llegar a coincidir.
+_ADVERSARIAS = [
+    "p-u-t-", "m.i.e.r.d", "h.i.j.o.d.e.p.u.t", "f_u_c", "c.a.r.a.j",
+    "x_" * 20, ".-" * 30, "m i e r", "s.h.i", "g.o.n.o.r.r.e",
+]
+
+
+class Muestra(NamedTuple):
+    categoria: str
+    tamano: int
+    texto: str
+    esperado: bool
+
+
+def _rellenar(rnd: random.Random, frases: List[str], tamano: int) -> str:
+    """Concatena frases al azar hasta alcanzar `tamano` bytes (cortando en un espacio)."""
+    partes: List[str] = []
+    total = 0
+    while total < tamano:
+        frase = rnd.choice(frases)
+        partes.append(frase)
+        total += len(frase.encode("utf-8")) + 1
+    texto = " ".join(partes)
+    if len(texto) > tamano:
+        corte = texto.rfind(" ", 0, tamano)
+        texto = texto[:corte if corte > 0 else tamano]
+    return texto
+
+
+def build_corpus(seed: int = 1234, tamanos=TAMANOS, por_tamano: int = 4) -> List[Muestra]:
+    rnd = random.Random(seed)
+    limpias = [f for frases in _LIMPIAS.values() for f in frases]
+    corpus: List[Muestra] = []
+    for tamano in tamanos:
+        for _ in range(por_tamano):
+            base = _rellenar(rnd, limpias, tamano)
+            corpus.append(Muestra("limpio", tamano, base, False))
+
+            # Una sola palabra ofuscada en posición aleatoria
+            palabra = rnd.choice(_OFUSCADAS)
+            pos = base.rfind(" ", 0, rnd.randint(0, len(base))) + 1
+            corpus.append(Muestra("ofuscado", tamano, f"{base[:pos]}{palabra} {base[pos:]}", True))
+
+            # Relleno de casi-coincidencias separadas por espacios
+            ruido = _rellenar(rnd, _ADVERSARIAS, tamano)
+            corpus.append(Muestra("adversario", tamano, ruido, False))
+    return corpus
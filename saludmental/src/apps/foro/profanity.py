@@ -1,7 +1,7 @@
 import re
 import unicodedata
 from functools import lru_cache
-from typing import Iterable, List, Optional, Sequence, Set, Tuple
+from typing import Iterable, List, NamedTuple, Optional, Sequence, Set, Tuple
 from django.conf import settings
 
 # Listas multilingües (no exhaustivas) de insultos/profanidades genéricas
@@ -68,6 +68,56 @@ def _squeeze_repeats(text: str, keep: int = 2) -> str:
     """Reduce repeticiones consecutivas de un mismo carácter (p. ej., miiierda → miierda)."""
     return re.sub(rf"(.)\1{{{keep},}}", r"\1" * keep, text)
 
+_REPEATS_RE = re.compile(r"(.)\1{2,}")
+
+def _normalize_with_offsets(text: str, squeeze: bool = True) -> Tuple[str, List[int], List[int]]:
+    """Como _normalize (+ _squeeze_repeats), pero conservando el mapa de posiciones.
+
+    Devuelve (norm, starts, ends): el carácter norm[j] proviene de text[starts[j]:ends[j]].
+    Los caracteres que desaparecen al normalizar (acentos combinados, repeticiones
+    recortadas) se asignan al carácter anterior, así un span cubre todo el original.
+    """
+    if text.isascii():
+        # Camino rápido: el mapeo es 1:1
+        norm = text.translate(_LEET_MAP).lower()
+        starts = list(range(len(norm)))
+        ends = list(range(1, len(norm) + 1))
+    else:
+        parts: List[str] = []
+        starts = []
+        ends = []
+        for i, ch in enumerate(text):
+            folded = ch if ch.isascii() else unicodedata.normalize("NFKD", ch).encode("ascii", "ignore").decode("ascii")
+            if not folded:
+                if ends:
+                    ends[-1] = i + 1
+                continue
+            for c in folded:
+                parts.append(c)
+                starts.append(i)
+                ends.append(i + 1)
+        # translate y lower son 1:1 sobre ASCII, no alteran las posiciones
+        norm = "".join(parts).translate(_LEET_MAP).lower()
+
+    if squeeze and _REPEATS_RE.search(norm):
+        keep = 2
+        out: List[str] = []
+        n_starts: List[int] = []
+        n_ends: List[int] = []
+        prev = 0
+        for m in _REPEATS_RE.finditer(norm):
+            a, b = m.start(), m.end()
+            out.append(norm[prev:a + keep])
+            n_starts.extend(starts[prev:a + keep])
+            n_ends.extend(ends[prev:a + keep])
+            n_ends[-1] = ends[b - 1]
+            prev = b
+        out.append(norm[prev:])
+        n_starts.extend(starts[prev:])
+        n_ends.extend(ends[prev:])
+        norm, starts, ends = "".join(out), n_starts, n_ends
+    return norm, starts, ends
+
 def _build_word_regex(word: str, aggressive: bool) -> str:
     """Crea un patrón para una palabra. En modo agresivo tolera 0-1 separadores entre letras y plural común."""
     if aggressive:
@@ -133,7 +183,10 @@ def get_banned_matches(text: str, languages: Optional[Sequence[str]] = None, agg
     return [m.group(0) for m in pattern.finditer(norm)]
 
 def censor_text(text: str, languages: Optional[Sequence[str]] = None, aggressive: bool = True) -> str:
-    """Censura aproximada (sobre texto normalizado). Útil para logs internos, no para mostrar al usuario."""
+    """Censura aproximada (sobre texto normalizado). Útil para logs internos, no para mostrar al usuario.
+
+    Para censurar el texto original del usuario usar scan_text(...).censored.
+    """
     if not text:
         return text
     norm = _normalize(text)
@@ -142,3 +195,41 @@ def censor_text(text: str, languages: Optional[Sequence[str]] = None, aggressive
     langs_key = tuple(sorted(languages)) if languages else tuple(sorted(_BANNED_WORDS.keys()))
     pattern = _compiled_pattern(langs_key, aggressive)
     return pattern.sub(lambda m: "*" * len(m.group(0)), norm)
+
+
+class ScanResult(NamedTuple):
+    """Resultado de un escaneo: veredicto, spans sobre el texto original y versión censurada."""
+    allowed: bool
+    spans: List[Tuple[int, int]]
+    matches: List[str]
+    censored: str
+
+
+def scan_text(text: str, languages: Optional[Sequence[str]] = None, aggressive: bool = True, mask: str = "*") -> ScanResult:
+    """Escanea el texto una sola vez y devuelve veredicto, spans y el texto ORIGINAL censurado.
+
+    A diferencia de censor_text, los spans y la censura se aplican sobre el texto
+    tal como lo escribió el usuario (acentos, mayúsculas y separadores intactos).
+    """
+    if not text:
+        return ScanResult(True, [], [], text)
+    norm, starts, ends = _normalize_with_offsets(text, squeeze=aggressive)
+    langs_key = tuple(sorted(languages)) if languages else tuple(sorted(_BANNED_WORDS.keys()))
+    pattern = _compiled_pattern(langs_key, aggressive)
+    spans: List[Tuple[int, int]] = []
+    matches: List[str] = []
+    for m in pattern.finditer(norm):
+        if m.end() == m.start():
+            continue
+        spans.append((starts[m.start()], ends[m.end() - 1]))
+        matches.append(m.group(0))
+    if not spans:
+        return ScanResult(True, [], [], text)
+    out: List[str] = []
+    prev = 0
+    for a, b in spans:
+        out.append(text[prev:a])
+        out.append(mask * (b - a))
+        prev = b
+    out.append(text[prev:])
+    return ScanResult(False, spans, matches, "".join(out))
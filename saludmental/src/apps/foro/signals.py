@@ -0,0 +1,5 @@
+from django.dispatch import Signal
+
+# Enviada por rescan_moderation tras ocultar filas con un UPDATE masivo (sin post_save).
+# sender: el modelo; pks: las filas ocultadas. Las apps dueñas del modelo ajustan sus derivados.
+contenido_oculto = Signal()
@@ -1,3 +1,243 @@
-from django.test import TestCase
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from apps.usuarios.models import CustomUser
+
+from . import antispam
+from .models import Comentario, Historia
+from .management.commands.bench_moderation import Command as BenchModeration
+from .moderation_corpus import TAMANOS, build_corpus
+from .profanity import censor_text, contains_banned_words, scan_text
+
+
+class ScanTextTests(SimpleTestCase):
+    def test_texto_vacio_o_limpio(self):
+        self.assertEqual(scan_text(''), (True, [], [], ''))
+        resultado = scan_text('Gracias por compartir tu historia.')
+        self.assertTrue(resultado.allowed)
+        self.assertEqual(resultado.censored, 'Gracias por compartir tu historia.')
+
+    def test_spans_sobre_el_texto_original(self):
+        texto = 'Eso fue Ídiota y pendéjo, la verdad'
+        resultado = scan_text(texto)
+        self.assertFalse(resultado.allowed)
+        self.assertEqual([texto[a:b] for a, b in resultado.spans], ['Ídiota', 'pendéjo'])
+        # Se censura el original: acentos y mayúsculas del resto intactos, misma longitud
+        self.assertEqual(resultado.censored, 'Eso fue ****** y *******, la verdad')
+        self.assertEqual(len(resultado.censored), len(texto))
+
+    def test_separadores_ofuscados(self):
+        texto = 'eres un i.d.i.o.t.a.'
+        resultado = scan_text(texto)
+        self.assertFalse(resultado.allowed)
+        a, b = resultado.spans[0]
+        self.assertEqual(texto[a:b], 'i.d.i.o.t.a')
+        self.assertEqual(resultado.censored, 'eres un ***********.')
+
+    def test_mascara(self):
+        self.assertEqual(scan_text('pendejo', mask='#').censored, '#######')
+
+    def test_mismo_veredicto_que_contains_banned_words(self):
+        for muestra in build_corpus(tamanos=(50, 500), por_tamano=2):
+            with self.subTest(texto=muestra.texto[:40]):
+                self.assertEqual(scan_text(muestra.texto).allowed, not contains_banned_words(muestra.texto))
+
+    def test_censura_sin_cambiar_veredicto(self):
+        for muestra in build_corpus(tamanos=(50,), por_tamano=4):
+            censurado = scan_text(muestra.texto).censored
+            with self.subTest(texto=muestra.texto[:40]):
+                self.assertEqual(len(censurado), len(muestra.texto))
+                self.assertTrue(scan_text(censurado).allowed or censurado == censor_text(muestra.texto))
+
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'antispam-tests'}},
+    ANTISPAM_ENABLED=True, ANTISPAM_RATE_LIMIT=3, ANTISPAM_RATE_WINDOW=60,
+    ANTISPAM_DUP_MAX_USUARIO=1, ANTISPAM_DUP_MAX_GLOBAL=2, ANTISPAM_MIN_LEN=20,
+)
+class AntispamTests(SimpleTestCase):
+    TEXTO = (
+        'Hola a todos, quiero invitarlos a visitar mi pagina donde vendemos seguidores y likes a muy '
+        'buen precio para que sus perfiles crezcan rapido, escribanme por mensaje privado y les doy un '
+        'descuento especial solo por hoy, tambien tenemos planes mensuales con garantia y soporte todos '
+        'los dias de la semana para cualquier duda que tengan'
+    )
+
+    def setUp(self):
+        cache.clear()
+        self.ana = SimpleNamespace(pk=1)
+        self.beto = SimpleNamespace(pk=2)
+
+    def test_simhash_casi_iguales_cerca_y_distintos_lejos(self):
+        _exacto, tokens = antispam.fingerprint(self.TEXTO)
+        _exacto, casi = antispam.fingerprint(self.TEXTO + ' ya')
+        _exacto, otro = antispam.fingerprint('Hoy fui al parque con mi familia y la pasamos muy bien juntos')
+        firma = antispam._simhash(tokens)
+        self.assertLessEqual(bin(firma ^ antispam._simhash(casi)).count('1'), 3)
+        self.assertGreater(bin(firma ^ antispam._simhash(otro)).count('1'), 16)
+
+    def test_fingerprint_normaliza(self):
+        self.assertEqual(
+            antispam.fingerprint('Hóla   MUNDOOOO.')[0],
+            antispam.fingerprint('hola mundoo')[0],
+        )
+
+    def test_check_flood_no_escribe(self):
+        for _ in range(5):
+            self.assertTrue(antispam.check_flood(self.ana, self.TEXTO).allowed)
+
+    def test_duplicado_exacto_tras_registrar(self):
+        antispam.registrar(self.ana, self.TEXTO)
+        resultado = antispam.check_flood(self.ana, self.TEXTO.upper())
+        self.assertFalse(resultado.allowed)
+        self.assertEqual(resultado.reason, 'duplicado')
+        self.assertEqual(antispam.status_rechazo(resultado), 400)
+        # Otro usuario aún tiene cupo global
+        self.assertTrue(antispam.check_flood(self.beto, self.TEXTO).allowed)
+
+    def test_casi_duplicado_global(self):
+        antispam.registrar(self.ana, self.TEXTO)
+        antispam.registrar(self.beto, self.TEXTO + ' ya')
+        resultado = antispam.check_flood(SimpleNamespace(pk=3), self.TEXTO + ' ya')
+        self.assertFalse(resultado.allowed)
+        self.assertEqual(resultado.details, {'tipo': 'similar'})
+
+    def test_textos_cortos_no_cuentan_como_duplicado(self):
+        antispam.registrar(self.ana, 'gracias')
+        self.assertTrue(antispam.check_flood(self.ana, 'gracias').allowed)
+
+    def test_ritmo(self):
+        for i in range(3):
+            self.assertTrue(antispam.check_flood(self.ana, f'ok {i}').allowed)
+            antispam.registrar(self.ana, f'ok {i}')
+        resultado = antispam.check_flood(self.ana, 'ok 4')
+        self.assertEqual(resultado.reason, 'flood')
+        self.assertEqual(antispam.status_rechazo(resultado), 429)
+
+    def test_bandas_como_anillo(self):
+        for i in range(antispam._MAX_POR_BANDA + 5):
+            antispam.registrar(SimpleNamespace(pk=100 + i), self.TEXTO)
+        claves = antispam._claves_bandas(antispam._simhash(antispam.fingerprint(self.TEXTO)[1]))
+        self.assertEqual(len(antispam._entradas_bandas(claves[:1])), antispam._MAX_POR_BANDA)
+
+
+@override_settings(MODERATION_BACKEND='local')
+class RescanModerationTests(TestCase):
+    def setUp(self):
+        self.ana = CustomUser.objects.create_user(username='ana', email='ana@example.com', password='x')
+        self.historia = Historia.objects.create(usuario=self.ana, titulo='Mi historia', contenido='Hoy estuve mejor.')
+        self.comentario = Comentario.objects.create(usuario=self.ana, historia=self.historia, texto='Gracias por compartir.')
+        directorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directorio, ignore_errors=True)
+        self.checkpoint = os.path.join(directorio, 'rescan.json')
+
+    def reescanear(self, *modelos):
+        salida = StringIO()
+        # El comando cierra las conexiones viejas entre bloques; la del TestCase está dentro de su transacción
+        with mock.patch('apps.foro.management.commands.rescan_moderation.close_old_connections'):
+            call_command(
+                'rescan_moderation', '--workers', '1', '--checkpoint', self.checkpoint,
+                *(['--modelos', *modelos] if modelos else []), stdout=salida,
+            )
+        return salida.getvalue()
+
+    def test_segunda_ejecucion_revisa_todo(self):
+        self.reescanear('historia', 'comentario')
+        self.comentario.refresh_from_db()
+        self.assertFalse(self.comentario.marcado)
+        self.assertFalse(os.path.exists(self.checkpoint))
+        # Cambió el contenido (o la lista de palabras): el siguiente reescaneo lo ve
+        Comentario.objects.filter(pk=self.comentario.pk).update(texto='eres un idiota')
+        salida = self.reescanear('historia', 'comentario')
+        self.assertNotIn('reanudando', salida)
+        self.comentario.refresh_from_db()
+        self.assertTrue(self.comentario.marcado)
+
+    def test_reanuda_una_ejecucion_interrumpida(self):
+        otro = Comentario.objects.create(usuario=self.ana, historia=self.historia, texto='eres un idiota')
+        Historia.objects.filter(pk=self.historia.pk).update(contenido='eres un idiota')
+        Comentario.objects.filter(pk=self.comentario.pk).update(texto='eres un idiota')
+        with open(self.checkpoint, 'w', encoding='utf-8') as f:
+            json.dump({'completos': ['historia'], 'comentario': self.comentario.pk}, f)
+        salida = self.reescanear('historia', 'comentario')
+        self.assertIn(f'reanudando desde pk>{self.comentario.pk}', salida)
+        # La historia ya estaba completa y el primer comentario antes del checkpoint
+        self.assertEqual(
+            list(Comentario.objects.filter(marcado=True).values_list('pk', flat=True)), [otro.pk],
+        )
+        self.assertFalse(Historia.objects.filter(marcado=True).exists())
+        self.assertFalse(os.path.exists(self.checkpoint))
+
+
+def _corpus_corto(seed):
+    return build_corpus(seed=seed, tamanos=(50, 500), por_tamano=2)
+
+
+@override_settings(MODERATION_BACKEND='local', AZURE_CONTENT_SAFETY_ENDPOINT='', AZURE_CONTENT_SAFETY_KEY='')
+class BenchModerationTests(SimpleTestCase):
+    def setUp(self):
+        directorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directorio, ignore_errors=True)
+        self.baseline = os.path.join(directorio, 'bench.json')
+        parche = mock.patch('apps.foro.management.commands.bench_moderation.build_corpus', _corpus_corto)
+        parche.start()
+        self.addCleanup(parche.stop)
+
+    def bench(self, *args):
+        salida = StringIO()
+        call_command('bench_moderation', '--tiempo', '0', '--rondas', '1', '--baseline', self.baseline, *args, stdout=salida)
+        return salida.getvalue()
+
+    def test_corpus_determinista_y_etiquetado(self):
+        corpus = build_corpus(tamanos=(50,), por_tamano=3)
+        self.assertEqual(corpus, build_corpus(tamanos=(50,), por_tamano=3))
+        self.assertNotEqual(corpus, build_corpus(seed=1, tamanos=(50,), por_tamano=3))
+        self.assertEqual({m.categoria for m in corpus}, {'limpio', 'ofuscado', 'adversario'})
+        self.assertTrue(all(m.esperado == (m.categoria == 'ofuscado') for m in corpus))
+        for m in build_corpus(tamanos=TAMANOS[:2], por_tamano=1):
+            if m.categoria != 'ofuscado':
+                self.assertLessEqual(len(m.texto), m.tamano)
+
+    def test_guardar_y_comparar_sin_regresion(self):
+        self.assertIn('guardados', self.bench('--guardar'))
+        base = json.load(open(self.baseline, encoding='utf-8'))
+        self.assertEqual(base['precision'], {'local': 1.0})
+        self.assertIn('moderate_text[local]|ofuscado|50', base['tiempos'])
+        self.assertIn('Sin regresiones', self.bench('--max-regresion', '1000'))
+
+    def test_regresion_de_tiempo_o_precision_falla(self):
+        self.bench('--guardar')
+        base = json.load(open(self.baseline, encoding='utf-8'))
+        for medida in base['tiempos'].values():
+            medida['p99_ms'] = 1e-6
+        with open(self.baseline, 'w', encoding='utf-8') as f:
+            json.dump(base, f)
+        with self.assertRaises(CommandError):
+            self.bench()
+
+    def test_umbrales(self):
+        base = {'precision': {'local': 1.0}, 'tiempos': {'f|limpio|50': {'ops': 1, 'p99_ms': 2.0}}}
+        opciones = {'max_regresion': 1.5}
+        igual = {'precision': {'local': 1.0}, 'tiempos': {'f|limpio|50': {'ops': 1, 'p99_ms': 2.9}}}
+        self.assertEqual(BenchModeration()._comparar(base, igual, opciones), [])
+        peor = {'precision': {'local': 0.9}, 'tiempos': {'f|limpio|50': {'ops': 1, 'p99_ms': 3.1}}}
+        fallos = BenchModeration()._comparar(base, peor, opciones)
+        self.assertEqual(len(fallos), 2)
+        self.assertTrue(fallos[0].startswith('precisión local'))
+
+    def test_tope_absoluto_por_llamada(self):
+        with self.assertRaisesMessage(CommandError, 'regresión'):
+            self.bench('--guardar', '--max-ms', '0')
+
+    def test_baseline_inexistente(self):
+        with self.assertRaisesMessage(CommandError, 'No existe el baseline'):
+            self.bench()
@@ -5,10 +5,11 @@ from django.contrib import messages
 from django.utils.translation import gettext as _
 from .forms import HistoriaForm
 from .moderation import moderate_text
+from .antispam import rechazo_flood, registrar
 from .models import Historia, Comentario, Like, LikeComentario
 from apps.usuarios.models import Notificacion
 from django.http import JsonResponse, HttpResponseForbidden
-from django.db.models import Count
+from django.db.models import Count, Prefetch, Q
 from django.urls import reverse
 from django.template.loader import render_to_string
 from apps.usuarios.email_utils import (
@@ -58,15 +59,19 @@ def crear_historia(request):
 def historia_detalle(request, pk):
     historia = get_object_or_404(Historia, pk=pk)
 
+    # Los comentarios ocultados por moderación no se muestran al público
     comentarios = (
         Comentario.objects
-        .filter(historia=historia, parent__isnull=True)
+        .filter(historia=historia, parent__isnull=True, oculto=False)
         .annotate(
             likes_count=Count('likecomentario', distinct=True),
-            replies_count=Count('respuestas', distinct=True),
+            replies_count=Count('respuestas', filter=Q(respuestas__oculto=False), distinct=True),
         )
         .select_related("usuario")
-        .prefetch_related("respuestas__usuario")
+        .prefetch_related(Prefetch(
+            "respuestas",
+            queryset=Comentario.objects.filter(oculto=False).select_related("usuario"),
+        ))
         .order_by('-likes_count', '-replies_count', '-fecha')
     )
 
@@ -90,7 +95,7 @@ def historia_detalle(request, pk):
         )
     }
 
-    comentarios_total = Comentario.objects.filter(historia=historia).count()
+    comentarios_total = Comentario.objects.filter(historia=historia, oculto=False).count()
 
     return render(request, "foro/historia_detalle.html", {
         "historia": historia,
@@ -200,6 +205,11 @@ def editar_comentario(request, pk):
         error = _("El texto no puede estar vacío.")
         messages.error(request, error)
     else:
+        # Editar sin cambiar el texto no cuenta como nueva publicación
+        cambio = texto != comentario.texto
+        rechazo = rechazo_flood(request, texto, reverse("historia_detalle", args=[comentario.historia_id])) if cambio else None
+        if rechazo:
+            return rechazo
         mod = moderate_text(texto)
         if not mod.allowed:
             error = _("Tu comentario contiene contenido no permitido.")
@@ -207,6 +217,8 @@ def editar_comentario(request, pk):
         else:
             comentario.texto = texto
             comentario.save()
+            if cambio:
+                registrar(request.user, texto)
             messages.success(request, _("Comentario actualizado."))
             ok = True
     if request.headers.get('x-requested-with') == 'XMLHttpRequest':
@@ -231,6 +243,10 @@ def comentar_historia(request, pk):
                 if request.headers.get('x-requested-with') == 'XMLHttpRequest':
                     return JsonResponse({"ok": False, "error": msg}, status=400)
             else:
+                # Prefiltro barato: flood y duplicados antes de moderar o escribir en BD
+                rechazo = rechazo_flood(request, texto, reverse("historia_detalle", args=[pk]))
+                if rechazo:
+                    return rechazo
                 mod = moderate_text(texto)
                 if not mod.allowed:
                     msg = _("Tu comentario contiene contenido no permitido.")
@@ -239,6 +255,7 @@ def comentar_historia(request, pk):
                         return JsonResponse({"ok": False, "error": msg}, status=400)
                 else:
                     c = Comentario.objects.create(historia=historia, usuario=request.user, texto=texto)
+                    registrar(request.user, texto)
                     
                     # Crear notificación para el autor de la historia
                     if historia.usuario != request.user:
@@ -299,6 +316,9 @@ def responder_comentario(request, pk):
         if request.headers.get('x-requested-with') == 'XMLHttpRequest':
             return JsonResponse({"ok": False, "error": msg}, status=400)
     else:
+        rechazo = rechazo_flood(request, texto, reverse("historia_detalle", args=[parent.historia_id]))
+        if rechazo:
+            return rechazo
         mod = moderate_text(texto)
         if not mod.allowed:
             msg = _("Tu respuesta contiene contenido no permitido.")
@@ -312,6 +332,7 @@ def responder_comentario(request, pk):
                 texto=texto,
                 parent=parent,
             )
+            registrar(request.user, texto)
             
             # Crear notificación para el autor del comentario padre
             if parent.usuario != request.user:
@@ -301,6 +301,42 @@ def enviar_notificacion_inscripcion_evento(usuario_staff, usuario_inscrito, even
     )
 
 
+def enviar_notificacion_cupo_liberado(usuario_destinatario, evento_titulo, url_evento):
+    """Envía notificación por email cuando un usuario pasa de la lista de espera a inscrito"""
+    asunto = f"Tienes cupo: {evento_titulo}"
+    mensaje = f"Se liberó un cupo y ya estás inscrito a: {evento_titulo}"
+    
+    mensaje_html = f"""
+    <html>
+        <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
+            <div style="max-width: 600px; margin: 0 auto; padding: 20px;">
+                <h2 style="color: #2c3e50;">✅ ¡Tienes cupo!</h2>
+                <p>Se liberó un cupo en <strong>"{evento_titulo}"</strong> y pasaste de la lista de espera a inscrito.</p>
+                <div style="margin: 30px 0;">
+                    <a href="{url_evento}" 
+                       style="background-color: #16a085; color: white; padding: 12px 24px; 
+                              text-decoration: none; border-radius: 5px; display: inline-block;">
+                        Ver detalles del evento
+                    </a>
+                </div>
+                <hr style="border: none; border-top: 1px solid #eee; margin: 30px 0;">
+                <p style="color: #7f8c8d; font-size: 12px;">
+                    Este es un correo automático de Iterum. Por favor no respondas a este mensaje.
+                </p>
+            </div>
+        </body>
+    </html>
+    """
+    
+    return enviar_email_notificacion(
+        destinatario_email=usuario_destinatario.email,
+        asunto=asunto,
+        mensaje_texto=mensaje,
+        mensaje_html=mensaje_html,
+        url_accion=url_evento
+    )
+
+
 def enviar_notificacion_comentario_evento(usuario_destinatario, usuario_origen, evento_titulo, url_comentario):
     """Envía notificación por email cuando alguien comenta en un evento"""
     asunto = f"{usuario_origen} comentó en {evento_titulo}"
@@ -10,10 +10,18 @@ class CustomUser(AbstractUser):
     bio = models.TextField(blank=True, null=True)
     phone_code = models.CharField(max_length=6, blank=True, null=True)  # Indicativo internacional
     phone_number = models.CharField(max_length=20, blank=True, null=True)  # Solo el número
+    # Entra en la firma de la URL del calendario personal (.ics); cambiarlo la anula (apps/agenda/ical.py)
+    token_calendario = models.CharField(max_length=64, unique=True, null=True, blank=True, editable=False)
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username']
 
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            # Lista de usuarios del panel ordenada por registro (apps/agenda/tablas.py)
+            models.Index(fields=['date_joined', 'id']),
+        ]
+
     def __str__(self):
         return self.email
 
@@ -41,6 +49,9 @@ class Notificacion(models.Model):
     
     class Meta:
         ordering = ['-fecha']
+        indexes = [
+            models.Index(fields=['usuario', 'fecha', 'id']),
+        ]
     
     def __str__(self):
         return f"{self.usuario.username} - {self.mensaje}"
@@ -15,8 +15,8 @@ class Custom404Middleware:
     def __call__(self, request):
         response = self.get_response(request)
         
-        # Si es un 404, redirigir a home con mensaje
-        if response.status_code == 404:
+        # Si es un 404, redirigir a home con mensaje (los 404 de las vistas JSON llegan tal cual al cliente)
+        if response.status_code == 404 and not response.get('Content-Type', '').startswith('application/json'):
             messages.warning(request, _("La página que buscas no está disponible o no existe."))
             return redirect('home')
         
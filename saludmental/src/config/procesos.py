@@ -0,0 +1,14 @@
+"""
+Utilidades para los comandos que reparten trabajo en un ProcessPoolExecutor
+(rescan_moderation, backfill_phash).
+"""
+import os
+
+
+def init_worker():
+    """Inicializa Django en procesos hijos creados con 'spawn'."""
+    import django
+    from django.conf import settings
+    if not settings.configured:
+        os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+    django.setup()
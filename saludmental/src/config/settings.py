@@ -76,6 +76,11 @@ DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": BASE_DIR / "db.sqlite3",  # ya funciona con Path
+        # Segundos que una escritura espera el bloqueo de SQLite antes de fallar (picos de inscripciones)
+        "OPTIONS": {"timeout": int(os.getenv("SQLITE_TIMEOUT", "20"))},
+        # Las pruebas usan un archivo: en la base en memoria compartida SQLite no espera el
+        # bloqueo entre hilos ("database table is locked") y las de concurrencia no servirían
+        "TEST": {"NAME": BASE_DIR / "test_db.sqlite3"},
     }
 }
 
@@ -140,6 +145,56 @@ STATIC_ROOT = BASE_DIR / "staticfiles"   # para collectstatic en producción
 # Media files (subidas de usuarios)
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
+# Media direccionada por contenido: archivos idénticos comparten un blob (ver config/storage.py y media_gc)
+STORAGES = {
+    "default": {
+        "BACKEND": os.getenv("MEDIA_STORAGE_BACKEND", "config.storage.ContentAddressedStorage"),
+    },
+    "staticfiles": {
+        "BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage",
+    },
+}
+# Permite soltar lotes grandes de fotos de un evento en una sola subida (Django limita a 100)
+DATA_UPLOAD_MAX_NUMBER_FILES = int(os.getenv("DATA_UPLOAD_MAX_NUMBER_FILES", "250"))
+# Anchos (px) de las derivadas responsivas de imágenes y hilos que las generan
+IMAGENES_ANCHOS = (64, 160, 320, 640, 1280)
+IMAGENES_WORKERS = int(os.getenv("IMAGENES_WORKERS", "2"))
+# Segundos que el índice de derivadas de una imagen vive en cache (media_gc borra los de nombres liberados)
+IMAGENES_CACHE_TIMEOUT = int(os.getenv("IMAGENES_CACHE_TIMEOUT", str(24 * 3600)))
+# Distancia de Hamming (bits de 64) a partir de la cual dos fotos de un evento se consideran casi iguales
+FOTOS_PHASH_DISTANCIA = int(os.getenv("FOTOS_PHASH_DISTANCIA", "6"))
+# Hilos para notificaciones y correos fuera de la petición (apps/agenda/tareas.py)
+TAREAS_WORKERS = int(os.getenv("TAREAS_WORKERS", "2"))
+# Usuarios por lote al avisar de un evento publicado (comando publicar_eventos)
+PUBLICACION_LOTE = int(os.getenv("PUBLICACION_LOTE", "500"))
+# Totales del dashboard (apps/agenda/estadisticas.py): antigüedad máxima antes de refrescar
+# en segundo plano y uso de conteos estimados (PostgreSQL) para tablas grandes
+ESTADISTICAS_MAX_EDAD = int(os.getenv("ESTADISTICAS_MAX_EDAD", "600"))
+ESTADISTICAS_ESTIMADAS = os.getenv("ESTADISTICAS_ESTIMADAS", "False").lower() in {"1","true","yes","on"}
+# Zona en la que se cortan los días de las series del dashboard (resumenes.py)
+ESTADISTICAS_ZONA = os.getenv("ESTADISTICAS_ZONA", "America/Bogota")
+# Filas por bloque al leer las exportaciones CSV/XLSX (apps/agenda/exportar.py)
+EXPORTAR_LOTE = int(os.getenv("EXPORTAR_LOTE", "2000"))
+
+# =============================
+# Cache
+# =============================
+# LocMemCache es por proceso: con varios workers usar un backend compartido
+# (Redis/Memcached) para que la invalidación de la agenda y el anti-spam apliquen a todos.
+CACHES = {
+    "default": {
+        "BACKEND": os.getenv("CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"),
+        "LOCATION": os.getenv("CACHE_LOCATION", "iterum-default"),
+    }
+}
+# Segundos máximos que se cachea la lista de próximos eventos
+AGENDA_CACHE_TIMEOUT = int(os.getenv("AGENDA_CACHE_TIMEOUT", "300"))
+# Duración en minutos de un evento en los feeds .ics (Evento solo guarda el inicio)
+AGENDA_DURACION_EVENTO = int(os.getenv("AGENDA_DURACION_EVENTO", "60"))
+# Días hacia adelante en que se expanden las series en la agenda (ver apps/agenda/ocurrencias.py)
+AGENDA_VENTANA_DIAS = int(os.getenv("AGENDA_VENTANA_DIAS", "90"))
+# Títulos por día en la vista de calendario (ver apps/agenda/calendario.py)
+AGENDA_CALENDARIO_TITULOS = int(os.getenv("AGENDA_CALENDARIO_TITULOS", "3"))
 
 # Default primary key field type
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
@@ -179,6 +234,22 @@ AZURE_CONTENT_SAFETY_CATEGORIES = (
 # 0: Safe, 1: Low, 2: Medium, 3: High, 4: VeryHigh
 AZURE_CONTENT_SAFETY_THRESHOLD = int(os.getenv("AZURE_CONTENT_SAFETY_THRESHOLD", "2"))
 
+# =============================
+# Prefiltro anti-spam (flood y duplicados) previo a la moderación
+# =============================
+ANTISPAM_ENABLED = os.getenv("ANTISPAM_ENABLED", "True").lower() in {"1","true","yes","on"}
+# Máximo de comentarios por usuario en la ventana (segundos)
+ANTISPAM_RATE_LIMIT = int(os.getenv("ANTISPAM_RATE_LIMIT", "5"))
+ANTISPAM_RATE_WINDOW = int(os.getenv("ANTISPAM_RATE_WINDOW", "60"))
+# Copias (exactas o casi idénticas) permitidas por usuario y en total dentro de la ventana
+ANTISPAM_DUP_WINDOW = int(os.getenv("ANTISPAM_DUP_WINDOW", "3600"))
+ANTISPAM_DUP_MAX_USUARIO = int(os.getenv("ANTISPAM_DUP_MAX_USUARIO", "2"))
+ANTISPAM_DUP_MAX_GLOBAL = int(os.getenv("ANTISPAM_DUP_MAX_GLOBAL", "5"))
+# Distancia de hamming máxima entre simhash para considerar dos textos casi iguales
+ANTISPAM_HAMMING = int(os.getenv("ANTISPAM_HAMMING", "3"))
+# Longitud mínima (texto normalizado) para vigilar duplicados; los textos cortos se repiten legítimamente
+ANTISPAM_MIN_LEN = int(os.getenv("ANTISPAM_MIN_LEN", "20"))
+
 # =============================
 # Palabras extra para el filtro local (por idioma)
 # =============================
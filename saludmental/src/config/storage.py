@@ -0,0 +1,117 @@
+"""
+Storage de media direccionado por contenido.
+
+Cada archivo guardado se escribe una sola vez como blob en
+`MEDIA_ROOT/.blobs/<aa>/<bb>/<sha256>` y la ruta que ve Django (la de
+upload_to, p. ej. eventos/fotos/foto.jpg) es un hard link a ese blob. Subir los
+mismos bytes a dos eventos crea dos nombres pero ocupa disco una sola vez, y
+las URLs y rutas existentes no cambian.
+
+El contador de referencias de un blob es su número de enlaces del sistema de
+archivos (st_nlink - 1). Borrar un nombre solo quita un enlace; los blobs sin
+nombres y los nombres que ya no referencia ninguna fila los recupera el
+comando media_gc. Si el sistema de archivos no admite hard links se copia el
+blob (se pierde la deduplicación, no la corrección).
+"""
+import errno
+import hashlib
+import os
+import shutil
+import tempfile
+
+from django.core.files.move import file_move_safe
+from django.core.files.storage import FileSystemStorage
+
+DIR_BLOBS = '.blobs'
+TAM_BLOQUE = 1024 * 1024
+
+
+def _sha256_archivo(ruta) -> str:
+    sha = hashlib.sha256()
+    with open(ruta, 'rb') as f:
+        for chunk in iter(lambda: f.read(TAM_BLOQUE), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+class ContentAddressedStorage(FileSystemStorage):
+
+    @property
+    def blobs_location(self):
+        return os.path.join(self.location, DIR_BLOBS)
+
+    def ruta_blob(self, digest: str) -> str:
+        return os.path.join(self.blobs_location, digest[:2], digest[2:4], digest)
+
+    def _save(self, name, content):
+        tmp_dir = os.path.join(self.blobs_location, 'tmp')
+        os.makedirs(tmp_dir, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=tmp_dir)
+        try:
+            if hasattr(content, 'temporary_file_path'):
+                # Subida grande ya en disco: hashear por bloques y moverla, como FileSystemStorage
+                os.close(fd)
+                origen = content.temporary_file_path()
+                digest = _sha256_archivo(origen)
+                file_move_safe(origen, tmp, allow_overwrite=True)
+            else:
+                # Una sola pasada: se hashea mientras se escribe
+                sha = hashlib.sha256()
+                with os.fdopen(fd, 'wb') as out:
+                    if hasattr(content, 'seek'):
+                        content.seek(0)
+                    for chunk in content.chunks(TAM_BLOQUE):
+                        sha.update(chunk)
+                        out.write(chunk)
+                digest = sha.hexdigest()
+            blob = self.ruta_blob(digest)
+            os.makedirs(os.path.dirname(blob), exist_ok=True)
+            if self.file_permissions_mode is not None:
+                os.chmod(tmp, self.file_permissions_mode)
+            try:
+                os.link(tmp, blob)
+            except FileExistsError:
+                pass  # mismo contenido ya almacenado
+            except OSError as e:
+                if e.errno not in (errno.EXDEV, errno.EPERM, errno.EMLINK):
+                    raise
+                blob = tmp  # sin hard links: el nombre será una copia
+            return self._enlazar(name, blob, tmp)
+        finally:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+
+    def _enlazar(self, name, blob, tmp):
+        """Crea `name` como enlace al blob, resolviendo colisiones igual que FileSystemStorage."""
+        while True:
+            full_path = self.path(name)
+            directory = os.path.dirname(full_path)
+            os.makedirs(directory, exist_ok=True)
+            if self.directory_permissions_mode is not None:
+                os.chmod(directory, self.directory_permissions_mode)
+            try:
+                try:
+                    os.link(blob, full_path)
+                except FileNotFoundError:
+                    # media_gc recogió el blob entre medias: enlazar desde el temporal y restaurarlo
+                    os.link(tmp, full_path)
+                    try:
+                        os.link(tmp, blob)
+                    except FileExistsError:
+                        pass
+            except FileExistsError:
+                name = self.get_available_name(name)
+                continue
+            except OSError as e:
+                if e.errno not in (errno.EXDEV, errno.EPERM, errno.EMLINK):
+                    raise
+                if os.path.exists(full_path):
+                    name = self.get_available_name(name)
+                    continue
+                shutil.copyfile(blob, full_path)
+            break
+        return str(name).replace('\\', '/')
+
+    def referencias(self, name) -> int:
+        """Cuántos nombres comparten el contenido de `name` (incluido él mismo)."""
+        return max(1, os.stat(self.path(name)).st_nlink - 1)